@@ -1,10 +1,13 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import argparse
+import queue
+import threading
+import time
 
 import cv2
 import mmcv
 
-from mmdet.apis import inference_detector, init_detector
+from mmdet.apis import VideoInference, init_detector
 from projects import *
 
 
@@ -17,6 +20,17 @@ def parse_args():
         '--device', default='cuda:0', help='Device used for inference')
     parser.add_argument(
         '--score-thr', type=float, default=0.3, help='Bbox score threshold')
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=4,
+        help='Number of frames forwarded together')
+    parser.add_argument(
+        '--frame-stride',
+        type=int,
+        default=1,
+        help='Run the detector on every n-th frame and interpolate the '
+        'boxes of the frames in between')
     parser.add_argument('--out', type=str, help='Output video file')
     parser.add_argument('--show', action='store_true', help='Show video')
     parser.add_argument(
@@ -38,25 +52,56 @@ def main():
 
     video_reader = mmcv.VideoReader(args.video)
     video_writer = None
+    write_queue = queue.Queue(32)
+    write_time = 0.
+
+    def write_frames():
+        nonlocal write_time
+        while True:
+            frame = write_queue.get()
+            if frame is None:
+                return
+            start = time.perf_counter()
+            video_writer.write(frame)
+            write_time += time.perf_counter() - start
+
     if args.out:
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
         video_writer = cv2.VideoWriter(
             args.out, fourcc, video_reader.fps,
             (video_reader.width, video_reader.height))
+        # encode in the background while the next frames are drawn
+        writer_thread = threading.Thread(target=write_frames, daemon=True)
+        writer_thread.start()
 
-    for frame in mmcv.track_iter_progress(video_reader):
-        result = inference_detector(model, frame)
+    video_inference = VideoInference(
+        model, batch_size=args.batch_size, frame_stride=args.frame_stride)
+    draw_time = 0.
+    prog_bar = mmcv.ProgressBar(len(video_reader))
+    for frame, result in video_inference(video_reader):
+        start = time.perf_counter()
         frame = model.show_result(frame, result, score_thr=args.score_thr)
+        draw_time += time.perf_counter() - start
         if args.show:
             cv2.namedWindow('video', 0)
             mmcv.imshow(frame, 'video', args.wait_time)
         if args.out:
-            video_writer.write(frame)
+            write_queue.put(frame)
+        prog_bar.update()
 
     if video_writer:
+        write_queue.put(None)
+        writer_thread.join()
         video_writer.release()
     cv2.destroyAllWindows()
 
+    stats = video_inference.stats
+    print(f'\n{stats["frames"]} frames, {stats["key_frames"]} key frames, '
+          f'{stats["fps"]:.2f} fps')
+    stage_times = dict(stats['stage_times'], draw=draw_time, write=write_time)
+    for name, stage_time in stage_times.items():
+        print(f'{name}: {stage_time * 1000 / max(stats["frames"], 1):.2f} '
+              'ms / frame')
 
 if __name__ == '__main__':
     main()
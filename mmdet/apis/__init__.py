@@ -1,12 +1,17 @@
 # Copyright (c) OpenMMLab. All rights reserved.
-from .inference import (async_inference_detector, inference_detector,
-                        init_detector, show_result_pyplot)
+from .inference import (DetectorEngine, async_inference_detector,
+                        inference_detector, init_detector, show_result_pyplot)
+from .service import (InferenceService, det_result_to_json,
+                      encode_det_result)
 from .test import multi_gpu_test, single_gpu_test
 from .train import (get_root_logger, init_random_seed, set_random_seed,
                     train_detector)
+from .video import VideoInference, interpolate_bbox_results
 
 __all__ = [
     'get_root_logger', 'set_random_seed', 'train_detector', 'init_detector',
     'async_inference_detector', 'inference_detector', 'show_result_pyplot',
-    'multi_gpu_test', 'single_gpu_test', 'init_random_seed'
+    'multi_gpu_test', 'single_gpu_test', 'init_random_seed', 'DetectorEngine',
+    'InferenceService', 'encode_det_result', 'det_result_to_json',
+    'VideoInference', 'interpolate_bbox_results'
 ]
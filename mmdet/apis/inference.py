@@ -1,5 +1,9 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+import asyncio
+import copy
+import math
 import warnings
+from collections import OrderedDict
 from pathlib import Path
 
 import mmcv
@@ -91,127 +95,235 @@ class LoadImage:
         return results
 
 
-def inference_detector(model, imgs):
-    """Inference image(s) with the detector.
+class DetectorEngine:
+    """Persistent, shape-bucketed batch inference engine for a detector.
 
-    Args:
-        model (nn.Module): The loaded detector.
-        imgs (str/ndarray or list[str/ndarray] or tuple[str/ndarray]):
-           Either image files or loaded images.
+    :func:`inference_detector` used to rebuild the test pipeline on every
+    call and collate all the given images into one padded batch, so a single
+    large image inflated the padding of every other image. The engine builds
+    the test pipeline once, groups the preprocessed images into buckets of
+    similar padded size and forwards each bucket in batches of at most
+    ``max_batch_size`` images.
 
-    Returns:
-        If imgs is a list or tuple, the same length list type results
-        will be returned, otherwise return the detection results directly.
+    Args:
+        model (nn.Module): The loaded detector, see :func:`init_detector`.
+        max_batch_size (int, optional): Maximum number of images forwarded
+            together. If None, a whole bucket is forwarded at once.
+            Default: 4.
+        bucket_size (int): Granularity in pixels of the size buckets. Images
+            whose padded height and width round up to the same multiple of
+            ``bucket_size`` share a bucket, so the padding added by batching
+            is less than ``bucket_size`` pixels per side. Default: 32.
+
+    Example:
+        >>> model = init_detector(config_file, checkpoint_file)
+        >>> engine = DetectorEngine(model, max_batch_size=8)
+        >>> results = engine(['frame_0.jpg', 'frame_1.jpg', 'portrait.jpg'])
     """
 
-    if isinstance(imgs, (list, tuple)):
-        is_batch = True
-    else:
-        imgs = [imgs]
-        is_batch = False
+    def __init__(self, model, max_batch_size=4, bucket_size=32):
+        assert max_batch_size is None or max_batch_size >= 1
+        assert bucket_size >= 1
+        self.model = model
+        self.cfg = model.cfg
+        self.max_batch_size = max_batch_size
+        self.bucket_size = bucket_size
+        self._pipelines = dict()
+        self._pipeline_cfg = None
+
+        param = next(model.parameters())
+        self.device = param.device
+        self.is_cuda = param.is_cuda
+        if not self.is_cuda:
+            for m in model.modules():
+                assert not isinstance(
+                    m, RoIPool
+                ), 'CPU inference with RoIPool is not supported currently.'
+
+    def get_pipeline(self, from_ndarray):
+        """Get the test pipeline, building it on first use.
+
+        The pipelines are rebuilt when ``cfg.data.test.pipeline`` differs
+        from the config they were built from, e.g. after it was edited in
+        place.
 
-    cfg = model.cfg
-    device = next(model.parameters()).device  # model device
+        Args:
+            from_ndarray (bool): Whether the inputs are loaded images rather
+                than image files.
 
-    if isinstance(imgs[0], np.ndarray):
-        cfg = cfg.copy()
-        # set loading pipeline type
-        cfg.data.test.pipeline[0].type = 'LoadImageFromWebcam'
+        Returns:
+            :obj:`Compose`: The batch-ready test pipeline.
+        """
+        if self.cfg.data.test.pipeline != self._pipeline_cfg:
+            self._pipelines = dict()
+            self._pipeline_cfg = copy.deepcopy(self.cfg.data.test.pipeline)
+        if from_ndarray not in self._pipelines:
+            pipeline = copy.deepcopy(self.cfg.data.test.pipeline)
+            if from_ndarray:
+                # set loading pipeline type
+                pipeline[0].type = 'LoadImageFromWebcam'
+            pipeline = replace_ImageToTensor(pipeline)
+            self._pipelines[from_ndarray] = Compose(pipeline)
+        return self._pipelines[from_ndarray]
+
+    def preprocess(self, img):
+        """Run the test pipeline on a single image.
 
-    cfg.data.test.pipeline = replace_ImageToTensor(cfg.data.test.pipeline)
-    test_pipeline = Compose(cfg.data.test.pipeline)
+        Args:
+            img (str | ndarray): Image file or loaded image.
 
-    datas = []
-    for img in imgs:
-        # prepare data
+        Returns:
+            dict: The processed data of the image.
+        """
         if isinstance(img, np.ndarray):
             # directly add img
             data = dict(img=img)
         else:
             # add information into dict
             data = dict(img_info=dict(filename=img), img_prefix=None)
-        # build the data pipeline
-        data = test_pipeline(data)
-        datas.append(data)
-
-    data = collate(datas, samples_per_gpu=len(imgs))
-    # just get the actual data from DataContainer
-    data['img_metas'] = [img_metas.data[0] for img_metas in data['img_metas']]
-    data['img'] = [img.data[0] for img in data['img']]
-    if next(model.parameters()).is_cuda:
-        # scatter to specified GPU
-        data = scatter(data, [device])[0]
-    else:
-        for m in model.modules():
-            assert not isinstance(
-                m, RoIPool
-            ), 'CPU inference with RoIPool is not supported currently.'
-
-    # forward the model
-    with torch.no_grad():
-        results = model(return_loss=False, rescale=True, **data)
-
-    if not is_batch:
-        return results[0]
-    else:
-        return results
+        return self.get_pipeline(isinstance(img, np.ndarray))(data)
 
+    def bucket_key(self, data):
+        """Get the size bucket of a processed image.
 
-async def async_inference_detector(model, imgs):
-    """Async inference image(s) with the detector.
+        Args:
+            data (dict): The processed data of an image.
+
+        Returns:
+            tuple[int]: Padded height and width of the image divided by
+                ``bucket_size`` and rounded up.
+        """
+        h, w = data['img'][0].data.shape[-2:]
+        return (math.ceil(h / self.bucket_size),
+                math.ceil(w / self.bucket_size))
+
+    def group(self, datas):
+        """Group processed images into batches of the same size bucket.
+
+        Args:
+            datas (list[dict]): The processed data of each image.
+
+        Returns:
+            list[list[int]]: Indices into ``datas`` of each batch.
+        """
+        buckets = OrderedDict()
+        for idx, data in enumerate(datas):
+            buckets.setdefault(self.bucket_key(data), []).append(idx)
+        batch_size = self.max_batch_size
+        batches = []
+        for inds in buckets.values():
+            step = len(inds) if batch_size is None else batch_size
+            for i in range(0, len(inds), step):
+                batches.append(inds[i:i + step])
+        return batches
+
+    def forward(self, datas):
+        """Collate processed images into one batch and run the detector.
+
+        Args:
+            datas (list[dict]): The processed data of each image.
+
+        Returns:
+            list: The detection results of each image.
+        """
+        data = collate(datas, samples_per_gpu=len(datas))
+        # just get the actual data from DataContainer
+        data['img_metas'] = [
+            img_metas.data[0] for img_metas in data['img_metas']
+        ]
+        data['img'] = [img.data[0] for img in data['img']]
+        if self.is_cuda:
+            # scatter to specified GPU
+            data = scatter(data, [self.device])[0]
+
+        # forward the model
+        with torch.no_grad():
+            return self.model(return_loss=False, rescale=True, **data)
+
+    def __call__(self, imgs):
+        """Inference image(s) with the detector.
+
+        Args:
+            imgs (str/ndarray or list[str/ndarray] or tuple[str/ndarray]):
+               Either image files or loaded images.
+
+        Returns:
+            If imgs is a list or tuple, the same length list type results
+            will be returned, otherwise return the detection results directly.
+        """
+        if isinstance(imgs, (list, tuple)):
+            is_batch = True
+        else:
+            imgs = [imgs]
+            is_batch = False
+
+        datas = [self.preprocess(img) for img in imgs]
+        results = [None] * len(datas)
+        for inds in self.group(datas):
+            batch_results = self.forward([datas[i] for i in inds])
+            for idx, result in zip(inds, batch_results):
+                results[idx] = result
+
+        if not is_batch:
+            return results[0]
+        else:
+            return results
+
+
+def inference_detector(model, imgs):
+    """Inference image(s) with the detector.
+
+    The images are run through a :obj:`DetectorEngine` cached on the model,
+    so the test pipeline is only rebuilt when ``model.cfg`` or its test
+    pipeline changes and images of different sizes are forwarded in
+    separate batches.
 
     Args:
         model (nn.Module): The loaded detector.
-        img (str | ndarray): Either image files or loaded images.
+        imgs (str/ndarray or list[str/ndarray] or tuple[str/ndarray]):
+           Either image files or loaded images.
 
     Returns:
-        Awaitable detection results.
+        If imgs is a list or tuple, the same length list type results
+        will be returned, otherwise return the detection results directly.
     """
-    if not isinstance(imgs, (list, tuple)):
-        imgs = [imgs]
+    engine = getattr(model, '_detector_engine', None)
+    if (engine is None or engine.cfg is not model.cfg
+            or engine.device != next(model.parameters()).device):
+        engine = DetectorEngine(model, max_batch_size=None)
+        model._detector_engine = engine
+    return engine(imgs)
 
-    cfg = model.cfg
-    device = next(model.parameters()).device  # model device
 
-    if isinstance(imgs[0], np.ndarray):
-        cfg = cfg.copy()
-        # set loading pipeline type
-        cfg.data.test.pipeline[0].type = 'LoadImageFromWebcam'
+async def async_inference_detector(model, imgs):
+    """Async inference image(s) with the detector.
 
-    cfg.data.test.pipeline = replace_ImageToTensor(cfg.data.test.pipeline)
-    test_pipeline = Compose(cfg.data.test.pipeline)
+    The images are processed by an :obj:`InferenceService` cached on the
+    model, so decoding, transforms and the forward pass run in its threads
+    instead of blocking the event loop, and the images of concurrent calls
+    are batched together.
 
-    datas = []
-    for img in imgs:
-        # prepare data
-        if isinstance(img, np.ndarray):
-            # directly add img
-            data = dict(img=img)
-        else:
-            # add information into dict
-            data = dict(img_info=dict(filename=img), img_prefix=None)
-        # build the data pipeline
-        data = test_pipeline(data)
-        datas.append(data)
-
-    data = collate(datas, samples_per_gpu=len(imgs))
-    # just get the actual data from DataContainer
-    data['img_metas'] = [img_metas.data[0] for img_metas in data['img_metas']]
-    data['img'] = [img.data[0] for img in data['img']]
-    if next(model.parameters()).is_cuda:
-        # scatter to specified GPU
-        data = scatter(data, [device])[0]
-    else:
-        for m in model.modules():
-            assert not isinstance(
-                m, RoIPool
-            ), 'CPU inference with RoIPool is not supported currently.'
-
-    # We don't restore `torch.is_grad_enabled()` value during concurrent
-    # inference since execution can overlap
-    torch.set_grad_enabled(False)
-    results = await model.aforward_test(rescale=True, **data)
-    return results
+    Args:
+        model (nn.Module): The loaded detector.
+        imgs (str/ndarray or list[str/ndarray] or tuple[str/ndarray]):
+           Either image files or loaded images.
+
+    Returns:
+        Awaitable detection results. If imgs is a list or tuple, the same
+        length list type results, otherwise the detection results directly.
+    """
+    from .service import InferenceService
+
+    service = getattr(model, '_inference_service', None)
+    if (service is None or service.engine.cfg is not model.cfg
+            or service.engine.device != next(model.parameters()).device):
+        if service is not None:
+            service.close()
+        service = InferenceService(model)
+        model._inference_service = service
+    if not isinstance(imgs, (list, tuple)):
+        return await service.asubmit(imgs)
+    return list(await asyncio.gather(*[service.asubmit(img) for img in imgs]))
 
 
 def show_result_pyplot(model,
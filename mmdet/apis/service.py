@@ -0,0 +1,356 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from mmdet.core import BoxMask, encode_mask_results
+from .inference import DetectorEngine
+
+_STOP = object()
+
+
+def encode_det_result(result):
+    """Encode the masks of a detection result to RLE.
+
+    Args:
+        result (list | tuple): The bbox results of each class, or a tuple of
+            bbox and mask results.
+
+    Returns:
+        list | tuple: The result with RLE encoded masks.
+    """
+    if isinstance(result, tuple):
+        bbox_result, segm_result = result
+        return bbox_result, encode_mask_results(segm_result)
+    return result
+
+
+def det_result_to_json(result, classes=None, score_thr=0.):
+    """Convert a detection result to a list of JSON serializable dicts.
+
+    Args:
+        result (list | tuple): The bbox results of each class, or a tuple of
+            bbox and mask results.
+        classes (Sequence[str], optional): Class names, added to every
+            detection as ``class`` if given.
+        score_thr (float): Minimum score of the kept detections.
+            Default: 0.
+
+    Returns:
+        list[dict]: ``label``, ``score``, ``bbox`` in ``xyxy`` format and
+            ``segmentation`` as a COCO RLE for instance segmentation
+            results of each detection.
+    """
+    if isinstance(result, tuple):
+        bbox_result, segm_result = result
+        if isinstance(segm_result, tuple):
+            segm_result = segm_result[0]  # ms rcnn
+    else:
+        bbox_result, segm_result = result, None
+    bboxes = np.vstack(bbox_result).reshape(-1, 5)
+    labels = np.concatenate([
+        np.full(len(bbox), i, dtype=np.int64)
+        for i, bbox in enumerate(bbox_result)
+    ])
+    keep = np.flatnonzero(bboxes[:, 4] >= score_thr)
+    if segm_result is not None:
+        segms = [segm for label_segms in segm_result for segm in label_segms]
+    dets = []
+    for i in keep.tolist():
+        det = dict(
+            label=int(labels[i]),
+            score=float(bboxes[i, 4]),
+            bbox=bboxes[i, :4].tolist())
+        if classes is not None:
+            det['class'] = classes[labels[i]]
+        if segm_result is not None:
+            segm = segms[i]
+            if isinstance(segm, BoxMask):
+                segm = segm.encode()
+            elif not isinstance(segm, dict):
+                segm = encode_mask_results([[segm]])[0][0]
+            counts = segm['counts']
+            det['segmentation'] = dict(
+                size=list(segm['size']),
+                counts=counts.decode()
+                if isinstance(counts, bytes) else counts)
+        dets.append(det)
+    return dets
+
+
+class _StageStats:
+    """Counters of a pipeline stage."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+        self.busy_time = 0.
+        self.calls = 0
+
+    def add(self, num, busy_time, failed=0):
+        with self.lock:
+            self.processed += num
+            self.failed += failed
+            self.busy_time += busy_time
+            self.calls += 1
+
+
+class InferenceService:
+    """Pipelined inference service of a detector.
+
+    Requests pass through three stages connected by bounded queues, so
+    image decoding and transforms of later requests overlap with the model
+    and with the postprocessing of earlier ones:
+
+    - ``preprocess``: ``num_workers`` threads run the test pipeline of the
+      :obj:`DetectorEngine`. Decoding and resizing release the GIL, so the
+      threads run in parallel.
+    - ``model``: One thread collects up to ``max_batch_size`` preprocessed
+      images that are ready, groups them by size bucket and runs the
+      detector without gradients.
+    - ``postprocess``: ``num_post_workers`` threads apply ``postprocess``
+      to every result, e.g. :func:`encode_det_result` or
+      :func:`det_result_to_json`.
+
+    When a stage falls behind, its input queue fills up and the stages
+    before it block. :meth:`submit` then blocks or raises ``queue.Full``, so
+    callers can shed load. :meth:`metrics` reports the queue sizes and the
+    counters of each stage.
+
+    Args:
+        model (nn.Module): The loaded detector, see :func:`init_detector`.
+        num_workers (int): Number of preprocessing threads. Default: 4.
+        max_batch_size (int): Maximum number of images forwarded together.
+            Default: 4.
+        queue_size (int): Capacity of each queue between stages.
+            Default: 16.
+        postprocess (callable, optional): Function applied to the result of
+            every image in the postprocessing stage. Default: None.
+        num_post_workers (int): Number of postprocessing threads.
+            Default: 1.
+        bucket_size (int): Granularity in pixels of the size buckets of the
+            batches, see :obj:`DetectorEngine`. Default: 32.
+
+    Example:
+        >>> model = init_detector(config_file, checkpoint_file)
+        >>> with InferenceService(model, postprocess=encode_det_result) as s:
+        >>>     futures = [s.submit(img) for img in img_files]
+        >>>     results = [future.result() for future in futures]
+    """
+
+    def __init__(self,
+                 model,
+                 num_workers=4,
+                 max_batch_size=4,
+                 queue_size=16,
+                 postprocess=None,
+                 num_post_workers=1,
+                 bucket_size=32):
+        assert num_workers >= 1 and num_post_workers >= 1
+        assert max_batch_size >= 1 and queue_size >= 1
+        self.engine = DetectorEngine(
+            model, max_batch_size=max_batch_size, bucket_size=bucket_size)
+        self.max_batch_size = max_batch_size
+        self.postprocess = postprocess
+        self._queues = dict(
+            preprocess=queue.Queue(queue_size),
+            model=queue.Queue(queue_size),
+            postprocess=queue.Queue(queue_size))
+        self._stats = {name: _StageStats() for name in self._queues}
+        self._submit_lock = threading.Lock()
+        self._submitted = 0
+        self._blocked_time = 0.
+        self._closed = False
+
+        self._threads = dict(
+            preprocess=[
+                self._start(self._preprocess_loop, f'preprocess_{i}')
+                for i in range(num_workers)
+            ],
+            model=[self._start(self._model_loop, 'model')],
+            postprocess=[
+                self._start(self._postprocess_loop, f'postprocess_{i}')
+                for i in range(num_post_workers)
+            ])
+
+    @staticmethod
+    def _start(target, name):
+        thread = threading.Thread(
+            target=target, name=f'InferenceService.{name}', daemon=True)
+        thread.start()
+        return thread
+
+    def submit(self, img, block=True, timeout=None):
+        """Submit an image for inference.
+
+        Args:
+            img (str | ndarray): Image file or loaded image.
+            block (bool): Whether to wait for room in the preprocessing
+                queue. Default: True.
+            timeout (float, optional): Maximum seconds to wait if ``block``.
+
+        Returns:
+            :obj:`concurrent.futures.Future`: The future of the result.
+
+        Raises:
+            queue.Full: If the preprocessing queue stays full.
+        """
+        if self._closed:
+            raise RuntimeError('cannot submit to a closed InferenceService')
+        future = Future()
+        start = time.perf_counter()
+        self._queues['preprocess'].put((future, img), block, timeout)
+        with self._submit_lock:
+            self._submitted += 1
+            self._blocked_time += time.perf_counter() - start
+        return future
+
+    async def asubmit(self, img):
+        """Inference an image without blocking the event loop.
+
+        Args:
+            img (str | ndarray): Image file or loaded image.
+
+        Returns:
+            The detection result after ``postprocess``.
+        """
+        loop = asyncio.get_running_loop()
+        # wait for room in the queue in the default executor
+        future = await loop.run_in_executor(None, self.submit, img)
+        return await asyncio.wrap_future(future)
+
+    def __call__(self, imgs):
+        """Inference image(s) and wait for the results.
+
+        Args:
+            imgs (str/ndarray or list[str/ndarray] or tuple[str/ndarray]):
+               Either image files or loaded images.
+
+        Returns:
+            If imgs is a list or tuple, the same length list type results
+            will be returned, otherwise return the detection results directly.
+        """
+        if not isinstance(imgs, (list, tuple)):
+            return self.submit(imgs).result()
+        futures = [self.submit(img) for img in imgs]
+        return [future.result() for future in futures]
+
+    def _preprocess_loop(self):
+        in_queue, out_queue = self._queues['preprocess'], self._queues['model']
+        stats = self._stats['preprocess']
+        while True:
+            item = in_queue.get()
+            if item is _STOP:
+                return
+            future, img = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            start = time.perf_counter()
+            try:
+                data = self.engine.preprocess(img)
+            except Exception as e:
+                future.set_exception(e)
+                stats.add(0, time.perf_counter() - start, failed=1)
+                continue
+            stats.add(1, time.perf_counter() - start)
+            out_queue.put((future, data))
+
+    def _model_loop(self):
+        in_queue, out_queue = self._queues['model'], self._queues['postprocess']
+        stats = self._stats['model']
+        stop = False
+        while not stop:
+            items = [in_queue.get()]
+            # batch the images that are already preprocessed
+            while len(items) < self.max_batch_size:
+                try:
+                    items.append(in_queue.get_nowait())
+                except queue.Empty:
+                    break
+            if items[-1] is _STOP:
+                items.pop()
+                stop = True
+                if not items:
+                    break
+            start = time.perf_counter()
+            failed = 0
+            datas = [data for _, data in items]
+            for inds in self.engine.group(datas):
+                try:
+                    results = self.engine.forward([datas[i] for i in inds])
+                except Exception as e:
+                    for i in inds:
+                        items[i][0].set_exception(e)
+                    failed += len(inds)
+                    continue
+                for i, result in zip(inds, results):
+                    out_queue.put((items[i][0], result))
+            stats.add(
+                len(items) - failed, time.perf_counter() - start, failed=failed)
+
+    def _postprocess_loop(self):
+        in_queue = self._queues['postprocess']
+        stats = self._stats['postprocess']
+        while True:
+            item = in_queue.get()
+            if item is _STOP:
+                return
+            future, result = item
+            start = time.perf_counter()
+            try:
+                if self.postprocess is not None:
+                    result = self.postprocess(result)
+            except Exception as e:
+                future.set_exception(e)
+                stats.add(0, time.perf_counter() - start, failed=1)
+                continue
+            stats.add(1, time.perf_counter() - start)
+            future.set_result(result)
+
+    def metrics(self):
+        """Get the queue sizes and counters of every stage.
+
+        Returns:
+            dict: ``submitted`` requests and the total ``blocked_time`` of
+                :meth:`submit` in seconds, and for each stage the
+                ``queue_size`` and ``queue_capacity`` of its input queue,
+                the number of ``processed`` and ``failed`` images, the
+                ``busy_time`` in seconds and the ``mean_batch_size``.
+        """
+        with self._submit_lock:
+            metrics = dict(
+                submitted=self._submitted, blocked_time=self._blocked_time)
+        for name, q in self._queues.items():
+            stats = self._stats[name]
+            with stats.lock:
+                metrics[name] = dict(
+                    queue_size=q.qsize(),
+                    queue_capacity=q.maxsize,
+                    processed=stats.processed,
+                    failed=stats.failed,
+                    busy_time=stats.busy_time,
+                    mean_batch_size=(stats.processed + stats.failed) /
+                    max(stats.calls, 1))
+        return metrics
+
+    def close(self):
+        """Finish the submitted requests and stop the threads."""
+        if self._closed:
+            return
+        self._closed = True
+        for name in ('preprocess', 'model', 'postprocess'):
+            for _ in self._threads[name]:
+                self._queues[name].put(_STOP)
+            for thread in self._threads[name]:
+                thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
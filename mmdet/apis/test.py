@@ -11,16 +11,38 @@ import torch.distributed as dist
 from mmcv.image import tensor2imgs
 from mmcv.runner import get_dist_info
 
-from mmdet.core import encode_mask_results
+from mmdet.core import (DetResults, DetResultWriter, ShardedDetResults,
+                        encode_mask_results)
 from projects import *
 
 def single_gpu_test(model,
                     data_loader,
                     show=False,
                     out_dir=None,
-                    show_score_thr=0.3):
+                    show_score_thr=0.3,
+                    result_dir=None):
+    """Test model with a single gpu.
+
+    Args:
+        model (nn.Module): Model to be tested.
+        data_loader (nn.Dataloader): Pytorch data loader.
+        show (bool): Whether to show the results. Default: False.
+        out_dir (str, optional): Directory to save the visualized results.
+            Default: None.
+        show_score_thr (float): Score threshold of the shown results.
+            Default: 0.3.
+        result_dir (str, optional): If given, bbox and instance segmentation
+            results are streamed to this directory with
+            :class:`DetResultWriter` instead of being kept in memory.
+            Default: None.
+
+    Returns:
+        list | DetResults: The prediction results, read back from
+            `result_dir` when it is given.
+    """
     model.eval()
     results = []
+    writer = DetResultWriter(result_dir) if result_dir is not None else None
     dataset = data_loader.dataset
     PALETTE = getattr(dataset, 'PALETTE', None)
     prog_bar = mmcv.ProgressBar(len(dataset))
@@ -71,14 +93,25 @@ def single_gpu_test(model,
                 result[j]['ins_results'] = (bbox_results,
                                             encode_mask_results(mask_results))
 
-        results.extend(result)
+        if writer is not None:
+            for res in result:
+                writer.add(res)
+        else:
+            results.extend(result)
 
         for _ in range(batch_size):
             prog_bar.update()
+    if writer is not None:
+        writer.close()
+        return DetResults(result_dir)
     return results
 
 
-def multi_gpu_test(model, data_loader, tmpdir=None, gpu_collect=False):
+def multi_gpu_test(model,
+                   data_loader,
+                   tmpdir=None,
+                   gpu_collect=False,
+                   result_dir=None):
     """Test model with multiple gpus.
 
     This method tests model with multiple gpus and collects the results
@@ -93,14 +126,27 @@ def multi_gpu_test(model, data_loader, tmpdir=None, gpu_collect=False):
         tmpdir (str): Path of directory to save the temporary results from
             different gpus under cpu mode.
         gpu_collect (bool): Option to use either gpu or cpu to collect results.
+        result_dir (str, optional): If given, every rank streams its bbox and
+            instance segmentation results to ``rank_<rank>`` in this
+            directory with :class:`DetResultWriter` and rank 0 reads the
+            shards back as :class:`ShardedDetResults`, so no results are
+            gathered in memory. The directory must be on a file system
+            shared by all ranks. Default: None.
 
     Returns:
-        list: The prediction results.
+        list | ShardedDetResults: The prediction results on rank 0 and None
+            on the other ranks.
     """
     model.eval()
     results = []
     dataset = data_loader.dataset
     rank, world_size = get_dist_info()
+    writer = None
+    if result_dir is not None:
+        writer = DetResultWriter(osp.join(result_dir, f'rank_{rank}'))
+    # the k-th sample of a rank is the (rank + k * world_size)-th sample of
+    # the dataset, see DistributedSampler
+    num_samples = 0
     if rank == 0:
         prog_bar = mmcv.ProgressBar(len(dataset))
     time.sleep(2)  # This line can prevent deadlock problem in some cases.
@@ -118,13 +164,30 @@ def multi_gpu_test(model, data_loader, tmpdir=None, gpu_collect=False):
                     result[j]['ins_results'] = (
                         bbox_results, encode_mask_results(mask_results))
 
-        results.extend(result)
+        if writer is not None:
+            for res in result:
+                img_idx = rank + num_samples * world_size
+                num_samples += 1
+                # the dataloader may pad some samples
+                if img_idx < len(dataset):
+                    writer.add(res, img_idx)
+        else:
+            results.extend(result)
 
         if rank == 0:
             batch_size = len(result)
             for _ in range(batch_size * world_size):
                 prog_bar.update()
 
+    if writer is not None:
+        writer.close()
+        dist.barrier()
+        if rank != 0:
+            return None
+        return ShardedDetResults([
+            osp.join(result_dir, f'rank_{i}') for i in range(world_size)
+        ])
+
     # collect results from all ranks
     if gpu_collect:
         results = collect_results_gpu(results, len(dataset))
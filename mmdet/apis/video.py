@@ -0,0 +1,304 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from mmdet.core.evaluation.bbox_overlaps import bbox_overlaps
+from .inference import DetectorEngine
+
+_STOP = object()
+# seconds between two checks of the stop event by a blocked thread
+_POLL_INTERVAL = 0.05
+
+
+def interpolate_bbox_results(result1, result2, alpha, iou_thr=0.3):
+    """Interpolate the bbox results of two frames.
+
+    Boxes of the same class are matched greedily by IoU, and the corners
+    and scores of matched boxes are interpolated linearly. Unmatched boxes
+    are kept from the nearer frame. Instance segmentation results are not
+    interpolated, the result of the nearer frame is returned instead.
+
+    Args:
+        result1 (list[np.ndarray] | tuple): Result of the earlier frame.
+        result2 (list[np.ndarray] | tuple): Result of the later frame.
+        alpha (float): Position between the frames, 0 for ``result1`` and 1
+            for ``result2``.
+        iou_thr (float): Minimum IoU of matched boxes. Default: 0.3.
+
+    Returns:
+        list[np.ndarray] | tuple: The interpolated result.
+    """
+    if isinstance(result1, tuple) or isinstance(result2, tuple):
+        return result1 if alpha < 0.5 else result2
+    interpolated = []
+    for bboxes1, bboxes2 in zip(result1, result2):
+        nearer = bboxes1 if alpha < 0.5 else bboxes2
+        if len(bboxes1) == 0 or len(bboxes2) == 0:
+            interpolated.append(nearer)
+            continue
+        ious = bbox_overlaps(bboxes1[:, :4], bboxes2[:, :4])
+        matched1 = np.zeros(len(bboxes1), dtype=bool)
+        matched2 = np.zeros(len(bboxes2), dtype=bool)
+        pairs = []
+        for flat_ind in np.argsort(-ious, axis=None):
+            i, j = np.unravel_index(flat_ind, ious.shape)
+            if ious[i, j] < iou_thr:
+                break
+            if matched1[i] or matched2[j]:
+                continue
+            matched1[i] = matched2[j] = True
+            pairs.append((i, j))
+        bboxes = [
+            (1 - alpha) * bboxes1[i] + alpha * bboxes2[j] for i, j in pairs
+        ]
+        unmatched = ~(matched1 if alpha < 0.5 else matched2)
+        bboxes = np.concatenate(
+            [np.asarray(bboxes).reshape(-1, 5), nearer[unmatched]])
+        interpolated.append(bboxes.astype(bboxes1.dtype))
+    return interpolated
+
+
+class VideoInference:
+    """Pipelined inference over the frames of a video.
+
+    Frames are read by a producer thread, every ``frame_stride``-th frame
+    (the key frames) is run through the test pipeline by a thread pool and a
+    model thread forwards the key frames in batches of ``batch_size``. The
+    results of the frames between two key frames are interpolated by
+    :func:`interpolate_bbox_results`, and frames after the last key frame
+    reuse its result. When the caller stops iterating early, the threads
+    are stopped and joined.
+
+    Args:
+        model (nn.Module): The loaded detector, see :func:`init_detector`.
+        batch_size (int): Number of key frames forwarded together.
+            Default: 4.
+        frame_stride (int): Distance between key frames. Default: 1.
+        num_workers (int): Number of preprocessing threads. Default: 2.
+        queue_size (int): Maximum number of frames buffered between the
+            reader and the model. Default: 32.
+        iou_thr (float): Minimum IoU of boxes matched for interpolation.
+            Default: 0.3.
+
+    Example:
+        >>> video_inference = VideoInference(model, frame_stride=2)
+        >>> for frame, result in video_inference(mmcv.VideoReader(path)):
+        >>>     pass
+        >>> print(video_inference.stats)
+    """
+
+    def __init__(self,
+                 model,
+                 batch_size=4,
+                 frame_stride=1,
+                 num_workers=2,
+                 queue_size=32,
+                 iou_thr=0.3):
+        assert batch_size >= 1 and frame_stride >= 1
+        self.engine = DetectorEngine(model, max_batch_size=batch_size)
+        self.batch_size = batch_size
+        self.frame_stride = frame_stride
+        self.num_workers = num_workers
+        self.queue_size = queue_size
+        self.iou_thr = iou_thr
+        self.stats = dict()
+        self._lock = threading.Lock()
+
+    def _add_time(self, name, start):
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._times[name] += elapsed
+
+    @staticmethod
+    def _put(out_queue, item, stop):
+        """Put an item unless ``stop`` is set while the queue is full.
+
+        Returns:
+            bool: Whether the item was put.
+        """
+        while not stop.is_set():
+            try:
+                out_queue.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    @staticmethod
+    def _get(in_queue, stop):
+        """Get an item, or ``_STOP`` once ``stop`` is set."""
+        while not stop.is_set():
+            try:
+                return in_queue.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                pass
+        return _STOP
+
+    def _read(self, frames, pool, out_queue, stop):
+        try:
+            frames = iter(frames)
+            idx = 0
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    frame = next(frames)
+                except StopIteration:
+                    break
+                self._add_time('read', start)
+                data = None
+                if idx % self.frame_stride == 0:
+                    data = pool.submit(self._preprocess, frame)
+                if not self._put(out_queue, (idx, frame, data), stop):
+                    if data is not None:
+                        data.cancel()
+                    return
+                idx += 1
+        except Exception as e:
+            self._put(out_queue, e, stop)
+        self._put(out_queue, _STOP, stop)
+
+    def _preprocess(self, frame):
+        start = time.perf_counter()
+        data = self.engine.preprocess(frame)
+        self._add_time('preprocess', start)
+        return data
+
+    def _forward(self, items, out_queue, stop):
+        key_items = [item for item in items if item[2] is not None]
+        datas = [data.result() for _, _, data in key_items]
+        start = time.perf_counter()
+        results = [None] * len(datas)
+        for inds in self.engine.group(datas):
+            batch_results = self.engine.forward([datas[i] for i in inds])
+            for idx, result in zip(inds, batch_results):
+                results[idx] = result
+        self._add_time('model', start)
+        self._counts['batches'] += 1
+        results = iter(results)
+        for idx, frame, data in items:
+            result = next(results) if data is not None else None
+            if not self._put(out_queue, (idx, frame, result), stop):
+                return
+
+    def _model(self, in_queue, out_queue, stop):
+        items = []
+        num_keys = 0
+        try:
+            while True:
+                item = self._get(in_queue, stop)
+                if item is _STOP:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                items.append(item)
+                num_keys += item[2] is not None
+                if num_keys == self.batch_size:
+                    self._forward(items, out_queue, stop)
+                    items, num_keys = [], 0
+            if stop.is_set():
+                return
+            if num_keys > 0:
+                self._forward(items, out_queue, stop)
+                items = []
+            # frames after the last key frame
+            for idx, frame, _ in items:
+                self._put(out_queue, (idx, frame, None), stop)
+        except Exception as e:
+            self._put(out_queue, e, stop)
+        self._put(out_queue, _STOP, stop)
+
+    def __call__(self, frames):
+        """Run the detector on the frames of a video.
+
+        Args:
+            frames (Iterable[np.ndarray]): The frames, e.g. a
+                :obj:`mmcv.VideoReader`.
+
+        Yields:
+            tuple: A frame and its detection result, in the order of the
+                frames.
+        """
+        self._times = defaultdict(float)
+        self._counts = defaultdict(int)
+        frame_queue = queue.Queue(self.queue_size)
+        result_queue = queue.Queue(self.queue_size)
+        pool = ThreadPoolExecutor(self.num_workers)
+        stop = threading.Event()
+        threads = [
+            threading.Thread(
+                target=self._read,
+                args=(frames, pool, frame_queue, stop),
+                daemon=True),
+            threading.Thread(
+                target=self._model,
+                args=(frame_queue, result_queue, stop),
+                daemon=True)
+        ]
+        for thread in threads:
+            thread.start()
+
+        wall_start = time.perf_counter()
+        last_key = None
+        pending = []
+        try:
+            while True:
+                item = result_queue.get()
+                if item is _STOP:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                idx, frame, result = item
+                if result is None:
+                    # wait for the next key frame
+                    pending.append((idx, frame))
+                    continue
+                start = time.perf_counter()
+                outputs = []
+                for pending_idx, pending_frame in pending:
+                    if last_key is None:
+                        pending_result = result
+                    else:
+                        alpha = (pending_idx - last_key[0]) / (
+                            idx - last_key[0])
+                        pending_result = interpolate_bbox_results(
+                            last_key[1], result, alpha, self.iou_thr)
+                    outputs.append((pending_frame, pending_result))
+                self._add_time('interpolate', start)
+                pending = []
+                last_key = (idx, result)
+                self._counts['key_frames'] += 1
+                self._counts['frames'] += len(outputs) + 1
+                yield from outputs
+                yield frame, result
+            # frames after the last key frame
+            for _, pending_frame in pending:
+                self._counts['frames'] += 1
+                yield pending_frame, last_key[1] if last_key else None
+        finally:
+            # unblock the threads if the caller stopped early, and drop the
+            # buffered frames and their pending preprocessing
+            stop.set()
+            for item_queue in (frame_queue, result_queue):
+                while True:
+                    try:
+                        item = item_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(item, tuple) and hasattr(item[2], 'cancel'):
+                        item[2].cancel()
+            for thread in threads:
+                thread.join()
+            pool.shutdown()
+            wall_time = time.perf_counter() - wall_start
+            self.stats = dict(
+                frames=self._counts['frames'],
+                key_frames=self._counts['key_frames'],
+                batches=self._counts['batches'],
+                wall_time=wall_time,
+                fps=self._counts['frames'] / max(wall_time, 1e-6),
+                stage_times=dict(self._times))
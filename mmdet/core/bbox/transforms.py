@@ -130,7 +130,11 @@ def bbox2result(bboxes, labels, num_classes):
         if isinstance(bboxes, torch.Tensor):
             bboxes = bboxes.detach().cpu().numpy()
             labels = labels.detach().cpu().numpy()
-        return [bboxes[labels == i, :] for i in range(num_classes)]
+        # one stable sort by label instead of a boolean mask per class,
+        # which keeps the order of the boxes within each class
+        inds = np.argsort(labels, kind='stable')
+        counts = np.bincount(labels, minlength=num_classes)[:num_classes]
+        return np.split(bboxes[inds], np.cumsum(counts))[:num_classes]
 
 
 def distance2bbox(points, distance, max_shape=None):
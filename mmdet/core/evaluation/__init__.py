@@ -3,6 +3,8 @@ from .class_names import (cityscapes_classes, coco_classes, dataset_aliases,
                           get_classes, imagenet_det_classes,
                           imagenet_vid_classes, oid_challenge_classes,
                           oid_v6_classes, voc_classes, DatasetEnum)
+from .det_results import (BaseDetResults, DetResults, DetResultWriter,
+                          ShardedDetResults)
 from .eval_hooks import DistEvalHook, EvalHook
 from .mean_ap import average_precision, eval_map, print_map_summary
 from .panoptic_utils import INSTANCE_OFFSET
@@ -15,5 +17,6 @@ __all__ = [
     'DistEvalHook', 'EvalHook', 'average_precision', 'eval_map',
     'print_map_summary', 'eval_recalls', 'print_recall_summary',
     'plot_num_recall', 'plot_iou_recall', 'oid_v6_classes',
-    'oid_challenge_classes', 'INSTANCE_OFFSET', 'DatasetEnum',
+    'oid_challenge_classes', 'INSTANCE_OFFSET', 'DatasetEnum', 'DetResults',
+    'DetResultWriter', 'ShardedDetResults', 'BaseDetResults'
 ]
@@ -0,0 +1,439 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import json
+import os.path as osp
+from abc import ABCMeta, abstractmethod
+
+import mmcv
+import numpy as np
+import pycocotools.mask as mask_util
+
+from mmdet.core.mask import BoxMask
+
+# name: (dtype, per detection shape)
+DET_RESULT_COLUMNS = dict(
+    img_idx=('<i4', ()),
+    label=('<i4', ()),
+    bbox=('<f4', (4, )),
+    score=('<f4', ()),
+    segm_score=('<f4', ()),
+    rle_size=('<i4', (2, )),
+    rle_end=('<i8', ()),
+)
+MASK_COLUMNS = ('segm_score', 'rle_size', 'rle_end')
+
+
+class DetResultWriter:
+    """Stream detection results to an on-disk columnar format.
+
+    Every detection is a row of the flat little-endian arrays
+    ``<column>.bin`` in ``out_dir``, see ``DET_RESULT_COLUMNS``: the dataset
+    index of its image, the label, the ``xyxy`` box, the score and for
+    instance segmentation results the mask score, the RLE size and the end
+    offset of its RLE counts in ``rle_counts.bin``. ``meta.json`` is written
+    by :meth:`close` and the results are read back with :class:`DetResults`.
+
+    Args:
+        out_dir (str): Directory of the results, created if missing.
+
+    Example:
+        >>> with DetResultWriter(out_dir) as writer:
+        >>>     for result in results:
+        >>>         writer.add(result)
+        >>> results = DetResults(out_dir)
+    """
+
+    def __init__(self, out_dir):
+        mmcv.mkdir_or_exist(out_dir)
+        self.out_dir = out_dir
+        self.num_images = 0
+        self.num_dets = 0
+        self.num_classes = None
+        self.with_mask = None
+        self._rle_bytes = 0
+        self._files = {
+            name: open(osp.join(out_dir, f'{name}.bin'), 'wb')
+            for name in list(DET_RESULT_COLUMNS) + ['rle_counts']
+        }
+
+    def _write(self, name, array):
+        dtype, shape = DET_RESULT_COLUMNS[name]
+        np.ascontiguousarray(array, dtype=dtype).reshape(
+            (-1, ) + shape).tofile(self._files[name])
+
+    def add(self, result, img_idx=None):
+        """Append the result of one image.
+
+        Args:
+            result (list[np.ndarray] | tuple): The bbox results of each
+                class, or a tuple of bbox results and RLE encoded mask
+                results as returned by :func:`encode_mask_results` or
+                :obj:`BoxMask`. The mask results may themselves be a tuple of
+                masks and mask scores.
+            img_idx (int, optional): Dataset index of the image. Defaults to
+                the number of images added so far.
+        """
+        if isinstance(result, tuple):
+            det, seg = result
+        elif isinstance(result, list):
+            det, seg = result, None
+        else:
+            raise TypeError(
+                f'invalid type of results: {type(result)}, only bbox and '
+                'instance segmentation results are supported')
+        with_mask = seg is not None
+        if self.with_mask is None:
+            self.with_mask = with_mask
+            self.num_classes = len(det)
+        assert with_mask == self.with_mask, \
+            'bbox and instance segmentation results cannot be mixed'
+        if img_idx is None:
+            img_idx = self.num_images
+        self.num_images = max(self.num_images, img_idx + 1)
+
+        num_dets = [len(bboxes) for bboxes in det]
+        num = sum(num_dets)
+        if num == 0:
+            return
+        bboxes = np.concatenate([bboxes.reshape(-1, 5) for bboxes in det])
+        labels = np.repeat(np.arange(len(det)), num_dets)
+        self._write('img_idx', np.full(num, img_idx))
+        self._write('label', labels)
+        self._write('bbox', bboxes[:, :4])
+        self._write('score', bboxes[:, 4])
+        self.num_dets += num
+        if not with_mask:
+            return
+
+        # some detectors use different scores for bbox and mask
+        if isinstance(seg, tuple):
+            segms, mask_scores = seg
+            mask_scores = np.concatenate(
+                [np.asarray(s, dtype=np.float32).reshape(-1)
+                 for s in mask_scores])
+        else:
+            segms, mask_scores = seg, bboxes[:, 4]
+        rles = [
+            rle.encode() if isinstance(rle, BoxMask) else rle
+            for label_segms in segms for rle in label_segms
+        ]
+        assert len(rles) == num and len(mask_scores) == num
+        counts = [
+            rle['counts'] if isinstance(rle['counts'], bytes) else
+            rle['counts'].encode() for rle in rles
+        ]
+        rle_end = self._rle_bytes + np.cumsum([len(c) for c in counts])
+        self._files['rle_counts'].write(b''.join(counts))
+        self._rle_bytes = int(rle_end[-1])
+        self._write('segm_score', mask_scores)
+        self._write('rle_size', [rle['size'] for rle in rles])
+        self._write('rle_end', rle_end)
+
+    def close(self):
+        """Flush the columns and write ``meta.json``."""
+        if self._files is None:
+            return
+        for f in self._files.values():
+            f.close()
+        self._files = None
+        mmcv.dump(
+            dict(
+                num_images=self.num_images,
+                num_dets=self.num_dets,
+                num_classes=self.num_classes,
+                with_mask=bool(self.with_mask),
+                columns={
+                    name: [dtype, list(shape)]
+                    for name, (dtype, shape) in DET_RESULT_COLUMNS.items()
+                }), osp.join(self.out_dir, 'meta.json'))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class BaseDetResults(metaclass=ABCMeta):
+    """Base class of detection results read back from disk.
+
+    Subclasses set ``num_images``, ``num_dets``, ``num_classes`` and
+    ``with_mask`` and implement :meth:`_get_dets`, :meth:`get_column`,
+    :meth:`get_rles` and :meth:`iter_json`. Indexing returns the per-image
+    results in the usual mmdet format, the columns are indexed by detection
+    in the order of :meth:`iter_json`.
+    """
+
+    def __len__(self):
+        return self.num_images
+
+    @abstractmethod
+    def _get_dets(self, idx):
+        """Get the labels, boxes with scores and RLEs of an image."""
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(f'index {idx} out of range')
+        labels, bboxes, rles = self._get_dets(idx)
+        det = [bboxes[labels == i] for i in range(self.num_classes)]
+        if not self.with_mask:
+            return det
+        segms = [[rles[i] for i in np.flatnonzero(labels == label)]
+                 for label in range(self.num_classes)]
+        return det, segms
+
+    def to_list(self):
+        """Load all results as a list of per-image results."""
+        return [self[i] for i in range(len(self))]
+
+    @abstractmethod
+    def get_column(self, name):
+        """Get a column of all detections, see ``DET_RESULT_COLUMNS``."""
+
+    @abstractmethod
+    def get_rles(self, inds):
+        """Get the RLE encoded masks of an array of detection indices."""
+
+    def get_mask_areas(self, chunk_size=100000):
+        """Get the mask area of every detection, chunk by chunk."""
+        areas = [
+            mask_util.area(
+                self.get_rles(
+                    np.arange(start, min(start + chunk_size,
+                                         self.num_dets))))
+            for start in range(0, self.num_dets, chunk_size)
+        ]
+        return np.concatenate(areas) if areas else np.zeros(0, np.uint32)
+
+    @abstractmethod
+    def iter_json(self, img_ids, cat_ids, iou_type='bbox', chunk_size=100000):
+        """Convert the results to COCO style json chunk by chunk.
+
+        Args:
+            img_ids (np.ndarray): Image id of each dataset index.
+            cat_ids (np.ndarray): Category id of each label.
+            iou_type (str): 'bbox' or 'segm'. Default: 'bbox'.
+            chunk_size (int): Number of detections converted at a time.
+                Default: 100000.
+
+        Yields:
+            str: The comma separated json objects of a chunk.
+        """
+
+    def dump_json(self,
+                  out_file,
+                  img_ids,
+                  cat_ids,
+                  iou_type='bbox',
+                  chunk_size=100000):
+        """Dump the results to a COCO style json file chunk by chunk.
+
+        Args:
+            out_file (str): Path of the json file.
+            img_ids (Sequence[int]): Image id of each dataset index.
+            cat_ids (Sequence[int]): Category id of each label.
+            iou_type (str): 'bbox' or 'segm'. Default: 'bbox'.
+            chunk_size (int): Number of detections converted at a time.
+                Default: 100000.
+        """
+        assert iou_type in ('bbox', 'segm')
+        assert iou_type == 'bbox' or self.with_mask
+        chunks = self.iter_json(
+            np.asarray(img_ids), np.asarray(cat_ids), iou_type, chunk_size)
+        with open(out_file, 'w') as f:
+            f.write('[')
+            for i, chunk in enumerate(chunks):
+                if i > 0 and chunk:
+                    f.write(', ')
+                f.write(chunk)
+            f.write(']')
+
+
+class DetResults(BaseDetResults):
+    """Detection results stored by :class:`DetResultWriter`.
+
+    The columns are memory mapped, so the results of a whole dataset can be
+    evaluated without loading them into per-image Python lists. Indexing
+    still returns the per-image results in the usual mmdet format.
+
+    Args:
+        result_dir (str): Directory written by :class:`DetResultWriter`.
+        mmap (bool): Whether to memory map the columns instead of reading
+            them into memory. Default: True.
+    """
+
+    def __init__(self, result_dir, mmap=True):
+        self.result_dir = result_dir
+        self.mmap = mmap
+        meta = mmcv.load(osp.join(result_dir, 'meta.json'))
+        self.num_images = meta['num_images']
+        self.num_dets = meta['num_dets']
+        self.num_classes = meta['num_classes']
+        self.with_mask = meta['with_mask']
+        for name, (dtype, shape) in meta['columns'].items():
+            if name in MASK_COLUMNS and not self.with_mask:
+                continue
+            setattr(self, name,
+                    self._load(f'{name}.bin', dtype,
+                               (self.num_dets, ) + tuple(shape), mmap))
+        if self.with_mask:
+            num_bytes = int(self.rle_end[-1]) if self.num_dets else 0
+            self.rle_counts = self._load('rle_counts.bin', np.uint8,
+                                         (num_bytes, ), mmap)
+        self._img_order = None
+
+    def __reduce__(self):
+        # reopen the files instead of copying the columns to subprocesses
+        return self.__class__, (self.result_dir, self.mmap)
+
+    def _load(self, filename, dtype, shape, mmap):
+        if shape[0] == 0:
+            return np.zeros(shape, dtype=dtype)
+        path = osp.join(self.result_dir, filename)
+        if mmap:
+            return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+        return np.fromfile(path, dtype=dtype).reshape(shape)
+
+    def get_rle(self, i):
+        """Get the RLE encoded mask of the i-th detection."""
+        start = int(self.rle_end[i - 1]) if i > 0 else 0
+        counts = self.rle_counts[start:int(self.rle_end[i])].tobytes()
+        return dict(size=self.rle_size[i].tolist(), counts=counts)
+
+    def get_rles(self, inds):
+        """Get the RLE encoded masks of an array of detection indices."""
+        return [self.get_rle(i) for i in np.asarray(inds).tolist()]
+
+    def get_column(self, name):
+        """Get a column of all detections, see ``DET_RESULT_COLUMNS``."""
+        return getattr(self, name)
+
+    def get_det_inds(self, idx):
+        """Get the detection indices of the image with dataset index idx."""
+        if self._img_order is None:
+            order = np.argsort(self.img_idx, kind='stable')
+            bounds = np.searchsorted(self.img_idx[order],
+                                     np.arange(self.num_images + 1))
+            self._img_order = (order, bounds)
+        order, bounds = self._img_order
+        return order[bounds[idx]:bounds[idx + 1]]
+
+    def _get_dets(self, idx):
+        """Get the labels, boxes with scores and RLEs of an image."""
+        inds = self.get_det_inds(idx)
+        labels = self.label[inds]
+        bboxes = np.concatenate(
+            [self.bbox[inds], self.score[inds, None]], axis=1)
+        rles = [self.get_rle(i) for i in inds] if self.with_mask else None
+        return labels, bboxes, rles
+
+    def iter_json(self, img_ids, cat_ids, iou_type='bbox', chunk_size=100000):
+        """Convert the results to COCO style json chunk by chunk.
+
+        Args:
+            img_ids (np.ndarray): Image id of each dataset index.
+            cat_ids (np.ndarray): Category id of each label.
+            iou_type (str): 'bbox' or 'segm'. Default: 'bbox'.
+            chunk_size (int): Number of detections converted at a time.
+                Default: 100000.
+
+        Yields:
+            str: The comma separated json objects of a chunk.
+        """
+        for start in range(0, self.num_dets, chunk_size):
+            end = min(start + chunk_size, self.num_dets)
+            bboxes = np.asarray(self.bbox[start:end], dtype=np.float64)
+            bboxes[:, 2:] -= bboxes[:, :2]
+            if iou_type == 'segm':
+                scores = self.segm_score[start:end]
+            else:
+                scores = self.score[start:end]
+            cols = zip(img_ids[self.img_idx[start:end]].tolist(),
+                       bboxes.tolist(),
+                       np.asarray(scores).tolist(),
+                       cat_ids[self.label[start:end]].tolist())
+            items = []
+            for i, (img_id, bbox, score, cat_id) in enumerate(cols):
+                data = dict(
+                    image_id=img_id,
+                    bbox=bbox,
+                    score=score,
+                    category_id=cat_id)
+                if iou_type == 'segm':
+                    segm = self.get_rle(start + i)
+                    segm['counts'] = segm['counts'].decode()
+                    data['segmentation'] = segm
+                items.append(json.dumps(data))
+            yield ', '.join(items)
+
+
+class ShardedDetResults(BaseDetResults):
+    """Detection results stored in several shards.
+
+    Every shard is written by its own :class:`DetResultWriter` with the
+    dataset indices of its images, e.g. one shard per rank in distributed
+    testing. The shards are memory mapped and read in dataset index order,
+    so no process loads all results at once.
+
+    Args:
+        result_dirs (list[str]): Directories of the shards.
+        mmap (bool): Whether to memory map the columns instead of reading
+            them into memory. Default: True.
+    """
+
+    def __init__(self, result_dirs, mmap=True):
+        self.result_dirs = list(result_dirs)
+        self.shards = [DetResults(d, mmap=mmap) for d in self.result_dirs]
+        self.num_images = max(shard.num_images for shard in self.shards)
+        self.num_dets = sum(shard.num_dets for shard in self.shards)
+        written = [shard for shard in self.shards if shard.num_images > 0]
+        self.num_classes = written[0].num_classes if written else None
+        self.with_mask = bool(written) and written[0].with_mask
+        assert all(shard.with_mask == self.with_mask for shard in written), \
+            'bbox and instance segmentation results cannot be mixed'
+        num_dets = np.array([shard.num_dets for shard in self.shards])
+        self._shard_starts = np.cumsum(num_dets) - num_dets
+
+    def _get_dets(self, idx):
+        labels, bboxes, rles = [], [], []
+        for shard in self.shards:
+            if idx >= shard.num_images:
+                continue
+            shard_labels, shard_bboxes, shard_rles = shard._get_dets(idx)
+            labels.append(shard_labels)
+            bboxes.append(shard_bboxes)
+            if self.with_mask:
+                rles.extend(shard_rles)
+        labels = np.concatenate(labels) if labels else np.zeros(0, np.int32)
+        bboxes = np.concatenate(bboxes) if bboxes else np.zeros((0, 5),
+                                                                np.float32)
+        return labels, bboxes, rles if self.with_mask else None
+
+    def get_column(self, name):
+        """Get a column of all detections, see ``DET_RESULT_COLUMNS``."""
+        dtype, shape = DET_RESULT_COLUMNS[name]
+        columns = [
+            shard.get_column(name) for shard in self.shards
+            if shard.num_dets > 0
+        ]
+        if not columns:
+            return np.zeros((0, ) + shape, dtype=dtype)
+        return np.concatenate(columns)
+
+    def get_rles(self, inds):
+        """Get the RLE encoded masks of an array of detection indices."""
+        inds = np.asarray(inds, dtype=np.int64)
+        # the last shard starting at or before each index, skipping empty
+        # shards
+        shard_inds = np.searchsorted(
+            self._shard_starts, inds, side='right') - 1
+        shard_dets = inds - self._shard_starts[shard_inds]
+        return [
+            self.shards[shard_idx].get_rle(i)
+            for shard_idx, i in zip(shard_inds.tolist(), shard_dets.tolist())
+        ]
+
+    def iter_json(self, img_ids, cat_ids, iou_type='bbox', chunk_size=100000):
+        for shard in self.shards:
+            yield from shard.iter_json(img_ids, cat_ids, iou_type, chunk_size)
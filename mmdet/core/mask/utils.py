@@ -34,14 +34,81 @@ def split_combined_polys(polys, poly_lens, polys_per_mask):
     return mask_polys_list
 
 
+class BoxMask:
+    """Binary mask of one instance stored in the region of its box.
+
+    Instance masks usually cover a small part of the image, so only the
+    region pasted from the mask prediction is kept together with its offset
+    in the image. The full image bitmap is created on demand by
+    :meth:`to_ndarray` or ``np.asarray(box_mask)``, and :meth:`encode`
+    computes the RLE of the full image mask from the region directly.
+
+    Args:
+        mask (np.ndarray): Bitmap of the region with shape (h, w).
+        offset (tuple[int]): (x, y) of the top left corner of the region.
+        img_shape (tuple[int]): (height, width) of the image.
+    """
+
+    def __init__(self, mask, offset, img_shape):
+        self.mask = mask
+        self.offset = tuple(int(x) for x in offset)
+        self.img_shape = tuple(int(x) for x in img_shape[:2])
+
+    @property
+    def shape(self):
+        """tuple[int]: Shape of the full image mask."""
+        return self.img_shape
+
+    @property
+    def dtype(self):
+        return self.mask.dtype
+
+    def to_ndarray(self):
+        """Paste the region into a full image bitmap."""
+        x, y = self.offset
+        h, w = self.mask.shape
+        full_mask = np.zeros(self.img_shape, dtype=self.mask.dtype)
+        full_mask[y:y + h, x:x + w] = self.mask
+        return full_mask
+
+    def __array__(self, dtype=None):
+        full_mask = self.to_ndarray()
+        return full_mask if dtype is None else full_mask.astype(dtype)
+
+    def encode(self):
+        """Encode the full image mask to a compressed RLE.
+
+        COCO RLE counts alternating runs of 0 and 1 in column-major order,
+        so the runs are found from the positive pixels of the region mapped
+        to their column-major index in the image.
+        """
+        img_h, img_w = self.img_shape
+        x, y = self.offset
+        h = self.mask.shape[0]
+        inds = np.flatnonzero(self.mask.T)
+        inds = (x + inds // h) * img_h + y + inds % h
+        bounds = inds
+        if len(inds) > 0:
+            breaks = np.flatnonzero(np.diff(inds) != 1) + 1
+            starts = inds[np.r_[0, breaks]]
+            ends = inds[np.r_[breaks - 1, len(inds) - 1]] + 1
+            bounds = np.stack([starts, ends], axis=1).reshape(-1)
+        # a 0-run before every 1-run, then the trailing 0-run if any
+        counts = np.diff(np.r_[0, bounds, img_h * img_w])
+        if counts[-1] == 0:
+            counts = counts[:-1]
+        return mask_util.frPyObjects(
+            dict(counts=counts.tolist(), size=[img_h, img_w]), img_h, img_w)
+
+
 # TODO: move this function to more proper place
 def encode_mask_results(mask_results):
     """Encode bitmap mask to RLE code.
 
     Args:
-        mask_results (list | tuple[list]): bitmap mask results.
-            In mask scoring rcnn, mask_results is a tuple of (segm_results,
-            segm_cls_score).
+        mask_results (list | tuple[list]): bitmap mask results, the masks
+            are arrays or :obj:`BoxMask`. In mask scoring rcnn,
+            mask_results is a tuple of (segm_results, segm_cls_score).
 
     Returns:
         list | tuple: RLE encoded mask.
@@ -54,6 +121,9 @@ def encode_mask_results(mask_results):
     encoded_mask_results = [[] for _ in range(num_classes)]
     for i in range(len(cls_segms)):
         for cls_segm in cls_segms[i]:
+            if isinstance(cls_segm, BoxMask):
+                encoded_mask_results[i].append(cls_segm.encode())
+                continue
             encoded_mask_results[i].append(
                 mask_util.encode(
                     np.array(
@@ -2,9 +2,11 @@
 from .bbox_nms import fast_nms, multiclass_nms
 from .matrix_nms import mask_matrix_nms
 from .merge_augs import (merge_aug_bboxes, merge_aug_masks,
-                         merge_aug_proposals, merge_aug_scores)
+                         merge_aug_proposals, merge_aug_scores,
+                         weighted_box_fusion)
 
 __all__ = [
     'multiclass_nms', 'merge_aug_proposals', 'merge_aug_bboxes',
-    'merge_aug_scores', 'merge_aug_masks', 'mask_matrix_nms', 'fast_nms'
+    'merge_aug_scores', 'merge_aug_masks', 'mask_matrix_nms', 'fast_nms',
+    'weighted_box_fusion'
 ]
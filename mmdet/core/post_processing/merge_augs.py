@@ -7,7 +7,7 @@ import torch
 from mmcv import ConfigDict
 from mmcv.ops import nms
 
-from ..bbox import bbox_mapping_back
+from ..bbox import bbox_mapping_back, bbox_overlaps
 
 
 def merge_aug_proposals(aug_proposals, img_metas, cfg):
@@ -110,6 +110,71 @@ def merge_aug_bboxes(aug_bboxes, aug_scores, img_metas, rcnn_test_cfg):
         return bboxes, scores
 
 
+def weighted_box_fusion(bboxes, scores, labels, iou_thr=0.55, num_augs=1):
+    """Fuse the detections of several augmentations by weighted box fusion.
+
+    Boxes of the same label are clustered greedily in descending order of
+    score, a box joins the cluster whose fused box it overlaps most if their
+    IoU exceeds `iou_thr`. A fused box is the score weighted mean of its
+    cluster and its score is the mean score of the cluster, multiplied by
+    ``min(cluster size, num_augs) / num_augs`` so that boxes found by few
+    augmentations are down-weighted.
+
+    Args:
+        bboxes (Tensor): shape (n, 4), boxes of all augmentations mapped
+            back to the same image.
+        scores (Tensor): shape (n, ).
+        labels (Tensor): shape (n, ).
+        iou_thr (float): IoU threshold of boxes in the same cluster.
+            Default: 0.55.
+        num_augs (int): Number of augmentations. Default: 1.
+
+    Returns:
+        tuple[Tensor, Tensor]: fused ``bboxes`` with shape (m, 5), where the
+            last column is the score, sorted by score, and ``labels`` with
+            shape (m, ).
+    """
+    device = bboxes.device
+    # the greedy clustering is sequential, so run it on the host
+    bboxes, scores, labels = bboxes.cpu(), scores.cpu(), labels.cpu()
+    fused_bboxes, fused_scores, fused_labels = [], [], []
+    for label in labels.unique():
+        inds = (labels == label).nonzero(as_tuple=True)[0]
+        inds = inds[scores[inds].argsort(descending=True)]
+        weighted_sums = bboxes.new_zeros((len(inds), 4))
+        score_sums = scores.new_zeros(len(inds))
+        counts = scores.new_zeros(len(inds))
+        fused = bboxes.new_zeros((len(inds), 4))
+        num_clusters = 0
+        for i in inds.tolist():
+            j = num_clusters
+            if num_clusters > 0:
+                ious = bbox_overlaps(bboxes[i:i + 1], fused[:num_clusters])[0]
+                max_iou, argmax = ious.max(0)
+                if max_iou > iou_thr:
+                    j = int(argmax)
+            if j == num_clusters:
+                num_clusters += 1
+            weighted_sums[j] += scores[i] * bboxes[i]
+            score_sums[j] += scores[i]
+            counts[j] += 1
+            fused[j] = weighted_sums[j] / score_sums[j].clamp(min=1e-12)
+        counts = counts[:num_clusters]
+        fused_bboxes.append(fused[:num_clusters])
+        fused_scores.append(score_sums[:num_clusters] / counts *
+                            counts.clamp(max=num_augs) / num_augs)
+        fused_labels.append(labels.new_full((num_clusters, ), int(label)))
+    if not fused_bboxes:
+        return bboxes.new_zeros((0, 5)).to(device), labels.to(device)
+    fused_bboxes = torch.cat(fused_bboxes)
+    fused_scores = torch.cat(fused_scores)
+    fused_labels = torch.cat(fused_labels)
+    order = fused_scores.argsort(descending=True)
+    det_bboxes = torch.cat(
+        [fused_bboxes[order], fused_scores[order, None]], dim=1)
+    return det_bboxes.to(device), fused_labels[order].to(device)
+
+
 def merge_aug_scores(aug_scores):
     """Merge augmented bbox scores."""
     if isinstance(aug_scores[0], torch.Tensor):
@@ -0,0 +1,234 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import hashlib
+import os
+import os.path as osp
+import shutil
+import tempfile
+
+import numpy as np
+
+# bump when the layout of the cached arrays changes
+ANN_INDEX_VERSION = 1
+
+ISCROWD = 1
+IGNORE = 2
+WITH_SEGM = 4
+
+
+def _pack_strs(strs):
+    """Pack strings into a utf-8 byte buffer and the offsets of the
+    strings."""
+    encoded = [s.encode('utf-8') for s in strs]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack_strs(buffer, offsets):
+    data = buffer.tobytes()
+    return [
+        data[start:end].decode('utf-8')
+        for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())
+    ]
+
+
+def file_hash(filename, chunk_size=1 << 24):
+    """SHA-1 digest of the content of a file."""
+    sha1 = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class AnnIndex:
+    """Binary index of a COCO style annotation file.
+
+    The images, annotations and polygon masks of the annotation file are
+    kept in flat numpy arrays, the annotations of the ``i``-th image are
+    rows ``ann_offsets[i]:ann_offsets[i + 1]``. The index is saved as a
+    directory of ``.npy`` files and loaded memory-mapped, so a warm start
+    does not parse the JSON file.
+
+    Only the ``id``, ``width``, ``height``, ``file_name`` and ``filename``
+    of the images are kept, and the masks of non-crowd annotations must be
+    polygons.
+
+    Args:
+        arrays (dict[str, np.ndarray]): The arrays of the index.
+    """
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self._img_rows = None
+
+    def __getattr__(self, name):
+        arrays = self.__dict__.get('arrays', {})
+        if name in arrays:
+            return arrays[name]
+        raise AttributeError(
+            f"'{self.__class__.__name__}' object has no attribute '{name}'")
+
+    @classmethod
+    def from_api(cls, api, data_infos, cat_ids):
+        """Build the index from a loaded COCO or LVIS api.
+
+        Args:
+            api (COCO | LVIS): The api the annotation file is loaded by.
+            data_infos (list[dict]): Image infos in the order of the
+                dataset.
+            cat_ids (list[int]): Category ids in the order of the labels.
+
+        Returns:
+            :obj:`AnnIndex`: The index.
+        """
+        num_imgs = len(data_infos)
+        ann_offsets = np.zeros(num_imgs + 1, dtype=np.int64)
+        bboxes, areas, ann_cat_ids, flags = [], [], [], []
+        coords, poly_lens, num_polys = [], [], []
+        for i, info in enumerate(data_infos):
+            anns = api.load_anns(api.get_ann_ids(img_ids=[info['id']]))
+            ann_offsets[i + 1] = ann_offsets[i] + len(anns)
+            for ann in anns:
+                bboxes.append(ann['bbox'])
+                areas.append(ann['area'])
+                ann_cat_ids.append(ann['category_id'])
+                flag = ISCROWD if ann.get('iscrowd', False) else 0
+                flag |= IGNORE if ann.get('ignore', False) else 0
+                segm = ann.get('segmentation', None)
+                polys = []
+                if segm is not None and not flag & ISCROWD:
+                    if not isinstance(segm, list):
+                        raise ValueError(
+                            'only polygon masks of non-crowd annotations '
+                            f'can be indexed, got {type(segm)} of '
+                            f"annotation {ann['id']}")
+                    flag |= WITH_SEGM
+                    polys = segm
+                flags.append(flag)
+                num_polys.append(len(polys))
+                for poly in polys:
+                    poly_lens.append(len(poly))
+                    coords.extend(poly)
+
+        file_names, file_name_offsets = _pack_strs(
+            [info['file_name'] for info in data_infos])
+        filenames, filename_offsets = _pack_strs(
+            [info['filename'] for info in data_infos])
+        poly_offsets = np.zeros(len(poly_lens) + 1, dtype=np.int64)
+        np.cumsum(poly_lens, out=poly_offsets[1:])
+        segm_offsets = np.zeros(len(num_polys) + 1, dtype=np.int64)
+        np.cumsum(num_polys, out=segm_offsets[1:])
+        arrays = dict(
+            cat_ids=np.array(cat_ids, dtype=np.int64),
+            img_ids=np.array([info['id'] for info in data_infos],
+                             dtype=np.int64),
+            widths=np.array([info['width'] for info in data_infos],
+                            dtype=np.int64),
+            heights=np.array([info['height'] for info in data_infos],
+                             dtype=np.int64),
+            file_names=file_names,
+            file_name_offsets=file_name_offsets,
+            filenames=filenames,
+            filename_offsets=filename_offsets,
+            ann_offsets=ann_offsets,
+            bboxes=np.array(bboxes, dtype=np.float64).reshape(-1, 4),
+            areas=np.array(areas, dtype=np.float64),
+            ann_cat_ids=np.array(ann_cat_ids, dtype=np.int64),
+            flags=np.array(flags, dtype=np.uint8),
+            segm_offsets=segm_offsets,
+            poly_offsets=poly_offsets,
+            coords=np.array(coords, dtype=np.float64))
+        return cls(arrays)
+
+    def dump(self, path):
+        """Save the index to the directory ``path``.
+
+        The arrays are written to a temporary directory which is renamed to
+        ``path``, so concurrent writers, e.g. the ranks of a distributed
+        job, never leave a partial index.
+        """
+        parent = osp.dirname(osp.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=parent)
+        for name, array in self.arrays.items():
+            np.save(osp.join(tmp_dir, f'{name}.npy'), array)
+        try:
+            os.rename(tmp_dir, path)
+        except OSError:
+            # another process wrote the index first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load an index saved by :meth:`dump`."""
+        mmap_mode = 'r' if mmap else None
+        arrays = {
+            osp.splitext(name)[0]: np.load(
+                osp.join(path, name), mmap_mode=mmap_mode)
+            for name in os.listdir(path) if name.endswith('.npy')
+        }
+        return cls(arrays)
+
+    def data_infos(self):
+        """Image infos of the indexed images."""
+        file_names = _unpack_strs(self.file_names, self.file_name_offsets)
+        filenames = _unpack_strs(self.filenames, self.filename_offsets)
+        return [
+            dict(
+                id=img_id,
+                width=width,
+                height=height,
+                file_name=file_name,
+                filename=filename)
+            for img_id, width, height, file_name, filename in zip(
+                self.img_ids.tolist(), self.widths.tolist(),
+                self.heights.tolist(), file_names, filenames)
+        ]
+
+    def get_rows(self, img_id):
+        """Rows of the annotations of an image."""
+        if self._img_rows is None:
+            self._img_rows = {
+                img_id: i
+                for i, img_id in enumerate(self.img_ids.tolist())
+            }
+        i = self._img_rows[img_id]
+        return slice(int(self.ann_offsets[i]), int(self.ann_offsets[i + 1]))
+
+    def get_segms(self, rows):
+        """Polygon masks of annotations, None for annotations without."""
+        segms = []
+        for row in rows:
+            if not self.flags[row] & WITH_SEGM:
+                segms.append(None)
+                continue
+            start, end = self.segm_offsets[row], self.segm_offsets[row + 1]
+            offsets = self.poly_offsets[start:end + 1].tolist()
+            segms.append([
+                self.coords[offsets[k]:offsets[k + 1]].tolist()
+                for k in range(len(offsets) - 1)
+            ])
+        return segms
+
+    def img_ids_with_cats(self, cat_ids=None):
+        """Ids of the images with annotations, optionally only annotations
+        of the given categories."""
+        img_rows = np.repeat(
+            np.arange(len(self.img_ids)), np.diff(self.ann_offsets))
+        if cat_ids is not None:
+            img_rows = img_rows[np.isin(self.ann_cat_ids, cat_ids)]
+        return set(self.img_ids[np.unique(img_rows)].tolist())
+
+
+def ann_index_path(cache_dir, ann_file, key):
+    """Path of the index of an annotation file in a cache directory.
+
+    The path is keyed by the content of the annotation file and ``key``,
+    e.g. the dataset class and its classes, so a changed annotation file or
+    dataset is indexed again.
+    """
+    sha1 = hashlib.sha1(file_hash(ann_file).encode())
+    sha1.update(f'{ANN_INDEX_VERSION}:{key}'.encode())
+    name = osp.splitext(osp.basename(ann_file))[0]
+    return osp.join(cache_dir, f'{name}.{sha1.hexdigest()[:16]}')
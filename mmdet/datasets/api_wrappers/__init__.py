@@ -1,7 +1,9 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 from .coco_api import COCO, COCOeval
+from .fast_eval import DetArrays, FastCOCOeval, FastLVISEval, LazyRLEs
 from .panoptic_evaluation import pq_compute_multi_core, pq_compute_single_core
 
 __all__ = [
-    'COCO', 'COCOeval', 'pq_compute_multi_core', 'pq_compute_single_core'
+    'COCO', 'COCOeval', 'DetArrays', 'FastCOCOeval', 'FastLVISEval',
+    'LazyRLEs', 'pq_compute_multi_core', 'pq_compute_single_core'
 ]
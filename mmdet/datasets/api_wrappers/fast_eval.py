@@ -0,0 +1,762 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+"""Vectorised COCO and LVIS evaluation.
+
+:class:`FastCOCOeval` and :class:`FastLVISEval` are drop-in replacements of
+``COCOeval`` and ``LVISEval`` with the same results. Instead of evaluating
+every image, category and area range in Python, the annotations are kept in
+flat arrays grouped by (category, image): the IoUs of boxes are computed
+with numpy for all groups at once, detections are matched greedily to the
+ground truths for the groups, area ranges and IoU thresholds of a chunk at
+once, one detection rank at a time, and the precision / recall of a
+category are accumulated for all area ranges and IoU thresholds at once.
+The matching can be sharded by image over processes.
+
+The detections can also be given as :class:`DetArrays`, e.g. built from the
+columns of results streamed to disk, which skips the json results file and
+the annotation dicts of the results api.
+"""
+import copy
+import datetime
+import time
+from collections import defaultdict
+from multiprocessing import Pool
+
+import numpy as np
+import pycocotools.mask as mask_util
+
+from .coco_api import COCOeval
+
+try:
+    from lvis import LVISEval, LVISResults
+except ImportError:
+    LVISEval = object
+
+
+def bbox_ious(dt_bboxes, gt_bboxes, gt_crowd):
+    """IoUs of xywh boxes, computed as ``pycocotools.mask.iou`` does.
+
+    Args:
+        dt_bboxes (np.ndarray): shape (..., D, 4).
+        gt_bboxes (np.ndarray): shape (..., G, 4).
+        gt_crowd (np.ndarray): shape (..., G). The IoU of a detection and a
+            crowd ground truth is their intersection over the area of the
+            detection.
+
+    Returns:
+        np.ndarray: shape (..., D, G).
+    """
+    dt = dt_bboxes[..., :, None, :]
+    gt = gt_bboxes[..., None, :, :]
+    w = np.minimum(dt[..., 2] + dt[..., 0], gt[..., 2] + gt[..., 0]) - \
+        np.maximum(dt[..., 0], gt[..., 0])
+    h = np.minimum(dt[..., 3] + dt[..., 1], gt[..., 3] + gt[..., 1]) - \
+        np.maximum(dt[..., 1], gt[..., 1])
+    inter = w * h
+    dt_area = dt[..., 2] * dt[..., 3]
+    gt_area = gt[..., 2] * gt[..., 3]
+    union = np.where(gt_crowd[..., None, :], dt_area,
+                     gt_area + dt_area - inter)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ious = inter / union
+    return np.where((w > 0) & (h > 0), ious, 0.)
+
+
+def _ranges(starts, lens):
+    """Concatenation of ``arange(start, start + len)``."""
+    lens = np.asarray(lens, dtype=np.int64)
+    ends = np.cumsum(lens)
+    return np.repeat(np.asarray(starts) - ends + lens, lens) + np.arange(
+        ends[-1] if len(ends) else 0)
+
+
+def match_groups(ious, gt_ignore, gt_crowd, gt_nonzero, iou_thrs):
+    """Greedily match the detections of groups to their ground truths.
+
+    Every detection, in descending order of score, is matched to the
+    not-ignored ground truth it overlaps most, or the ignored one if it
+    overlaps no not-ignored ground truth, like ``COCOeval.evaluateImg``.
+    Ties go to the last ground truth.
+
+    Args:
+        ious (np.ndarray): shape (B, D, G), IoUs of the detections and
+            ground truths of B groups, -1 for padding.
+        gt_ignore (np.ndarray): shape (B, A, G), whether a ground truth is
+            ignored in an area range.
+        gt_crowd (np.ndarray): shape (B, G), crowd ground truths can be
+            matched repeatedly.
+        gt_nonzero (np.ndarray): shape (B, G), whether the id of a ground
+            truth is not 0. COCOeval treats detections matched to id 0 as
+            unmatched.
+        iou_thrs (np.ndarray): shape (T, ).
+
+    Returns:
+        tuple[np.ndarray]: ``dt_matched`` and ``dt_ignore`` with shape
+            (B, A, T, D).
+    """
+    num_groups, num_dts, num_gts = ious.shape
+    num_areas = gt_ignore.shape[1]
+    thrs = np.minimum(iou_thrs, 1 - 1e-10)[:, None]
+    ignore = gt_ignore[:, :, None, :]
+    reusable = gt_crowd[:, None, None, :]
+    gt_matched = np.zeros((num_groups, num_areas, len(thrs), num_gts), bool)
+    dt_matched = np.zeros((num_groups, num_areas, len(thrs), num_dts), bool)
+    dt_ignore = np.zeros_like(dt_matched)
+    for rank in range(num_dts):
+        iou = ious[:, rank, None, None, :]
+        cands = (iou >= thrs) & ~(gt_matched & ~reusable)
+        regular_cands = cands & ~ignore
+        cands = np.where(
+            regular_cands.any(-1, keepdims=True), regular_cands,
+            cands & ignore)
+        vals = np.where(cands, iou, -1.)
+        # the last of the largest IoUs
+        inds = num_gts - 1 - np.argmax(vals[..., ::-1], axis=-1)
+        b, a, t = np.nonzero(cands.any(-1))
+        m = inds[b, a, t]
+        gt_matched[b, a, t, m] = True
+        dt_matched[b, a, t, rank] = gt_nonzero[b, m]
+        dt_ignore[b, a, t, rank] = gt_ignore[b, a, m]
+    return dt_matched, dt_ignore
+
+
+def _match_shard(shard, iou_type, iou_thrs, chunk_size):
+    """Match the groups of a shard of images, see :func:`match_groups`.
+
+    Returns:
+        tuple[np.ndarray]: ``dt_matched`` and ``dt_ignore`` of the
+            detections of the shard, with shape (N, A, T).
+    """
+    nd, ng = shard['nd'], shard['ng']
+    dt_starts = np.cumsum(nd) - nd
+    gt_starts = np.cumsum(ng) - ng
+    num_areas = shard['gt_ignore'].shape[1]
+    dt_matched = np.zeros((nd.sum(), num_areas, len(iou_thrs)), bool)
+    dt_ignore = np.zeros_like(dt_matched)
+    if iou_type == 'segm':
+        # the masks are compared in C, group by group
+        blocks = [
+            np.asarray(
+                mask_util.iou(
+                    shard['dt_geoms'][dt_start:dt_start + num_dt],
+                    shard['gt_geoms'][gt_start:gt_start + num_gt],
+                    shard['gt_crowd'][gt_start:gt_start +
+                                      num_gt].astype(np.uint8).tolist()),
+                dtype=np.float64).ravel()
+            for dt_start, num_dt, gt_start, num_gt in zip(
+                dt_starts.tolist(), nd.tolist(), gt_starts.tolist(),
+                ng.tolist())
+        ]
+        block_starts = np.cumsum(nd * ng) - nd * ng
+        flat_ious = np.concatenate(blocks) if blocks else np.zeros(0)
+
+    # chunks of groups with similar numbers of detections and ground truths
+    order = np.lexsort((ng, nd))
+    num_cells = num_areas * len(iou_thrs)
+    start = 0
+    while start < len(order):
+        end, max_ng = start + 1, ng[order[start]]
+        while end < len(order):
+            chunk_ng = max(max_ng, ng[order[end]])
+            chunk_nd = nd[order[end]]
+            if (end + 1 - start) * (chunk_nd * chunk_ng + num_cells *
+                                    (chunk_nd + chunk_ng)) > chunk_size:
+                break
+            end, max_ng = end + 1, chunk_ng
+        inds = order[start:end]
+        start = end
+        num_dt, num_gt = nd[inds], ng[inds]
+        dt_valid = np.arange(num_dt.max()) < num_dt[:, None]
+        gt_valid = np.arange(num_gt.max()) < num_gt[:, None]
+        dt_inds = np.where(dt_valid,
+                           dt_starts[inds, None] + np.arange(num_dt.max()), 0)
+        gt_inds = np.where(gt_valid,
+                           gt_starts[inds, None] + np.arange(num_gt.max()), 0)
+        if iou_type == 'segm':
+            block_inds = block_starts[inds, None, None] + \
+                np.arange(num_dt.max())[:, None] * num_gt[:, None, None] + \
+                np.arange(num_gt.max())
+            valid = dt_valid[:, :, None] & gt_valid[:, None, :]
+            ious = flat_ious[np.where(valid, block_inds, 0)]
+        else:
+            ious = bbox_ious(shard['dt_geoms'][dt_inds],
+                             shard['gt_geoms'][gt_inds],
+                             shard['gt_crowd'][gt_inds])
+        ious = np.where(dt_valid[:, :, None] & gt_valid[:, None, :], ious,
+                        -1.)
+        matched, ignore = match_groups(
+            ious, shard['gt_ignore'][gt_inds].transpose(0, 2, 1),
+            shard['gt_crowd'][gt_inds], shard['gt_nonzero'][gt_inds] &
+            gt_valid, iou_thrs)
+        dt_matched[dt_inds[dt_valid]] = matched.transpose(0, 3, 1,
+                                                          2)[dt_valid]
+        dt_ignore[dt_inds[dt_valid]] = ignore.transpose(0, 3, 1, 2)[dt_valid]
+    return dt_matched, dt_ignore
+
+
+class LazyRLEs:
+    """RLE encoded masks that are only read when they are compared.
+
+    Args:
+        get_rles (callable): Function returning the list of RLEs of an array
+            of detection indices, e.g. :meth:`BaseDetResults.get_rles`.
+        inds (np.ndarray): Detection indices of the items.
+    """
+
+    def __init__(self, get_rles, inds):
+        self.get_rles = get_rles
+        self.inds = np.asarray(inds, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.inds)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self.get_rles(self.inds[item])
+        return self.get_rles(self.inds[[item]])[0]
+
+    def take(self, inds):
+        return LazyRLEs(self.get_rles, self.inds[inds])
+
+
+def _take(geoms, inds):
+    if isinstance(geoms, LazyRLEs):
+        return geoms.take(inds)
+    if isinstance(geoms, np.ndarray):
+        return geoms[inds]
+    return [geoms[i] for i in inds.tolist()]
+
+
+class DetArrays:
+    """Detections given as flat arrays instead of a results api.
+
+    Args:
+        img_ids (np.ndarray): Image id of each detection, shape (N, ).
+        cat_ids (np.ndarray): Category id of each detection, shape (N, ).
+        scores (np.ndarray): Scores, shape (N, ).
+        areas (np.ndarray): Areas compared with the area ranges, shape (N, ).
+        bboxes (np.ndarray, optional): xywh boxes with shape (N, 4), needed
+            for 'bbox' evaluation.
+        rles (list[dict] | :obj:`LazyRLEs`, optional): RLE encoded masks,
+            needed for 'segm' evaluation.
+        ids (np.ndarray, optional): Detection ids. Defaults to 1 to N, the
+            ids assigned by ``COCO.loadRes`` and ``LVISResults``.
+    """
+
+    def __init__(self,
+                 img_ids,
+                 cat_ids,
+                 scores,
+                 areas,
+                 bboxes=None,
+                 rles=None,
+                 ids=None):
+        self.img_ids = np.asarray(img_ids, dtype=np.int64)
+        self.cat_ids = np.asarray(cat_ids, dtype=np.int64)
+        self.scores = np.asarray(scores, dtype=np.float64)
+        self.areas = np.asarray(areas, dtype=np.float64)
+        self.bboxes = None if bboxes is None else np.asarray(
+            bboxes, dtype=np.float64).reshape(-1, 4)
+        self.rles = rles
+        self.ids = np.arange(1, len(self.img_ids) + 1) if ids is None \
+            else np.asarray(ids, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.img_ids)
+
+    @classmethod
+    def from_anns(cls, anns, iou_type, ann_to_rle=None):
+        """Get the arrays of the annotations of a results api.
+
+        Args:
+            anns (list[dict]): Detections loaded by the results api.
+            iou_type (str): 'bbox' or 'segm'.
+            ann_to_rle (callable, optional): Function converting an
+                annotation to its RLE, needed for 'segm'.
+        """
+        if iou_type == 'segm':
+            bboxes, rles = None, [ann_to_rle(ann) for ann in anns]
+        else:
+            bboxes, rles = [ann['bbox'] for ann in anns], None
+        return cls(
+            img_ids=[ann['image_id'] for ann in anns],
+            cat_ids=[ann['category_id'] for ann in anns],
+            scores=[ann['score'] for ann in anns],
+            areas=[ann['area'] for ann in anns],
+            bboxes=bboxes,
+            rles=rles,
+            ids=[ann['id'] for ann in anns])
+
+    def take(self, inds):
+        """Get the detections with the given indices."""
+        inds = np.asarray(inds, dtype=np.int64)
+        return DetArrays(
+            self.img_ids[inds],
+            self.cat_ids[inds],
+            self.scores[inds],
+            self.areas[inds],
+            bboxes=None if self.bboxes is None else self.bboxes[inds],
+            rles=None if self.rles is None else _take(self.rles, inds),
+            ids=self.ids[inds])
+
+    def select(self, img_ids, cat_ids):
+        """Get the detections of the given images and categories."""
+        keep = np.isin(self.img_ids, img_ids) & np.isin(self.cat_ids, cat_ids)
+        return self.take(np.flatnonzero(keep))
+
+    def limit_per_image(self, max_dets):
+        """Keep the top ``max_dets`` detections of each image.
+
+        Reorders and renumbers the detections like ``LVISResults``: by image
+        in order of appearance, the detections of images with more than
+        ``max_dets`` of them by descending score.
+        """
+        _, first, img_inds = np.unique(
+            self.img_ids, return_index=True, return_inverse=True)
+        img_order = np.argsort(np.argsort(first))[img_inds]
+        limited = np.bincount(img_inds)[img_inds] > max_dets
+        order = np.lexsort((np.where(limited, -self.scores, 0), img_order))
+        group_starts = np.searchsorted(img_order[order], img_order[order])
+        keep = order[np.arange(len(order)) - group_starts < max_dets]
+        dets = self.take(keep)
+        dets.ids = np.arange(1, len(dets) + 1)
+        return dets
+
+
+def _index_of(values, keys):
+    """Positions of ``values`` in the array of unique ``keys``."""
+    keys = np.asarray(keys)
+    order = np.argsort(keys, kind='mergesort')
+    return order[np.searchsorted(keys[order], values)]
+
+
+class _FastEvalMixin:
+    """Array based evaluation shared by the COCO and LVIS evaluators."""
+
+    def _fast_evaluate(self,
+                       img_ids,
+                       cat_ids,
+                       gts,
+                       dets,
+                       gt_geoms,
+                       gt_ignore,
+                       gt_crowd,
+                       dt_extra_ignore,
+                       iou_type,
+                       iou_thrs,
+                       area_rngs,
+                       max_det=None):
+        """Match the detections to the ground truths.
+
+        Args:
+            img_ids (list[int]): Evaluated images, sorted.
+            cat_ids (list[int]): Evaluated categories.
+            gts (list[dict]): Ground truth annotations.
+            dets (:obj:`DetArrays`): Detections of the evaluated images and
+                categories.
+            gt_geoms (np.ndarray | list[dict]): xywh boxes or RLEs of the
+                ground truths.
+            gt_ignore (np.ndarray): Ignored ground truths.
+            gt_crowd (np.ndarray): Crowd ground truths.
+            dt_extra_ignore (np.ndarray): Unmatched detections to ignore in
+                all area ranges.
+            iou_type (str): 'bbox' or 'segm'.
+            iou_thrs (np.ndarray): IoU thresholds.
+            area_rngs (list): Area ranges.
+            max_det (int, optional): Only the top ``max_det`` detections of
+                an image and category are evaluated.
+        """
+        num_imgs = len(img_ids)
+        img_inds = {img_id: i for i, img_id in enumerate(img_ids)}
+        cat_inds = {cat_id: i for i, cat_id in enumerate(cat_ids)}
+        area_rngs = np.asarray(area_rngs, dtype=np.float64)
+
+        # ground truths by (category, image), in the order of the api
+        gt_keys = [
+            cat_inds[ann['category_id']] * num_imgs + img_inds[ann['image_id']]
+            for ann in gts
+        ]
+        gt_keys = np.array(gt_keys, dtype=np.int64)
+        gt_order = np.argsort(gt_keys, kind='mergesort')
+        gt_keys = gt_keys[gt_order]
+        gt_areas = np.array([gts[i]['area'] for i in gt_order.tolist()],
+                            dtype=np.float64)
+        gt_ids = np.array([gts[i]['id'] for i in gt_order.tolist()],
+                          dtype=np.int64)
+        gt_ignore = np.asarray(gt_ignore, bool)[gt_order]
+        gt_crowd = np.asarray(gt_crowd, bool)[gt_order]
+        gt_geoms = _take(gt_geoms, gt_order)
+        # ignored in each area range
+        gt_ignore = gt_ignore[:, None] | (
+            gt_areas[:, None] < area_rngs[:, 0]) | (
+                gt_areas[:, None] > area_rngs[:, 1])
+
+        # detections by (category, image) and descending score
+        dt_keys = _index_of(dets.cat_ids, cat_ids) * num_imgs + _index_of(
+            dets.img_ids, img_ids)
+        dt_scores = dets.scores
+        dt_order = np.lexsort((-dt_scores, dt_keys))
+        dt_keys = dt_keys[dt_order]
+        group_starts = np.searchsorted(dt_keys, dt_keys, side='left')
+        dt_ranks = np.arange(len(dt_keys)) - group_starts
+        if max_det is not None:
+            keep = dt_ranks < max_det
+            dt_order, dt_keys, dt_ranks = (dt_order[keep], dt_keys[keep],
+                                           dt_ranks[keep])
+        dt_scores = dt_scores[dt_order]
+        dt_areas = dets.areas[dt_order]
+        dt_ids = dets.ids[dt_order]
+        dt_extra_ignore = np.asarray(dt_extra_ignore, bool)[dt_order]
+        dt_geoms = _take(dets.rles if iou_type == 'segm' else dets.bboxes,
+                         dt_order)
+
+        # groups with both detections and ground truths are matched
+        dt_group_keys, dt_starts, nd = np.unique(
+            dt_keys, return_index=True, return_counts=True)
+        gt_group_keys, gt_starts, ng = np.unique(
+            gt_keys, return_index=True, return_counts=True)
+        keys, dt_inds, gt_inds = np.intersect1d(
+            dt_group_keys, gt_group_keys, return_indices=True)
+        dt_starts, nd = dt_starts[dt_inds], nd[dt_inds]
+        gt_starts, ng = gt_starts[gt_inds], ng[gt_inds]
+
+        num_shards = max(min(self.nproc, len(keys)), 1)
+        shard_ids = (keys % num_imgs) * num_shards // num_imgs
+        shards, shard_dts = [], []
+        for i in range(num_shards):
+            in_shard = shard_ids == i
+            dt_rows = _ranges(dt_starts[in_shard], nd[in_shard])
+            gt_rows = _ranges(gt_starts[in_shard], ng[in_shard])
+            shard_dts.append(dt_rows)
+            shards.append(
+                dict(
+                    nd=nd[in_shard],
+                    ng=ng[in_shard],
+                    dt_geoms=_take(dt_geoms, dt_rows),
+                    gt_geoms=_take(gt_geoms, gt_rows),
+                    gt_ignore=gt_ignore[gt_rows],
+                    gt_crowd=gt_crowd[gt_rows],
+                    gt_nonzero=gt_ids[gt_rows] != 0))
+        args = [(shard, iou_type, iou_thrs, self.chunk_size)
+                for shard in shards]
+        if num_shards > 1:
+            pool = Pool(num_shards)
+            outs = pool.starmap(_match_shard, args)
+            pool.close()
+        else:
+            outs = [_match_shard(*arg) for arg in args]
+
+        dt_matched = np.zeros((len(dt_keys), len(area_rngs), len(iou_thrs)),
+                              bool)
+        dt_ignore = np.zeros_like(dt_matched)
+        for dt_rows, (matched, ignore) in zip(shard_dts, outs):
+            dt_matched[dt_rows] = matched
+            dt_ignore[dt_rows] = ignore
+        # ignore unmatched detections outside of the area range
+        dt_ignore |= ~dt_matched & (
+            (dt_areas[:, None] < area_rngs[:, 0])
+            | (dt_areas[:, None] > area_rngs[:, 1])
+            | dt_extra_ignore[:, None])[..., None]
+
+        self._dt_cats = dt_keys // num_imgs
+        self._dt_ranks = dt_ranks
+        self._dt_scores = dt_scores
+        self._dt_ids = dt_ids
+        self._dt_matched = dt_matched
+        self._dt_ignore = dt_ignore
+        self._num_gts = np.stack([
+            np.bincount(
+                gt_keys[~gt_ignore[:, a]] // num_imgs,
+                minlength=len(cat_ids)) for a in range(len(area_rngs))
+        ], 1)
+
+    def _fast_accumulate(self, rec_thrs, max_dets):
+        """Accumulate the matches to precision and recall.
+
+        Returns:
+            tuple[np.ndarray]: ``precision`` and ``scores`` with shape
+                (T, R, K, A, M), ``recall`` with shape (T, K, A, M) and the
+                sorted detection ids, true and false positives of each
+                category and area range.
+        """
+        num_cats, num_areas = self._num_gts.shape
+        num_thrs = self._dt_matched.shape[2]
+        shape = (num_thrs, len(rec_thrs), num_cats, num_areas, len(max_dets))
+        precision = -np.ones(shape)
+        scores = -np.ones(shape)
+        recall = -np.ones((num_thrs, num_cats, num_areas, len(max_dets)))
+        dt_pointers = {
+            k: {a: {} for a in range(num_areas)}
+            for k in range(num_cats)
+        }
+        cat_starts = np.searchsorted(self._dt_cats, np.arange(num_cats + 1))
+        for k in range(num_cats):
+            if not self._num_gts[k].any():
+                continue
+            dts = slice(cat_starts[k], cat_starts[k + 1])
+            for m, max_det in enumerate(max_dets):
+                keep = np.ones(dts.stop - dts.start, bool) if max_det is None \
+                    else self._dt_ranks[dts] < max_det
+                dt_scores = self._dt_scores[dts][keep]
+                order = np.argsort(-dt_scores, kind='mergesort')
+                dt_scores = dt_scores[order]
+                # (A, T, N)
+                dt_matched = self._dt_matched[dts][keep][order].transpose(
+                    1, 2, 0)
+                dt_ignore = self._dt_ignore[dts][keep][order].transpose(
+                    1, 2, 0)
+                num_dts = len(dt_scores)
+                for a in range(num_areas):
+                    num_gts = self._num_gts[k, a]
+                    if num_gts == 0:
+                        continue
+                    tps = dt_matched[a] & ~dt_ignore[a]
+                    fps = ~dt_matched[a] & ~dt_ignore[a]
+                    if m == len(max_dets) - 1:
+                        dt_pointers[k][a] = dict(
+                            dt_ids=self._dt_ids[dts][keep][order],
+                            tps=tps,
+                            fps=fps)
+                    if num_dts == 0:
+                        # ground truths but no detections
+                        precision[:, :, k, a, m] = 0
+                        recall[:, k, a, m] = 0
+                        scores[:, :, k, a, m] = 0
+                        continue
+                    tp_sum = np.cumsum(tps, axis=1).astype(dtype=float)
+                    fp_sum = np.cumsum(fps, axis=1).astype(dtype=float)
+                    rc = tp_sum / num_gts
+                    pr = tp_sum / (fp_sum + tp_sum + np.spacing(1))
+                    recall[:, k, a, m] = rc[:, -1]
+                    # the largest precision at any larger recall
+                    pr = np.maximum.accumulate(pr[:, ::-1], axis=1)[:, ::-1]
+                    for t in range(num_thrs):
+                        inds = np.searchsorted(rc[t], rec_thrs, side='left')
+                        valid = inds < num_dts
+                        inds = np.minimum(inds, num_dts - 1)
+                        precision[t, :, k, a, m] = np.where(
+                            valid, pr[t, inds], 0)
+                        scores[t, :, k, a, m] = np.where(
+                            valid, dt_scores[inds], 0)
+        return precision, recall, scores, dt_pointers
+
+
+class FastCOCOeval(_FastEvalMixin, COCOeval):
+    """Vectorised ``COCOeval`` with the same results.
+
+    ``evaluate`` and ``accumulate`` are vectorised for 'bbox' and 'segm'
+    evaluation of categories, other settings fall back to ``COCOeval``.
+    ``evalImgs`` are not kept.
+
+    Args:
+        cocoGt (COCO): Ground truth api.
+        cocoDt (COCO | :obj:`DetArrays`): Detection api, or the detections
+            as arrays, which only supports the vectorised settings.
+        iouType (str): 'segm', 'bbox' or 'keypoints'. Default: 'segm'.
+        nproc (int): Processes the images are sharded over. Default: 1.
+        chunk_size (int): Maximum number of elements of the arrays of a
+            matching step. Default: 2**22.
+    """
+
+    def __init__(self,
+                 cocoGt=None,
+                 cocoDt=None,
+                 iouType='segm',
+                 nproc=1,
+                 chunk_size=2**22):
+        self.dets = None
+        if isinstance(cocoDt, DetArrays):
+            self.dets, cocoDt = cocoDt, None
+        super().__init__(cocoGt, cocoDt, iouType)
+        self.nproc = nproc
+        self.chunk_size = chunk_size
+        self._fallback = False
+
+    def evaluate(self):
+        """Match the detections of every image, category and area range."""
+        p = self.params
+        self._fallback = p.useSegm is not None or not p.useCats or \
+            p.iouType not in ('bbox', 'segm') or len(p.imgIds) == 0
+        if self._fallback:
+            assert self.dets is None, \
+                'detection arrays only support the evaluation of categories'
+            return super().evaluate()
+        tic = time.time()
+        print('Running per image evaluation...')
+        print(f'Evaluate annotation type *{p.iouType}*')
+        p.imgIds = list(np.unique(p.imgIds))
+        p.catIds = list(np.unique(p.catIds))
+        p.maxDets = sorted(p.maxDets)
+        self.params = p
+
+        gts = self.cocoGt.loadAnns(
+            self.cocoGt.getAnnIds(imgIds=p.imgIds, catIds=p.catIds))
+        if self.dets is None:
+            dts = self.cocoDt.loadAnns(
+                self.cocoDt.getAnnIds(imgIds=p.imgIds, catIds=p.catIds))
+            dets = DetArrays.from_anns(dts, p.iouType, self.cocoDt.annToRLE)
+        else:
+            dets = self.dets.select(p.imgIds, p.catIds)
+        if p.iouType == 'segm':
+            gt_geoms = [self.cocoGt.annToRLE(ann) for ann in gts]
+        else:
+            gt_geoms = np.array([ann['bbox'] for ann in gts],
+                                dtype=np.float64).reshape(-1, 4)
+        gt_crowd = [bool(ann.get('iscrowd', 0)) for ann in gts]
+        self._fast_evaluate(
+            p.imgIds,
+            p.catIds,
+            gts,
+            dets,
+            gt_geoms,
+            gt_ignore=gt_crowd,
+            gt_crowd=gt_crowd,
+            dt_extra_ignore=np.zeros(len(dets), bool),
+            iou_type=p.iouType,
+            iou_thrs=np.asarray(p.iouThrs, dtype=np.float64),
+            area_rngs=p.areaRng,
+            max_det=p.maxDets[-1])
+        self.evalImgs = []
+        self.ious = {}
+        self._paramsEval = copy.deepcopy(self.params)
+        toc = time.time()
+        print(f'DONE (t={toc - tic:0.2f}s).')
+
+    def accumulate(self, p=None):
+        """Accumulate the matches to precision and recall."""
+        if self._fallback:
+            return super().accumulate(p)
+        print('Accumulating evaluation results...')
+        tic = time.time()
+        if p is None:
+            p = self.params
+        precision, recall, scores, _ = self._fast_accumulate(
+            p.recThrs, p.maxDets)
+        self.eval = {
+            'params': p,
+            'counts': list(precision.shape),
+            'date': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'precision': precision,
+            'recall': recall,
+            'scores': scores,
+        }
+        toc = time.time()
+        print(f'DONE (t={toc - tic:0.2f}s).')
+
+
+class FastLVISEval(_FastEvalMixin, LVISEval):
+    """Vectorised ``LVISEval`` with the same results.
+
+    See :class:`FastCOCOeval`. ``eval_imgs`` are not kept.
+
+    Args:
+        lvis_gt (LVIS): Ground truth api.
+        lvis_dt (LVISResults | :obj:`DetArrays`): Detections. The arrays
+            are evaluated as given, see :meth:`DetArrays.limit_per_image`
+            for the ``max_dets`` of ``LVISResults``.
+        iou_type (str): 'segm' or 'bbox'. Default: 'segm'.
+        nproc (int): Processes the images are sharded over. Default: 1.
+        chunk_size (int): Maximum number of elements of the arrays of a
+            matching step. Default: 2**22.
+    """
+
+    def __init__(self,
+                 lvis_gt,
+                 lvis_dt=None,
+                 iou_type='segm',
+                 nproc=1,
+                 chunk_size=2**22):
+        if LVISEval is object:
+            raise ImportError(
+                'Package lvis is not installed. Please run "pip install git+https://github.com/lvis-dataset/lvis-api.git".'  # noqa: E501
+            )
+        self.dets = None
+        if isinstance(lvis_dt, DetArrays):
+            # LVISEval only accepts a results api, which is left empty
+            self.dets, lvis_dt = lvis_dt, LVISResults.__new__(LVISResults)
+        super().__init__(lvis_gt, lvis_dt, iou_type)
+        self.nproc = nproc
+        self.chunk_size = chunk_size
+        self._fallback = False
+
+    def evaluate(self):
+        """Match the detections of every image, category and area range."""
+        p = self.params
+        self._fallback = not p.use_cats or not p.cat_ids or not p.img_ids
+        if self._fallback:
+            assert self.dets is None, \
+                'detection arrays only support the evaluation of categories'
+            return super().evaluate()
+        p.img_ids = list(np.unique(p.img_ids))
+        gts = self.lvis_gt.load_anns(
+            self.lvis_gt.get_ann_ids(img_ids=p.img_ids, cat_ids=p.cat_ids))
+        if self.dets is None:
+            dts = self.lvis_dt.load_anns(
+                self.lvis_dt.get_ann_ids(
+                    img_ids=p.img_ids, cat_ids=p.cat_ids))
+            dets = DetArrays.from_anns(dts, p.iou_type,
+                                       self.lvis_dt.ann_to_rle)
+        else:
+            dets = self.dets.select(p.img_ids, p.cat_ids)
+
+        # detections of categories neither annotated nor known to be absent
+        # in an image are not evaluated
+        img_data = self.lvis_gt.load_imgs(ids=p.img_ids)
+        img_nl = {d['id']: set(d['neg_category_ids']) for d in img_data}
+        img_pl = defaultdict(set)
+        for ann in gts:
+            img_pl[ann['image_id']].add(ann['category_id'])
+        self.img_nel = {
+            d['id']: d['not_exhaustive_category_ids']
+            for d in img_data
+        }
+        num_cats = max(p.cat_ids) + 1
+
+        def pair_keys(img_cats):
+            keys = [
+                img_id * num_cats + cat_id
+                for img_id, cat_ids in img_cats.items() for cat_id in cat_ids
+                if cat_id < num_cats
+            ]
+            return np.array(keys, dtype=np.int64)
+
+        dt_keys = dets.img_ids * num_cats + dets.cat_ids
+        dets = dets.take(
+            np.flatnonzero(
+                np.isin(dt_keys, pair_keys(img_nl))
+                | np.isin(dt_keys, pair_keys(img_pl))))
+        dt_keys = dets.img_ids * num_cats + dets.cat_ids
+
+        if p.iou_type == 'segm':
+            gt_geoms = [self.lvis_gt.ann_to_rle(ann) for ann in gts]
+        else:
+            gt_geoms = np.array([ann['bbox'] for ann in gts],
+                                dtype=np.float64).reshape(-1, 4)
+        self._fast_evaluate(
+            p.img_ids,
+            p.cat_ids,
+            gts,
+            dets,
+            gt_geoms,
+            gt_ignore=[bool(ann.get('ignore', 0)) for ann in gts],
+            gt_crowd=np.zeros(len(gts), bool),
+            dt_extra_ignore=np.isin(dt_keys, pair_keys(self.img_nel)),
+            iou_type=p.iou_type,
+            iou_thrs=np.asarray(p.iou_thrs, dtype=np.float64),
+            area_rngs=p.area_rng)
+        self.freq_groups = self._prepare_freq_group()
+        self.eval_imgs = []
+
+    def accumulate(self):
+        """Accumulate the matches to precision and recall."""
+        if self._fallback:
+            return super().accumulate()
+        precision, recall, _, dt_pointers = self._fast_accumulate(
+            self.params.rec_thrs, [None])
+        self.eval = {
+            'params': self.params,
+            'counts': list(precision.shape[:4]),
+            'date': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'precision': precision[..., 0],
+            'recall': recall[..., 0],
+            'dt_pointers': dt_pointers,
+        }
@@ -13,8 +13,9 @@ import numpy as np
 from mmcv.utils import print_log
 from terminaltables import AsciiTable
 
-from mmdet.core import eval_recalls
-from .api_wrappers import COCO, COCOeval
+from mmdet.core import BaseDetResults, BoxMask, eval_recalls
+from .ann_index import IGNORE, ISCROWD, AnnIndex, ann_index_path
+from .api_wrappers import COCO, COCOeval, DetArrays, FastCOCOeval, LazyRLEs
 from .builder import DATASETS
 from .custom import CustomDataset
 
@@ -62,9 +63,102 @@ class CocoDataset(CustomDataset):
     CLASSES = ('accordion', 'adhesive_tape', 'air_conditioner', 'air_fryer', 'air_purifier', 'airplane', 'alarm_clock', 'almond', 'alpaca', 'aluminium_foil', 'ambulance', 'ant', 'antelope', 'apple', 'apricot', 'armadillo', 'artichoke', 'arugula', 'avocado', 'axe', 'baby_monitor', 'backpack', 'bacon', 'badminton_birdie', 'badminton_racket', 'bagel', 'balance_beam', 'balloon', 'banana', 'band_aid', 'banjo', 'barge', 'barrel', 'baseball_bat', 'baseball_glove', 'basketball', 'bat_animal', 'bathroom_cabinet', 'bathtub', 'beaker', 'beans', 'bee', 'beef', 'beehive', 'beer', 'bell_pepper', 'belt', 'bench', 'bicycle', 'bicycle_helmet', 'bicycle_wheel', 'bidet', 'billboard', 'billiard_table', 'binoculars', 'blackberry', 'blanket', 'blender', 'blue_jay', 'blueberry', 'bok_choy', 'bomb', 'bonsai', 'book', 'bookcase', 'boot', 'bottle', 'bottle_opener', 'bow_and_arrow', 'bowl', 'bowling_equipment', 'box', 'box_of_macaroni_and_cheese', 'boxing_gloves', 'brassiere', 'bread', 'bridges', 'briefcase', 'broccoli', 'bronze_sculpture', 'brown_bear', 'brussel_sprouts', 'bull', 'burrito', 'bus', 'bust', 'butterfly', 'cabbage', 'cabinetry', 'cake', 'cake_stand', 'calculator', 'calendar', 'camel', 'camera', 'can_opener', 'canary', 'candle', 'candy', 'cannon', 'canoe', 'cantaloupe', 'carrot', 'cart', 'cashew', 'cassette_deck', 'castle', 'cat', 'cat_furniture', 'caterpillar', 'cattle', 'cauliflower', 'ceiling_fan', 'celery', 'cello', 'centipede', 'chainsaw', 'chair', 'chandelier', 'chard', 'cheese', 'cheetah', 'cherry', 'cherry_tomato', 'chest_of_drawers', 'chicken', 'chicken_breast', 'chime', 'chisel', 'chive', 'chopsticks', 'christmas_tree', 'closet', 'coat', 'cocktail', 'cocktail_shaker', 'coconut', 'coffee', 'coffee_cup', 'coffee_table', 'coffeemaker', 'coin', 'collard_green', 'common_fig', 'common_sunflower', 'computer_keyboard', 'computer_monitor', 'computer_mouse', 'condiment', 'convenience_store', 'cookie', 'cooking_spray', 'corded_phone', 'countertop', 'cowboy_hat', 'crab', 'cream', 'creamer', 'crib', 'cricket_ball', 'crocodile', 'croissant', 'crown', 'crutch', 'cucumber', 'cupboard', 'curtain', 'cutting_board', 'dagger', 'deep_fryer', 'deer', 'dental_floss', 'desk', 'detergent', 'diaper', 'dice', 'digital_clock', 'dinosaur', 'dishwasher', 'dog', 'dog_bed', 'doll', 'dolphin', 'door', 'door_handle', 'doughnut', 'dragonfly', 'drawer', 'dress', 'drill_tool', 'drinking_straw', 'drivers_license', 'drum', 'duck', 'dumbbell', 'eagle', 'earrings', 'egg_food', 'eggplant', 'elephant', 'endive', 'envelope', 'eraser', 'face_powder', 'facial_tissue_holder', 'falcon', 'fax', 'fedora', 'filing_cabinet', 'fire', 'fire_alarm', 'fire_hydrant', 'fire_truck', 'firearm', 'fireplace', 'firework', 'fishing_pole', 'flag', 'flashlight', 'floor_lamp', 'flowerpot', 'flute', 'flying_disc', 'food_processor', 'football', 'football_helmet', 'fork', 'fountain', 'fox', 'french_fries', 'french_horn', 'frisée', 'frog', 'fruit_juice', 'frying_pan', 'game_controller_pad', 'garden_asparagus', 'garlic', 'gas_stove', 'gift', 'ginger', 'giraffe', 'glasses', 'glove', 'goat', 'goggles', 'goldfish', 'golf_ball', 'golf_cart', 'gondola', 'goose', 'grape', 'grapefruit', 'grinder', 'ground_chicken', 'ground_turkey', 'guacamole', 'guitar', 'hair_dryer', 'hair_spray', 'hamburger', 'hammer', 'hamster', 'hand_dryer', 'handbag', 'handgun', 'harbor_seal', 'harmonica', 'harp', 'harpsichord', 'headphones', 'heart_rate_monitor', 'heater', 'hedgehog', 'helicopter', 'high_heels', 'hiking_equipment', 'hippopotamus', 'hockey_puck', 'hockey_stick', 'honeycomb', 'honeydew', 'horizontal_bar', 'horse', 'hot_dog', 'house', 'house_car_key', 'houseplant', 'humidifier', 'ice_cream', 'indoor_rower', 'infant_bed', 'ipod', 'isopod', 'jacket', 'jacuzzi', 'jaguar_animal', 'jeans', 'jellyfish', 'jet_ski', 'jug', 'juice', 'juicer', 'kale', 'kangaroo', 'kettle', 'kitchen_and_dining_room_table', 'kite', 'kiwi', 'knife', 'koala', 'lacrosse_ball', 'lacrosse_stick', 'ladder', 'ladle', 'ladybug', 'lamp', 'lamp_shade', 'lantern', 'laptop', 'laptop_charger', 'lavender_plant', 'lemon', 'lemonade', 'leopard', 'lettuce', 'light_bulb', 'light_switch', 'lighthouse', 'lily', 'lime', 'limousine', 'lion', 'lipstick', 'lizard', 'lobster', 'loveseat', 'lynx', 'magpie', 'mango', 'maple', 'maracas', 'measuring_cup', 'mechanical_fan', 'microphone', 'microwave_oven', 'milk', 'miniskirt', 'mirror', 'missile', 'mixer', 'mixing_bowl', 'mobile_phone', 'monkey', 'motorcycle', 'mouse', 'mouthwash', 'muffin', 'mug', 'mule', 'mushroom', 'musical_keyboard', 'mussel', 'nail_construction', 'napkin', 'necklace', 'nectarine', 'night_light', 'nightstand', 'notebook', 'oboe', 'office_building', 'onion', 'orange', 'organ', 'ostrich', 'otter', 'oven', 'owl', 'oyster', 'paddle', 'palm_tree', 'pancake', 'panda', 'papaya', 'paper', 'paper_cutter', 'paper_towel', 'parachute', 'parking_meter', 'parrot', 'parsnip', 'passport', 'pasta', 'pasta_and_noodles', 'pattypan_squash', 'peach', 'peacock', 'pear', 'pen', 'pencil', 'pencil_case', 'pencil_sharpener', 'penguin', 'peppers', 'perfume', 'personal_flotation_device', 'phone_charger', 'piano', 'picnic_basket', 'picture_frame', 'pig', 'pillow', 'pineapple', 'pitcher_container', 'pizza', 'pizza_cutter', 'plastic_bag', 'plate', 'platter', 'playstation', 'plum', 'polar_bear', 'police_car', 'pomegranate', 'pop_tarts', 'popcorn', 'porch', 'porcupine', 'pork', 'post_it', 'poster', 'potato', 'pottery', 'power_plugs_and_sockets', 'prawn', 'pressure_cooker', 'pretzel', 'printer', 'projector', 'pumpkin', 'punching_bag', 'rabbit', 'raccoon', 'radicchio', 'radish', 'raspberry', 'ratchet_device', 'raven', 'rays_and_skates', 'receipt', 'red_panda', 'red_tomato', 'refrigerator', 'remote_control', 'rhinoceros', 'rhubarb', 'rifle', 'ring', 'ring_binder', 'robotic_vacuum', 'rocket', 'roller_skates', 'rose', 'rugby_ball', 'ruler', 'salad', 'salmon', 'salt_and_pepper_shakers', 'sandal', 'saucer', 'sausage', 'saxophone', 'scale', 'scallop', 'scarf', 'scissors', 'scoreboard', 'scorpion', 'screwdriver', 'sea_lion', 'sea_turtle', 'seahorse', 'seat_belt', 'segway', 'semi_truck_truck_with_long_trailer', 'serving_tray', 'sewing_machine', 'shallot', 'shark', 'shaving_cream', 'sheep', 'shelf', 'shirt', 'shorts', 'shotgun', 'shower', 'shrimp', 'sink', 'skateboard', 'ski', 'skull', 'skunk', 'skyscraper', 'slow_cooker', 'snail', 'snake', 'snowboard', 'snowman', 'snowmobile', 'snowplow', 'soap', 'soap_dispenser', 'soccer_ball', 'sock', 'sofa', 'sombrero', 'sound_bar', 'sparrow', 'spatula', 'speaker_stereo_equipment', 'spice_rack', 'spider', 'spinach', 'spoon', 'sports_uniform', 'squid', 'squirrel', 'stairs', 'stapler', 'starfish', 'stationary_bicycle', 'stethoscope', 'stool', 'stop_sign', 'strawberry', 'street_light', 'stretcher', 'studio_couch', 'submarine', 'submarine_sandwich', 'suit', 'suitcase', 'sun_hat', 'sunglasses', 'surfboard', 'sushi', 'swan', 'sweet_potato', 'swim_cap', 'swimming_pool', 'swimwear', 'sword', 'syringe', 'table_tennis_racket', 'tablet_computer', 'taco', 'tangerine', 'tank', 'tap', 'tart', 'taxi', 'tea', 'tea_cup', 'teapot', 'teddy_bear', 'television', 'tennis_ball', 'tennis_racket', 'tent', 'thermostat', 'tiara', 'tick', 'tie', 'tiger', 'tin_can', 'tire', 'toaster', 'toilet', 'toilet_paper', 'tomato', 'toothbrush', 'toothpaste', 'torch', 'tortoise', 'towel', 'tower', 'traffic_light', 'train', 'training_bench', 'trampoline', 'treadmill', 'tree_house', 'tripod', 'trombone', 'truck', 'trumpet', 'turkey', 'turnip', 'umbrella', 'unicycle', 'vacuum', 'van', 'vase', 'vehicle_registration_plate', 'violin', 'volleyball_ball', 'waffle', 'waffle_iron', 'wall_clock', 'wallet', 'wardrobe', 'washing_machine', 'waste_container', 'watch', 'water_glass', 'watermelon', 'whale', 'wheel', 'wheelchair', 'whisk', 'whiteboard', 'willow', 'window', 'window_blind', 'wine', 'wine_glass', 'wine_rack', 'winter_melon', 'wok', 'wood_burning_stove', 'woodpecker', 'worm', 'wrench', 'xbox', 'yoga_mat', 'zebra', 'zucchini', )
     PALETTE = [(242, 220, 241), (125, 162, 148), (233, 150, 241), (164, 74, 186), (228, 209, 225), (46, 197, 195), (206, 206, 156), (207, 250, 167), (136, 164, 93), (62, 118, 189), (9, 9, 210), (152, 41, 191), (161, 115, 13), (5, 136, 196), (171, 44, 119), (150, 17, 153), (75, 227, 72), (62, 34, 98), (249, 155, 233), (88, 110, 138), (43, 175, 103), (116, 246, 194), (164, 128, 144), (171, 150, 117), (232, 79, 144), (126, 7, 58), (71, 120, 187), (248, 26, 170), (53, 154, 251), (160, 114, 135), (93, 186, 77), (214, 115, 179), (192, 59, 172), (1, 102, 21), (183, 76, 211), (113, 85, 171), (176, 6, 252), (187, 228, 129), (231, 14, 121), (212, 157, 111), (221, 219, 42), (87, 112, 83), (135, 155, 19), (18, 17, 114), (209, 51, 239), (36, 5, 69), (226, 249, 4), (253, 118, 132), (214, 103, 24), (179, 75, 54), (62, 131, 137), (226, 208, 121), (69, 250, 247), (91, 169, 197), (1, 179, 96), (18, 174, 219), (153, 190, 160), (10, 71, 124), (36, 46, 66), (218, 80, 117), (195, 61, 238), (178, 203, 14), (172, 184, 57), (35, 254, 230), (197, 152, 227), (186, 107, 208), (174, 31, 183), (88, 132, 63), (115, 238, 23), (169, 221, 18), (142, 39, 240), (251, 212, 182), (67, 32, 77), (208, 33, 142), (150, 24, 95), (213, 250, 62), (176, 20, 55), (170, 233, 124), (19, 106, 26), (62, 21, 75), (234, 180, 203), (61, 235, 174), (2, 157, 54), (135, 114, 100), (241, 15, 215), (43, 226, 255), (144, 201, 1), (203, 230, 61), (87, 2, 226), (23, 57, 205), (9, 148, 158), (187, 15, 69), (238, 28, 248), (209, 117, 33), (100, 181, 135), (202, 10, 73), (7, 244, 53), (79, 57, 78), (216, 215, 189), (49, 106, 29), (239, 108, 159), (20, 111, 102), (51, 244, 101), (29, 44, 65), (155, 29, 150), (177, 139, 10), (76, 48, 71), (180, 215, 12), (16, 202, 236), (215, 8, 70), (73, 184, 140), (155, 74, 197), (208, 69, 18), (14, 255, 214), (51, 199, 14), (213, 134, 251), (244, 86, 198), (92, 135, 37), (99, 117, 0), (36, 52, 116), (160, 214, 207), (149, 123, 203), (35, 54, 201), (224, 190, 138), (92, 240, 85), (12, 132, 87), (151, 89, 164), (254, 94, 66), (241, 166, 136), (81, 156, 114), (133, 203, 133), (140, 25, 177), (173, 34, 102), (197, 215, 155), (181, 165, 99), (103, 49, 171), (87, 118, 188), (145, 32, 146), (80, 173, 26), (190, 114, 207), (150, 145, 14), (162, 177, 6), (85, 55, 112), (226, 50, 109), (111, 56, 185), (94, 190, 22), (136, 184, 115), (50, 194, 43), (45, 253, 156), (95, 75, 60), (4, 210, 174), (4, 41, 122), (34, 121, 71), (145, 218, 121), (55, 129, 99), (112, 155, 57), (246, 180, 250), (30, 64, 80), (181, 34, 20), (98, 114, 60), (169, 1, 63), (245, 48, 14), (134, 187, 158), (171, 121, 18), (255, 161, 89), (194, 106, 119), (40, 36, 75), (129, 231, 188), (249, 74, 215), (129, 118, 199), (222, 233, 193), (201, 108, 39), (193, 254, 71), (92, 171, 156), (176, 29, 32), (89, 22, 177), (188, 166, 99), (62, 37, 31), (51, 202, 81), (35, 76, 173), (10, 192, 14), (193, 207, 190), (52, 219, 52), (99, 127, 180), (99, 20, 156), (206, 52, 202), (228, 174, 139), (97, 2, 89), (199, 239, 137), (238, 148, 204), (77, 135, 234), (174, 20, 129), (32, 102, 53), (58, 186, 216), (60, 197, 3), (82, 213, 197), (123, 210, 197), (172, 56, 184), (188, 147, 34), (150, 167, 25), (41, 207, 47), (205, 36, 215), (13, 162, 36), (166, 230, 23), (89, 198, 20), (147, 18, 149), (111, 142, 199), (176, 132, 110), (237, 21, 164), (237, 152, 198), (200, 187, 70), (53, 53, 164), (8, 109, 189), (93, 48, 64), (247, 206, 25), (179, 148, 0), (80, 181, 195), (25, 24, 110), (29, 56, 30), (24, 88, 51), (141, 40, 189), (10, 41, 75), (236, 152, 250), (77, 33, 219), (68, 40, 204), (89, 1, 62), (125, 144, 133), (0, 7, 216), (150, 97, 57), (45, 80, 195), (203, 113, 189), (51, 35, 253), (178, 53, 178), (81, 101, 27), (80, 95, 101), (50, 181, 165), (195, 155, 63), (19, 246, 111), (7, 156, 29), (250, 147, 185), (133, 1, 235), (42, 31, 69), (45, 248, 212), (221, 224, 50), (215, 96, 226), (193, 193, 195), (103, 165, 131), (131, 207, 102), (16, 97, 204), (230, 52, 244), (81, 37, 195), (204, 168, 130), (140, 2, 239), (220, 161, 122), (242, 39, 72), (126, 70, 42), (167, 118, 161), (40, 6, 111), (183, 83, 15), (144, 217, 179), (253, 236, 77), (232, 169, 122), (175, 237, 232), (64, 237, 50), (124, 39, 207), (139, 14, 37), (246, 18, 242), (150, 198, 53), (185, 191, 160), (253, 117, 15), (5, 31, 217), (192, 55, 166), (13, 82, 71), (173, 29, 148), (193, 49, 86), (84, 138, 219), (140, 145, 20), (191, 135, 220), (16, 183, 208), (116, 52, 147), (9, 191, 177), (62, 220, 254), (51, 147, 157), (196, 71, 214), (41, 29, 252), (12, 82, 0), (137, 123, 252), (236, 221, 149), (27, 97, 84), (10, 126, 150), (1, 231, 82), (218, 40, 163), (144, 136, 68), (57, 173, 90), (101, 217, 253), (104, 154, 193), (198, 239, 51), (212, 59, 119), (207, 64, 177), (197, 17, 110), (68, 28, 248), (154, 191, 15), (200, 5, 123), (253, 169, 22), (75, 157, 151), (60, 215, 247), (119, 82, 18), (66, 205, 115), (45, 255, 3), (166, 253, 214), (65, 243, 120), (244, 121, 6), (10, 39, 150), (179, 245, 42), (160, 100, 233), (156, 109, 19), (109, 70, 131), (46, 86, 53), (186, 94, 99), (19, 188, 128), (254, 5, 240), (186, 84, 202), (69, 32, 81), (190, 133, 227), (77, 123, 44), (246, 21, 216), (73, 59, 30), (93, 152, 68), (118, 93, 38), (67, 194, 245), (177, 96, 125), (240, 111, 158), (66, 175, 217), (34, 100, 175), (23, 62, 224), (79, 233, 105), (105, 198, 190), (194, 39, 229), (139, 203, 115), (240, 249, 102), (84, 93, 122), (191, 173, 70), (61, 153, 234), (40, 67, 254), (169, 130, 130), (21, 211, 135), (230, 160, 88), (158, 70, 198), (156, 216, 10), (150, 237, 222), (30, 190, 59), (191, 71, 77), (73, 201, 222), (110, 187, 61), (212, 79, 27), (30, 59, 209), (166, 37, 45), (211, 177, 217), (231, 129, 217), (241, 124, 193), (182, 127, 200), (110, 185, 166), (19, 102, 178), (242, 197, 39), (122, 37, 75), (192, 142, 148), (253, 20, 253), (181, 181, 37), (141, 74, 118), (116, 15, 80), (120, 132, 94), (119, 38, 77), (0, 218, 255), (77, 13, 237), (61, 196, 48), (54, 70, 81), (211, 234, 218), (102, 69, 13), (141, 35, 35), (90, 188, 65), (61, 136, 239), (81, 138, 157), (186, 72, 210), (234, 27, 93), (21, 171, 166), (135, 246, 23), (76, 74, 12), (79, 96, 117), (184, 201, 222), (210, 255, 58), (117, 58, 98), (81, 228, 216), (83, 148, 50), (172, 208, 85), (108, 79, 225), (67, 217, 190), (105, 150, 245), (15, 206, 120), (230, 137, 196), (63, 14, 20), (81, 158, 194), (138, 46, 40), (190, 46, 122), (129, 227, 162), (233, 187, 20), (252, 72, 217), (202, 119, 199), (22, 5, 178), (243, 216, 198), (88, 190, 64), (204, 98, 156), (250, 127, 9), (146, 164, 89), (101, 205, 92), (76, 210, 79), (225, 154, 57), (212, 97, 8), (35, 213, 139), (71, 51, 227), (117, 70, 164), (4, 41, 252), (108, 122, 51), (4, 146, 171), (247, 166, 175), (227, 252, 0), (32, 84, 13), (210, 180, 41), (156, 37, 72), (89, 249, 228), (84, 29, 64), (226, 174, 208), (39, 153, 77), (232, 186, 18), (14, 73, 191), (168, 58, 232), (137, 102, 217), (185, 198, 242), (226, 8, 184), (191, 46, 61), (14, 85, 133), (79, 87, 70), (168, 46, 178), (31, 195, 49), (242, 223, 190), (102, 200, 61), (3, 10, 207), (22, 223, 33), (57, 224, 139), (203, 160, 253), (91, 97, 154), (30, 178, 14), (49, 120, 84), (101, 54, 223), (183, 33, 19), (85, 39, 173), (84, 101, 236), (241, 48, 206), (240, 141, 79), (70, 168, 94), (112, 169, 70), (107, 119, 148), (201, 157, 224), (103, 232, 122), (84, 84, 10), (22, 128, 153), (64, 252, 17), (77, 17, 201), (216, 47, 18), (5, 63, 165), (202, 228, 15), (62, 32, 122), (0, 167, 157), (102, 151, 230), (69, 240, 196), (178, 111, 225), (42, 201, 47), (169, 126, 199), (242, 38, 183), (94, 140, 192), (13, 134, 227), (58, 179, 90), (174, 200, 203), (23, 167, 68), (19, 205, 120), (182, 220, 30), (142, 224, 125), (141, 40, 28), (134, 250, 26), (195, 18, 40), (74, 199, 98), (207, 82, 110), (146, 5, 103), (61, 248, 134), (198, 101, 129), (19, 247, 121), (88, 16, 221), (167, 181, 33), (112, 206, 74), (210, 23, 97), (223, 249, 76), (151, 185, 26), (11, 33, 220), (140, 130, 124), (160, 187, 220), (51, 56, 113), (76, 207, 35), (50, 46, 88), (199, 53, 11), (61, 195, 41), (60, 15, 119), (197, 226, 159), (171, 81, 136), (53, 84, 22), (68, 243, 147), (152, 18, 237), (191, 70, 156), (196, 70, 61), (35, 149, 71), (101, 236, 89), (75, 48, 89), (235, 84, 199), (173, 71, 43), (101, 105, 176), (203, 34, 77), (31, 128, 215), (14, 207, 1), (172, 79, 33), (84, 9, 62), (92, 126, 93), (76, 187, 56), (30, 43, 64), (127, 164, 207), (178, 63, 183), (204, 115, 112), (236, 169, 233), (130, 113, 22), (181, 220, 135), (211, 213, 210), (90, 13, 86), (159, 74, 19), (140, 211, 223), (161, 34, 209), (207, 154, 250), (245, 30, 79), (33, 184, 202), (103, 236, 164), (97, 118, 181), (241, 114, 148), (222, 6, 18), (128, 147, 148), (165, 42, 165), (241, 147, 121), (12, 133, 4), (77, 248, 254), (231, 87, 193), (29, 64, 149), (232, 122, 82), (55, 210, 34), (43, 234, 236), (53, 249, 35), (150, 132, 160), (247, 246, 209), (199, 33, 163), (71, 185, 6), (17, 188, 115), (12, 93, 16), (44, 95, 96), (8, 93, 255), (40, 27, 81), (195, 242, 211), (209, 159, 47), (82, 115, 142), (50, 148, 42), (172, 243, 207), (214, 156, 235), (217, 168, 159), (198, 110, 202), (93, 150, 58), (108, 119, 65), (107, 126, 40), (159, 76, 225), (42, 47, 209), (221, 155, 204), (2, 229, 32), (132, 40, 255), (118, 10, 60), (178, 215, 232), (159, 178, 221), (142, 185, 97), (56, 220, 37), (82, 178, 235), (87, 51, 162), (140, 69, 20), (16, 47, 213), (210, 205, 105), (137, 201, 34), (36, 114, 7), (210, 199, 49), (13, 223, 75), (0, 98, 129), (98, 161, 18), (44, 6, 20), (231, 243, 73), (112, 213, 15), (44, 221, 252), (228, 119, 123), (248, 85, 254), (105, 4, 132), (168, 2, 116), (128, 11, 164), (218, 112, 225), (128, 187, 15), (147, 246, 219), (149, 36, 64), (73, 223, 47), (175, 24, 14), (121, 15, 147), (142, 91, 18), (212, 62, 15), (107, 146, 232), (115, 75, 81), (225, 97, 252), (3, 157, 28), (181, 59, 111), (255, 102, 53), (49, 151, 168), (93, 218, 8), (104, 165, 199), (31, 53, 209), (45, 180, 19), (16, 35, 103), (176, 3, 41), (99, 202, 120), (110, 244, 152), (80, 33, 35), (101, 165, 87), (90, 217, 117), (214, 134, 219), ]
 
+    def __init__(self,
+                 ann_file,
+                 pipeline,
+                 classes=None,
+                 data_root=None,
+                 img_prefix='',
+                 seg_prefix=None,
+                 seg_suffix='.png',
+                 proposal_file=None,
+                 test_mode=False,
+                 filter_empty_gt=True,
+                 file_client_args=dict(backend='disk'),
+                 ann_cache_dir=None):
+        """COCO style dataset.
+
+        Args:
+            ann_cache_dir (str, optional): Directory of the binary
+                :obj:`AnnIndex` of the annotation file. If set, the index is
+                built on the first load, keyed by the content of the
+                annotation file, and later loads memory-map it instead of
+                parsing the JSON file. The COCO api, e.g. for evaluation, is
+                then loaded on first use. Default: None.
+            Other args see :class:`CustomDataset`.
+        """
+        self.ann_cache_dir = ann_cache_dir
+        self.ann_index = None
+        self._coco = None
+        super().__init__(
+            ann_file,
+            pipeline,
+            classes=classes,
+            data_root=data_root,
+            img_prefix=img_prefix,
+            seg_prefix=seg_prefix,
+            seg_suffix=seg_suffix,
+            proposal_file=proposal_file,
+            test_mode=test_mode,
+            filter_empty_gt=filter_empty_gt,
+            file_client_args=file_client_args)
+
+    @property
+    def coco(self):
+        """COCO api of the annotation file.
+
+        Loaded on first use if the annotations are served from the index.
+        """
+        if self._coco is None and self.ann_index is not None:
+            with self.file_client.get_local_path(self.ann_file) as local_path:
+                self._coco = self._load_api(local_path)
+        return self._coco
+
+    @coco.setter
+    def coco(self, coco):
+        self._coco = coco
+
+    def _load_api(self, ann_file):
+        """Load the api of an annotation file."""
+        return COCO(ann_file)
+
     def load_annotations(self, ann_file):
         """Load annotation from COCO style annotation file.
 
+        If ``ann_cache_dir`` is set, the annotations are served from the
+        binary index of the annotation file, see :obj:`AnnIndex`.
+
+        Args:
+            ann_file (str): Path of annotation file.
+
+        Returns:
+            list[dict]: Annotation info from COCO api.
+        """
+        if self.ann_cache_dir is None:
+            return self._load_annotations(ann_file)
+
+        cache_path = ann_index_path(
+            self.ann_cache_dir, ann_file,
+            f'{self.__class__.__name__}:{self.CLASSES}')
+        if not osp.isdir(cache_path):
+            data_infos = self._load_annotations(ann_file)
+            try:
+                ann_index = AnnIndex.from_api(self.coco, data_infos,
+                                              self.cat_ids)
+            except ValueError as e:
+                warnings.warn(f'The annotations of {ann_file} are not '
+                              f'cached: {e}')
+                return data_infos
+            ann_index.dump(cache_path)
+        self.ann_index = AnnIndex.load(cache_path)
+        self.cat_ids = self.ann_index.cat_ids.tolist()
+        self.cat2label = {cat_id: i for i, cat_id in enumerate(self.cat_ids)}
+        self.img_ids = self.ann_index.img_ids.tolist()
+        return self.ann_index.data_infos()
+
+    def _load_annotations(self, ann_file):
+        """Load annotation from COCO style annotation file with COCO api.
+
         Args:
             ann_file (str): Path of annotation file.
 
@@ -72,7 +166,7 @@ class CocoDataset(CustomDataset):
             list[dict]: Annotation info from COCO api.
         """
 
-        self.coco = COCO(ann_file)
+        self.coco = self._load_api(ann_file)
         # The order of returned `cat_ids` will not
         # change with the order of the CLASSES
         self.cat_ids = self.coco.get_cat_ids(cat_names=self.CLASSES)
@@ -102,6 +196,9 @@ class CocoDataset(CustomDataset):
         """
 
         img_id = self.data_infos[idx]['id']
+        if self.ann_index is not None:
+            return self._parse_ann_index(self.data_infos[idx],
+                                         self.ann_index.get_rows(img_id))
         ann_ids = self.coco.get_ann_ids(img_ids=[img_id])
         ann_info = self.coco.load_anns(ann_ids)
         return self._parse_ann_info(self.data_infos[idx], ann_info)
@@ -117,6 +214,9 @@ class CocoDataset(CustomDataset):
         """
 
         img_id = self.data_infos[idx]['id']
+        if self.ann_index is not None:
+            rows = self.ann_index.get_rows(img_id)
+            return self.ann_index.ann_cat_ids[rows].tolist()
         ann_ids = self.coco.get_ann_ids(img_ids=[img_id])
         ann_info = self.coco.load_anns(ann_ids)
         return [ann['category_id'] for ann in ann_info]
@@ -124,15 +224,21 @@ class CocoDataset(CustomDataset):
     def _filter_imgs(self, min_size=32):
         """Filter images too small or without ground truths."""
         valid_inds = []
-        # obtain images that contain annotation
-        ids_with_ann = set(_['image_id'] for _ in self.coco.anns.values())
-        # obtain images that contain annotations of the required categories
-        ids_in_cat = set()
-        for i, class_id in enumerate(self.cat_ids):
-            ids_in_cat |= set(self.coco.cat_img_map[class_id])
-        # merge the image id sets of the two conditions and use the merged set
-        # to filter out images if self.filter_empty_gt=True
-        ids_in_cat &= ids_with_ann
+        if self.ann_index is not None:
+            # images that contain annotations of the required categories
+            ids_in_cat = self.ann_index.img_ids_with_cats(self.cat_ids)
+        else:
+            # obtain images that contain annotation
+            ids_with_ann = set(
+                _['image_id'] for _ in self.coco.anns.values())
+            # obtain images that contain annotations of the required
+            # categories
+            ids_in_cat = set()
+            for i, class_id in enumerate(self.cat_ids):
+                ids_in_cat |= set(self.coco.cat_img_map[class_id])
+            # merge the image id sets of the two conditions and use the
+            # merged set to filter out images if self.filter_empty_gt=True
+            ids_in_cat &= ids_with_ann
 
         valid_img_ids = []
         for i, img_info in enumerate(self.data_infos):
@@ -204,6 +310,56 @@ class CocoDataset(CustomDataset):
 
         return ann
 
+    def _parse_ann_index(self, img_info, rows):
+        """Parse bbox and mask annotation from the annotation index.
+
+        The same annotations as :meth:`_parse_ann_info` are kept, with the
+        filters applied to the arrays of the index at once.
+
+        Args:
+            img_info (dict): Info of the image.
+            rows (slice): Rows of the annotations of the image in the index.
+
+        Returns:
+            dict: A dict containing the following keys: bboxes, bboxes_ignore,\
+                labels, masks, seg_map. "masks" are raw annotations and not \
+                decoded into binary masks.
+        """
+        index = self.ann_index
+        x1, y1, w, h = np.asarray(index.bboxes[rows]).T
+        flags = index.flags[rows]
+        cat_ids = index.ann_cat_ids[rows]
+        inter_w = np.maximum(
+            0,
+            np.minimum(x1 + w, img_info['width']) - np.maximum(x1, 0))
+        inter_h = np.maximum(
+            0,
+            np.minimum(y1 + h, img_info['height']) - np.maximum(y1, 0))
+        valid = ((flags & IGNORE) == 0) & (inter_w * inter_h != 0) & (
+            index.areas[rows] > 0) & (w >= 1) & (h >= 1) & np.isin(
+                cat_ids, self.cat_ids)
+        crowd = (flags & ISCROWD) != 0
+        bboxes = np.stack([x1, y1, x1 + w, y1 + h], axis=1)
+        gt = valid & ~crowd
+
+        gt_bboxes = bboxes[gt].astype(np.float32)
+        gt_labels = np.array([self.cat2label[cat_id] for cat_id in
+                              cat_ids[gt].tolist()],
+                             dtype=np.int64)
+        gt_bboxes_ignore = bboxes[valid & crowd].astype(np.float32)
+        gt_masks_ann = index.get_segms(
+            np.arange(rows.start, rows.stop)[gt].tolist())
+        seg_map = img_info['filename'].rsplit('.', 1)[0] + self.seg_suffix
+
+        ann = dict(
+            bboxes=gt_bboxes,
+            labels=gt_labels,
+            bboxes_ignore=gt_bboxes_ignore,
+            masks=gt_masks_ann,
+            seg_map=seg_map)
+
+        return ann
+
     def xyxy2xywh(self, bbox):
         """Convert ``xyxy`` style bounding boxes to ``xywh`` style for COCO
         evaluation.
@@ -224,74 +380,86 @@ class CocoDataset(CustomDataset):
             _bbox[3] - _bbox[1],
         ]
 
+    @staticmethod
+    def _flatten_det(det):
+        """Concatenate the per-class bbox results of one image.
+
+        Args:
+            det (list[np.ndarray]): bbox results of each class.
+
+        Returns:
+            tuple[np.ndarray]: bboxes of shape (n, 5) and their labels.
+        """
+        num_dets = [len(bboxes) for bboxes in det]
+        bboxes = np.concatenate([bboxes.reshape(-1, 5) for bboxes in det])
+        labels = np.repeat(np.arange(len(det)), num_dets)
+        return bboxes, labels
+
+    def _bboxes2json(self, img_id, bboxes, scores, cat_ids):
+        """Convert the ``xyxy`` bboxes of one image to COCO json style."""
+        bboxes = np.asarray(bboxes[:, :4], dtype=np.float64)
+        bboxes[:, 2:] -= bboxes[:, :2]
+        return [
+            dict(image_id=img_id, bbox=bbox, score=score, category_id=cat_id)
+            for bbox, score, cat_id in zip(bboxes.tolist(),
+                                           np.asarray(scores).tolist(),
+                                           np.asarray(cat_ids).tolist())
+        ]
+
     def _proposal2json(self, results):
         """Convert proposal results to COCO json style."""
         json_results = []
         for idx in range(len(self)):
-            img_id = self.img_ids[idx]
             bboxes = results[idx]
-            for i in range(bboxes.shape[0]):
-                data = dict()
-                data['image_id'] = img_id
-                data['bbox'] = self.xyxy2xywh(bboxes[i])
-                data['score'] = float(bboxes[i][4])
-                data['category_id'] = 1
-                json_results.append(data)
+            json_results.extend(
+                self._bboxes2json(self.img_ids[idx], bboxes, bboxes[:, 4],
+                                  np.ones(len(bboxes), dtype=np.int64)))
         return json_results
 
     def _det2json(self, results):
         """Convert detection results to COCO json style."""
         json_results = []
+        cat_ids = np.asarray(self.cat_ids)
         for idx in range(len(self)):
-            img_id = self.img_ids[idx]
-            result = results[idx]
-            for label in range(len(result)):
-                bboxes = result[label]
-                for i in range(bboxes.shape[0]):
-                    data = dict()
-                    data['image_id'] = img_id
-                    data['bbox'] = self.xyxy2xywh(bboxes[i])
-                    data['score'] = float(bboxes[i][4])
-                    data['category_id'] = self.cat_ids[label]
-                    json_results.append(data)
+            bboxes, labels = self._flatten_det(results[idx])
+            json_results.extend(
+                self._bboxes2json(self.img_ids[idx], bboxes, bboxes[:, 4],
+                                  cat_ids[labels]))
         return json_results
 
     def _segm2json(self, results):
         """Convert instance segmentation results to COCO json style."""
         bbox_json_results = []
         segm_json_results = []
+        cat_ids = np.asarray(self.cat_ids)
         for idx in range(len(self)):
             img_id = self.img_ids[idx]
             det, seg = results[idx]
-            for label in range(len(det)):
-                # bbox results
-                bboxes = det[label]
-                for i in range(bboxes.shape[0]):
-                    data = dict()
-                    data['image_id'] = img_id
-                    data['bbox'] = self.xyxy2xywh(bboxes[i])
-                    data['score'] = float(bboxes[i][4])
-                    data['category_id'] = self.cat_ids[label]
-                    bbox_json_results.append(data)
-
-                # segm results
-                # some detectors use different scores for bbox and mask
-                if isinstance(seg, tuple):
-                    segms = seg[0][label]
-                    mask_score = seg[1][label]
-                else:
-                    segms = seg[label]
-                    mask_score = [bbox[4] for bbox in bboxes]
-                for i in range(bboxes.shape[0]):
-                    data = dict()
-                    data['image_id'] = img_id
-                    data['bbox'] = self.xyxy2xywh(bboxes[i])
-                    data['score'] = float(mask_score[i])
-                    data['category_id'] = self.cat_ids[label]
-                    if isinstance(segms[i]['counts'], bytes):
-                        segms[i]['counts'] = segms[i]['counts'].decode()
-                    data['segmentation'] = segms[i]
-                    segm_json_results.append(data)
+            bboxes, labels = self._flatten_det(det)
+            bbox_json = self._bboxes2json(img_id, bboxes, bboxes[:, 4],
+                                          cat_ids[labels])
+            bbox_json_results.extend(bbox_json)
+
+            # some detectors use different scores for bbox and mask
+            if isinstance(seg, tuple):
+                segms = seg[0]
+                mask_scores = np.concatenate([
+                    np.asarray(mask_score).reshape(-1)
+                    for mask_score in seg[1]
+                ])
+            else:
+                segms = seg
+                mask_scores = bboxes[:, 4]
+            segm_json = self._bboxes2json(img_id, bboxes, mask_scores,
+                                          cat_ids[labels])
+            segms = [segm for label_segms in segms for segm in label_segms]
+            for data, segm in zip(segm_json, segms):
+                if isinstance(segm, BoxMask):
+                    segm = segm.encode()
+                if isinstance(segm['counts'], bytes):
+                    segm['counts'] = segm['counts'].decode()
+                data['segmentation'] = segm
+            segm_json_results.extend(segm_json)
         return bbox_json_results, segm_json_results
 
     def results2json(self, results, outfile_prefix):
@@ -302,8 +470,8 @@ class CocoDataset(CustomDataset):
         automatically recognize the type, and dump them to json files.
 
         Args:
-            results (list[list | tuple | ndarray]): Testing results of the
-                dataset.
+            results (list[list | tuple | ndarray] | BaseDetResults): Testing
+                results of the dataset.
             outfile_prefix (str): The filename prefix of the json files. If the
                 prefix is "somepath/xxx", the json files will be named
                 "somepath/xxx.bbox.json", "somepath/xxx.segm.json",
@@ -314,7 +482,19 @@ class CocoDataset(CustomDataset):
                 values are corresponding filenames.
         """
         result_files = dict()
-        if isinstance(results[0], list):
+        if isinstance(results, BaseDetResults):
+            result_files['bbox'] = f'{outfile_prefix}.bbox.json'
+            result_files['proposal'] = f'{outfile_prefix}.bbox.json'
+            results.dump_json(result_files['bbox'], self.img_ids,
+                              self.cat_ids)
+            if results.with_mask:
+                result_files['segm'] = f'{outfile_prefix}.segm.json'
+                results.dump_json(
+                    result_files['segm'],
+                    self.img_ids,
+                    self.cat_ids,
+                    iou_type='segm')
+        elif isinstance(results[0], list):
             json_results = self._det2json(results)
             result_files['bbox'] = f'{outfile_prefix}.bbox.json'
             result_files['proposal'] = f'{outfile_prefix}.bbox.json'
@@ -334,6 +514,39 @@ class CocoDataset(CustomDataset):
             raise TypeError('invalid type of results')
         return result_files
 
+    def det_results2arrays(self, results, iou_type, mask_areas=True):
+        """Get the detections of streamed results as evaluation arrays.
+
+        The arrays hold what :meth:`results2json` and the results api would
+        produce, without a json object or a dict per detection. The masks
+        are read from the result files when they are compared.
+
+        Args:
+            results (BaseDetResults): Testing results of the dataset.
+            iou_type (str): 'bbox' or 'segm'.
+            mask_areas (bool): Whether the areas of 'segm' detections are
+                their mask areas, as in ``COCO.loadRes``, or their box
+                areas, as in ``LVISResults``. Default: True.
+
+        Returns:
+            :obj:`DetArrays`: The detections.
+        """
+        bboxes = np.asarray(results.get_column('bbox'), dtype=np.float64)
+        bboxes[:, 2:] -= bboxes[:, :2]
+        if iou_type == 'segm' and mask_areas:
+            areas = results.get_mask_areas()
+        else:
+            areas = bboxes[:, 2] * bboxes[:, 3]
+        score = 'segm_score' if iou_type == 'segm' else 'score'
+        return DetArrays(
+            img_ids=np.asarray(self.img_ids)[results.get_column('img_idx')],
+            cat_ids=np.asarray(self.cat_ids)[results.get_column('label')],
+            scores=results.get_column(score),
+            areas=areas,
+            bboxes=bboxes,
+            rles=LazyRLEs(results.get_rles, np.arange(results.num_dets))
+            if iou_type == 'segm' else None)
+
     def fast_eval_recall(self, results, proposal_nums, iou_thrs, logger=None):
         gt_bboxes = []
         for i in range(len(self.img_ids)):
@@ -362,8 +575,8 @@ class CocoDataset(CustomDataset):
         """Format the results to json (standard format for COCO evaluation).
 
         Args:
-            results (list[tuple | numpy.ndarray]): Testing results of the
-                dataset.
+            results (list[tuple | numpy.ndarray] | BaseDetResults): Testing
+                results of the dataset.
             jsonfile_prefix (str | None): The prefix of json files. It includes
                 the file path and the prefix of filename, e.g., "a/b/prefix".
                 If not specified, a temp file will be created. Default: None.
@@ -373,7 +586,8 @@ class CocoDataset(CustomDataset):
                 the json filepaths, tmp_dir is the temporal directory created \
                 for saving json files when jsonfile_prefix is not specified.
         """
-        assert isinstance(results, list), 'results must be a list'
+        assert isinstance(results, (list, BaseDetResults)), \
+            'results must be a list or BaseDetResults'
         assert len(results) == len(self), (
             'The length of results is not equal to the dataset len: {} != {}'.
             format(len(results), len(self)))
@@ -395,13 +609,15 @@ class CocoDataset(CustomDataset):
                           classwise=False,
                           proposal_nums=(100, 300, 1000),
                           iou_thrs=None,
-                          metric_items=None):
+                          metric_items=None,
+                          backend='official',
+                          nproc=1):
         """Instance segmentation and object detection evaluation in COCO
         protocol.
 
         Args:
-            results (list[list | tuple | dict]): Testing results of the
-                dataset.
+            results (list[list | tuple | dict] | BaseDetResults): Testing
+                results of the dataset.
             result_files (dict[str, str]): a dict contains json file path.
             coco_gt (COCO): COCO API object with ground truth annotation.
             metric (str | list[str]): Metrics to be evaluated. Options are
@@ -423,6 +639,13 @@ class CocoDataset(CustomDataset):
                 used when ``metric=='proposal'``, ``['mAP', 'mAP_50', 'mAP_75',
                 'mAP_s', 'mAP_m', 'mAP_l']`` will be used when
                 ``metric=='bbox' or metric=='segm'``.
+            backend (str): 'official' evaluates with ``COCOeval``, 'fast'
+                with the vectorised :class:`FastCOCOeval`, which gives the
+                same results. The 'fast' backend evaluates
+                :obj:`BaseDetResults` from their columns instead of the json
+                results. Default: 'official'.
+            nproc (int): Processes the images are sharded over by the 'fast'
+                backend. Default: 1.
 
         Returns:
             dict[str, float]: COCO style evaluation metric.
@@ -433,6 +656,8 @@ class CocoDataset(CustomDataset):
         if metric_items is not None:
             if not isinstance(metric_items, list):
                 metric_items = [metric_items]
+        if backend not in ('official', 'fast'):
+            raise KeyError(f'evaluation backend {backend} is not supported')
 
         eval_results = OrderedDict()
         for metric in metrics:
@@ -442,6 +667,8 @@ class CocoDataset(CustomDataset):
             print_log(msg, logger=logger)
 
             if metric == 'proposal_fast':
+                if isinstance(results, BaseDetResults):
+                    results = results.to_list()
                 if isinstance(results[0], tuple):
                     raise KeyError('proposal_fast is not supported for '
                                    'instance segmentation result.')
@@ -456,34 +683,50 @@ class CocoDataset(CustomDataset):
                 continue
 
             iou_type = 'bbox' if metric == 'proposal' else metric
-            if metric not in result_files:
+            if (backend == 'fast' and metric != 'proposal'
+                    and isinstance(results, BaseDetResults)):
+                # the columns are evaluated without the json results
+                if metric == 'segm' and not results.with_mask:
+                    raise KeyError(f'{metric} is not in results')
+                if results.num_dets == 0:
+                    print_log(
+                        'The testing results of the whole dataset is empty.',
+                        logger=logger,
+                        level=logging.ERROR)
+                    break
+                coco_det = self.det_results2arrays(results, iou_type)
+            elif metric not in result_files:
                 raise KeyError(f'{metric} is not in results')
-            try:
-                predictions = mmcv.load(result_files[metric])
-                if iou_type == 'segm':
-                    # Refer to https://github.com/cocodataset/cocoapi/blob/master/PythonAPI/pycocotools/coco.py#L331  # noqa
-                    # When evaluating mask AP, if the results contain bbox,
-                    # cocoapi will use the box area instead of the mask area
-                    # for calculating the instance area. Though the overall AP
-                    # is not affected, this leads to different
-                    # small/medium/large mask AP results.
-                    for x in predictions:
-                        x.pop('bbox')
-                    warnings.simplefilter('once')
-                    warnings.warn(
-                        'The key "bbox" is deleted for more accurate mask AP '
-                        'of small/medium/large instances since v2.12.0. This '
-                        'does not change the overall mAP calculation.',
-                        UserWarning)
-                coco_det = coco_gt.loadRes(predictions)
-            except IndexError:
-                print_log(
-                    'The testing results of the whole dataset is empty.',
-                    logger=logger,
-                    level=logging.ERROR)
-                break
-
-            cocoEval = COCOeval(coco_gt, coco_det, iou_type)
+            else:
+                try:
+                    predictions = mmcv.load(result_files[metric])
+                    if iou_type == 'segm':
+                        # Refer to https://github.com/cocodataset/cocoapi/blob/master/PythonAPI/pycocotools/coco.py#L331  # noqa
+                        # When evaluating mask AP, if the results contain
+                        # bbox, cocoapi will use the box area instead of the
+                        # mask area for calculating the instance area. Though
+                        # the overall AP is not affected, this leads to
+                        # different small/medium/large mask AP results.
+                        for x in predictions:
+                            x.pop('bbox')
+                        warnings.simplefilter('once')
+                        warnings.warn(
+                            'The key "bbox" is deleted for more accurate mask '
+                            'AP of small/medium/large instances since '
+                            'v2.12.0. This does not change the overall mAP '
+                            'calculation.', UserWarning)
+                    coco_det = coco_gt.loadRes(predictions)
+                except IndexError:
+                    print_log(
+                        'The testing results of the whole dataset is empty.',
+                        logger=logger,
+                        level=logging.ERROR)
+                    break
+
+            if backend == 'fast':
+                cocoEval = FastCOCOeval(coco_gt, coco_det, iou_type, nproc)
+            else:
+                cocoEval = COCOeval(coco_gt, coco_det, iou_type)
             cocoEval.params.catIds = self.cat_ids
             cocoEval.params.imgIds = self.img_ids
             cocoEval.params.maxDets = list(proposal_nums)
@@ -600,11 +843,15 @@ class CocoDataset(CustomDataset):
                  classwise=False,
                  proposal_nums=(100, 300, 1000),
                  iou_thrs=None,
-                 metric_items=None):
+                 metric_items=None,
+                 backend='official',
+                 nproc=1):
         """Evaluation in COCO protocol.
 
         Args:
-            results (list[list | tuple]): Testing results of the dataset.
+            results (list[list | tuple] | BaseDetResults): Testing results of
+                the dataset, or the results streamed to disk by
+                :class:`DetResultWriter`.
             metric (str | list[str]): Metrics to be evaluated. Options are
                 'bbox', 'segm', 'proposal', 'proposal_fast'.
             logger (logging.Logger | str | None): Logger used for printing
@@ -627,6 +874,13 @@ class CocoDataset(CustomDataset):
                 used when ``metric=='proposal'``, ``['mAP', 'mAP_50', 'mAP_75',
                 'mAP_s', 'mAP_m', 'mAP_l']`` will be used when
                 ``metric=='bbox' or metric=='segm'``.
+            backend (str): 'official' evaluates with ``COCOeval``, 'fast'
+                with the vectorised :class:`FastCOCOeval`, which gives the
+                same results. The 'fast' backend evaluates
+                :obj:`BaseDetResults` from their columns instead of the json
+                results. Default: 'official'.
+            nproc (int): Processes the images are sharded over by the 'fast'
+                backend. Default: 1.
 
         Returns:
             dict[str, float]: COCO style evaluation metric.
@@ -641,11 +895,17 @@ class CocoDataset(CustomDataset):
         coco_gt = self.coco
         self.cat_ids = coco_gt.get_cat_ids(cat_names=self.CLASSES)
 
-        result_files, tmp_dir = self.format_results(results, jsonfile_prefix)
+        if (backend == 'fast' and isinstance(results, BaseDetResults)
+                and jsonfile_prefix is None and 'proposal' not in metrics):
+            # the columns of the results are evaluated directly
+            result_files, tmp_dir = dict(), None
+        else:
+            result_files, tmp_dir = self.format_results(
+                results, jsonfile_prefix)
         eval_results = self.evaluate_det_segm(results, result_files, coco_gt,
                                               metrics, logger, classwise,
                                               proposal_nums, iou_thrs,
-                                              metric_items)
+                                              metric_items, backend, nproc)
 
         if tmp_dir is not None:
             tmp_dir.cleanup()
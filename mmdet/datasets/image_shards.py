@@ -0,0 +1,136 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import json
+import os
+import os.path as osp
+import shutil
+import tempfile
+
+import numpy as np
+
+# bump when the layout of the shards changes
+IMAGE_SHARDS_VERSION = 1
+
+
+class ImageShards:
+    """Pre-decoded images in memory-mapped shards.
+
+    The images are stored back to back as raw uint8 arrays in the files
+    ``images-00000.bin``, ``images-00001.bin``, ... of a directory, and
+    ``index.json`` maps the ``filename`` of every image to its shard, offset
+    and shape and the shape of the original image. The shards are
+    memory-mapped read-only, so reading an image neither copies nor decodes
+    it and the processes reading the same shards share their pages through
+    the page cache. Shards are written by :class:`ImageShardWriter`.
+
+    Args:
+        path (str): The directory of the shards.
+    """
+
+    def __init__(self, path):
+        with open(osp.join(path, 'index.json')) as f:
+            index = json.load(f)
+        assert index['version'] == IMAGE_SHARDS_VERSION, \
+            f'image shards of version {index["version"]} are not supported'
+        self.path = path
+        self.meta = index['meta']
+        self.images = index['images']
+        self._shards = {}
+
+    def __len__(self):
+        return len(self.images)
+
+    def __contains__(self, filename):
+        return filename in self.images
+
+    def _shard(self, i):
+        # mapped on first use, i.e. in every dataloader worker
+        if i not in self._shards:
+            self._shards[i] = np.memmap(
+                osp.join(self.path, f'images-{i:05d}.bin'),
+                dtype=np.uint8,
+                mode='r')
+        return self._shards[i]
+
+    def get(self, filename):
+        """Read an image.
+
+        Args:
+            filename (str): The ``filename`` the image was added with.
+
+        Returns:
+            tuple[np.ndarray, tuple]: A read-only view of the image in the
+                shard and the shape of the original image.
+        """
+        shard, offset, shape, ori_shape = self.images[filename]
+        size = int(np.prod(shape))
+        img = self._shard(shard)[offset:offset + size].reshape(shape)
+        return img, tuple(ori_shape)
+
+
+class ImageShardWriter:
+    """Write images to memory-mapped shards, see :class:`ImageShards`.
+
+    The shards are written to a temporary directory which is renamed to
+    ``path`` by :meth:`close`, so an interrupted run never leaves partial
+    shards.
+
+    Args:
+        path (str): The directory of the shards.
+        shard_size (int): A new shard is started once a shard is larger
+            than ``shard_size`` bytes. Default: 4 GiB.
+        meta (dict, optional): Information saved with the shards, e.g. how
+            the images are resized.
+    """
+
+    def __init__(self, path, shard_size=4 << 30, meta=None):
+        self.path = path
+        self.shard_size = shard_size
+        self.meta = meta or {}
+        parent = osp.dirname(osp.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        self._tmp_dir = tempfile.mkdtemp(dir=parent)
+        self._images = {}
+        self._shard = -1
+        self._file = None
+        self._offset = 0
+
+    def add(self, filename, img, ori_shape):
+        """Add an image.
+
+        Args:
+            filename (str): The key the image is read by.
+            img (np.ndarray): The uint8 image.
+            ori_shape (tuple): The shape of the original image.
+        """
+        assert img.dtype == np.uint8, 'only uint8 images can be written'
+        assert filename not in self._images, f'{filename} is added twice'
+        if self._file is None or self._offset >= self.shard_size:
+            if self._file is not None:
+                self._file.close()
+            self._shard += 1
+            self._file = open(
+                osp.join(self._tmp_dir, f'images-{self._shard:05d}.bin'),
+                'wb')
+            self._offset = 0
+        img = np.ascontiguousarray(img)
+        self._file.write(img.data)
+        self._images[filename] = [
+            self._shard, self._offset,
+            list(img.shape),
+            list(ori_shape)
+        ]
+        self._offset += img.nbytes
+
+    def close(self):
+        """Write the index and move the shards to ``path``."""
+        if self._file is not None:
+            self._file.close()
+        with open(osp.join(self._tmp_dir, 'index.json'), 'w') as f:
+            json.dump(
+                dict(
+                    version=IMAGE_SHARDS_VERSION,
+                    meta=self.meta,
+                    images=self._images), f)
+        if osp.exists(self.path):
+            shutil.rmtree(self.path)
+        os.rename(self._tmp_dir, self.path)
@@ -10,6 +10,8 @@ import numpy as np
 from mmcv.utils import print_log
 from terminaltables import AsciiTable
 
+from mmdet.core import BaseDetResults
+from .api_wrappers import FastLVISEval
 from .builder import DATASETS
 from .coco import CocoDataset
 
@@ -269,16 +271,8 @@ class LVISV05Dataset(CocoDataset):
 
     PALETTE = None
 
-    def load_annotations(self, ann_file):
-        """Load annotation from lvis style annotation file.
-
-        Args:
-            ann_file (str): Path of annotation file.
-
-        Returns:
-            list[dict]: Annotation info from LVIS api.
-        """
-
+    def _load_api(self, ann_file):
+        """Load the LVIS api of an annotation file."""
         try:
             import lvis
             if getattr(lvis, '__version__', '0') >= '10.5.3':
@@ -290,7 +284,19 @@ class LVISV05Dataset(CocoDataset):
             raise ImportError(
                 'Package lvis is not installed. Please run "pip install git+https://github.com/lvis-dataset/lvis-api.git".'  # noqa: E501
             )
-        self.coco = LVIS(ann_file)
+        return LVIS(ann_file)
+
+    def _load_annotations(self, ann_file):
+        """Load annotation from lvis style annotation file.
+
+        Args:
+            ann_file (str): Path of annotation file.
+
+        Returns:
+            list[dict]: Annotation info from LVIS api.
+        """
+
+        self.coco = self._load_api(ann_file)
         self.cat_ids = self.coco.get_cat_ids()
         self.cat2label = {cat_id: i for i, cat_id in enumerate(self.cat_ids)}
         self.img_ids = self.coco.get_img_ids()
@@ -315,11 +321,15 @@ class LVISV05Dataset(CocoDataset):
                  jsonfile_prefix=None,
                  classwise=False,
                  proposal_nums=(100, 300, 1000),
-                 iou_thrs=np.arange(0.5, 0.96, 0.05)):
+                 iou_thrs=np.arange(0.5, 0.96, 0.05),
+                 backend='official',
+                 nproc=1):
         """Evaluation in LVIS protocol.
 
         Args:
-            results (list[list | tuple]): Testing results of the dataset.
+            results (list[list | tuple] | BaseDetResults): Testing results of
+                the dataset, or the results streamed to disk by
+                :class:`DetResultWriter`.
             metric (str | list[str]): Metrics to be evaluated. Options are
                 'bbox', 'segm', 'proposal', 'proposal_fast'.
             logger (logging.Logger | str | None): Logger used for printing
@@ -332,6 +342,13 @@ class LVISV05Dataset(CocoDataset):
             iou_thrs (Sequence[float]): IoU threshold used for evaluating
                 recalls. If set to a list, the average recall of all IoUs will
                 also be computed. Default: 0.5.
+            backend (str): 'official' evaluates 'bbox' and 'segm' with
+                ``LVISEval``, 'fast' with the vectorised
+                :class:`FastLVISEval`, which gives the same results. The
+                'fast' backend evaluates :obj:`BaseDetResults` from their
+                columns instead of the json results. Default: 'official'.
+            nproc (int): Processes the images are sharded over by the 'fast'
+                backend. Default: 1.
 
         Returns:
             dict[str, float]: LVIS style metrics.
@@ -348,7 +365,8 @@ class LVISV05Dataset(CocoDataset):
             raise ImportError(
                 'Package lvis is not installed. Please run "pip install git+https://github.com/lvis-dataset/lvis-api.git".'  # noqa: E501
             )
-        assert isinstance(results, list), 'results must be a list'
+        assert isinstance(results, (list, BaseDetResults)), \
+            'results must be a list or BaseDetResults'
         assert len(results) == len(self), (
             'The length of results is not equal to the dataset len: {} != {}'.
             format(len(results), len(self)))
@@ -358,13 +376,22 @@ class LVISV05Dataset(CocoDataset):
         for metric in metrics:
             if metric not in allowed_metrics:
                 raise KeyError('metric {} is not supported'.format(metric))
+        if backend not in ('official', 'fast'):
+            raise KeyError(f'evaluation backend {backend} is not supported')
 
-        if jsonfile_prefix is None:
-            tmp_dir = tempfile.TemporaryDirectory()
-            jsonfile_prefix = osp.join(tmp_dir.name, 'results')
+        # the 'fast' backend evaluates the columns of streamed results
+        from_columns = backend == 'fast' and isinstance(
+            results, BaseDetResults)
+        if from_columns and jsonfile_prefix is None and \
+                'proposal' not in metrics:
+            result_files, tmp_dir = dict(), None
         else:
-            tmp_dir = None
-        result_files = self.results2json(results, jsonfile_prefix)
+            if jsonfile_prefix is None:
+                tmp_dir = tempfile.TemporaryDirectory()
+                jsonfile_prefix = osp.join(tmp_dir.name, 'results')
+            else:
+                tmp_dir = None
+            result_files = self.results2json(results, jsonfile_prefix)
 
         eval_results = OrderedDict()
         # get original api
@@ -376,6 +403,8 @@ class LVISV05Dataset(CocoDataset):
             print_log(msg, logger=logger)
 
             if metric == 'proposal_fast':
+                if isinstance(results, BaseDetResults):
+                    results = results.to_list()
                 ar = self.fast_eval_recall(
                     results, proposal_nums, iou_thrs, logger='silent')
                 log_msg = []
@@ -386,20 +415,37 @@ class LVISV05Dataset(CocoDataset):
                 print_log(log_msg, logger=logger)
                 continue
 
-            if metric not in result_files:
+            iou_type = 'bbox' if metric == 'proposal' else metric
+            if from_columns and metric != 'proposal':
+                if metric == 'segm' and not results.with_mask:
+                    raise KeyError('{} is not in results'.format(metric))
+                if results.num_dets == 0:
+                    print_log(
+                        'The testing results of the whole dataset is empty.',
+                        logger=logger,
+                        level=logging.ERROR)
+                    break
+                # LVISResults uses the box areas of masks given with boxes
+                lvis_dt = self.det_results2arrays(
+                    results, iou_type, mask_areas=False).limit_per_image(1000)
+            elif metric not in result_files:
                 raise KeyError('{} is not in results'.format(metric))
-            try:
-                # NOTE: We only limit the max_dets in test config.
-                lvis_dt = LVISResults(lvis_gt, result_files[metric], max_dets=1000)
-            except IndexError:
-                print_log(
-                    'The testing results of the whole dataset is empty.',
-                    logger=logger,
-                    level=logging.ERROR)
-                break
+            else:
+                try:
+                    # NOTE: We only limit the max_dets in test config.
+                    lvis_dt = LVISResults(
+                        lvis_gt, result_files[metric], max_dets=1000)
+                except IndexError:
+                    print_log(
+                        'The testing results of the whole dataset is empty.',
+                        logger=logger,
+                        level=logging.ERROR)
+                    break
 
-            iou_type = 'bbox' if metric == 'proposal' else metric
-            lvis_eval = LVISEval(lvis_gt, lvis_dt, iou_type)
+            if backend == 'fast' and metric != 'proposal':
+                lvis_eval = FastLVISEval(lvis_gt, lvis_dt, iou_type, nproc)
+            else:
+                lvis_eval = LVISEval(lvis_gt, lvis_dt, iou_type)
             lvis_eval.params.imgIds = self.img_ids
             if metric == 'proposal':
                 lvis_eval.params.useCats = 0
@@ -715,19 +761,8 @@ class LVISV1Dataset(LVISDataset):
         'wreath', 'wrench', 'wristband', 'wristlet', 'yacht', 'yogurt',
         'yoke_(animal_equipment)', 'zebra', 'zucchini')
 
-    def load_annotations(self, ann_file):
-        try:
-            import lvis
-            if getattr(lvis, '__version__', '0') >= '10.5.3':
-                warnings.warn(
-                    'mmlvis is deprecated, please install official lvis-api by "pip install git+https://github.com/lvis-dataset/lvis-api.git"',  # noqa: E501
-                    UserWarning)
-            from lvis import LVIS
-        except ImportError:
-            raise ImportError(
-                'Package lvis is not installed. Please run "pip install git+https://github.com/lvis-dataset/lvis-api.git".'  # noqa: E501
-            )
-        self.coco = LVIS(ann_file)
+    def _load_annotations(self, ann_file):
+        self.coco = self._load_api(ann_file)
         self.cat_ids = self.coco.get_cat_ids()
         self.cat2label = {cat_id: i for i, cat_id in enumerate(self.cat_ids)}
         self.img_ids = self.coco.get_img_ids()
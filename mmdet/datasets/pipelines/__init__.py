@@ -7,11 +7,13 @@ from .formatting import (Collect, DefaultFormatBundle, ImageToTensor,
                          ToDataContainer, ToTensor, Transpose, to_tensor)
 from .instaboost import InstaBoost
 from .loading import (FilterAnnotations, LoadAnnotations, LoadImageFromFile,
-                      LoadImageFromWebcam, LoadMultiChannelImageFromFiles,
-                      LoadPanopticAnnotations, LoadProposals)
+                      LoadImageFromShards, LoadImageFromWebcam,
+                      LoadMultiChannelImageFromFiles, LoadPanopticAnnotations,
+                      LoadProposals)
 from .test_time_aug import MultiScaleFlipAug
-from .transforms import (Albu, CopyPaste, CutOut, Expand, MinIoURandomCrop,
-                         MixUp, Mosaic, Normalize, Pad, PhotoMetricDistortion,
+from .transforms import (Albu, CopyPaste, CutOut, Expand,
+                         FusedResizeNormalizePad, MinIoURandomCrop, MixUp,
+                         Mosaic, Normalize, Pad, PhotoMetricDistortion,
                          RandomAffine, RandomCenterCropPad, RandomCrop,
                          RandomFlip, RandomShift, Resize, SegRescale,
                          YOLOXHSVRandomAug)
@@ -27,5 +29,6 @@ __all__ = [
     'AutoAugment', 'CutOut', 'Shear', 'Rotate', 'ColorTransform',
     'EqualizeTransform', 'BrightnessTransform', 'ContrastTransform',
     'Translate', 'RandomShift', 'Mosaic', 'MixUp', 'RandomAffine',
-    'YOLOXHSVRandomAug', 'CopyPaste'
+    'YOLOXHSVRandomAug', 'CopyPaste', 'FusedResizeNormalizePad',
+    'LoadImageFromShards'
 ]
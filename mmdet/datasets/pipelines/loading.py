@@ -1,12 +1,14 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import os.path as osp
 
+import cv2
 import mmcv
 import numpy as np
 import pycocotools.mask as maskUtils
 
 from mmdet.core import BitmapMasks, PolygonMasks
 from ..builder import PIPELINES
+from ..image_shards import ImageShards
 
 try:
     from panopticapi.utils import rgb2id
@@ -14,6 +16,35 @@ except ImportError:
     rgb2id = None
 
 
+def _jpeg_size(img_bytes):
+    """The (height, width) in the frame header of a JPEG image, None if the
+    bytes are not a JPEG image."""
+    if img_bytes[:2] != b'\xff\xd8':
+        return None
+    i = 2
+    while i + 9 <= len(img_bytes):
+        if img_bytes[i] != 0xFF:
+            return None
+        marker = img_bytes[i + 1]
+        if marker == 0xFF:
+            # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # markers without a segment
+            i += 2
+            continue
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            # start of frame
+            return (int.from_bytes(img_bytes[i + 5:i + 7], 'big'),
+                    int.from_bytes(img_bytes[i + 7:i + 9], 'big'))
+        if marker == 0xDA:
+            # start of scan before a frame header
+            return None
+        i += 2 + int.from_bytes(img_bytes[i + 2:i + 4], 'big')
+    return None
+
+
 @PIPELINES.register_module()
 class LoadImageFromFile:
     """Load an image from file.
@@ -32,18 +63,86 @@ class LoadImageFromFile:
         file_client_args (dict): Arguments to instantiate a FileClient.
             See :class:`mmcv.fileio.FileClient` for details.
             Defaults to ``dict(backend='disk')``.
+        decode_scale (tuple | list[tuple], optional): The scale (or scales)
+            the image is resized to by the following keep ratio
+            :class:`Resize`, e.g. the ``img_scale`` of
+            :class:`MultiScaleFlipAug`. If set, JPEG images at least twice
+            as large are decoded at 1/2, 1/4 or 1/8 of their resolution by
+            libjpeg DCT scaling (``cv2.IMREAD_REDUCED_*``), still at least
+            as large as the largest scale. "ori_shape" is the shape of the
+            full resolution image and the added "decode_scale_factor" the
+            scale factor of the decoded image, which :class:`Resize` uses
+            to resize it to the size and "scale_factor" of the full
+            resolution image. Only for 'color' and 'grayscale' images.
+            Defaults to None.
     """
 
+    # cv2 flags of reduced decoding by factor 2, 4 and 8
+    _reduced_flags = dict(
+        color={
+            2: cv2.IMREAD_REDUCED_COLOR_2,
+            4: cv2.IMREAD_REDUCED_COLOR_4,
+            8: cv2.IMREAD_REDUCED_COLOR_8
+        },
+        grayscale={
+            2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+            4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+            8: cv2.IMREAD_REDUCED_GRAYSCALE_8
+        })
+
     def __init__(self,
                  to_float32=False,
                  color_type='color',
                  channel_order='bgr',
-                 file_client_args=dict(backend='disk')):
+                 file_client_args=dict(backend='disk'),
+                 decode_scale=None):
         self.to_float32 = to_float32
         self.color_type = color_type
         self.channel_order = channel_order
         self.file_client_args = file_client_args.copy()
         self.file_client = None
+        if decode_scale is not None:
+            if not isinstance(decode_scale, list):
+                decode_scale = [decode_scale]
+            assert mmcv.is_list_of(decode_scale, tuple)
+        self.decode_scale = decode_scale
+
+    def _decode_reduced(self, img_bytes):
+        """Decode a JPEG image at a reduced resolution.
+
+        Returns:
+            tuple[np.ndarray, tuple] | None: The decoded image and the shape
+                of the full resolution image, None if the image is not
+                decoded at a reduced resolution.
+        """
+        if self.color_type not in self._reduced_flags:
+            return None
+        size = _jpeg_size(img_bytes)
+        if size is None:
+            return None
+        h, w = size
+        scale_factor = max(
+            min(max(scale) / max(h, w),
+                min(scale) / min(h, w)) for scale in self.decode_scale)
+        for factor in (8, 4, 2):
+            if factor * scale_factor <= 1:
+                break
+        else:
+            return None
+        img = cv2.imdecode(
+            np.frombuffer(img_bytes, np.uint8),
+            self._reduced_flags[self.color_type][factor])
+        if img is None:
+            return None
+        reduced_h, reduced_w = -(-h // factor), -(-w // factor)
+        if img.shape[:2] == (reduced_w, reduced_h):
+            # rotated by the EXIF orientation
+            h, w = w, h
+        elif img.shape[:2] != (reduced_h, reduced_w):
+            return None
+        if self.channel_order == 'rgb' and img.ndim == 3:
+            img = mmcv.bgr2rgb(img)
+        return img, (h, w) + img.shape[2:]
 
     def __call__(self, results):
         """Call functions to load image and get image meta information.
@@ -65,8 +164,21 @@ class LoadImageFromFile:
             filename = results['img_info']['filename']
 
         img_bytes = self.file_client.get(filename)
-        img = mmcv.imfrombytes(
-            img_bytes, flag=self.color_type, channel_order=self.channel_order)
+        reduced = None
+        if self.decode_scale is not None:
+            reduced = self._decode_reduced(img_bytes)
+        if reduced is not None:
+            img, ori_shape = reduced
+            w_scale = img.shape[1] / ori_shape[1]
+            h_scale = img.shape[0] / ori_shape[0]
+            results['decode_scale_factor'] = np.array(
+                [w_scale, h_scale, w_scale, h_scale], dtype=np.float32)
+        else:
+            img = mmcv.imfrombytes(
+                img_bytes,
+                flag=self.color_type,
+                channel_order=self.channel_order)
+            ori_shape = img.shape
         if self.to_float32:
             img = img.astype(np.float32)
 
@@ -74,7 +186,7 @@ class LoadImageFromFile:
         results['ori_filename'] = results['img_info']['filename']
         results['img'] = img
         results['img_shape'] = img.shape
-        results['ori_shape'] = img.shape
+        results['ori_shape'] = ori_shape
         results['img_fields'] = ['img']
         return results
 
@@ -83,7 +195,10 @@ class LoadImageFromFile:
                     f'to_float32={self.to_float32}, '
                     f"color_type='{self.color_type}', "
                     f"channel_order='{self.channel_order}', "
-                    f'file_client_args={self.file_client_args})')
+                    f'file_client_args={self.file_client_args}')
+        if self.decode_scale is not None:
+            repr_str += f', decode_scale={self.decode_scale}'
+        repr_str += ')'
         return repr_str
 
 
@@ -119,6 +234,76 @@ class LoadImageFromWebcam(LoadImageFromFile):
         return results
 
 
+@PIPELINES.register_module()
+class LoadImageFromShards(LoadImageFromFile):
+    """Load a pre-decoded and resized image from image shards.
+
+    The shards are built from the test pipeline of a dataset by
+    ``tools/misc/build_image_shards.py``. The image is a read-only view of the
+    memory-mapped shard and "ori_shape" is the shape of the original image.
+    Like a reduced resolution decode of :class:`LoadImageFromFile`, the
+    added "decode_scale_factor" makes the following :class:`Resize` resize
+    the image to the size and "scale_factor" of the original image resized,
+    which keeps the image as it is if it is stored at the test scale. So
+    neither decoding nor resizing is repeated. Images not in the shards are
+    loaded from file.
+
+    Args:
+        shard_dir (str): The directory of the shards.
+        **kwargs: Arguments of :class:`LoadImageFromFile` to load images not
+            in the shards.
+    """
+
+    def __init__(self, shard_dir, **kwargs):
+        super().__init__(**kwargs)
+        self.shard_dir = shard_dir
+        self.shards = None
+
+    def __call__(self, results):
+        """Call functions to load image and get image meta information.
+
+        Args:
+            results (dict): Result dict from :obj:`mmdet.CustomDataset`.
+
+        Returns:
+            dict: The dict contains loaded image and meta information.
+        """
+        if self.shards is None:
+            self.shards = ImageShards(self.shard_dir)
+        if results['img_info']['filename'] not in self.shards:
+            return super().__call__(results)
+
+        if results['img_prefix'] is not None:
+            filename = osp.join(results['img_prefix'],
+                                results['img_info']['filename'])
+        else:
+            filename = results['img_info']['filename']
+        img, ori_shape = self.shards.get(results['img_info']['filename'])
+        w_scale = img.shape[1] / ori_shape[1]
+        h_scale = img.shape[0] / ori_shape[0]
+        results['decode_scale_factor'] = np.array(
+            [w_scale, h_scale, w_scale, h_scale], dtype=np.float32)
+        if self.to_float32:
+            img = img.astype(np.float32)
+
+        results['filename'] = filename
+        results['ori_filename'] = results['img_info']['filename']
+        results['img'] = img
+        results['img_shape'] = img.shape
+        results['ori_shape'] = ori_shape
+        results['img_fields'] = ['img']
+        return results
+
+    def __repr__(self):
+        repr_str = (f'{self.__class__.__name__}('
+                    f"shard_dir='{self.shard_dir}', "
+                    f'to_float32={self.to_float32}, '
+                    f"color_type='{self.color_type}', "
+                    f"channel_order='{self.channel_order}', "
+                    f'file_client_args={self.file_client_args})')
+        return repr_str
+
+
 @PIPELINES.register_module()
 class LoadMultiChannelImageFromFiles:
     """Load multi-channel images from a list of separate channel files.
@@ -7,6 +7,7 @@ import warnings
 import cv2
 import mmcv
 import numpy as np
+import torch
 from numpy import random
 
 from mmdet.core import BitmapMasks, PolygonMasks, find_inside_bboxes
@@ -37,7 +38,9 @@ class Resize:
     scale in the init method is used. If the input dict contains the key
     "scale_factor" (if MultiScaleFlipAug does not give img_scale but
     scale_factor), the actual scale will be computed by image shape and
-    scale_factor.
+    scale_factor. If the image is decoded at a reduced resolution (the key
+    "decode_scale_factor" set by :class:`LoadImageFromFile`), it is resized
+    to the size the full resolution image of "ori_shape" would be resized to.
 
     `img_scale` can either be a tuple (single-scale) or a list of tuple
     (multi-scale). There are 3 multiscale modes:
@@ -215,7 +218,26 @@ class Resize:
     def _resize_img(self, results):
         """Resize images with ``results['scale']``."""
         for key in results.get('img_fields', ['img']):
-            if self.keep_ratio:
+            if 'decode_scale_factor' in results:
+                # the image is decoded at a reduced resolution, resize it to
+                # the size the full resolution image is resized to
+                h, w = results['ori_shape'][:2]
+                if self.keep_ratio:
+                    size = mmcv.rescale_size((w, h), results['scale'])
+                else:
+                    size = results['scale']
+                if results[key].shape[1::-1] == tuple(size):
+                    # e.g. pre-resized by LoadImageFromShards
+                    img = results[key]
+                else:
+                    img = mmcv.imresize(
+                        results[key],
+                        size,
+                        interpolation=self.interpolation,
+                        backend=self.backend)
+                w_scale = size[0] / w
+                h_scale = size[1] / h
+            elif self.keep_ratio:
                 img, scale_factor = mmcv.imrescale(
                     results[key],
                     results['scale'],
@@ -244,6 +266,7 @@ class Resize:
             results['pad_shape'] = img.shape
             results['scale_factor'] = scale_factor
             results['keep_ratio'] = self.keep_ratio
+        results.pop('decode_scale_factor', None)
 
     def _resize_bboxes(self, results):
         """Resize bounding boxes with ``results['scale_factor']``."""
@@ -296,7 +319,10 @@ class Resize:
 
         if 'scale' not in results:
             if 'scale_factor' in results:
-                img_shape = results['img'].shape[:2]
+                if 'decode_scale_factor' in results:
+                    img_shape = results['ori_shape'][:2]
+                else:
+                    img_shape = results['img'].shape[:2]
                 scale_factor = results['scale_factor']
                 assert isinstance(scale_factor, float)
                 results['scale'] = tuple(
@@ -716,6 +742,157 @@ class Normalize:
         return repr_str
 
 
+@PIPELINES.register_module()
+class FusedResizeNormalizePad:
+    """Resize, flip, normalize and pad the image into a tensor in one step.
+
+    A test time replacement of ``Resize``, ``RandomFlip``, ``Normalize``,
+    ``Pad`` and ``ImageToTensor`` giving the same image tensor and metas.
+    The resized (and flipped) uint8 image is normalized channel by channel
+    straight into a preallocated padded (C, H, W) float32 buffer, instead of
+    allocating a normalized, a padded and a transposed full size copy of it.
+
+    An example test pipeline is as followed:
+
+    .. code-block::
+
+        dict(
+            type='MultiScaleFlipAug',
+            img_scale=(1333, 800),
+            flip=False,
+            transforms=[
+                dict(
+                    type='FusedResizeNormalizePad',
+                    keep_ratio=True,
+                    size_divisor=1,
+                    **img_norm_cfg),
+                dict(type='Collect', keys=['img'])
+            ])
+
+    Only ``results['img']`` is transformed, the flip is taken from
+    ``results['flip']`` and ``results['flip_direction']`` as set by
+    :class:`MultiScaleFlipAug`, no flip if they are not set.
+
+    Args:
+        mean (sequence): Mean values of 3 channels.
+        std (sequence): Std values of 3 channels.
+        to_rgb (bool): Whether to convert the image from BGR to RGB.
+            Default: True.
+        size (tuple, optional): Fixed padding size.
+        size_divisor (int, optional): The divisor of padded size.
+        pad_to_square (bool): Whether to pad the image into a square.
+            Default: False.
+        pad_val (float): Padding value of the normalized image. Default: 0.
+        pin_memory (bool): Whether to allocate the image tensor in page-locked
+            memory when CUDA is available, which speeds up the copy to the
+            GPU when the pipeline runs in the main process. Default: False.
+        **kwargs: Arguments of :class:`Resize`, e.g. ``img_scale`` and
+            ``keep_ratio``.
+    """
+
+    def __init__(self,
+                 mean,
+                 std,
+                 to_rgb=True,
+                 size=None,
+                 size_divisor=None,
+                 pad_to_square=False,
+                 pad_val=0,
+                 pin_memory=False,
+                 **kwargs):
+        self.resize = Resize(**kwargs)
+        self.mean = np.array(mean, dtype=np.float32)
+        self.std = np.array(std, dtype=np.float32)
+        self.to_rgb = to_rgb
+        # the same float64 constants as mmcv.imnormalize
+        self._mean = self.mean.astype(np.float64).tolist()
+        self._stdinv = (1 / self.std.astype(np.float64)).tolist()
+        if pad_to_square:
+            assert size is None and size_divisor is None, \
+                'The size and size_divisor must be None ' \
+                'when pad2square is True'
+        else:
+            assert size is not None or size_divisor is not None, \
+                'only one of size and size_divisor should be valid'
+            assert size is None or size_divisor is None
+        self.size = size
+        self.size_divisor = size_divisor
+        self.pad_to_square = pad_to_square
+        self.pad_val = pad_val
+        self.pin_memory = pin_memory
+
+    def _pad_size(self, img_h, img_w):
+        """The padded size and the ``pad_fixed_size`` of :class:`Pad`."""
+        if self.pad_to_square:
+            size = (max(img_h, img_w), max(img_h, img_w))
+        else:
+            size = self.size
+        if size is not None:
+            assert size[0] >= img_h and size[1] >= img_w
+            return tuple(size), size
+        divisor = self.size_divisor
+        pad_h = int(np.ceil(img_h / divisor)) * divisor
+        pad_w = int(np.ceil(img_w / divisor)) * divisor
+        return (pad_h, pad_w), None
+
+    def __call__(self, results):
+        """Call function to transform the image.
+
+        Args:
+            results (dict): Result dict from loading pipeline.
+
+        Returns:
+            dict: Transformed results, ``results['img']`` is a float32
+                tensor of shape (C, H, W).
+        """
+        assert results.get('img_fields', ['img']) == ['img']
+        results = self.resize(results)
+        if 'flip' not in results:
+            results['flip'] = False
+        if 'flip_direction' not in results:
+            results['flip_direction'] = None
+        img = results['img']
+        if results['flip']:
+            img = mmcv.imflip(img, direction=results['flip_direction'])
+
+        img_h, img_w = img.shape[:2]
+        (pad_h, pad_w), pad_fixed_size = self._pad_size(img_h, img_w)
+        num_channels = img.shape[2]
+        tensor = torch.empty((num_channels, pad_h, pad_w),
+                             dtype=torch.float32,
+                             pin_memory=self.pin_memory
+                             and torch.cuda.is_available())
+        buffer = tensor.numpy()
+        buffer[:, img_h:] = self.pad_val
+        buffer[:, :img_h, img_w:] = self.pad_val
+        channels = cv2.split(img)
+        if self.to_rgb:
+            channels = channels[::-1]
+        for i, channel in enumerate(channels):
+            out = buffer[i, :img_h, :img_w]
+            cv2.subtract(channel, self._mean[i], dst=out, dtype=cv2.CV_32F)
+            cv2.multiply(out, self._stdinv[i], dst=out)
+
+        results['img'] = tensor
+        results['pad_shape'] = (pad_h, pad_w, num_channels)
+        results['pad_fixed_size'] = pad_fixed_size
+        results['pad_size_divisor'] = self.size_divisor
+        results['img_norm_cfg'] = dict(
+            mean=self.mean, std=self.std, to_rgb=self.to_rgb)
+        return results
+
+    def __repr__(self):
+        repr_str = self.__class__.__name__
+        repr_str += f'(resize={self.resize}, '
+        repr_str += f'mean={self.mean}, std={self.std}, to_rgb={self.to_rgb}, '
+        repr_str += f'size={self.size}, '
+        repr_str += f'size_divisor={self.size_divisor}, '
+        repr_str += f'pad_to_square={self.pad_to_square}, '
+        repr_str += f'pad_val={self.pad_val}, '
+        repr_str += f'pin_memory={self.pin_memory})'
+        return repr_str
+
+
 @PIPELINES.register_module()
 class RandomCrop:
     """Random crop the image & bboxes & masks.
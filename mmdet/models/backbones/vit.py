@@ -26,8 +26,40 @@ from collections import OrderedDict
 from copy import deepcopy
 try:
     import xformers.ops as xops
-except:
-    pass
+except ImportError:
+    xops = None
+
+ATTN_BACKENDS = ('xformers', 'sdpa', 'naive')
+
+
+def resolve_attn_backend(attn_backend='auto'):
+    """Resolve the attention backend of the ViT blocks.
+
+    'auto' picks xformers when it is installed and CUDA is available, then
+    ``torch.nn.functional.scaled_dot_product_attention`` ('sdpa') and falls
+    back to the naive ``q @ k^T`` implementation.
+
+    Args:
+        attn_backend (str): One of 'auto', 'xformers', 'sdpa' and 'naive'.
+
+    Returns:
+        str: The resolved backend.
+    """
+    has_sdpa = hasattr(F, 'scaled_dot_product_attention')
+    if attn_backend == 'auto':
+        if xops is not None and torch.cuda.is_available():
+            return 'xformers'
+        return 'sdpa' if has_sdpa else 'naive'
+    if attn_backend not in ATTN_BACKENDS:
+        raise ValueError(f'attn_backend must be "auto" or one of '
+                         f'{ATTN_BACKENDS}, but got {attn_backend}')
+    if attn_backend == 'xformers' and xops is None:
+        raise ImportError('attn_backend "xformers" requires xformers, '
+                          'please install it or use "sdpa" / "naive"')
+    if attn_backend == 'sdpa' and not has_sdpa:
+        raise ImportError('attn_backend "sdpa" requires torch>=2.0, '
+                          f'but got torch {torch.__version__}')
+    return attn_backend
 
 try:
     from apex.normalization import FusedLayerNorm
@@ -105,7 +137,17 @@ class VisionRotaryEmbeddingFast(nn.Module):
     def forward(self, t): return  t * self.freqs_cos + rotate_half(t) * self.freqs_sin
 
 
-def get_rope(t, H, W):
+def get_rope_tables(H, W, device=None):
+    """Build the rotary embedding cos/sin tables of an H x W token grid.
+
+    Args:
+        H (int): Height of the token grid.
+        W (int): Width of the token grid.
+        device (torch.device, optional): Device of the tables.
+
+    Returns:
+        tuple[Tensor]: The cos and sin tables, each of shape (H * W, 64).
+    """
     dim=32
     pt_seq_len=16
     custom_freqs = None
@@ -133,13 +175,51 @@ def get_rope(t, H, W):
     freqsW = torch.einsum('..., f -> ... f', tW, freqs)
     freqsW = repeat(freqsW, '... n -> ... (n r)', r = 2) # W, 32
     freqs = broadcat((freqsH[:, None, :], freqsW[None, :, :]), dim = -1)
-    freqs = freqs.to(t.device)
+    freqs = freqs.to(device)
     freqs_cos = freqs.cos().view(-1, freqs.shape[-1])
     freqs_sin = freqs.sin().view(-1, freqs.shape[-1])
+    return freqs_cos, freqs_sin
 
+
+def get_rope(t, H, W):
+    freqs_cos, freqs_sin = get_rope_tables(H, W, t.device)
     return  t * freqs_cos + rotate_half(t) * freqs_sin
 
 
+class RopeTableCache:
+    """LRU cache of the rotary embedding tables used by global attention.
+
+    The tables only depend on the token grid, so they are built once per
+    (H, W, device) and shared by all global attention blocks of a
+    :obj:`ViT` instead of being rebuilt by :func:`get_rope` in every block.
+
+    Args:
+        max_size (int): Maximum number of cached grid sizes. Default: 4.
+    """
+
+    def __init__(self, max_size=4):
+        assert max_size >= 1
+        self.max_size = max_size
+        self.tables = OrderedDict()
+
+    def get(self, H, W, device):
+        key = (H, W, device)
+        if key in self.tables:
+            self.tables.move_to_end(key)
+        else:
+            self.tables[key] = get_rope_tables(H, W, device)
+            if len(self.tables) > self.max_size:
+                self.tables.popitem(last=False)
+        return self.tables[key]
+
+    def clear(self):
+        self.tables.clear()
+
+    def __call__(self, t, H, W):
+        freqs_cos, freqs_sin = self.get(H, W, t.device)
+        return  t * freqs_cos + rotate_half(t) * freqs_sin
+
+
 class PatchEmbed(nn.Module):
     """
     Image to Patch Embedding.
@@ -311,7 +391,8 @@ class Attention(nn.Module):
             qk_scale=None, 
             attn_head_dim=None, 
             rope=None,
-            xattn=True,
+            rope_cache=None,
+            attn_backend='naive',
         ):
         super().__init__()
         self.num_heads = num_heads
@@ -320,6 +401,7 @@ class Attention(nn.Module):
             head_dim = attn_head_dim
         all_head_dim = head_dim * self.num_heads
         self.scale = qk_scale or head_dim ** -0.5
+        self.default_scale = head_dim ** -0.5
 
         self.q_proj = nn.Linear(dim, all_head_dim, bias=False)
         self.k_proj = nn.Linear(dim, all_head_dim, bias=False)
@@ -333,7 +415,9 @@ class Attention(nn.Module):
             self.v_bias = None
 
         self.rope = rope
-        self.xattn = xattn
+        self.rope_cache = rope_cache
+        assert attn_backend in ATTN_BACKENDS
+        self.attn_backend = attn_backend
         self.proj = nn.Linear(all_head_dim, dim)
 
     def forward(self, x):
@@ -353,17 +437,33 @@ class Attention(nn.Module):
         if self.rope is not None:
             q = self.rope(q).type_as(v)
             k = self.rope(k).type_as(v)
+        elif self.rope_cache is not None:
+            q = self.rope_cache(q, H, W).type_as(v)
+            k = self.rope_cache(k, H, W).type_as(v)
         else:
             q = get_rope(q, H, W).type_as(v)
             k = get_rope(k, H, W).type_as(v)
 
-        if self.xattn:
+        attn_backend = self.attn_backend
+        if attn_backend == 'xformers' and not q.is_cuda:
+            # xformers kernels are CUDA only
+            attn_backend = 'sdpa' if hasattr(
+                F, 'scaled_dot_product_attention') else 'naive'
+
+        if attn_backend != 'naive' and self.scale != self.default_scale:
+            # the fused kernels apply head_dim ** -0.5 themselves
+            q = q * (self.scale / self.default_scale)
+
+        if attn_backend == 'xformers':
             q = q.permute(0, 2, 1, 3)   # B, num_heads, N, C -> B, N, num_heads, C
             k = k.permute(0, 2, 1, 3)
             v = v.permute(0, 2, 1, 3)
             
             x = xops.memory_efficient_attention(q, k, v)
             x = x.reshape(B, N, -1)
+        elif attn_backend == 'sdpa':
+            x = F.scaled_dot_product_attention(q, k, v)
+            x = x.transpose(1, 2).reshape(B, N, -1)
         else:
             q = q * self.scale
             attn = (q @ k.transpose(-2, -1))
@@ -390,7 +490,8 @@ class Block(nn.Module):
         window_size=0,
         use_residual_block=False,
         rope=None,
-        xattn=True,
+        rope_cache=None,
+        attn_backend='naive',
     ):
         """
         Args:
@@ -408,6 +509,11 @@ class Block(nn.Module):
             use_residual_block (bool): If True, use a residual block after the MLP block.
             input_size (int or None): Input resolution for calculating the relative positional
                 parameter size.
+            rope (nn.Module or None): Rotary embedding with fixed tables.
+            rope_cache (RopeTableCache or None): Cache of rotary embedding tables used when
+                `rope` is None.
+            attn_backend (str): Attention implementation, one of 'xformers', 'sdpa' and
+                'naive'.
         """
         super().__init__()
         self.norm1 = norm_layer(dim)
@@ -416,7 +522,8 @@ class Block(nn.Module):
             num_heads=num_heads,
             qkv_bias=qkv_bias,
             rope=rope,
-            xattn=xattn,
+            rope_cache=rope_cache,
+            attn_backend=attn_backend,
         )
 
         from timm.models.layers import DropPath
@@ -484,10 +591,13 @@ class ViT(BaseModule):
         residual_block_indexes=(),
         use_act_checkpoint=False,
         use_lsj=False,
+        rope_cache_size=4,
+        abs_pos_cache_size=4,
         pretrain_img_size=224,
         pretrain_use_cls_token=True,
         out_feature="last_feat",
-        xattn=False,
+        attn_backend='auto',
+        xattn=None,
         pretrained=None,
         init_cfg=None
     ):
@@ -511,9 +621,19 @@ class ViT(BaseModule):
             window_block_indexes (list): Indexes for blocks using window attention.
             residual_block_indexes (list): Indexes for blocks using conv propagation.
             use_act_checkpoint (bool): If True, use activation checkpointing.
+            use_lsj (bool): If True, global attention blocks use rotary tables of the fixed
+                `img_size` token grid, otherwise the tables follow the input size.
+            rope_cache_size (int): Number of input sizes whose global attention rotary tables
+                are cached when `use_lsj` is False.
+            abs_pos_cache_size (int): Number of token grid sizes whose resized absolute
+                positional embeddings are cached in eval mode.
             pretrain_img_size (int): input image size for pretraining models.
             pretrain_use_cls_token (bool): If True, pretrainig models use class token.
             out_feature (str): name of the feature from the last block.
+            attn_backend (str): Attention implementation of the blocks, one of 'auto',
+                'xformers', 'sdpa' and 'naive'. See :func:`resolve_attn_backend`.
+            xattn (bool, optional): Deprecated, True means 'xformers' and False means
+                'naive'. Overrides `attn_backend` when set.
         """
         assert not (init_cfg and pretrained), \
             'init_cfg and pretrained cannot be specified at the same time'
@@ -527,6 +647,17 @@ class ViT(BaseModule):
             raise TypeError('pretrained must be a str or None')
 
         super(ViT, self).__init__(init_cfg=init_cfg)
+        if xattn is not None:
+            warnings.warn('DeprecationWarning: xattn is deprecated, '
+                          'please use "attn_backend" instead')
+            attn_backend = 'xformers' if xattn else 'naive'
+        self.attn_backend = resolve_attn_backend(attn_backend)
+        has_sdpa = hasattr(F, 'scaled_dot_product_attention')
+        get_root_logger().info(
+            f'ViT attention backend: {self.attn_backend} '
+            f'(requested: {attn_backend}, '
+            f'xformers: {"installed" if xops is not None else "not installed"}, '
+            f'sdpa: {"available" if has_sdpa else "unavailable"})')
         self.pretrain_use_cls_token = pretrain_use_cls_token
 
         self.patch_embed = PatchEmbed(
@@ -543,6 +674,9 @@ class ViT(BaseModule):
             self.pos_embed = nn.Parameter(torch.zeros(1, num_positions, embed_dim))
         else:
             self.pos_embed = None
+        # resized `pos_embed` per token grid, only filled at inference time
+        self.abs_pos_cache_size = abs_pos_cache_size
+        self._abs_pos_cache = OrderedDict()
 
 
         half_head_dim = embed_dim // num_heads // 2
@@ -558,8 +692,12 @@ class ViT(BaseModule):
             pt_seq_len=pt_hw_seq_len,
             ft_seq_len=hw_seq_len if intp_freq else None,
         )
+        # without LSJ the global blocks follow the input size, their rotary
+        # tables are built once per size and shared through this cache
+        self.rope_cache = None
         if not use_lsj:
             self.rope_glb = None
+            self.rope_cache = RopeTableCache(max_size=rope_cache_size)
 
         # stochastic depth decay rule
         dpr = [x.item() for x in torch.linspace(0, drop_path_rate, depth)]
@@ -576,7 +714,8 @@ class ViT(BaseModule):
                 window_size=window_size if i in window_block_indexes else 0,
                 use_residual_block=i in residual_block_indexes,
                 rope=self.rope_win if i in window_block_indexes else self.rope_glb,
-                xattn=xattn
+                rope_cache=self.rope_cache,
+                attn_backend=self.attn_backend
             )
             if use_act_checkpoint:
                 # TODO: use torch.utils.checkpoint
@@ -684,12 +823,40 @@ class ViT(BaseModule):
             logger.info(msg)
 
 
+    def train(self, mode=True):
+        if mode:
+            self._abs_pos_cache.clear()
+        return super().train(mode)
+
+    def _load_from_state_dict(self, *args, **kwargs):
+        self._abs_pos_cache.clear()
+        super()._load_from_state_dict(*args, **kwargs)
+
+    def _get_abs_pos(self, hw):
+        """Resize `pos_embed` to the token grid `hw`.
+
+        `pos_embed` is fixed at inference time, so the resized embedding is
+        cached per grid size in eval mode without gradients, keeping the
+        `abs_pos_cache_size` most recently used sizes. The cache is cleared
+        when weights are loaded or the module goes back to training.
+        """
+        if (self.training or torch.is_grad_enabled()
+                or self.abs_pos_cache_size <= 0):
+            return get_abs_pos(self.pos_embed, self.pretrain_use_cls_token, hw)
+        key = (tuple(hw), self.pos_embed.device, self.pos_embed.dtype)
+        if key in self._abs_pos_cache:
+            self._abs_pos_cache.move_to_end(key)
+            return self._abs_pos_cache[key]
+        abs_pos = get_abs_pos(self.pos_embed, self.pretrain_use_cls_token, hw)
+        self._abs_pos_cache[key] = abs_pos
+        if len(self._abs_pos_cache) > self.abs_pos_cache_size:
+            self._abs_pos_cache.popitem(last=False)
+        return abs_pos
+
     def forward(self, x):
         x = self.patch_embed(x)
         if self.pos_embed is not None:
-            x = x + get_abs_pos(
-                self.pos_embed, self.pretrain_use_cls_token, (x.shape[1], x.shape[2])
-            )
+            x = x + self._get_abs_pos((x.shape[1], x.shape[2]))
 
         for blk in self.blocks:
             x = blk(x)
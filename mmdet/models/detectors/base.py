@@ -8,6 +8,7 @@ import torch
 import torch.distributed as dist
 from mmcv.runner import BaseModule, auto_fp16
 
+from mmdet.core.mask import BoxMask
 from mmdet.core.visualization import imshow_det_bboxes
 
 
@@ -329,6 +330,9 @@ class BaseDetector(BaseModule, metaclass=ABCMeta):
             segms = mmcv.concat_list(segm_result)
             if isinstance(segms[0], torch.Tensor):
                 segms = torch.stack(segms, dim=0).detach().cpu().numpy()
+            elif isinstance(segms[0], BoxMask):
+                # box-local masks are drawn as full image bitmaps
+                segms = np.stack([segm.to_ndarray() for segm in segms])
             else:
                 segms = np.stack(segms, axis=0)
         # if out_file specified, do not show image in window
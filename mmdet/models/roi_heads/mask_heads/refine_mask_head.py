@@ -1,3 +1,5 @@
+from collections import defaultdict
+
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
@@ -8,12 +10,104 @@ from mmcv.cnn import ConvModule, build_upsample_layer
 from mmcv.ops.roi_align import roi_align
 
 from mmdet.core.mask.structures import polygon_to_bitmap, BitmapMasks
+from mmdet.core.mask.utils import BoxMask
 from mmdet.models.builder import HEADS, build_loss, build_roi_extractor
 from .fcn_mask_head import _do_paste_mask
 from .fcn_mask_head import BYTES_PER_FLOAT, GPU_MEM_LIMIT
 from mmcv.ops import SimpleRoIAlign
 
 
+def _paste_box_masks(mask_pred, bboxes, img_h, img_w, threshold):
+    """Paste every mask into the region of its box only.
+
+    The region is the box grown by one pixel like the CPU path of
+    :meth:`SimpleRefineMaskHead.get_seg_masks`. Sampled probabilities outside
+    a box are below 0.5, so for thresholds of at least 0.5 the masks equal
+    the full image ones while memory and host copies scale with the box
+    areas. Regions whose sides are within a factor of two are pasted
+    together by one ``grid_sample`` on a grid padded to the largest of
+    them, and cropped afterwards, which gives the same masks as pasting them
+    one by one with :func:`_do_paste_mask`.
+
+    Args:
+        mask_pred (Tensor): Mask probabilities of shape (N, 1, H, W).
+        bboxes (Tensor): Boxes of shape (N, 4) in the output image.
+        img_h (int): Height of the output image.
+        img_w (int): Width of the output image.
+        threshold (float): Binarization threshold of the masks, the
+            masks are scaled to uint8 instead if negative.
+
+    Returns:
+        list[:obj:`BoxMask`]: The mask of each detection.
+    """
+    if len(mask_pred) == 0:
+        return []
+    device = mask_pred.device
+    # the regions of _do_paste_mask(skip_empty=True) for single boxes
+    starts = torch.clamp(bboxes[:, :2].floor() - 1, min=0)
+    ends = torch.min(bboxes[:, 2:].ceil() + 1,
+                     bboxes.new_tensor([img_w, img_h]))
+    regions = torch.cat([starts, ends], dim=1).to(torch.int64).tolist()
+    sizes = [(max(y1 - y0, 0), max(x1 - x0, 0))
+             for x0, y0, x1, y1 in regions]
+    groups = defaultdict(list)
+    for i, (h, w) in enumerate(sizes):
+        groups[(h.bit_length(), w.bit_length())].append(i)
+
+    mask_dtype = torch.bool if threshold >= 0 else torch.uint8
+    region_masks = [None] * len(mask_pred)
+    for group in groups.values():
+        pad_h = max(sizes[i][0] for i in group)
+        pad_w = max(sizes[i][1] for i in group)
+        if pad_h == 0 or pad_w == 0:
+            for i in group:
+                region_masks[i] = mask_pred.new_zeros(
+                    sizes[i], dtype=mask_dtype)
+            continue
+        chunk_size = max(
+            1, int(GPU_MEM_LIMIT // (BYTES_PER_FLOAT * pad_h * pad_w + 1)))
+        for chunk_start in range(0, len(group), chunk_size):
+            inds = group[chunk_start:chunk_start + chunk_size]
+            inds_t = torch.tensor(inds, device=device)
+            offsets = torch.tensor([regions[i][:2] for i in inds],
+                                   dtype=torch.float32,
+                                   device=device)
+            x0, y0, x1, y1 = torch.split(bboxes[inds_t], 1, dim=1)
+            img_y = offsets[:, 1:] + torch.arange(
+                pad_h, device=device, dtype=torch.float32) + 0.5
+            img_x = offsets[:, :1] + torch.arange(
+                pad_w, device=device, dtype=torch.float32) + 0.5
+            img_y = (img_y - y0) / (y1 - y0) * 2 - 1
+            img_x = (img_x - x0) / (x1 - x0) * 2 - 1
+            img_x[torch.isinf(img_x)] = 0
+            img_y[torch.isinf(img_y)] = 0
+            gx = img_x[:, None, :].expand(len(inds), pad_h, pad_w)
+            gy = img_y[:, :, None].expand(len(inds), pad_h, pad_w)
+            grid = torch.stack([gx, gy], dim=3)
+            chunk_masks = F.grid_sample(
+                mask_pred[inds_t].to(dtype=torch.float32),
+                grid,
+                align_corners=False)[:, 0]
+            if threshold >= 0:
+                chunk_masks = chunk_masks >= threshold
+            else:
+                # for visualization and debugging
+                chunk_masks = (chunk_masks * 255).to(dtype=torch.uint8)
+            for i, chunk_mask in zip(inds, chunk_masks):
+                h, w = sizes[i]
+                region_masks[i] = chunk_mask[:h, :w]
+
+    # copy all regions to the host at once
+    flat_masks = torch.cat([m.flatten() for m in region_masks]).cpu()
+    flat_masks = torch.split(flat_masks, [m.numel() for m in region_masks])
+    return [
+        BoxMask(
+            flat_mask.numpy().reshape(m.shape), (region[0], region[1]),
+            (img_h, img_w))
+        for flat_mask, m, region in zip(flat_masks, region_masks, regions)
+    ]
+
+
 class MultiBranchFusion(nn.Module):
 
     def __init__(self, feat_dim, dilations=[1, 3, 5]):
@@ -611,17 +705,54 @@ class SimpleRefineMaskHead(nn.Module):
             loss_instance = self.loss_func(stage_instance_preds, stage_instance_targets) * self.loss_weight
         return dict(loss_mask=loss_instance)
 
+    def get_roi_memory(self):
+        """Estimate the test time activation memory of one RoI in bytes.
+
+        Every stage keeps about four feature maps of its size alive (the
+        instance, semantic and fused features and a dilated branch), and
+        the channels are halved from stage to stage.
+        """
+        num_floats = 0
+        channels = self.conv_out_channels_instance
+        for size in self.stage_sup_size:
+            num_floats += 4 * channels * size * size
+            channels //= 2
+        return num_floats * BYTES_PER_FLOAT
+
+    @staticmethod
+    def get_mask_shape(ori_shape, scale_factor, rescale):
+        """Get the (height, width) of the pasted masks."""
+        if rescale:
+            return ori_shape[:2]
+        img_h = np.round(ori_shape[0] * scale_factor).astype(np.int32)
+        img_w = np.round(ori_shape[1] * scale_factor).astype(np.int32)
+        return img_h, img_w
+
+    def get_empty_masks(self, num_masks, rcnn_test_cfg, ori_shape,
+                        scale_factor, rescale):
+        """Get all-negative masks for detections whose masks are skipped.
+
+        The masks have the type and size of the results of
+        :meth:`get_seg_masks`.
+        """
+        img_h, img_w = self.get_mask_shape(ori_shape, scale_factor, rescale)
+        if rcnn_test_cfg.get('box_masks', True):
+            return [
+                BoxMask(np.zeros((0, 0), dtype=bool), (0, 0), (img_h, img_w))
+                for _ in range(num_masks)
+            ]
+        return [
+            np.zeros((img_h, img_w), dtype=bool) for _ in range(num_masks)
+        ]
+
     def get_seg_masks(self, mask_pred, det_bboxes, det_labels, rcnn_test_cfg, ori_shape, scale_factor, rescale):
         mask_pred = mask_pred.sigmoid()
         device = mask_pred[0].device
         bboxes = det_bboxes[:, :4]
         labels = det_labels
 
-        if rescale:
-            img_h, img_w = ori_shape[:2]
-        else:
-            img_h = np.round(ori_shape[0] * scale_factor).astype(np.int32)
-            img_w = np.round(ori_shape[1] * scale_factor).astype(np.int32)
+        img_h, img_w = self.get_mask_shape(ori_shape, scale_factor, rescale)
+        if not rescale:
             scale_factor = 1.0
 
         if not isinstance(scale_factor, (float, torch.Tensor)):
@@ -629,6 +760,14 @@ class SimpleRefineMaskHead(nn.Module):
         bboxes = bboxes / scale_factor
 
         N = len(mask_pred)
+        threshold = rcnn_test_cfg.mask_thr_binary
+        if mask_pred.shape[1] > 1:
+            mask_pred = mask_pred[range(N), labels][:, None]
+
+        if rcnn_test_cfg.get('box_masks', True):
+            return _paste_box_masks(mask_pred, bboxes, img_h, img_w,
+                                    threshold)
+
         # The actual implementation split the input into chunks,
         # and paste them chunk by chunk.
         if device.type == 'cpu':
@@ -644,7 +783,6 @@ class SimpleRefineMaskHead(nn.Module):
             assert (num_chunks <= N), 'Default GPU_MEM_LIMIT is too small; try increasing it'
         chunks = torch.chunk(torch.arange(N, device=device), num_chunks)
 
-        threshold = rcnn_test_cfg.mask_thr_binary
         im_mask = torch.zeros(
             N,
             img_h,
@@ -652,9 +790,6 @@ class SimpleRefineMaskHead(nn.Module):
             device=device,
             dtype=torch.bool if threshold >= 0 else torch.uint8)
 
-        if mask_pred.shape[1] > 1:
-            mask_pred = mask_pred[range(N), labels][:, None]
-
         for inds in chunks:
             masks_chunk, spatial_inds = _do_paste_mask(
                 mask_pred[inds],
@@ -0,0 +1,39 @@
+# A small Co-DINO for CPU latency benchmarks of every inference stage, see
+# tools/analysis_tools/benchmark_codetr.py. Not meant for training.
+_base_ = './co_dino_5scale_r50_1x_coco.py'
+
+model = dict(
+    backbone=dict(depth=18, init_cfg=None),
+    neck=dict(in_channels=[64, 128, 256, 512]),
+    query_head=dict(
+        num_query=100,
+        in_channels=512,
+        dn_cfg=dict(group_cfg=dict(num_dn_queries=10)),
+        transformer=dict(
+            encoder=dict(
+                num_layers=2,
+                with_cp=-1,
+                transformerlayers=dict(feedforward_channels=512)),
+            decoder=dict(
+                num_layers=2, transformerlayers=dict(
+                    feedforward_channels=512)))))
+
+img_norm_cfg = dict(
+    mean=[123.675, 116.28, 103.53], std=[58.395, 57.12, 57.375], to_rgb=True)
+test_pipeline = [
+    dict(type='LoadImageFromFile'),
+    dict(
+        type='MultiScaleFlipAug',
+        img_scale=(640, 384),
+        flip=False,
+        transforms=[
+            dict(type='Resize', keep_ratio=True),
+            dict(type='RandomFlip'),
+            dict(type='Normalize', **img_norm_cfg),
+            dict(type='Pad', size_divisor=32),
+            dict(type='ImageToTensor', keys=['img']),
+            dict(type='Collect', keys=['img'])
+        ])
+]
+data = dict(
+    val=dict(pipeline=test_pipeline), test=dict(pipeline=test_pipeline))
@@ -0,0 +1,48 @@
+# Multi-scale and flip test-time augmentation of Co-DINO. The detections of
+# all augmentations are merged by weighted box fusion, set
+# `aug_merge=dict(type='nms', iou_threshold=0.6)` in the test config of the
+# query head to merge them by NMS instead.
+_base_ = './co_dino_5scale_r50_1x_coco.py'
+
+model = dict(test_cfg=[
+    dict(
+        max_per_img=300,
+        nms=dict(type='soft_nms', iou_threshold=0.8),
+        aug_merge=dict(type='wbf', iou_thr=0.55)),
+    dict(
+        rpn=dict(
+            nms_pre=1000,
+            max_per_img=1000,
+            nms=dict(type='nms', iou_threshold=0.7),
+            min_bbox_size=0),
+        rcnn=dict(
+            score_thr=0.0,
+            nms=dict(type='nms', iou_threshold=0.5),
+            max_per_img=100)),
+    dict(
+        nms_pre=1000,
+        min_bbox_size=0,
+        score_thr=0.0,
+        nms=dict(type='nms', iou_threshold=0.6),
+        max_per_img=100),
+])
+
+img_norm_cfg = dict(
+    mean=[123.675, 116.28, 103.53], std=[58.395, 57.12, 57.375], to_rgb=True)
+test_pipeline = [
+    dict(type='LoadImageFromFile'),
+    dict(
+        type='MultiScaleFlipAug',
+        img_scale=[(1333, 640), (1333, 800), (1333, 960)],
+        flip=True,
+        transforms=[
+            dict(type='Resize', keep_ratio=True),
+            dict(type='RandomFlip'),
+            dict(type='Normalize', **img_norm_cfg),
+            dict(type='Pad', size_divisor=1),
+            dict(type='ImageToTensor', keys=['img']),
+            dict(type='Collect', keys=['img'])
+        ])
+]
+data = dict(
+    val=dict(pipeline=test_pipeline), test=dict(pipeline=test_pipeline))
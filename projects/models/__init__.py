@@ -6,4 +6,5 @@ from .co_roi_head import *
 from .transformer import *
 from .query_denoising import build_dn_generator
 from .swin_transformer import *
-from .norm import *
\ No newline at end of file
+from .norm import *
+from .temporal_cache import TemporalFeatureCache
\ No newline at end of file
@@ -1,4 +1,6 @@
 import copy
+from collections import OrderedDict, defaultdict
+
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
@@ -14,7 +16,8 @@ from mmdet.models.dense_heads.detr_head import DETRHead
 import sys
 import numpy as np
 from mmcv.ops import batched_nms
-from mmdet.core import bbox_mapping_back, merge_aug_proposals
+from mmdet.core import (bbox_mapping_back, merge_aug_proposals,
+                        weighted_box_fusion)
 if sys.version_info >= (3, 7):
     from mmdet.utils.contextmanagers import completed
 
@@ -30,6 +33,7 @@ class CoDeformDETRHead(DETRHead):
                  mixed_selection=False,
                  transformer=None,
                  use_zero_padding=False,
+                 spatial_cache_size=4,
                  **kwargs):
         self.max_pos_coords = max_pos_coords
         self.lambda_1 = lambda_1
@@ -43,7 +47,10 @@ class CoDeformDETRHead(DETRHead):
             transformer['mixed_selection'] = self.mixed_selection
         super(CoDeformDETRHead, self).__init__(
             *args, transformer=transformer, **kwargs)
-
+        # padding masks, positional encodings and level geometry per batch
+        # shape, only filled at inference time
+        self.spatial_cache_size = spatial_cache_size
+        self._spatial_cache = OrderedDict()
 
     def _init_layers(self):
         """Initialize classification branch and regression branch of head."""
@@ -97,8 +104,22 @@ class CoDeformDETRHead(DETRHead):
             for m in self.reg_branches:
                 nn.init.constant_(m[-1].bias.data[2:], 0.0)
 
-    def forward(self, mlvl_feats, img_metas):
-        """Forward function.
+    def train(self, mode=True):
+        if mode:
+            self._spatial_cache.clear()
+        return super().train(mode)
+
+    def _load_from_state_dict(self, *args, **kwargs):
+        self._spatial_cache.clear()
+        super()._load_from_state_dict(*args, **kwargs)
+
+    def get_spatial_inputs(self, mlvl_feats, img_metas):
+        """Build the padding masks, positional encodings and level geometry.
+
+        They only depend on the padded batch shape and the valid image
+        shapes, e.g. they are the same for every batch of the LSJ configs,
+        so they are cached per shape in eval mode without gradients,
+        keeping the `spatial_cache_size` most recently used entries.
 
         Args:
             mlvl_feats (tuple[Tensor]): Features from the upstream
@@ -107,21 +128,28 @@ class CoDeformDETRHead(DETRHead):
             img_metas (list[dict]): List of image information.
 
         Returns:
-            all_cls_scores (Tensor): Outputs from the classification head, \
-                shape [nb_dec, bs, num_query, cls_out_channels]. Note \
-                cls_out_channels should includes background.
-            all_bbox_preds (Tensor): Sigmoid outputs from the regression \
-                head with normalized coordinate format (cx, cy, w, h). \
-                Shape [nb_dec, bs, num_query, 4].
-            enc_outputs_class (Tensor): The score of each point on encode \
-                feature map, has shape (N, h*w, num_class). Only when \
-                as_two_stage is True it would be returned, otherwise \
-                `None` would be returned.
-            enc_outputs_coord (Tensor): The proposal generate from the \
-                encode feature map, has shape (N, h*w, 4). Only when \
-                as_two_stage is True it would be returned, otherwise \
-                `None` would be returned.
+            tuple: A tuple of
+
+                - mlvl_masks (list[Tensor]): The padding masks of each \
+                    level, each has shape (N, H, W).
+                - mlvl_positional_encodings (list[Tensor]): The positional \
+                    encodings of each level, each has shape (N, C, H, W).
+                - spatial_meta (dict[str, Tensor]): The level geometry \
+                    from the transformer's `get_spatial_meta`.
         """
+        if torch.onnx.is_in_onnx_export():
+            return self._get_spatial_inputs_onnx(mlvl_feats)
+        use_cache = not (self.training or torch.is_grad_enabled()
+                         or self.spatial_cache_size <= 0)
+        if use_cache:
+            key = (tuple(img_metas[0]['batch_input_shape']),
+                   tuple(tuple(meta['img_shape'][:2]) for meta in img_metas),
+                   tuple(tuple(feat.shape[-2:]) for feat in mlvl_feats),
+                   mlvl_feats[0].device, mlvl_feats[0].dtype)
+            if key in self._spatial_cache:
+                self._spatial_cache.move_to_end(key)
+                return self._spatial_cache[key]
+
         batch_size = mlvl_feats[0].size(0)
         input_img_h, input_img_w = img_metas[0]['batch_input_shape']
         img_masks = mlvl_feats[0].new_ones(
@@ -138,6 +166,100 @@ class CoDeformDETRHead(DETRHead):
                               size=feat.shape[-2:]).to(torch.bool).squeeze(0))
             mlvl_positional_encodings.append(
                 self.positional_encoding(mlvl_masks[-1]))
+        spatial_meta = self.transformer.get_spatial_meta(mlvl_masks)
+
+        spatial_inputs = (mlvl_masks, mlvl_positional_encodings, spatial_meta)
+        if use_cache:
+            self._spatial_cache[key] = spatial_inputs
+            if len(self._spatial_cache) > self.spatial_cache_size:
+                self._spatial_cache.popitem(last=False)
+        return spatial_inputs
+
+    def _get_spatial_inputs_onnx(self, mlvl_feats):
+        """Build the spatial inputs for exporting to ONNX.
+
+        Like `DETRHead.forward_single_onnx`, `img_shape` is not traceable,
+        so the masks are created with zeros (valid tag) and the whole padded
+        input is treated as image. The batch size stays dynamic, while the
+        level geometry is fixed by the traced input shape.
+        """
+        batch_size = mlvl_feats[0].size(0)
+        mlvl_masks = []
+        mlvl_positional_encodings = []
+        for feat in mlvl_feats:
+            h, w = feat.shape[-2:]
+            mlvl_masks.append(
+                feat.new_zeros((batch_size, h, w)).to(torch.bool))
+            mlvl_positional_encodings.append(
+                self.positional_encoding(mlvl_masks[-1]))
+        spatial_meta = self.transformer.get_spatial_meta(mlvl_masks)
+        return mlvl_masks, mlvl_positional_encodings, spatial_meta
+
+    def forward_onnx(self, mlvl_feats, img_metas):
+        """Forward function for exporting to ONNX.
+
+        Runs the encoder, the decoder and the branches of the last decoder
+        layer, see `_get_spatial_inputs_onnx` for the padding masks.
+
+        Args:
+            mlvl_feats (tuple[Tensor]): Features from the upstream
+                network, each is a 4D-tensor with shape
+                (N, C, H, W).
+            img_metas (list[dict]): List of image information.
+
+        Returns:
+            tuple[list[Tensor], list[Tensor]]: The classification scores \
+                and the sigmoid regression outputs of the last decoder \
+                layer, in the single level format of `DETRHead.onnx_export`.
+        """
+        outs = self(
+            mlvl_feats,
+            img_metas,
+            last_layer_only=True,
+            return_encoder_output=False)
+        return [outs[0]], [outs[1]]
+
+    def forward(self,
+                mlvl_feats,
+                img_metas,
+                last_layer_only=False,
+                return_encoder_output=True):
+        """Forward function.
+
+        Args:
+            mlvl_feats (tuple[Tensor]): Features from the upstream
+                network, each is a 4D-tensor with shape
+                (N, C, H, W).
+            img_metas (list[dict]): List of image information.
+            last_layer_only (bool): Whether to only run the classification
+                and regression branches on the last decoder layer, in which
+                case nb_dec of the outputs is 1. Default: False.
+            return_encoder_output (bool): Whether to rebuild the multi-level
+                encoder feature maps consumed by the auxiliary heads. If
+                False, `enc_outputs` is returned as `None`. Default: True.
+
+        Returns:
+            all_cls_scores (Tensor): Outputs from the classification head, \
+                shape [nb_dec, bs, num_query, cls_out_channels]. Note \
+                cls_out_channels should includes background.
+            all_bbox_preds (Tensor): Sigmoid outputs from the regression \
+                head with normalized coordinate format (cx, cy, w, h). \
+                Shape [nb_dec, bs, num_query, 4].
+            enc_outputs_class (Tensor): The score of each point on encode \
+                feature map, has shape (N, h*w, num_class). Only when \
+                as_two_stage is True it would be returned, otherwise \
+                `None` would be returned.
+            enc_outputs_coord (Tensor): The proposal generate from the \
+                encode feature map, has shape (N, h*w, 4). Only when \
+                as_two_stage is True it would be returned, otherwise \
+                `None` would be returned.
+            enc_outputs (list[Tensor] | None): The encoder memory reshaped \
+                to multi-level feature maps of shape (N, C, H, W), plus one \
+                downsampled level. `None` if `return_encoder_output` is \
+                False.
+        """
+        mlvl_masks, mlvl_positional_encodings, spatial_meta = \
+            self.get_spatial_inputs(mlvl_feats, img_metas)
 
         query_embeds = None
         if not self.as_two_stage or self.mixed_selection:
@@ -151,25 +273,36 @@ class CoDeformDETRHead(DETRHead):
                     mlvl_positional_encodings,
                     reg_branches=self.reg_branches if self.with_box_refine else None,  # noqa:E501
                     cls_branches=self.cls_branches if self.as_two_stage else None,  # noqa:E501
-                    return_encoder_output=True
+                    return_encoder_output=True,
+                    spatial_meta=spatial_meta
             )
 
-        outs = []
-        num_level = len(mlvl_feats)
-        start = 0
-        for lvl in range(num_level):
-            bs, c, h, w = mlvl_feats[lvl].shape
-            end = start + h*w
-            feat = enc_outputs[start:end].permute(1, 2, 0).contiguous()
-            start = end
-            outs.append(feat.reshape(bs, c, h, w))
-        outs.append(self.downsample(outs[-1]))
+        # rebuild the multi-level encoder feature maps for the auxiliary
+        # heads, skipped when nothing downstream consumes them
+        outs = None
+        if return_encoder_output:
+            outs = []
+            num_level = len(mlvl_feats)
+            start = 0
+            for lvl in range(num_level):
+                bs, c, h, w = mlvl_feats[lvl].shape
+                end = start + h*w
+                feat = enc_outputs[start:end].permute(1, 2, 0).contiguous()
+                start = end
+                outs.append(feat.reshape(bs, c, h, w))
+            outs.append(self.downsample(outs[-1]))
 
         hs = hs.permute(0, 2, 1, 3)
         outputs_classes = []
         outputs_coords = []
 
-        for lvl in range(hs.shape[0]):
+        # The reference points of every layer are refined inside the decoder,
+        # so the branches of the earlier layers can be skipped when only the
+        # last layer is read, e.g. by `get_bboxes` at test time.
+        num_dec_layers = hs.shape[0]
+        dec_layers = [num_dec_layers - 1] if last_layer_only \
+            else range(num_dec_layers)
+        for lvl in dec_layers:
             if lvl == 0:
                 reference = init_reference
             else:
@@ -1022,17 +1155,19 @@ class CoDeformDETRHead(DETRHead):
         max_per_img = self.test_cfg.get('max_per_img', self.num_query)
         score_thr = self.test_cfg.get('score_thr', 0)
         if with_nms:
-            max_per_img = self.num_query
+            # fewer queries than `num_query` may be decoded at test time
+            max_per_img = len(cls_score)
         # exclude background
         if self.loss_cls.use_sigmoid:
             cls_score = cls_score.sigmoid()
-            scores, indexes = cls_score.view(-1).topk(max_per_img)
+            scores, indexes = cls_score.view(-1).topk(
+                min(max_per_img, cls_score.numel()))
             det_labels = indexes % self.num_classes
             bbox_index = indexes // self.num_classes
             bbox_pred = bbox_pred[bbox_index]
         else:
             scores, det_labels = F.softmax(cls_score, dim=-1)[..., :-1].max(-1)
-            scores, bbox_index = scores.topk(max_per_img)
+            scores, bbox_index = scores.topk(min(max_per_img, len(scores)))
             bbox_pred = bbox_pred[bbox_index]
             det_labels = det_labels[bbox_index]
 
@@ -1062,6 +1197,15 @@ class CoDeformDETRHead(DETRHead):
 
     def aug_test_bboxes(self, feats, img_metas, rescale=False):
         """Test det bboxes with test-time augmentation.
+
+        Augmentations with the same feature and padded input shapes, e.g.
+        an image and its flip, are forwarded as one batch. The detections
+        of all augmentations are mapped back to the original image and
+        merged as set by `aug_merge` in the test config, either
+        ``dict(type='wbf', iou_thr=0.55)`` for :func:`weighted_box_fusion`
+        or a `batched_nms` config. It defaults to the `nms` of the test
+        config, or NMS with an IoU threshold of 0.6.
+
         Args:
             feats (list[Tensor]): the outer list indicates test-time
                 augmentations and inner Tensor should have a shape NxCxHxW,
@@ -1071,10 +1215,86 @@ class CoDeformDETRHead(DETRHead):
                 images in a batch. each dict has image information.
             rescale (bool, optional): Whether to rescale the results.
                 Defaults to False.
+
         Returns:
-            list[ndarray]: bbox results of each class
+            list[tuple[Tensor, Tensor]]: Each item in result_list is 2-tuple.
+                The first item is ``bboxes`` with shape (n, 5),
+                where 5 represent (tl_x, tl_y, br_x, br_y, score).
+                The shape of the second tensor in the tuple is ``labels``
+                with shape (n,). The length of list is the number of images
+                in the batch.
         """
-        raise ValueError('Not implemented')
+        groups = defaultdict(list)
+        for aug_idx, (x, img_meta) in enumerate(zip(feats, img_metas)):
+            key = (tuple(tuple(feat.shape[1:]) for feat in x),
+                   tuple(img_meta[0]['batch_input_shape']))
+            groups[key].append(aug_idx)
+        num_imgs = len(img_metas[0])
+        aug_results = [None] * len(feats)
+        for aug_inds in groups.values():
+            if len(aug_inds) == 1:
+                x = feats[aug_inds[0]]
+            else:
+                x = [
+                    torch.cat([feats[i][lvl] for i in aug_inds])
+                    for lvl in range(len(feats[aug_inds[0]]))
+                ]
+            group_metas = [meta for i in aug_inds for meta in img_metas[i]]
+            outs = self.forward(
+                x,
+                group_metas,
+                last_layer_only=True,
+                return_encoder_output=False)
+            results = self.get_bboxes(
+                *outs, group_metas, rescale=False, with_nms=False)
+            for k, aug_idx in enumerate(aug_inds):
+                aug_results[aug_idx] = results[k * num_imgs:(k + 1) *
+                                               num_imgs]
+
+        merge_cfg = self.test_cfg.get(
+            'aug_merge',
+            self.test_cfg.get('nms', dict(type='nms', iou_threshold=0.6)))
+        max_per_img = self.test_cfg.get('max_per_img', self.num_query)
+        result_list = []
+        for img_id in range(num_imgs):
+            aug_bboxes, aug_labels = [], []
+            for results, img_meta in zip(aug_results, img_metas):
+                det_bboxes, det_labels = results[img_id]
+                img_info = img_meta[img_id]
+                # the input is not padded for configs without attention
+                # masks, but flips are mapped back in the unpadded image
+                img_shape = img_info.get('unpad_img_shape',
+                                         img_info['img_shape'])
+                aug_bboxes.append(
+                    torch.cat([
+                        bbox_mapping_back(det_bboxes[:, :4], img_shape,
+                                          img_info['scale_factor'],
+                                          img_info['flip'],
+                                          img_info['flip_direction']),
+                        det_bboxes[:, 4:]
+                    ], -1))
+                aug_labels.append(det_labels)
+            bboxes = torch.cat(aug_bboxes)
+            labels = torch.cat(aug_labels)
+            if bboxes.numel() == 0:
+                det_bboxes, det_labels = bboxes, labels
+            elif merge_cfg.get('type', 'nms') == 'wbf':
+                det_bboxes, det_labels = weighted_box_fusion(
+                    bboxes[:, :4], bboxes[:, 4], labels,
+                    merge_cfg.get('iou_thr', 0.55), len(feats))
+            else:
+                det_bboxes, keep_idxs = batched_nms(
+                    bboxes[:, :4].contiguous(), bboxes[:, 4].contiguous(),
+                    labels, merge_cfg)
+                det_labels = labels[keep_idxs]
+            det_bboxes = det_bboxes[:max_per_img]
+            det_labels = det_labels[:max_per_img]
+            if not rescale:
+                det_bboxes = det_bboxes.clone()
+                det_bboxes[:, :4] *= det_bboxes.new_tensor(
+                    img_metas[0][img_id]['scale_factor'])
+            result_list.append((det_bboxes, det_labels))
+        return result_list
 
     def simple_test_bboxes(self, feats, img_metas, rescale=False, return_encoder_output=False):
         """Test det bboxes without test-time augmentation.
@@ -1096,7 +1316,12 @@ class CoDeformDETRHead(DETRHead):
         # forward of this head requires img_metas
         with_nms = self.test_cfg.get('nms', None)
         with_nms = True if with_nms is not None else False
-        outs = self.forward(feats, img_metas)
+        # `get_bboxes` only reads the outputs of the last decoder layer
+        outs = self.forward(
+            feats,
+            img_metas,
+            last_layer_only=True,
+            return_encoder_output=return_encoder_output)
         results_list = self.get_bboxes(*outs, img_metas, rescale=rescale, with_nms=with_nms)
         if return_encoder_output:
             return results_list, outs[-1]
@@ -1,5 +1,7 @@
 import warnings
+from collections import defaultdict
 
+import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
@@ -8,6 +10,7 @@ from mmdet.core import bbox2result, bbox2roi, build_assigner, build_sampler
 from mmdet.models.builder import DETECTORS, build_backbone, build_head, build_neck, build_roi_extractor
 from mmdet.models.detectors.base import BaseDetector
 from mmdet.models.losses.cross_entropy_loss import generate_block_target
+from .temporal_cache import TemporalFeatureCache
 
 
 @DETECTORS.register_module()
@@ -29,7 +32,8 @@ class CoDETR(BaseDetector):
                  with_pos_coord=True,
                  with_attn_mask=True,
                  eval_module='detr',
-                 eval_index=0):
+                 eval_index=0,
+                 stream_cfg=None):
         super(CoDETR, self).__init__(init_cfg)
         self.with_pos_coord = with_pos_coord
         self.with_attn_mask = with_attn_mask
@@ -69,6 +73,11 @@ class CoDETR(BaseDetector):
         if mask_iou_head is not None:
             self.mask_iou_head = build_head(mask_iou_head)
 
+        # At test time the encoder feature maps rebuilt by the query head
+        # are only consumed by the mask head, the RPN/RoI and bbox heads
+        # ask for them explicitly.
+        self.with_query_encoder_output = mask_head is not None
+
         if rpn_head is not None:
             rpn_train_cfg = train_cfg[head_idx].rpn if (train_cfg is not None and train_cfg[head_idx] is not None) else None
             rpn_head_ = rpn_head.copy()
@@ -97,6 +106,17 @@ class CoDETR(BaseDetector):
         self.train_cfg = train_cfg
         self.test_cfg = test_cfg
 
+        # opt-in reuse of the features of unchanged tiles of video frames
+        self.temporal_cache = None
+        if stream_cfg is not None:
+            self.temporal_cache = TemporalFeatureCache(**stream_cfg)
+
+    def train(self, mode=True):
+        """Drop the cached stream features when switching to training."""
+        if mode and self.temporal_cache is not None:
+            self.temporal_cache.reset()
+        return super().train(mode)
+
     @property
     def with_rpn(self):
         """bool: whether the detector has RPN"""
@@ -128,13 +148,42 @@ class CoDETR(BaseDetector):
         """bool: whether the detector has a mask head"""
         return (hasattr(self, 'roi_head') and self.roi_head is not None and len(self.roi_head)>0 and self.roi_head[0].with_mask)
     
-    def extract_feat(self, img, img_metas=None):
-        """Directly extract features from the backbone+neck."""
+    def _extract_feat(self, img):
         x = self.backbone(img)
         if self.with_neck:
             x = self.neck(x)
         return x
 
+    def extract_feat(self, img, img_metas=None):
+        """Directly extract features from the backbone+neck.
+
+        In streaming mode (``stream_cfg``) the features of single frames at
+        test time are taken from the :obj:`TemporalFeatureCache`.
+        """
+        if (self.temporal_cache is not None and not self.training
+                and img.size(0) == 1):
+            return self.temporal_cache(img, self._extract_feat)
+        return self._extract_feat(img)
+
+    def extract_feats(self, imgs):
+        """Extract features of the test-time augmentations of a batch.
+
+        Augmentations with the same input shape, e.g. an image and its flip,
+        share one backbone and neck pass.
+        """
+        groups = defaultdict(list)
+        for aug_idx, img in enumerate(imgs):
+            groups[tuple(img.shape[1:])].append(aug_idx)
+        feats = [None] * len(imgs)
+        for aug_inds in groups.values():
+            x = self._extract_feat(torch.cat([imgs[i] for i in aug_inds]))
+            for k, aug_idx in enumerate(aug_inds):
+                num_imgs = imgs[aug_idx].size(0)
+                feats[aug_idx] = [
+                    feat[k * num_imgs:(k + 1) * num_imgs] for feat in x
+                ]
+        return feats
+
     # over-write `forward_dummy` because:
     # the forward of bbox_head requires img_metas
     def forward_dummy(self, img):
@@ -381,8 +430,12 @@ class CoDETR(BaseDetector):
                 img_metas[i]['img_shape'] = [input_img_h, input_img_w, 3]
 
         x = self.extract_feat(img, img_metas)
-        results_list, x = self.query_head.simple_test(
-            x, img_metas, rescale=rescale, return_encoder_output=True)
+        if self.with_query_encoder_output:
+            results_list, x = self.query_head.simple_test(
+                x, img_metas, rescale=rescale, return_encoder_output=True)
+        else:
+            results_list = self.query_head.simple_test(
+                x, img_metas, rescale=rescale, return_encoder_output=False)
         bbox_results = [
             bbox2result(det_bboxes, det_labels, self.query_head.num_classes)
             for det_bboxes, det_labels in results_list
@@ -433,78 +486,131 @@ class CoDETR(BaseDetector):
         ]
         return bbox_results
 
+    def _get_mask_inds(self, scores):
+        """Indices of the detections whose masks are computed at test time.
+
+        Detections are kept if their score is at least ``mask_score_thr``
+        and among the ``mask_topk`` best of the test config, both are
+        disabled by default.
+        """
+        score_thr = self.rcnn_test_cfg.get('mask_score_thr', None)
+        topk = self.rcnn_test_cfg.get('mask_topk', None)
+        inds = torch.arange(len(scores), device=scores.device)
+        if score_thr is not None:
+            inds = inds[scores >= score_thr]
+        if topk is not None and len(inds) > topk:
+            inds = inds[scores[inds].topk(topk).indices].sort().values
+        return inds
+
+    def _get_mask_chunk_size(self, device):
+        """Number of detections passed through the mask branch at a time.
+
+        Uses ``mask_chunk_size`` of the test config if set. Otherwise on GPU
+        as many RoIs as fit into half of the free memory are processed at a
+        time, and 150 on CPU.
+        """
+        chunk_size = self.rcnn_test_cfg.get('mask_chunk_size', None)
+        if chunk_size is not None:
+            return chunk_size
+        if device.type != 'cuda' or not hasattr(torch.cuda, 'mem_get_info'):
+            return 150
+        free_mem = torch.cuda.mem_get_info(device)[0]
+        # memory cached by the allocator can be reused as well
+        free_mem += torch.cuda.memory_reserved(device) - torch.cuda.memory_allocated(device)
+        return max(1, int(free_mem * 0.5) // self.mask_head.get_roi_memory())
+
     def simple_test_mask(self,
                          x,
                          img_metas,
                          det_bboxes,
                          det_labels,
                          rescale=False):
-        """Obtain mask prediction without augmentation."""
+        """Obtain mask prediction without augmentation.
+
+        Masks are only computed for the detections selected by
+        ``mask_score_thr`` and ``mask_topk`` of the mask test config, the
+        other detections get empty masks and mask scores of 0.
+        """
+        num_classes = self.mask_head.stage_num_classes[0]
+        with_mask_iou = hasattr(self, "mask_iou_head")
         segm_results = []
         mask_scores = []
         for img_idx in range(len(img_metas)):
             ori_shape = img_metas[img_idx]['ori_shape']
             scale_factor = img_metas[img_idx]['scale_factor']
-            det_bboxes = det_bboxes[img_idx]
-            det_labels = det_labels[img_idx]            
-            if det_bboxes.shape[0] == 0:
-                segm_result = [[] for _ in range(self.mask_head.stage_num_classes[0])]
-                mask_score = [[] for _ in range(self.mask_head.stage_num_classes[0])]
-            else:
-                # if det_bboxes is rescaled to the original image size, we need to
-                # rescale it back to the testing scale to obtain RoIs.
-                if rescale and not isinstance(scale_factor, float):
-                    scale_factor = torch.from_numpy(scale_factor).to(det_bboxes.device)
-                _bboxes = det_bboxes[:, :4] * scale_factor if rescale else det_bboxes
-                mask_rois = bbox2roi([_bboxes])
-
-                interval = 150  # to avoid memory overflow
-                segm_result = [[] for _ in range(self.mask_head.stage_num_classes[0])]
-                mask_score = [[] for _ in range(self.mask_head.stage_num_classes[0])]
-                for i in range(0, det_labels.shape[0], interval):
-                    mask_results = self._mask_forward(x, mask_rois[i: i + interval], det_labels[i: i + interval])
-
-                    # mask scoring
-                    if hasattr(self, "mask_iou_head"):
-                        # get mask scores with mask iou head
-                        mask_feats = mask_results['mask_feats']
-                        mask_pred = mask_results['stage_instance_preds'][1].squeeze(1)
-                        mask_iou_pred = self.mask_iou_head(
-                            mask_feats, mask_pred)
-                        chunk_mask_score = self.mask_iou_head.get_mask_scores(
-                            mask_iou_pred, det_bboxes[i: i + interval], det_labels[i: i + interval], return_score=True)
-
-                    # refine instance masks from stage 1
-                    stage_instance_preds = mask_results['stage_instance_preds'][1:]
-                    for idx in range(len(stage_instance_preds) - 1):
-                        instance_pred = stage_instance_preds[idx].squeeze(1).sigmoid() >= 0.5
-                        non_boundary_mask = (generate_block_target(instance_pred, boundary_width=1) != 1).unsqueeze(1)
-                        non_boundary_mask = F.interpolate(
-                            non_boundary_mask.float(),
-                            stage_instance_preds[idx + 1].shape[-2:], mode='bilinear', align_corners=True) >= 0.5
-                        pre_pred = F.interpolate(
-                            stage_instance_preds[idx],
-                            stage_instance_preds[idx + 1].shape[-2:], mode='bilinear', align_corners=True)
-                        stage_instance_preds[idx + 1][non_boundary_mask] = pre_pred[non_boundary_mask]
-                    instance_pred = stage_instance_preds[-1]
-
-                    chunk_segm_result = self.mask_head.get_seg_masks(
-                        instance_pred, _bboxes[i: i + interval], det_labels[i: i + interval],
-                        self.rcnn_test_cfg, ori_shape, scale_factor, rescale)
-
-                    if hasattr(self, "mask_iou_head"):
-                        for c, segm, score in zip(det_labels[i: i + interval], chunk_segm_result, chunk_mask_score):
-                            segm_result[c].append(segm)     
-                            mask_score[c].append(score)                   
-                    else:
-                        for c, segm in zip(det_labels[i: i + interval], chunk_segm_result):
-                            segm_result[c].append(segm)
+            img_det_bboxes = det_bboxes[img_idx]
+            img_det_labels = det_labels[img_idx]
+            segm_result = [[] for _ in range(num_classes)]
+            mask_score = [[] for _ in range(num_classes)]
+            num_dets = img_det_bboxes.shape[0]
+            if num_dets == 0:
+                segm_results.append(segm_result)
+                mask_scores.append(mask_score)
+                continue
+
+            mask_inds = self._get_mask_inds(img_det_bboxes[:, 4])
+            segms = [None] * num_dets
+            det_mask_scores = np.zeros(num_dets, dtype=np.float32)
+            skipped = set(range(num_dets)) - set(mask_inds.tolist())
+            empty_segms = self.mask_head.get_empty_masks(
+                len(skipped), self.rcnn_test_cfg, ori_shape, scale_factor, rescale)
+            for ind, segm in zip(sorted(skipped), empty_segms):
+                segms[ind] = segm
+
+            # if det_bboxes is rescaled to the original image size, we need to
+            # rescale it back to the testing scale to obtain RoIs.
+            if rescale and not isinstance(scale_factor, float):
+                scale_factor = torch.from_numpy(scale_factor).to(img_det_bboxes.device)
+            _bboxes = img_det_bboxes[:, :4] * scale_factor if rescale else img_det_bboxes[:, :4]
+
+            chunk_size = self._get_mask_chunk_size(img_det_bboxes.device)
+            for i in range(0, len(mask_inds), chunk_size):
+                inds = mask_inds[i: i + chunk_size]
+                chunk_bboxes = _bboxes[inds]
+                chunk_labels = img_det_labels[inds]
+                mask_rois = torch.cat([chunk_bboxes.new_full((len(inds), 1), img_idx), chunk_bboxes], dim=1)
+                mask_results = self._mask_forward(x, mask_rois, chunk_labels)
+
+                # mask scoring
+                if with_mask_iou:
+                    # get mask scores with mask iou head
+                    mask_feats = mask_results['mask_feats']
+                    mask_pred = mask_results['stage_instance_preds'][1].squeeze(1)
+                    mask_iou_pred = self.mask_iou_head(
+                        mask_feats, mask_pred)
+                    det_mask_scores[inds.cpu().numpy()] = self.mask_iou_head.get_mask_scores(
+                        mask_iou_pred, img_det_bboxes[inds], chunk_labels, return_score=True)
+
+                # refine instance masks from stage 1
+                stage_instance_preds = mask_results['stage_instance_preds'][1:]
+                for idx in range(len(stage_instance_preds) - 1):
+                    instance_pred = stage_instance_preds[idx].squeeze(1).sigmoid() >= 0.5
+                    non_boundary_mask = (generate_block_target(instance_pred, boundary_width=1) != 1).unsqueeze(1)
+                    non_boundary_mask = F.interpolate(
+                        non_boundary_mask.float(),
+                        stage_instance_preds[idx + 1].shape[-2:], mode='bilinear', align_corners=True) >= 0.5
+                    pre_pred = F.interpolate(
+                        stage_instance_preds[idx],
+                        stage_instance_preds[idx + 1].shape[-2:], mode='bilinear', align_corners=True)
+                    stage_instance_preds[idx + 1][non_boundary_mask] = pre_pred[non_boundary_mask]
+                instance_pred = stage_instance_preds[-1]
+
+                chunk_segm_result = self.mask_head.get_seg_masks(
+                    instance_pred, chunk_bboxes, chunk_labels,
+                    self.rcnn_test_cfg, ori_shape, scale_factor, rescale)
+                for ind, segm in zip(inds.tolist(), chunk_segm_result):
+                    segms[ind] = segm
+
+            for ind, label in enumerate(img_det_labels.tolist()):
+                segm_result[label].append(segms[ind])
+                if with_mask_iou:
+                    mask_score[label].append(det_mask_scores[ind])
             segm_results.append(segm_result)
             mask_scores.append(mask_score)
-        if hasattr(self, "mask_iou_head"):
+        if with_mask_iou:
             return list(zip(segm_results, mask_scores))
         return segm_results
-    
+
     def simple_test(self, img, img_metas, proposals=None, rescale=False):
         """Test without augmentation."""
         assert self.eval_module in ['detr', 'one-stage', 'two-stage']
@@ -517,6 +623,10 @@ class CoDETR(BaseDetector):
     def aug_test(self, imgs, img_metas, rescale=False):
         """Test function with test time augmentation.
 
+        The detections of the query head are merged across scales and flips
+        as set by `aug_merge` in its test config, see
+        :meth:`CoDeformDETRHead.aug_test_bboxes`.
+
         Args:
             imgs (list[Tensor]): the outer list indicates test-time
                 augmentations and inner Tensor should have a shape NxCxHxW,
@@ -535,6 +645,17 @@ class CoDETR(BaseDetector):
         assert hasattr(self.query_head, 'aug_test'), \
             f'{self.query_head.__class__.__name__}' \
             ' does not support test-time augmentation'
+        assert not hasattr(self, 'mask_head'), \
+            'test-time augmentation of masks is not supported'
+
+        for img, img_meta in zip(imgs, img_metas):
+            batch_input_shape = tuple(img.size()[-2:])
+            for meta in img_meta:
+                meta['batch_input_shape'] = batch_input_shape
+                if not self.with_attn_mask:  # remove attn mask for LSJ
+                    # boxes are mapped back in the unpadded image
+                    meta['unpad_img_shape'] = meta['img_shape']
+                    meta['img_shape'] = [*batch_input_shape, 3]
 
         feats = self.extract_feats(imgs)
         results_list = self.query_head.aug_test(
@@ -546,7 +667,14 @@ class CoDETR(BaseDetector):
         return bbox_results
 
     def onnx_export(self, img, img_metas, with_nms=True):
-        """Test function without test time augmentation.
+        """Test function without test time augmentation for ONNX export.
+
+        The backbone, neck, transformer and top-k post-processing of the
+        query head are exported, NMS and the mask branch are not. The
+        padding masks are all valid and the spatial shapes of the levels are
+        fixed by the traced input shape, so one model is exported per input
+        size bucket and the inputs are padded to it. The batch size may be
+        dynamic.
 
         Args:
             img (torch.Tensor): input images.
@@ -556,25 +684,14 @@ class CoDETR(BaseDetector):
             tuple[Tensor, Tensor]: dets of shape [N, num_det, 5]
                 and class labels of shape [N, num_det].
         """
-        x = self.extract_feat(img)
-        outs = self.query_head.forward_onnx(x, img_metas)[:2]
-        # get origin input shape to support onnx dynamic shape
-
-        # get shape as tensor
+        assert self.with_query_head, \
+            'only CoDETR models with a query head can be exported to ONNX'
+        x = self._extract_feat(img)
+        outs = self.query_head.forward_onnx(x, img_metas)
+        # get shape as tensor to support onnx dynamic shape
         img_shape = torch._shape_as_tensor(img)[2:]
         img_metas[0]['img_shape_for_onnx'] = img_shape
-        # get pad input shape to support onnx dynamic shape for exporting
-        # `CornerNet` and `CentripetalNet`, which 'pad_shape' is used
-        # for inference
         img_metas[0]['pad_shape_for_onnx'] = img_shape
-
-        if len(outs) == 2:
-            # add dummy score_factor
-            outs = (*outs, None)
-        # TODO Can we change to `get_bboxes` when `onnx_export` fail
-        # TODO support NMS
-        # det_bboxes, det_labels = self.query_head.onnx_export(
-        #     *outs, img_metas, with_nms=with_nms)
         det_bboxes, det_labels = self.query_head.onnx_export(*outs, img_metas)
 
         return det_bboxes, det_labels
\ No newline at end of file
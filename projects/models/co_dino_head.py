@@ -50,6 +50,34 @@ class CoDINOHead(CoDeformDETRHead):
             nn.GroupNorm(32, self.embed_dims)
         )
         
+    def set_query_budget(self, num_query=None, num_dec_layers=None):
+        """Set the number of queries and decoder layers used at test time.
+
+        The top `num_query` encoder proposals are decoded by the first
+        `num_dec_layers` decoder layers and the boxes are predicted by the
+        branches of the last layer run. Self-attention in the decoder is
+        quadratic in the number of queries, so scenes with few objects can
+        be decoded with far fewer queries. Training is not affected.
+
+        Args:
+            num_query (int, optional): Number of queries, at most the
+                `num_query` of the head. None to use all queries.
+            num_dec_layers (int, optional): Number of decoder layers, at
+                most the number of layers of the decoder. None to use all
+                layers.
+        """
+        if num_query is not None:
+            assert 0 < num_query <= self.num_query, \
+                f'num_query must be in [1, {self.num_query}]'
+        num_layers = self.transformer.decoder.num_layers
+        if num_dec_layers is not None:
+            assert 0 < num_dec_layers <= num_layers, \
+                f'num_dec_layers must be in [1, {num_layers}]'
+        if self.test_cfg is None:
+            self.test_cfg = dict()
+        self.test_cfg['num_query'] = num_query
+        self.test_cfg['num_dec_layers'] = num_dec_layers
+
     def init_denoising(self, dn_cfg):
         if dn_cfg is not None:
             dn_cfg['num_classes'] = self.num_classes
@@ -87,25 +115,19 @@ class CoDINOHead(CoDeformDETRHead):
                 img_metas,
                 dn_label_query=None,
                 dn_bbox_query=None,
-                attn_mask=None):
-        batch_size = mlvl_feats[0].size(0)
-        input_img_h, input_img_w = img_metas[0]['batch_input_shape']
-        img_masks = mlvl_feats[0].new_ones(
-            (batch_size, input_img_h, input_img_w))
-        for img_id in range(batch_size):
-            img_h, img_w, _ = img_metas[img_id]['img_shape']
-            img_masks[img_id, :img_h, :img_w] = 0
-
-        mlvl_masks = []
-        mlvl_positional_encodings = []
-        for feat in mlvl_feats:
-            mlvl_masks.append(
-                F.interpolate(img_masks[None],
-                              size=feat.shape[-2:]).to(torch.bool).squeeze(0))
-            mlvl_positional_encodings.append(
-                self.positional_encoding(mlvl_masks[-1]))
+                attn_mask=None,
+                last_layer_only=False,
+                return_encoder_output=True):
+        mlvl_masks, mlvl_positional_encodings, spatial_meta = \
+            self.get_spatial_inputs(mlvl_feats, img_metas)
 
         query_embeds = None
+        # test time query budget, see `set_query_budget`
+        budget = dict()
+        if not self.training and self.test_cfg is not None:
+            budget = dict(
+                num_query=self.test_cfg.get('num_query', None),
+                num_dec_layers=self.test_cfg.get('num_dec_layers', None))
         hs, inter_references, topk_score, topk_anchor, enc_outputs = \
             self.transformer(
                 mlvl_feats,
@@ -116,18 +138,24 @@ class CoDINOHead(CoDeformDETRHead):
                 dn_bbox_query,
                 attn_mask,
                 reg_branches=self.reg_branches if self.with_box_refine else None,  # noqa:E501
-                cls_branches=self.cls_branches if self.as_two_stage else None  # noqa:E501
+                cls_branches=self.cls_branches if self.as_two_stage else None,  # noqa:E501
+                spatial_meta=spatial_meta,
+                **budget
             )
-        outs = []
-        num_level = len(mlvl_feats)
-        start = 0
-        for lvl in range(num_level):
-            bs, c, h, w = mlvl_feats[lvl].shape
-            end = start + h*w
-            feat = enc_outputs[start:end].permute(1, 2, 0).contiguous()
-            start = end
-            outs.append(feat.reshape(bs, c, h, w))
-        outs.append(self.downsample(outs[-1]))
+        # rebuild the multi-level encoder feature maps for the auxiliary
+        # heads, skipped when nothing downstream consumes them
+        outs = None
+        if return_encoder_output:
+            outs = []
+            num_level = len(mlvl_feats)
+            start = 0
+            for lvl in range(num_level):
+                bs, c, h, w = mlvl_feats[lvl].shape
+                end = start + h*w
+                feat = enc_outputs[start:end].permute(1, 2, 0).contiguous()
+                start = end
+                outs.append(feat.reshape(bs, c, h, w))
+            outs.append(self.downsample(outs[-1]))
 
         hs = hs.permute(0, 2, 1, 3)
 
@@ -140,7 +168,13 @@ class CoDINOHead(CoDeformDETRHead):
         outputs_classes = []
         outputs_coords = []
 
-        for lvl in range(hs.shape[0]):
+        # The reference points of every layer are refined inside the decoder,
+        # so the branches of the earlier layers can be skipped when only the
+        # last layer is read, e.g. by `get_bboxes` at test time.
+        num_dec_layers = hs.shape[0]
+        dec_layers = [num_dec_layers - 1] if last_layer_only \
+            else range(num_dec_layers)
+        for lvl in dec_layers:
             reference = inter_references[lvl]
             reference = inverse_sigmoid(reference, eps=1e-3)
             outputs_class = self.cls_branches[lvl](hs[lvl])
@@ -0,0 +1,138 @@
+import math
+
+import torch
+import torch.nn.functional as F
+
+
+class TemporalFeatureCache:
+    """Reuse backbone and neck features of unchanged tiles in video streams.
+
+    The input of each frame is compared with the input the cached features
+    were computed from, tile by tile. If no tile changed, the cached
+    multi-level features are returned as is. Otherwise the bounding region
+    of the changed tiles, grown by ``margin`` pixels of context, is run
+    through the backbone and neck and the features of the changed region
+    are pasted into the cache. Every tile is recomputed at least every
+    ``max_staleness`` frames.
+
+    Cropping changes the absolute position of the pixels, so backbones with
+    absolute position embeddings (e.g. ViT) should set
+    ``crop_recompute=False``, which recomputes the whole image if any tile
+    changed.
+
+    Args:
+        tile_size (int): Side of the change detection tiles in input
+            pixels. Must be a multiple of the coarsest feature stride.
+            Default: 128.
+        diff_thr (float): Mean absolute difference of the normalized input
+            above which a tile is changed. Default: 0.05.
+        margin (int): Context in input pixels recomputed around the changed
+            tiles. Must be a multiple of the coarsest feature stride.
+            Default: 128.
+        max_staleness (int): Maximum number of frames the features of a
+            tile are reused. Default: 30.
+        max_crop_ratio (float): Recompute the whole image if the region to
+            recompute covers more than this ratio of it. Default: 0.5.
+        crop_recompute (bool): Whether to recompute only the changed region
+            instead of the whole image. Default: True.
+    """
+
+    def __init__(self,
+                 tile_size=128,
+                 diff_thr=0.05,
+                 margin=128,
+                 max_staleness=30,
+                 max_crop_ratio=0.5,
+                 crop_recompute=True):
+        self.tile_size = tile_size
+        self.diff_thr = diff_thr
+        self.margin = margin
+        self.max_staleness = max_staleness
+        self.max_crop_ratio = max_crop_ratio
+        self.crop_recompute = crop_recompute
+        self.stats = dict(frames=0, reused=0, partial=0, full=0)
+        self.reset()
+
+    def reset(self):
+        """Drop the cached features, e.g. when the stream changes."""
+        self.ref_img = None
+        self.feats = None
+        self.age = None
+
+    def _full(self, img, extract_fn):
+        self.feats = [feat.clone() for feat in extract_fn(img)]
+        self.ref_img = img.clone()
+        h, w = img.shape[-2:]
+        self.age = img.new_zeros(
+            (math.ceil(h / self.tile_size), math.ceil(w / self.tile_size)),
+            dtype=torch.long)
+        self.stats['full'] += 1
+        return list(self.feats)
+
+    def _paste(self, img, extract_fn, y0, y1, x0, x1):
+        """Recompute the features of the input region [y0:y1, x0:x1]."""
+        h, w = img.shape[-2:]
+        crop_y0, crop_x0 = max(y0 - self.margin, 0), max(x0 - self.margin, 0)
+        crop_y1 = min(y1 + self.margin, h)
+        crop_x1 = min(x1 + self.margin, w)
+        crop_feats = extract_fn(img[..., crop_y0:crop_y1, crop_x0:crop_x1])
+        # the features returned for earlier frames are not modified in place
+        self.feats = [feat.clone() for feat in self.feats]
+        for feat, crop_feat in zip(self.feats, crop_feats):
+            stride = 2**round(math.log2(h / feat.shape[-2]))
+            assert self.tile_size % stride == 0 and \
+                self.margin % stride == 0, \
+                'tile_size and margin must be multiples of the feature ' \
+                f'stride {stride}'
+            fy0, fx0 = y0 // stride, x0 // stride
+            fy1 = min(math.ceil(y1 / stride), feat.shape[-2])
+            fx1 = min(math.ceil(x1 / stride), feat.shape[-1])
+            oy, ox = (y0 - crop_y0) // stride, (x0 - crop_x0) // stride
+            fy1 = min(fy1, fy0 + crop_feat.shape[-2] - oy)
+            fx1 = min(fx1, fx0 + crop_feat.shape[-1] - ox)
+            feat[..., fy0:fy1, fx0:fx1] = crop_feat[...,
+                                                    oy:oy + fy1 - fy0,
+                                                    ox:ox + fx1 - fx0]
+        self.ref_img[..., y0:y1, x0:x1] = img[..., y0:y1, x0:x1]
+
+    def __call__(self, img, extract_fn):
+        """Get the multi-level features of a frame.
+
+        Args:
+            img (Tensor): Input of a single frame with shape (1, C, H, W).
+            extract_fn (callable): Function computing the features of an
+                input, e.g. the backbone followed by the neck.
+
+        Returns:
+            list[Tensor]: Multi-level features of the frame.
+        """
+        assert img.size(0) == 1, 'only single frames are supported'
+        self.stats['frames'] += 1
+        if self.feats is None or self.ref_img.shape != img.shape:
+            return self._full(img, extract_fn)
+
+        diff = (img - self.ref_img).abs().mean(dim=1, keepdim=True)
+        diff = F.avg_pool2d(
+            diff, self.tile_size, self.tile_size, ceil_mode=True)[0, 0]
+        self.age += 1
+        changed = (diff > self.diff_thr) | (self.age >= self.max_staleness)
+        if not changed.any():
+            self.stats['reused'] += 1
+            return list(self.feats)
+        if not self.crop_recompute:
+            return self._full(img, extract_fn)
+
+        ys, xs = torch.nonzero(changed, as_tuple=True)
+        ty0, ty1 = int(ys.min()), int(ys.max()) + 1
+        tx0, tx1 = int(xs.min()), int(xs.max()) + 1
+        h, w = img.shape[-2:]
+        y0, y1 = ty0 * self.tile_size, min(ty1 * self.tile_size, h)
+        x0, x1 = tx0 * self.tile_size, min(tx1 * self.tile_size, w)
+        crop_area = (min(y1 + self.margin, h) - max(y0 - self.margin, 0)) * (
+            min(x1 + self.margin, w) - max(x0 - self.margin, 0))
+        if crop_area > self.max_crop_ratio * h * w:
+            return self._full(img, extract_fn)
+        self._paste(img, extract_fn, y0, y1, x0, x1)
+        self.age[ty0:ty1, tx0:tx1] = 0
+        self.stats['partial'] += 1
+        return list(self.feats)
@@ -187,6 +187,40 @@ class CoDeformableDetrTransformer(DeformableDetrTransformer):
                           dim=4).flatten(2)
         return pos
 
+    def get_spatial_meta(self, mlvl_masks):
+        """Get the multi-level geometry shared by the encoder and decoder.
+
+        It only depends on the padding masks, so the heads can cache it per
+        batch shape and pass it back through `spatial_meta`.
+
+        Args:
+            mlvl_masks (list(Tensor)): The key_padding_mask from
+                different level, each element has shape [bs, h, w].
+
+        Returns:
+            dict[str, Tensor]: The flattened `mask_flatten`, \
+                `spatial_shapes`, `level_start_index`, `valid_ratios` \
+                and the encoder `reference_points`.
+        """
+        device = mlvl_masks[0].device
+        mask_flatten = torch.cat([mask.flatten(1) for mask in mlvl_masks], 1)
+        spatial_shapes = torch.as_tensor(
+            [mask.shape[-2:] for mask in mlvl_masks],
+            dtype=torch.long,
+            device=device)
+        level_start_index = torch.cat((spatial_shapes.new_zeros(
+            (1, )), spatial_shapes.prod(1).cumsum(0)[:-1]))
+        valid_ratios = torch.stack(
+            [self.get_valid_ratio(m) for m in mlvl_masks], 1)
+        reference_points = self.get_reference_points(
+            spatial_shapes, valid_ratios, device=device)
+        return dict(
+            mask_flatten=mask_flatten,
+            spatial_shapes=spatial_shapes,
+            level_start_index=level_start_index,
+            valid_ratios=valid_ratios,
+            reference_points=reference_points)
+
     def forward(self,
                 mlvl_feats,
                 mlvl_masks,
@@ -196,6 +230,7 @@ class CoDeformableDetrTransformer(DeformableDetrTransformer):
                 cls_branches=None,
                 return_encoder_output=False,
                 attn_masks=None,
+                spatial_meta=None,
                 **kwargs):
         """Forward function for `Transformer`.
 
@@ -219,7 +254,9 @@ class CoDeformableDetrTransformer(DeformableDetrTransformer):
                 for feature maps from each decoder layer. Only would
                  be passed when `as_two_stage`
                  is True. Default to None.
-
+            spatial_meta (dict, optional): The output of
+                :meth:`get_spatial_meta` for `mlvl_masks`, computed here
+                when not given. Default to None.
 
         Returns:
             tuple[Tensor]: results of decoder containing the following tensor.
@@ -247,36 +284,26 @@ class CoDeformableDetrTransformer(DeformableDetrTransformer):
         """
         assert self.as_two_stage or query_embed is not None
 
+        if spatial_meta is None:
+            spatial_meta = self.get_spatial_meta(mlvl_masks)
+        mask_flatten = spatial_meta['mask_flatten']
+        spatial_shapes = spatial_meta['spatial_shapes']
+        level_start_index = spatial_meta['level_start_index']
+        valid_ratios = spatial_meta['valid_ratios']
+        reference_points = spatial_meta['reference_points']
+
         feat_flatten = []
-        mask_flatten = []
         lvl_pos_embed_flatten = []
-        spatial_shapes = []
-        for lvl, (feat, mask, pos_embed) in enumerate(
-                zip(mlvl_feats, mlvl_masks, mlvl_pos_embeds)):
+        for lvl, (feat, pos_embed) in enumerate(
+                zip(mlvl_feats, mlvl_pos_embeds)):
             bs, c, h, w = feat.shape
-            spatial_shape = (h, w)
-            spatial_shapes.append(spatial_shape)
             feat = feat.flatten(2).transpose(1, 2)
-            mask = mask.flatten(1)
             pos_embed = pos_embed.flatten(2).transpose(1, 2)
             lvl_pos_embed = pos_embed + self.level_embeds[lvl].view(1, 1, -1)
             lvl_pos_embed_flatten.append(lvl_pos_embed)
             feat_flatten.append(feat)
-            mask_flatten.append(mask)
         feat_flatten = torch.cat(feat_flatten, 1)
-        mask_flatten = torch.cat(mask_flatten, 1)
         lvl_pos_embed_flatten = torch.cat(lvl_pos_embed_flatten, 1)
-        spatial_shapes = torch.as_tensor(
-            spatial_shapes, dtype=torch.long, device=feat_flatten.device)
-        level_start_index = torch.cat((spatial_shapes.new_zeros(
-            (1, )), spatial_shapes.prod(1).cumsum(0)[:-1]))
-        valid_ratios = torch.stack(
-            [self.get_valid_ratio(m) for m in mlvl_masks], 1)
-
-        reference_points = \
-            self.get_reference_points(spatial_shapes,
-                                      valid_ratios,
-                                      device=feat.device)
 
         feat_flatten = feat_flatten.permute(1, 0, 2)  # (H*W, bs, embed_dims)
         lvl_pos_embed_flatten = lvl_pos_embed_flatten.permute(
@@ -509,11 +536,19 @@ class DinoTransformerDecoder(DeformableDetrTransformerDecoder):
                 reference_points=None,
                 valid_ratios=None,
                 reg_branches=None,
+                num_layers=None,
                 **kwargs):
+        """Forward function of the decoder.
+
+        Args:
+            num_layers (int, optional): Only run the first `num_layers`
+                layers, e.g. to trade accuracy for latency at test time.
+                Defaults to all layers.
+        """
         output = query
         intermediate = []
         intermediate_reference_points = [reference_points]
-        for lid, layer in enumerate(self.layers):
+        for lid, layer in enumerate(self.layers[:num_layers]):
             if reference_points.shape[-1] == 4:
                 reference_points_input = \
                     reference_points[:, :, None] * torch.cat(
@@ -601,38 +636,48 @@ class CoDinoTransformer(CoDeformableDetrTransformer):
                 attn_mask,
                 reg_branches=None,
                 cls_branches=None,
+                spatial_meta=None,
+                num_query=None,
+                num_dec_layers=None,
                 **kwargs):
+        """Forward function of the Co-DINO transformer.
+
+        `num_query` and `num_dec_layers` lower the number of encoder
+        proposals decoded and the number of decoder layers run, e.g. at test
+        time. The content queries of the top `num_query` proposals are the
+        first `num_query` query embeddings, as in the full model. Both
+        default to the values the model was built with.
+        """
         assert self.as_two_stage and query_embed is None, \
             'as_two_stage must be True for DINO'
+        if num_query is None:
+            num_query = self.two_stage_num_proposals
+        assert 0 < num_query <= self.two_stage_num_proposals, \
+            f'num_query must be in [1, {self.two_stage_num_proposals}]'
+        if num_dec_layers is not None:
+            assert 0 < num_dec_layers <= self.decoder.num_layers, \
+                f'num_dec_layers must be in [1, {self.decoder.num_layers}]'
+
+        if spatial_meta is None:
+            spatial_meta = self.get_spatial_meta(mlvl_masks)
+        mask_flatten = spatial_meta['mask_flatten']
+        spatial_shapes = spatial_meta['spatial_shapes']
+        level_start_index = spatial_meta['level_start_index']
+        valid_ratios = spatial_meta['valid_ratios']
+        reference_points = spatial_meta['reference_points']
 
         feat_flatten = []
-        mask_flatten = []
         lvl_pos_embed_flatten = []
-        spatial_shapes = []
-        for lvl, (feat, mask, pos_embed) in enumerate(
-                zip(mlvl_feats, mlvl_masks, mlvl_pos_embeds)):
+        for lvl, (feat, pos_embed) in enumerate(
+                zip(mlvl_feats, mlvl_pos_embeds)):
             bs, c, h, w = feat.shape
-            spatial_shape = (h, w)
-            spatial_shapes.append(spatial_shape)
             feat = feat.flatten(2).transpose(1, 2)
-            mask = mask.flatten(1)
             pos_embed = pos_embed.flatten(2).transpose(1, 2)
             lvl_pos_embed = pos_embed + self.level_embeds[lvl].view(1, 1, -1)
             lvl_pos_embed_flatten.append(lvl_pos_embed)
             feat_flatten.append(feat)
-            mask_flatten.append(mask)
         feat_flatten = torch.cat(feat_flatten, 1)
-        mask_flatten = torch.cat(mask_flatten, 1)
         lvl_pos_embed_flatten = torch.cat(lvl_pos_embed_flatten, 1)
-        spatial_shapes = torch.as_tensor(
-            spatial_shapes, dtype=torch.long, device=feat_flatten.device)
-        level_start_index = torch.cat((spatial_shapes.new_zeros(
-            (1, )), spatial_shapes.prod(1).cumsum(0)[:-1]))
-        valid_ratios = torch.stack(
-            [self.get_valid_ratio(m) for m in mlvl_masks], 1)
-
-        reference_points = self.get_reference_points(
-            spatial_shapes, valid_ratios, device=feat.device)
 
         feat_flatten = feat_flatten.permute(1, 0, 2)  # (H*W, bs, embed_dims)
         lvl_pos_embed_flatten = lvl_pos_embed_flatten.permute(
@@ -658,7 +703,7 @@ class CoDinoTransformer(CoDeformableDetrTransformer):
         enc_outputs_coord_unact = reg_branches[self.decoder.num_layers](
             output_memory) + output_proposals
         cls_out_features = cls_branches[self.decoder.num_layers].out_features
-        topk = self.two_stage_num_proposals
+        topk = num_query
         # NOTE In DeformDETR, enc_outputs_class[..., 0] is used for topk TODO
         topk_indices = torch.topk(enc_outputs_class.max(-1)[0], topk, dim=1)[1]
 
@@ -671,8 +716,8 @@ class CoDinoTransformer(CoDeformableDetrTransformer):
         topk_anchor = topk_coords_unact.sigmoid()
         topk_coords_unact = topk_coords_unact.detach()
 
-        query = self.query_embed.weight[:, None, :].repeat(1, bs,
-                                                           1).transpose(0, 1)
+        query = self.query_embed.weight[:topk, None, :].repeat(
+            1, bs, 1).transpose(0, 1)
         # NOTE the query_embed here is not spatial query as in DETR.
         # It is actually content query, which is named tgt in other
         # DETR-like models
@@ -698,6 +743,7 @@ class CoDinoTransformer(CoDeformableDetrTransformer):
             level_start_index=level_start_index,
             valid_ratios=valid_ratios,
             reg_branches=reg_branches,
+            num_layers=num_dec_layers,
             **kwargs)
 
         inter_references_out = inter_references
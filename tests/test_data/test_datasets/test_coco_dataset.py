@@ -1,11 +1,16 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+import copy
+import os
 import os.path as osp
 import tempfile
 
 import mmcv
+import numpy as np
 import pytest
 
 from mmdet.datasets import CocoDataset
+from mmdet.datasets.api_wrappers import (COCO, COCOeval, DetArrays,
+                                         FastCOCOeval, FastLVISEval, LazyRLEs)
 
 
 def _create_ids_error_coco_json(json_name):
@@ -56,3 +61,287 @@ def test_coco_annotation_ids_unique():
     # test annotation ids not unique error
     with pytest.raises(AssertionError):
         CocoDataset(ann_file=fake_json_file, classes=('car', ), pipeline=[])
+
+
+def _create_coco_json(json_name):
+    images = [{
+        'id': i + 1,
+        'width': 640,
+        'height': 480,
+        'file_name': f'fake_name_{i}.jpg',
+    } for i in range(3)]
+    annotations = [{
+        'id': 1,
+        'image_id': 1,
+        'category_id': 1,
+        'area': 400,
+        'bbox': [50, 60, 20, 20],
+        'iscrowd': 0,
+        'segmentation': [[50, 60, 70, 60, 70, 80, 50, 80]],
+    }, {
+        'id': 2,
+        'image_id': 1,
+        'category_id': 2,
+        'area': 900,
+        'bbox': [100, 120, 30, 30],
+        'iscrowd': 1,
+        'segmentation': {
+            'counts': [0, 10],
+            'size': [480, 640]
+        },
+    }, {
+        'id': 3,
+        'image_id': 2,
+        'category_id': 2,
+        'area': 0,
+        'bbox': [100, 120, 30.5, 30],
+        'iscrowd': 0,
+    }, {
+        'id': 4,
+        'image_id': 2,
+        'category_id': 1,
+        'area': 300,
+        'bbox': [630, 470, 30.5, 20.5],
+        'iscrowd': 0,
+        'segmentation': [[630, 470, 640, 470, 640, 480]],
+    }]
+    categories = [{
+        'id': 1,
+        'name': 'car',
+        'supercategory': 'car',
+    }, {
+        'id': 2,
+        'name': 'person',
+        'supercategory': 'person',
+    }]
+    mmcv.dump(
+        dict(
+            images=images, annotations=annotations, categories=categories),
+        json_name)
+
+
+def test_coco_ann_cache():
+    tmp_dir = tempfile.TemporaryDirectory()
+    fake_json_file = osp.join(tmp_dir.name, 'fake_data.json')
+    cache_dir = osp.join(tmp_dir.name, 'cache')
+    _create_coco_json(fake_json_file)
+
+    dataset = CocoDataset(
+        ann_file=fake_json_file, classes=('car', 'person'), pipeline=[])
+    # the first load builds the index, the second one loads it
+    cold_dataset = CocoDataset(
+        ann_file=fake_json_file,
+        classes=('car', 'person'),
+        pipeline=[],
+        ann_cache_dir=cache_dir)
+    warm_dataset = CocoDataset(
+        ann_file=fake_json_file,
+        classes=('car', 'person'),
+        pipeline=[],
+        ann_cache_dir=cache_dir)
+    assert warm_dataset._coco is None
+    for cached_dataset in (cold_dataset, warm_dataset):
+        assert cached_dataset.ann_index is not None
+        assert cached_dataset.img_ids == dataset.img_ids == [1, 2]
+        assert cached_dataset.cat_ids == dataset.cat_ids
+        for i in range(len(dataset)):
+            ann_info = dataset.get_ann_info(i)
+            cached_ann_info = cached_dataset.get_ann_info(i)
+            for key in ['bboxes', 'labels', 'bboxes_ignore']:
+                assert cached_ann_info[key].dtype == ann_info[key].dtype
+                np.testing.assert_array_equal(cached_ann_info[key],
+                                              ann_info[key])
+            assert cached_ann_info['masks'] == ann_info['masks']
+            assert cached_ann_info['seg_map'] == ann_info['seg_map']
+            assert cached_dataset.get_cat_ids(i) == dataset.get_cat_ids(i)
+    # the COCO api is loaded on first use
+    assert warm_dataset.coco.get_img_ids() == dataset.coco.get_img_ids()
+
+    # the index is keyed by the classes
+    CocoDataset(
+        ann_file=fake_json_file,
+        classes=('car', ),
+        pipeline=[],
+        ann_cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 2
+
+
+def _create_random_coco(num_imgs=20, num_cats=4, seed=0):
+    rng = np.random.RandomState(seed)
+    images = [dict(id=i + 1, width=200, height=200) for i in range(num_imgs)]
+    categories = [dict(id=2 * i + 1, name=str(i)) for i in range(num_cats)]
+    annotations, dets = [], []
+    for img in images:
+        img_anns = []
+        for _ in range(rng.randint(0, 8)):
+            x, y = rng.uniform(0, 150, 2)
+            # small, medium and large boxes and exact area range bounds
+            w, h = rng.choice([4, 32, 40, 96, rng.uniform(1, 60)], 2)
+            img_anns.append(
+                dict(
+                    id=len(annotations) + len(img_anns) + 1,
+                    image_id=img['id'],
+                    category_id=categories[rng.randint(num_cats)]['id'],
+                    bbox=[x, y, w, h],
+                    area=float(w * h),
+                    iscrowd=int(rng.rand() < 0.1),
+                    segmentation=[[x, y, x + w, y, x + w, y + h, x, y + h]]))
+        annotations.extend(img_anns)
+        for _ in range(rng.randint(0, 15)):
+            if img_anns and rng.rand() < 0.6:
+                ann = img_anns[rng.randint(len(img_anns))]
+                bbox = np.array(ann['bbox']) + rng.normal(0, 1, 4)
+                bbox[2:] = np.abs(bbox[2:]) + 1
+                cat_id = ann['category_id']
+            else:
+                bbox = np.concatenate(
+                    [rng.uniform(0, 150, 2),
+                     rng.uniform(1, 60, 2)])
+                cat_id = categories[rng.randint(num_cats)]['id']
+            if cat_id == categories[-1]['id']:
+                # the last category only has ground truths
+                continue
+            x, y, w, h = bbox.tolist()
+            dets.append(
+                dict(
+                    image_id=img['id'],
+                    category_id=cat_id,
+                    bbox=[x, y, w, h],
+                    # rounded scores to have ties
+                    score=float(np.round(rng.rand(), 1)),
+                    segmentation=[[x, y, x + w, y, x + w, y + h, x, y + h]]))
+    return dict(
+        images=images, annotations=annotations,
+        categories=categories), dets
+
+
+class _RLEList(list):
+
+    def get_rles(self, inds):
+        return [self[i] for i in inds]
+
+
+def _det_arrays(dets, iou_type, ann_to_rle):
+    """The arrays of the detections as loaded by the results api."""
+    bboxes = np.array([det['bbox'] for det in dets])
+    rles = _RLEList(ann_to_rle(det) for det in dets)
+    return DetArrays(
+        img_ids=[det['image_id'] for det in dets],
+        cat_ids=[det['category_id'] for det in dets],
+        scores=[det['score'] for det in dets],
+        # the api uses the box areas of results with boxes
+        areas=bboxes[:, 2] * bboxes[:, 3],
+        bboxes=bboxes,
+        rles=LazyRLEs(rles.get_rles, np.arange(len(dets)))
+        if iou_type == 'segm' else None)
+
+
+@pytest.mark.parametrize('iou_type', ['bbox', 'segm'])
+@pytest.mark.parametrize('max_dets', [[1, 10, 100], [1, 2, 3]])
+def test_fast_coco_eval(iou_type, max_dets):
+    dataset, dets = _create_random_coco()
+    coco_gt = COCO()
+    coco_gt.dataset = dataset
+    coco_gt.createIndex()
+
+    evals = []
+    for eval_cls, kwargs in [(COCOeval, {}), (FastCOCOeval, {}),
+                             (FastCOCOeval, dict(nproc=2, chunk_size=1000))]:
+        coco_dt = coco_gt.loadRes(copy.deepcopy(dets))
+        coco_eval = eval_cls(coco_gt, coco_dt, iou_type, **kwargs)
+        coco_eval.params.maxDets = max_dets
+        coco_eval.evaluate()
+        coco_eval.accumulate()
+        coco_eval.summarize()
+        evals.append(coco_eval)
+    # detections given as arrays
+    for nproc in [1, 2]:
+        coco_eval = FastCOCOeval(
+            coco_gt,
+            _det_arrays(dets, iou_type, coco_gt.annToRLE),
+            iou_type,
+            nproc=nproc)
+        coco_eval.params.maxDets = max_dets
+        coco_eval.evaluate()
+        coco_eval.accumulate()
+        coco_eval.summarize()
+        evals.append(coco_eval)
+
+    coco_eval = evals[0]
+    for fast_eval in evals[1:]:
+        for key in ['precision', 'recall', 'scores']:
+            np.testing.assert_array_equal(fast_eval.eval[key],
+                                          coco_eval.eval[key])
+        np.testing.assert_array_equal(fast_eval.stats, coco_eval.stats)
+
+
+@pytest.mark.parametrize('iou_type', ['bbox', 'segm'])
+def test_fast_lvis_eval(iou_type):
+    lvis = pytest.importorskip('lvis')
+    dataset, dets = _create_random_coco(seed=1)
+    rng = np.random.RandomState(1)
+    cat_ids = [cat['id'] for cat in dataset['categories']]
+    for cat in dataset['categories']:
+        cat['frequency'] = rng.choice(['r', 'c', 'f'])
+    for img in dataset['images']:
+        pos_cat_ids = {
+            ann['category_id']
+            for ann in dataset['annotations'] if ann['image_id'] == img['id']
+        }
+        # detections of the other categories are not evaluated
+        img['neg_category_ids'] = [
+            cat_id for cat_id in cat_ids
+            if cat_id not in pos_cat_ids and rng.rand() < 0.5
+        ]
+        # unmatched detections of these categories are ignored
+        img['not_exhaustive_category_ids'] = [
+            cat_id for cat_id in pos_cat_ids if rng.rand() < 0.3
+        ]
+    for ann in dataset['annotations']:
+        ann['ignore'] = int(rng.rand() < 0.05)
+
+    tmp_dir = tempfile.TemporaryDirectory()
+    ann_file = osp.join(tmp_dir.name, 'lvis.json')
+    mmcv.dump(dataset, ann_file)
+    lvis_gt = lvis.LVIS(ann_file)
+    evals = []
+    for eval_cls, kwargs in [(lvis.LVISEval, {}), (FastLVISEval, {}),
+                             (FastLVISEval, dict(nproc=2, chunk_size=1000))]:
+        lvis_dt = lvis.LVISResults(lvis_gt, copy.deepcopy(dets))
+        lvis_eval = eval_cls(lvis_gt, lvis_dt, iou_type, **kwargs)
+        lvis_eval.run()
+        evals.append(lvis_eval)
+    for nproc in [1, 2]:
+        lvis_dt = _det_arrays(dets, iou_type, lvis_gt.ann_to_rle)
+        lvis_eval = FastLVISEval(
+            lvis_gt, lvis_dt.limit_per_image(300), iou_type, nproc=nproc)
+        lvis_eval.run()
+        evals.append(lvis_eval)
+
+    # the detections of images with more than max_dets are limited and
+    # renumbered like LVISResults does
+    lvis_dt = lvis.LVISResults(lvis_gt, copy.deepcopy(dets), max_dets=5)
+    det_arrays = _det_arrays(dets, iou_type,
+                             lvis_gt.ann_to_rle).limit_per_image(5)
+    anns = lvis_dt.dataset['annotations']
+    assert len(det_arrays) == len(anns) < len(dets)
+    np.testing.assert_array_equal(det_arrays.ids, [ann['id'] for ann in anns])
+    np.testing.assert_array_equal(det_arrays.scores,
+                                  [ann['score'] for ann in anns])
+    np.testing.assert_array_equal(det_arrays.img_ids,
+                                  [ann['image_id'] for ann in anns])
+    tmp_dir.cleanup()
+
+    lvis_eval = evals[0]
+    for fast_eval in evals[1:]:
+        for key in ['precision', 'recall']:
+            np.testing.assert_array_equal(fast_eval.eval[key],
+                                          lvis_eval.eval[key])
+        assert fast_eval.results == lvis_eval.results
+        for k, pointers in lvis_eval.eval['dt_pointers'].items():
+            for a, pointer in pointers.items():
+                fast_pointer = fast_eval.eval['dt_pointers'][k][a]
+                assert pointer.keys() == fast_pointer.keys()
+                for key in pointer:
+                    np.testing.assert_array_equal(fast_pointer[key],
+                                                  pointer[key])
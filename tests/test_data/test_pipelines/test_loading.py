@@ -1,15 +1,17 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import copy
 import os.path as osp
+import tempfile
 
 import mmcv
 import numpy as np
 import pytest
 
 from mmdet.core.mask import BitmapMasks, PolygonMasks
+from mmdet.datasets import ImageShards, ImageShardWriter
 from mmdet.datasets.pipelines import (FilterAnnotations, LoadImageFromFile,
-                                      LoadImageFromWebcam,
-                                      LoadMultiChannelImageFromFiles)
+                                      LoadImageFromShards, LoadImageFromWebcam,
+                                      LoadMultiChannelImageFromFiles, Resize)
 
 
 class TestLoading:
@@ -60,6 +62,97 @@ class TestLoading:
         assert results['img'].shape == (288, 512)
         assert results['img'].dtype == np.uint8
 
+    def test_load_img_decode_scale(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        y, x = np.mgrid[0:1203, 0:1601]
+        img = np.stack([x % 256, y % 256, (x + y) % 256], -1).astype(np.uint8)
+        mmcv.imwrite(img, osp.join(tmp_dir.name, 'large.jpg'))
+        mmcv.imwrite(img, osp.join(tmp_dir.name, 'large.png'))
+
+        cases = [
+            ('large.jpg', (400, 300), (301, 401, 3)),
+            ('large.jpg', (800, 600), (602, 801, 3)),
+            # not twice as large as the largest scale
+            ('large.jpg', [(400, 300), (1000, 700)], (1203, 1601, 3)),
+            # not a JPEG image
+            ('large.png', (400, 300), (1203, 1601, 3))
+        ]
+        for filename, decode_scale, reduced_shape in cases:
+            results = dict(
+                img_prefix=tmp_dir.name, img_info=dict(filename=filename))
+            full_results = LoadImageFromFile()(copy.deepcopy(results))
+            transform = LoadImageFromFile(decode_scale=decode_scale)
+            results = transform(copy.deepcopy(results))
+            assert results['img'].shape == reduced_shape
+            assert results['img_shape'] == reduced_shape
+            assert results['ori_shape'] == (1203, 1601, 3)
+            assert ('decode_scale_factor' in results) == (
+                reduced_shape != (1203, 1601, 3))
+
+            # resized to the size of the full resolution image
+            for keep_ratio in [True, False]:
+                resize = Resize(img_scale=(400, 300), keep_ratio=keep_ratio)
+                resized = resize(copy.deepcopy(results))
+                full_resized = resize(copy.deepcopy(full_results))
+                assert resized['img_shape'] == full_resized['img_shape']
+                np.testing.assert_array_equal(resized['scale_factor'],
+                                              full_resized['scale_factor'])
+                assert 'decode_scale_factor' not in resized
+        assert repr(transform).endswith('decode_scale=[(400, 300)])')
+        tmp_dir.cleanup()
+
+    def test_load_img_from_shards(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        shard_dir = osp.join(tmp_dir.name, 'shards')
+        rng = np.random.RandomState(0)
+        imgs = {
+            f'{i}.png': rng.randint(0, 256, (120 + i, 160 - i, 3), np.uint8)
+            for i in range(4)
+        }
+        for filename, img in imgs.items():
+            mmcv.imwrite(img, osp.join(tmp_dir.name, filename))
+
+        # resize as the test pipeline and write the images to 2 shards
+        load = LoadImageFromFile()
+        resize = Resize(img_scale=(100, 50), keep_ratio=True)
+        writer = ImageShardWriter(shard_dir, shard_size=15000)
+        expected = {}
+        for filename in list(imgs)[:3]:
+            results = dict(
+                img_prefix=tmp_dir.name, img_info=dict(filename=filename))
+            results = resize(load(results))
+            writer.add(filename, results['img'], results['ori_shape'])
+            expected[filename] = results
+        writer.close()
+        shards = ImageShards(shard_dir)
+        assert len(shards) == 3
+        assert '0.png' in shards and '3.png' not in shards
+        assert osp.exists(osp.join(shard_dir, 'images-00001.bin'))
+
+        transform = LoadImageFromShards(shard_dir)
+        for filename, img in imgs.items():
+            results = dict(
+                img_prefix=tmp_dir.name, img_info=dict(filename=filename))
+            results = transform(results)
+            assert results['filename'] == osp.join(tmp_dir.name, filename)
+            assert results['ori_filename'] == filename
+            assert results['ori_shape'] == img.shape
+            if filename not in expected:
+                # loaded from file
+                np.testing.assert_array_equal(results['img'], img)
+                continue
+            shard_img = results['img']
+            assert not shard_img.flags.writeable
+            results = resize(results)
+            # neither copied nor resized again
+            assert results['img'] is shard_img
+            for key in ['img', 'img_shape', 'scale_factor']:
+                np.testing.assert_array_equal(results[key],
+                                              expected[filename][key])
+        assert repr(transform).startswith(
+            f"LoadImageFromShards(shard_dir='{shard_dir}'")
+        tmp_dir.cleanup()
+
     def test_load_multi_channel_img(self):
         results = dict(
             img_prefix=self.data_prefix,
@@ -472,6 +472,63 @@ def test_normalize():
     assert np.allclose(results['img'], converted_img)
 
 
+@pytest.mark.parametrize('pad_cfg', [
+    dict(size_divisor=1),
+    dict(size_divisor=32),
+    dict(size=(1400, 1400)),
+    dict(pad_to_square=True)
+])
+@pytest.mark.parametrize('flip_direction',
+                         [None, 'horizontal', 'vertical', 'diagonal'])
+def test_fused_resize_normalize_pad(pad_cfg, flip_direction):
+    img_norm_cfg = dict(
+        mean=[123.675, 116.28, 103.53],
+        std=[58.395, 57.12, 57.375],
+        to_rgb=True)
+    img = mmcv.imread(
+        osp.join(osp.dirname(__file__), '../../../data/color.jpg'), 'color')
+    results = dict(
+        img=img,
+        img_shape=img.shape,
+        ori_shape=img.shape,
+        img_fields=['img'],
+        scale=(1333, 800),
+        flip=flip_direction is not None,
+        flip_direction=flip_direction)
+
+    transforms = [
+        dict(type='Resize', keep_ratio=True),
+        dict(type='RandomFlip'),
+        dict(type='Normalize', **img_norm_cfg),
+        dict(type='Pad', **pad_cfg),
+        dict(type='ImageToTensor', keys=['img'])
+    ]
+    ref_results = copy.deepcopy(results)
+    for transform in transforms:
+        ref_results = build_from_cfg(transform, PIPELINES)(ref_results)
+
+    transform = dict(
+        type='FusedResizeNormalizePad',
+        keep_ratio=True,
+        **img_norm_cfg,
+        **pad_cfg)
+    transform = build_from_cfg(transform, PIPELINES)
+    fused_results = transform(copy.deepcopy(results))
+
+    assert fused_results['img'].dtype == torch.float32
+    assert fused_results['img'].is_contiguous()
+    assert torch.equal(fused_results['img'], ref_results['img'])
+    assert set(fused_results) == set(ref_results)
+    for key in ['img_shape', 'pad_shape', 'keep_ratio', 'flip',
+                'flip_direction', 'pad_fixed_size', 'pad_size_divisor']:
+        assert fused_results[key] == ref_results[key]
+    np.testing.assert_array_equal(fused_results['scale_factor'],
+                                  ref_results['scale_factor'])
+    for key in ['mean', 'std', 'to_rgb']:
+        np.testing.assert_array_equal(fused_results['img_norm_cfg'][key],
+                                      ref_results['img_norm_cfg'][key])
+
+
 def test_albu_transform():
     results = dict(
         img_prefix=osp.join(osp.dirname(__file__), '../../../data'),
@@ -0,0 +1,164 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import os.path as osp
+import tempfile
+
+import mmcv
+import numpy as np
+import pytest
+
+from mmdet.core import (BaseDetResults, DetResults, DetResultWriter,
+                        ShardedDetResults, encode_mask_results)
+from mmdet.datasets import CocoDataset
+
+
+def _create_dummy_coco_json(json_name):
+    images = [{
+        'id': img_id,
+        'width': 640,
+        'height': 640,
+        'file_name': f'fake_name_{img_id}.jpg'
+    } for img_id in (3, 7)]
+    bboxes = [[50, 60, 20, 20], [100, 120, 30, 30], [250, 260, 100, 100]]
+    annotations = [{
+        'id': i + 1,
+        'image_id': 3 if i < 2 else 7,
+        'category_id': i % 2,
+        'area': bbox[2] * bbox[3],
+        'bbox': bbox,
+        'segmentation': [[
+            bbox[0], bbox[1], bbox[0] + bbox[2], bbox[1],
+            bbox[0] + bbox[2], bbox[1] + bbox[3], bbox[0], bbox[1] + bbox[3]
+        ]],
+        'iscrowd': 0,
+    } for i, bbox in enumerate(bboxes)]
+    categories = [{
+        'id': 0,
+        'name': 'car',
+        'supercategory': 'car'
+    }, {
+        'id': 1,
+        'name': 'person',
+        'supercategory': 'person'
+    }]
+    mmcv.dump(
+        dict(images=images, annotations=annotations, categories=categories),
+        json_name)
+
+
+def _create_dummy_results(with_mask=False):
+    results = [[
+        np.array([[50, 60, 70, 80, 0.9]], dtype=np.float32),
+        np.array([[100, 120, 130, 150, 0.8], [10, 10, 20, 20, 0.1]],
+                 dtype=np.float32)
+    ], [
+        np.array([[250, 260, 350, 360, 0.7]], dtype=np.float32),
+        np.zeros((0, 5), dtype=np.float32)
+    ]]
+    if not with_mask:
+        return results
+    mask_results = []
+    for det in results:
+        masks = []
+        for bboxes in det:
+            label_masks = []
+            for x1, y1, x2, y2, _ in bboxes.astype(int):
+                mask = np.zeros((640, 640), dtype=bool)
+                mask[y1:y2, x1:x2] = True
+                label_masks.append(mask)
+            masks.append(label_masks)
+        mask_results.append((det, encode_mask_results(masks)))
+    return mask_results
+
+
+@pytest.mark.parametrize('with_mask', [False, True])
+def test_det_results(with_mask):
+    tmp_dir = tempfile.TemporaryDirectory()
+    results = _create_dummy_results(with_mask)
+    result_dir = osp.join(tmp_dir.name, 'results')
+    with DetResultWriter(result_dir) as writer:
+        for result in results:
+            writer.add(result)
+
+    det_results = DetResults(result_dir)
+    assert len(det_results) == 2
+    assert det_results.num_dets == 4
+    assert det_results.with_mask == with_mask
+    for result, loaded in zip(results, det_results.to_list()):
+        det = result[0] if with_mask else result
+        loaded_det = loaded[0] if with_mask else loaded
+        for bboxes, loaded_bboxes in zip(det, loaded_det):
+            np.testing.assert_allclose(bboxes, loaded_bboxes)
+        if with_mask:
+            assert loaded[1] == result[1]
+
+    # the streamed results are formatted and evaluated like the list
+    fake_json_file = osp.join(tmp_dir.name, 'fake_data.json')
+    _create_dummy_coco_json(fake_json_file)
+    dataset = CocoDataset(
+        ann_file=fake_json_file, classes=('car', 'person'), pipeline=[])
+    list_files, _ = dataset.format_results(
+        results, osp.join(tmp_dir.name, 'list'))
+    det_files, _ = dataset.format_results(det_results,
+                                          osp.join(tmp_dir.name, 'det'))
+    assert list_files.keys() == det_files.keys()
+    for key in list_files:
+        assert mmcv.load(list_files[key]) == mmcv.load(det_files[key])
+
+    metric = ['bbox', 'segm'] if with_mask else 'bbox'
+    eval_results = dataset.evaluate(results, metric)
+    assert dataset.evaluate(det_results, metric) == eval_results
+    tmp_dir.cleanup()
+
+    # the fast backend evaluates the columns without the json results
+    def results2json(*args):
+        raise AssertionError('the results are dumped to json')
+
+    dataset.results2json = results2json
+    assert dataset.evaluate(det_results, metric, backend='fast') == \
+        eval_results
+
+
+@pytest.mark.parametrize('with_mask', [False, True])
+def test_sharded_det_results(with_mask):
+    tmp_dir = tempfile.TemporaryDirectory()
+    results = _create_dummy_results(with_mask)
+    # images are interleaved over the ranks like in distributed testing
+    world_size = 3
+    result_dirs = []
+    for rank in range(world_size):
+        result_dirs.append(osp.join(tmp_dir.name, f'rank_{rank}'))
+        with DetResultWriter(result_dirs[-1]) as writer:
+            for img_idx in range(rank, len(results), world_size):
+                writer.add(results[img_idx], img_idx)
+
+    det_results = ShardedDetResults(result_dirs)
+    assert isinstance(det_results, BaseDetResults)
+    assert not isinstance(det_results, DetResults)
+    assert len(det_results) == 2
+    assert det_results.num_dets == 4
+    assert det_results.with_mask == with_mask
+    for result, loaded in zip(results, det_results.to_list()):
+        det = result[0] if with_mask else result
+        loaded_det = loaded[0] if with_mask else loaded
+        for bboxes, loaded_bboxes in zip(det, loaded_det):
+            np.testing.assert_allclose(bboxes, loaded_bboxes)
+        if with_mask:
+            assert loaded[1] == result[1]
+
+    fake_json_file = osp.join(tmp_dir.name, 'fake_data.json')
+    _create_dummy_coco_json(fake_json_file)
+    dataset = CocoDataset(
+        ann_file=fake_json_file, classes=('car', 'person'), pipeline=[])
+    list_files, _ = dataset.format_results(
+        results, osp.join(tmp_dir.name, 'list'))
+    det_files, _ = dataset.format_results(det_results,
+                                          osp.join(tmp_dir.name, 'det'))
+    for key in list_files:
+        assert mmcv.load(list_files[key]) == mmcv.load(det_files[key])
+
+    # the shards are reopened in the processes of the fast backend
+    metric = ['bbox', 'segm'] if with_mask else 'bbox'
+    assert dataset.evaluate(
+        det_results, metric, backend='fast',
+        nproc=2) == dataset.evaluate(results, metric)
+    tmp_dir.cleanup()
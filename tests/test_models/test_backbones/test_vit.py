@@ -0,0 +1,99 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import pytest
+import torch
+import torch.nn.functional as F
+
+from mmdet.models.backbones import ViT
+from mmdet.models.backbones.vit import (RopeTableCache, get_abs_pos,
+                                        get_rope, resolve_attn_backend)
+
+
+def _small_vit(**kwargs):
+    return ViT(
+        img_size=64,
+        pretrain_img_size=32,
+        patch_size=16,
+        embed_dim=128,
+        depth=2,
+        num_heads=2,
+        window_size=2,
+        window_block_indexes=[0],
+        **kwargs)
+
+
+def test_vit_attn_backend():
+    with pytest.raises(ValueError):
+        resolve_attn_backend('flash')
+    assert resolve_attn_backend('naive') == 'naive'
+
+    imgs = torch.randn(1, 3, 64, 96)
+    model = _small_vit(attn_backend='naive')
+    model.eval()
+    with torch.no_grad():
+        feat = model(imgs)[0]
+    assert feat.shape == (1, 128, 4, 6)
+
+    if not hasattr(F, 'scaled_dot_product_attention'):
+        return
+    sdpa_model = _small_vit(attn_backend='sdpa')
+    sdpa_model.load_state_dict(model.state_dict())
+    sdpa_model.eval()
+    with torch.no_grad():
+        sdpa_feat = sdpa_model(imgs)[0]
+    assert all(blk.attn.attn_backend == 'sdpa' for blk in sdpa_model.blocks)
+    assert torch.allclose(feat, sdpa_feat, atol=1e-5)
+
+
+def test_rope_table_cache():
+    cache = RopeTableCache(max_size=2)
+    t = torch.randn(2, 4 * 6, 64)
+    assert torch.allclose(cache(t, 4, 6), get_rope(t, 4, 6))
+    tables = cache.get(4, 6, t.device)
+    assert cache.get(4, 6, t.device) is tables
+    # the least recently used grid size is dropped
+    cache.get(6, 4, t.device)
+    cache.get(4, 6, t.device)
+    cache.get(2, 2, t.device)
+    assert list(cache.tables) == [(4, 6, t.device), (2, 2, t.device)]
+    cache.clear()
+    assert len(cache.tables) == 0
+
+    # the global blocks of a ViT share one table per grid size
+    model = _small_vit(attn_backend='naive')
+    assert all(blk.attn.rope_cache is model.rope_cache
+               for blk in model.blocks)
+    model(torch.randn(1, 3, 64, 96))
+    assert len(model.rope_cache.tables) == 1
+    model(torch.randn(1, 3, 96, 64))
+    assert len(model.rope_cache.tables) == 2
+
+
+def test_vit_abs_pos_cache():
+    model = _small_vit(attn_backend='naive', abs_pos_cache_size=1)
+    imgs = torch.randn(1, 3, 64, 96)
+
+    # training keeps the uncached path
+    model(imgs)
+    assert len(model._abs_pos_cache) == 0
+
+    model.eval()
+    with torch.no_grad():
+        feat = model(imgs)[0]
+        assert len(model._abs_pos_cache) == 1
+        abs_pos = model._get_abs_pos((4, 6))
+        assert model._get_abs_pos((4, 6)) is abs_pos
+        assert torch.equal(
+            abs_pos,
+            get_abs_pos(model.pos_embed, model.pretrain_use_cls_token,
+                        (4, 6)))
+        assert torch.allclose(model(imgs)[0], feat)
+        model(torch.randn(1, 3, 96, 64))
+    # bounded by abs_pos_cache_size
+    assert len(model._abs_pos_cache) == 1
+
+    model.load_state_dict(model.state_dict())
+    assert len(model._abs_pos_cache) == 0
+    with torch.no_grad():
+        model(imgs)
+    model.train()
+    assert len(model._abs_pos_cache) == 0
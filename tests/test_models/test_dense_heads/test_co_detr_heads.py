@@ -0,0 +1,665 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import numpy as np
+import pytest
+import torch
+from mmcv import ConfigDict
+
+from mmdet.core import BoxMask
+from mmdet.models import build_detector, build_head
+from projects import *  # noqa: F401,F403
+
+
+def _decoder_layer_cfg(num_levels):
+    return dict(
+        type='DetrTransformerDecoderLayer',
+        attn_cfgs=[
+            dict(
+                type='MultiheadAttention',
+                embed_dims=256,
+                num_heads=8,
+                dropout=0.0),
+            dict(
+                type='MultiScaleDeformableAttention',
+                embed_dims=256,
+                num_levels=num_levels,
+                dropout=0.0)
+        ],
+        feedforward_channels=256,
+        ffn_dropout=0.0,
+        operation_order=('self_attn', 'norm', 'cross_attn', 'norm', 'ffn',
+                         'norm'))
+
+
+def _encoder_cfg(num_levels):
+    return dict(
+        type='DetrTransformerEncoder',
+        num_layers=1,
+        transformerlayers=dict(
+            type='BaseTransformerLayer',
+            attn_cfgs=dict(
+                type='MultiScaleDeformableAttention',
+                embed_dims=256,
+                num_levels=num_levels,
+                dropout=0.0),
+            feedforward_channels=256,
+            ffn_dropout=0.0,
+            operation_order=('self_attn', 'norm', 'ffn', 'norm')))
+
+
+def _co_dino_head_cfg(num_levels=2):
+    return ConfigDict(
+        type='CoDINOHead',
+        num_query=30,
+        num_classes=4,
+        in_channels=256,
+        as_two_stage=True,
+        with_box_refine=True,
+        mixed_selection=True,
+        dn_cfg=dict(
+            type='CdnQueryGenerator',
+            noise_scale=dict(label=0.5, box=1.0),
+            group_cfg=dict(dynamic=True, num_groups=None, num_dn_queries=10)),
+        transformer=dict(
+            type='CoDinoTransformer',
+            with_coord_feat=False,
+            num_co_heads=2,
+            num_feature_levels=num_levels,
+            encoder=_encoder_cfg(num_levels),
+            decoder=dict(
+                type='DinoTransformerDecoder',
+                num_layers=3,
+                return_intermediate=True,
+                transformerlayers=_decoder_layer_cfg(num_levels))),
+        positional_encoding=dict(
+            type='SinePositionalEncoding',
+            num_feats=128,
+            temperature=20,
+            normalize=True),
+        loss_cls=dict(
+            type='QualityFocalLoss',
+            use_sigmoid=True,
+            beta=2.0,
+            loss_weight=1.0),
+        test_cfg=dict(max_per_img=10))
+
+
+def _co_deform_detr_head_cfg(num_levels=4):
+    return ConfigDict(
+        type='CoDeformDETRHead',
+        num_query=30,
+        num_classes=4,
+        in_channels=256,
+        with_box_refine=True,
+        as_two_stage=True,
+        mixed_selection=True,
+        transformer=dict(
+            type='CoDeformableDetrTransformer',
+            num_co_heads=2,
+            num_feature_levels=num_levels,
+            encoder=_encoder_cfg(num_levels),
+            decoder=dict(
+                type='CoDeformableDetrTransformerDecoder',
+                num_layers=3,
+                return_intermediate=True,
+                look_forward_twice=True,
+                transformerlayers=_decoder_layer_cfg(num_levels))),
+        positional_encoding=dict(
+            type='SinePositionalEncoding',
+            num_feats=128,
+            normalize=True,
+            offset=-0.5),
+        loss_cls=dict(
+            type='FocalLoss',
+            use_sigmoid=True,
+            gamma=2.0,
+            alpha=0.25,
+            loss_weight=2.0),
+        test_cfg=dict(max_per_img=10))
+
+
+def _check_last_layer_only(head, num_levels):
+    s = 64
+    img_metas = [{
+        'img_shape': (s, s - 8, 3),
+        'scale_factor': 1,
+        'pad_shape': (s, s, 3),
+        'batch_input_shape': (s, s)
+    }, {
+        'img_shape': (s, s, 3),
+        'scale_factor': 1,
+        'pad_shape': (s, s, 3),
+        'batch_input_shape': (s, s)
+    }]
+    feats = [
+        torch.rand(2, 256, s // 2**(i + 3), s // 2**(i + 3))
+        for i in range(num_levels)
+    ]
+    head.init_weights()
+    head.eval()
+    with torch.no_grad():
+        outs = head(feats, img_metas)
+        last_outs = head(feats, img_metas, last_layer_only=True)
+        results = head.get_bboxes(*outs, img_metas)
+        last_results = head.get_bboxes(*last_outs, img_metas)
+        no_enc_outs = head(
+            feats,
+            img_metas,
+            last_layer_only=True,
+            return_encoder_output=False)
+
+    all_cls_scores, all_bbox_preds = outs[:2]
+    last_cls_scores, last_bbox_preds = last_outs[:2]
+    assert last_cls_scores.shape[0] == 1 and last_bbox_preds.shape[0] == 1
+    assert torch.allclose(all_cls_scores[-1], last_cls_scores[0])
+    assert torch.allclose(all_bbox_preds[-1], last_bbox_preds[0])
+    # the encoder feature maps are only rebuilt when requested
+    assert len(outs[-1]) == num_levels + 1
+    assert no_enc_outs[-1] is None
+    assert torch.allclose(no_enc_outs[0], last_cls_scores)
+    for (bboxes, labels), (last_bboxes, last_labels) in zip(
+            results, last_results):
+        assert torch.allclose(bboxes, last_bboxes)
+        assert torch.equal(labels, last_labels)
+
+
+def test_co_dino_head_last_layer_only():
+    """Tests that last-layer-only test outputs match the full forward."""
+    head = build_head(_co_dino_head_cfg(num_levels=2))
+    _check_last_layer_only(head, num_levels=2)
+
+
+def test_co_deform_detr_head_last_layer_only():
+    """Tests that last-layer-only test outputs match the full forward."""
+    head = build_head(_co_deform_detr_head_cfg(num_levels=4))
+    _check_last_layer_only(head, num_levels=4)
+
+
+def test_co_detr_head_spatial_cache():
+    """Tests the per batch shape cache of masks and level geometry."""
+    head = build_head(_co_dino_head_cfg(num_levels=2))
+    head.init_weights()
+    s = 64
+    img_metas = [{
+        'img_shape': (s, s - 8, 3),
+        'scale_factor': 1,
+        'pad_shape': (s, s, 3),
+        'batch_input_shape': (s, s)
+    }]
+    feats = [torch.rand(1, 256, s // 8, s // 8), torch.rand(1, 256, 4, 4)]
+
+    head.get_spatial_inputs(feats, img_metas)
+    assert len(head._spatial_cache) == 0
+
+    head.eval()
+    with torch.no_grad():
+        outs = head(feats, img_metas)
+        assert len(head._spatial_cache) == 1
+        cached_outs = head(feats, img_metas)
+        assert len(head._spatial_cache) == 1
+        for i in range(head.spatial_cache_size + 1):
+            head.get_spatial_inputs(
+                feats, [dict(img_metas[0], img_shape=(s - i, s, 3))])
+    assert len(head._spatial_cache) == head.spatial_cache_size
+    assert torch.allclose(outs[0], cached_outs[0])
+    assert torch.allclose(outs[1], cached_outs[1])
+
+    masks, _, spatial_meta = head.get_spatial_inputs(feats, img_metas)
+    assert spatial_meta['spatial_shapes'].tolist() == [[8, 8], [4, 4]]
+    assert spatial_meta['mask_flatten'].shape == (1, 80)
+    assert masks[0][0, :, -1].all()
+
+    head.train()
+    assert len(head._spatial_cache) == 0
+
+
+def test_co_dino_head_query_budget():
+    """Tests decoding fewer queries with fewer decoder layers at test time."""
+    head = build_head(_co_dino_head_cfg(num_levels=2))
+    head.init_weights()
+    s = 64
+    img_metas = [{
+        'img_shape': (s, s, 3),
+        'scale_factor': 1,
+        'pad_shape': (s, s, 3),
+        'batch_input_shape': (s, s)
+    }]
+    feats = [torch.rand(1, 256, s // 8, s // 8), torch.rand(1, 256, 4, 4)]
+
+    head.eval()
+    with torch.no_grad():
+        outs = head(feats, img_metas)
+        head.set_query_budget(num_query=5, num_dec_layers=2)
+        budget_outs = head(feats, img_metas)
+        results = head.get_bboxes(*budget_outs, img_metas)
+    cls_scores, bbox_preds = budget_outs[:2]
+    assert cls_scores.shape == (2, 1, 5, 4)
+    assert bbox_preds.shape == (2, 1, 5, 4)
+    # the proposals are ranked before the decoder, so the reference points
+    # of the kept queries are the top ones of the full model
+    assert torch.allclose(outs[3][:, :5], budget_outs[3])
+    assert results[0][0].shape == (10, 5)
+
+    # training always uses all queries and layers
+    head.train()
+    assert head(feats, img_metas)[0].shape == (3, 1, 30, 4)
+    head.set_query_budget()
+    head.eval()
+    with torch.no_grad():
+        assert head(feats, img_metas)[0].shape == (3, 1, 30, 4)
+
+
+def test_co_detr_head_aug_test():
+    """Tests merging the detections of flipped and rescaled inputs."""
+    head = build_head(_co_dino_head_cfg(num_levels=2))
+    head.init_weights()
+    head.eval()
+    s = 64
+    img_metas = []
+    for scale, flip in [(1., False), (1., True), (0.5, False)]:
+        size = int(s * scale)
+        img_metas.append([{
+            'img_shape': (size, size, 3),
+            'scale_factor': np.array([scale] * 4, dtype=np.float32),
+            'pad_shape': (size, size, 3),
+            'batch_input_shape': (size, size),
+            'flip': flip,
+            'flip_direction': 'horizontal'
+        }])
+    feats = [[
+        torch.rand(1, 256, meta[0]['img_shape'][0] // 8,
+                   meta[0]['img_shape'][0] // 8),
+        torch.rand(1, 256, 4, 4)
+    ] for meta in img_metas]
+
+    with torch.no_grad():
+        # the unflipped and flipped views share a forward
+        det_bboxes, det_labels = head.aug_test(
+            feats, img_metas, rescale=True)[0]
+        single_results = head.simple_test_bboxes(
+            feats[0], img_metas[0], rescale=True)
+    assert det_bboxes.size(1) == 5
+    assert len(det_bboxes) == len(det_labels) <= 10
+    assert (det_bboxes[:, :4] >= 0).all()
+    assert (det_bboxes[:, [0, 2]] <= s).all()
+    # a single augmentation merged by NMS keeps its top detection
+    head.test_cfg['aug_merge'] = dict(type='nms', iou_threshold=0.6)
+    with torch.no_grad():
+        det_bboxes, _ = head.aug_test(feats[:1], img_metas[:1])[0]
+    assert torch.allclose(det_bboxes[0], single_results[0][0][0])
+
+    head.test_cfg['aug_merge'] = dict(type='wbf', iou_thr=0.55)
+    with torch.no_grad():
+        det_bboxes, det_labels = head.aug_test(feats, img_metas)[0]
+    assert det_bboxes.size(1) == 5
+    assert len(det_bboxes) == len(det_labels) <= 10
+
+
+def test_co_detr_head_forward_onnx(monkeypatch):
+    """Tests the ONNX forward against the test forward of unpadded inputs."""
+    s = 64
+    img_metas = [{
+        'img_shape': (s, s, 3),
+        'scale_factor': 1,
+        'pad_shape': (s, s, 3),
+        'batch_input_shape': (s, s)
+    }] * 2
+    for cfg, num_levels in [(_co_dino_head_cfg(), 2),
+                            (_co_deform_detr_head_cfg(), 4)]:
+        head = build_head(cfg)
+        head.init_weights()
+        head.eval()
+        feats = [
+            torch.rand(2, 256, s // 2**(i + 3), s // 2**(i + 3))
+            for i in range(num_levels)
+        ]
+        with torch.no_grad():
+            outs = head(feats, img_metas, last_layer_only=True)
+            head._spatial_cache.clear()
+            monkeypatch.setattr(torch.onnx, 'is_in_onnx_export',
+                                lambda: True)
+            onnx_outs = head.forward_onnx(feats, img_metas)
+            monkeypatch.undo()
+        assert len(onnx_outs[0]) == 1 and len(onnx_outs[1]) == 1
+        assert torch.allclose(outs[0], onnx_outs[0][0], atol=1e-5)
+        assert torch.allclose(outs[1], onnx_outs[1][0], atol=1e-5)
+        # nothing is cached while exporting
+        assert len(head._spatial_cache) == 0
+
+
+class _ImgMetasWrapper(torch.nn.Module):
+    """Bind the img_metas of a detector for ``torch.onnx.export``.
+
+    The exporter appends the defaults of the ``forward`` signature to the
+    traced inputs, so the img_metas are not bound with ``partial``.
+    """
+
+    def __init__(self, model, img_metas):
+        super().__init__()
+        self.model = model
+        self.img_metas = img_metas
+
+    def forward(self, img):
+        return self.model([img], img_metas=[self.img_metas], return_loss=False)
+
+
+def test_co_dino_onnx_export(tmp_path, monkeypatch):
+    """Tests a dynamic batch ONNX export of a tiny Co-DINO."""
+    pytest.importorskip('onnx')
+    ort = pytest.importorskip('onnxruntime')
+    from mmdet import digit_version
+
+    model = build_detector(
+        ConfigDict(
+            type='CoDETR',
+            backbone=dict(
+                type='ResNet',
+                depth=18,
+                num_stages=2,
+                strides=(1, 2),
+                dilations=(1, 1),
+                out_indices=(0, 1)),
+            neck=dict(
+                type='ChannelMapper',
+                in_channels=[64, 128],
+                kernel_size=1,
+                out_channels=256,
+                num_outs=2),
+            query_head=_co_dino_head_cfg(),
+            test_cfg=[dict(max_per_img=10)]))
+    model.init_weights()
+    model.eval()
+    s = 64
+    img_metas = [{
+        'img_shape': (s, s, 3),
+        'ori_shape': (s, s, 3),
+        'pad_shape': (s, s, 3),
+        'scale_factor': 1.0,
+        'batch_input_shape': (s, s)
+    }]
+    torch.manual_seed(0)
+    imgs = torch.rand(2, 3, s, s)
+
+    output_file = str(tmp_path / 'co_dino.onnx')
+    export_kwargs = dict()
+    if digit_version(torch.__version__) >= digit_version('2.9.0'):
+        # the TorchScript exporter of tools/deployment/pytorch2onnx.py
+        export_kwargs['dynamo'] = False
+    with torch.no_grad():
+        # traced with one image, the batch size is dynamic like with
+        # pytorch2onnx.py --dynamic-batch
+        torch.onnx.export(
+            _ImgMetasWrapper(model, img_metas),
+            imgs[:1],
+            output_file,
+            input_names=['input'],
+            output_names=['dets', 'labels'],
+            do_constant_folding=True,
+            opset_version=16,
+            dynamic_axes={
+                name: {
+                    0: 'batch'
+                }
+                for name in ['input', 'dets', 'labels']
+            },
+            **export_kwargs)
+    sess = ort.InferenceSession(output_file)
+    dets, labels = sess.run(None, {'input': imgs.numpy()})
+
+    monkeypatch.setattr(torch.onnx, 'is_in_onnx_export', lambda: True)
+    with torch.no_grad():
+        torch_dets, torch_labels = model.onnx_export(imgs, img_metas)
+    assert dets.shape == (2, 10, 5) and labels.shape == (2, 10)
+    np.testing.assert_allclose(dets, torch_dets.numpy(), atol=1e-4)
+    np.testing.assert_array_equal(labels, torch_labels.numpy())
+
+
+def test_temporal_feature_cache():
+    from projects.models import TemporalFeatureCache
+
+    torch.manual_seed(0)
+    convs = torch.nn.Sequential(*[
+        torch.nn.Conv2d(3 if i == 0 else 4, 4, 3, 2, 1) for i in range(4)
+    ])
+
+    def extract_fn(img):
+        outs = []
+        for conv in convs:
+            img = conv(img)
+            outs.append(img)
+        return outs[1:]
+
+    cache = TemporalFeatureCache(
+        tile_size=64, margin=64, diff_thr=0.01, max_staleness=3)
+    img = torch.randn(1, 3, 512, 512)
+    with torch.no_grad():
+        cache(img, extract_fn)
+        reused_feats = cache(img.clone(), extract_fn)
+        assert cache.stats['reused'] == 1
+        assert all(
+            torch.equal(feat, ref)
+            for feat, ref in zip(reused_feats, extract_fn(img)))
+        ref_feats = [feat.clone() for feat in reused_feats]
+
+        # only the changed region is recomputed
+        changed = img.clone()
+        changed[..., 200:230, 300:320] += 1
+        feats = cache(changed, extract_fn)
+        assert cache.stats['partial'] == 1
+        # the features returned for the previous frame are left untouched
+        assert all(
+            torch.equal(feat, ref)
+            for feat, ref in zip(reused_feats, ref_feats))
+        for feat, ref in zip(feats, extract_fn(changed)):
+            stride = 512 // feat.shape[-1]
+            region = (..., slice(192 // stride, 256 // stride),
+                      slice(256 // stride, 320 // stride))
+            assert torch.allclose(feat[region], ref[region], atol=1e-6)
+
+        # stale tiles are recomputed
+        cache(changed, extract_fn)
+        assert cache.stats['full'] == 2
+
+
+def _co_detr_mask_cfg():
+    return ConfigDict(
+        type='CoDETR',
+        backbone=dict(
+            type='ResNet',
+            depth=18,
+            num_stages=1,
+            strides=(1, ),
+            dilations=(1, ),
+            out_indices=(0, )),
+        mask_roi_extractor=dict(
+            type='SingleRoIExtractor',
+            roi_layer=dict(
+                type='RoIAlign', output_size=14, sampling_ratio=0),
+            out_channels=16,
+            featmap_strides=[4, 8],
+            finest_scale=56),
+        mask_head=dict(
+            type='SimpleRefineMaskHead',
+            num_convs_instance=1,
+            num_convs_semantic=1,
+            conv_in_channels_instance=16,
+            conv_in_channels_semantic=16,
+            conv_out_channels_instance=16,
+            conv_out_channels_semantic=16,
+            norm_cfg=dict(type='LN2d'),
+            stage_num_classes=[4, 4, 4, 1],
+            stage_sup_size=[14, 28, 56, 112]),
+        mask_iou_head=dict(
+            type='MaskIoUHead',
+            num_convs=1,
+            num_fcs=1,
+            roi_feat_size=14,
+            in_channels=16,
+            conv_out_channels=16,
+            fc_out_channels=32,
+            num_classes=4,
+            score_use_sigmoid=True,
+            norm_cfg=dict(type='LN2d')),
+        test_cfg=[dict(mask_thr_binary=0.5)])
+
+
+def _mask_test_inputs(num_imgs=1):
+    torch.manual_seed(0)
+    x = [torch.rand(num_imgs, 16, 16, 16), torch.rand(num_imgs, 16, 8, 8)]
+    img_metas = [dict(ori_shape=(64, 64, 3), scale_factor=1.0)] * num_imgs
+    det_bboxes, det_labels = [], []
+    for _ in range(num_imgs):
+        xy = torch.rand(6, 2) * 32
+        wh = torch.rand(6, 2) * 24 + 8
+        scores = torch.tensor([0.9, 0.2, 0.6, 0.4, 0.8, 0.1])
+        det_bboxes.append(torch.cat([xy, xy + wh, scores[:, None]], dim=1))
+        det_labels.append(torch.tensor([0, 1, 0, 2, 1, 0]))
+    return x, img_metas, det_bboxes, det_labels
+
+
+def _det_masks(result, labels):
+    """Masks and mask scores of an image in the order of its detections."""
+    segm_result, mask_score = result
+    counts = [0] * len(segm_result)
+    masks, scores = [], []
+    for label in labels.tolist():
+        masks.append(np.asarray(segm_result[label][counts[label]]))
+        scores.append(mask_score[label][counts[label]])
+        counts[label] += 1
+    return masks, scores
+
+
+def test_co_detr_mask_gating():
+    detector = build_detector(_co_detr_mask_cfg())
+    detector.eval()
+    x, img_metas, det_bboxes, det_labels = _mask_test_inputs()
+    scores = det_bboxes[0][:, 4]
+
+    # uint8 probabilities instead of binary masks
+    detector.rcnn_test_cfg = ConfigDict(mask_thr_binary=-1)
+    assert detector._get_mask_inds(scores).tolist() == list(range(6))
+    with torch.no_grad():
+        results = detector.simple_test_mask(x, img_metas, det_bboxes,
+                                            det_labels)
+    masks, mask_scores = _det_masks(results[0], det_labels[0])
+    assert all(mask.any() for mask in masks)
+
+    detector.rcnn_test_cfg = ConfigDict(mask_thr_binary=-1, mask_score_thr=0.3)
+    assert detector._get_mask_inds(scores).tolist() == [0, 2, 3, 4]
+    detector.rcnn_test_cfg = ConfigDict(mask_thr_binary=-1, mask_topk=3)
+    assert detector._get_mask_inds(scores).tolist() == [0, 2, 4]
+    detector.rcnn_test_cfg = ConfigDict(
+        mask_thr_binary=-1, mask_score_thr=0.3, mask_topk=2)
+    assert detector._get_mask_inds(scores).tolist() == [0, 4]
+    with torch.no_grad():
+        gated = detector.simple_test_mask(x, img_metas, det_bboxes,
+                                          det_labels)
+    assert [len(segms) for segms in gated[0][0]] == \
+        [len(segms) for segms in results[0][0]]
+    gated_masks, gated_scores = _det_masks(gated[0], det_labels[0])
+    for i in range(6):
+        if i in (0, 4):
+            np.testing.assert_allclose(gated_masks[i], masks[i], atol=1)
+            assert gated_scores[i] == pytest.approx(mask_scores[i], abs=1e-5)
+        else:
+            # skipped detections keep their place with empty masks
+            assert gated_masks[i].shape == (64, 64)
+            assert not gated_masks[i].any()
+            assert gated_scores[i] == 0
+
+
+def test_co_detr_mask_chunks():
+    detector = build_detector(_co_detr_mask_cfg())
+    detector.eval()
+    x, img_metas, det_bboxes, det_labels = _mask_test_inputs(num_imgs=2)
+
+    detector.rcnn_test_cfg = ConfigDict(mask_thr_binary=-1)
+    assert detector._get_mask_chunk_size(torch.device('cpu')) == 150
+    with torch.no_grad():
+        results = detector.simple_test_mask(x, img_metas, det_bboxes,
+                                            det_labels)
+        # the RoIs of the second image use its own features
+        single = detector.simple_test_mask([feat[1:] for feat in x],
+                                           img_metas[1:], det_bboxes[1:],
+                                           det_labels[1:])
+    for mask, single_mask in zip(
+            _det_masks(results[1], det_labels[1])[0],
+            _det_masks(single[0], det_labels[1])[0]):
+        np.testing.assert_allclose(mask, single_mask, atol=1)
+
+    for chunk_size in [1, 4]:
+        detector.rcnn_test_cfg = ConfigDict(
+            mask_thr_binary=-1, mask_chunk_size=chunk_size)
+        assert detector._get_mask_chunk_size(
+            torch.device('cpu')) == chunk_size
+        with torch.no_grad():
+            chunked = detector.simple_test_mask(x, img_metas, det_bboxes,
+                                                det_labels)
+        for result, chunked_result, labels in zip(results, chunked,
+                                                  det_labels):
+            masks, mask_scores = _det_masks(result, labels)
+            chunked_masks, chunked_scores = _det_masks(chunked_result, labels)
+            for mask, chunked_mask in zip(masks, chunked_masks):
+                np.testing.assert_allclose(chunked_mask, mask, atol=1)
+            np.testing.assert_allclose(
+                chunked_scores, mask_scores, rtol=1e-5, atol=1e-6)
+
+
+def test_simple_refine_mask_head_empty_masks():
+    mask_head = build_head(_co_detr_mask_cfg().mask_head)
+    masks = mask_head.get_empty_masks(2, ConfigDict(), (30, 40, 3), 2.0,
+                                      False)
+    assert len(masks) == 2
+    for mask in masks:
+        assert isinstance(mask, BoxMask)
+        assert mask.shape == (60, 80)
+        assert not np.asarray(mask).any()
+    masks = mask_head.get_empty_masks(2, ConfigDict(box_masks=False),
+                                      (30, 40, 3), 2.0, True)
+    assert len(masks) == 2
+    for mask in masks:
+        assert mask.shape == (30, 40) and mask.dtype == bool
+        assert not mask.any()
+    assert mask_head.get_empty_masks(0, ConfigDict(), (30, 40, 3), 1.0,
+                                     True) == []
+
+    # four maps per stage, the channels are halved from stage to stage
+    num_floats = 4 * (16 * 14**2 + 8 * 28**2 + 4 * 56**2 + 2 * 112**2)
+    assert mask_head.get_roi_memory() == num_floats * 4
+
+
+@pytest.mark.parametrize('threshold', [0.5, -1])
+def test_paste_box_masks(threshold):
+    from mmdet.models.roi_heads.mask_heads.fcn_mask_head import \
+        _do_paste_mask
+    from mmdet.models.roi_heads.mask_heads.refine_mask_head import \
+        _paste_box_masks
+    rng = np.random.RandomState(0)
+    xy = rng.uniform(-2, 75, (40, 2))
+    wh = rng.uniform(1, 40, (40, 2)) * rng.choice([0.25, 1, 3], (40, 1))
+    bboxes = torch.tensor(np.concatenate([xy, xy + wh], axis=1),
+                          dtype=torch.float32)
+    # a box without width and one outside the image
+    bboxes[-2, 2] = bboxes[-2, 0]
+    bboxes[-1] = torch.tensor([120, 10, 130, 20])
+    mask_pred = torch.rand(40, 1, 28, 28)
+
+    masks = _paste_box_masks(mask_pred, bboxes, 80, 100, threshold)
+    assert _paste_box_masks(mask_pred[:0], bboxes[:0], 80, 100,
+                            threshold) == []
+    assert len(masks) == 40
+    for i, mask in enumerate(masks):
+        assert isinstance(mask, BoxMask) and mask.shape == (80, 100)
+        if i == len(masks) - 1:
+            assert not np.asarray(mask).any()
+            continue
+        # pasted one by one
+        region_mask, (y_slice, x_slice) = _do_paste_mask(
+            mask_pred[i:i + 1], bboxes[i:i + 1], 80, 100, skip_empty=True)
+        region_mask = region_mask[0]
+        if threshold >= 0:
+            region_mask = region_mask >= threshold
+        else:
+            region_mask = (region_mask * 255).to(dtype=torch.uint8)
+        expected = np.zeros((80, 100), dtype=region_mask.numpy().dtype)
+        expected[y_slice, x_slice] = region_mask.numpy()
+        np.testing.assert_array_equal(np.asarray(mask), expected)
@@ -1,6 +1,7 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 """pytest tests/test_forward.py."""
 import copy
+import threading
 from os.path import dirname, exists, join
 
 import numpy as np
@@ -673,6 +674,177 @@ def test_inference_detector():
     assert len(result) == 2 and len(result[0]) == num_class
 
 
+def _small_retinanet(num_class):
+    from mmcv import ConfigDict
+
+    from mmdet.models import build_detector
+
+    model_dict = dict(
+        type='RetinaNet',
+        backbone=dict(
+            type='ResNet',
+            depth=18,
+            num_stages=4,
+            out_indices=(3, ),
+            norm_cfg=dict(type='BN', requires_grad=False),
+            norm_eval=True,
+            style='pytorch'),
+        neck=None,
+        bbox_head=dict(
+            type='RetinaHead',
+            num_classes=num_class,
+            in_channels=512,
+            stacked_convs=1,
+            feat_channels=256,
+            anchor_generator=dict(
+                type='AnchorGenerator',
+                octave_base_scale=4,
+                scales_per_octave=3,
+                ratios=[0.5],
+                strides=[32]),
+            bbox_coder=dict(
+                type='DeltaXYWHBBoxCoder',
+                target_means=[.0, .0, .0, .0],
+                target_stds=[1.0, 1.0, 1.0, 1.0]),
+        ),
+        test_cfg=dict(
+            nms_pre=1000,
+            min_bbox_size=0,
+            score_thr=0.05,
+            nms=dict(type='nms', iou_threshold=0.5),
+            max_per_img=100))
+    model = build_detector(ConfigDict(model_dict))
+    model.cfg = _get_config_module('retinanet/retinanet_r50_fpn_1x_coco.py')
+    model.eval()
+    return model
+
+
+def test_detector_engine():
+    from mmdet.apis import DetectorEngine
+
+    num_class = 3
+    rng = np.random.RandomState(0)
+    landscape = [rng.rand(100, 160, 3) for _ in range(3)]
+    portrait = rng.rand(160, 100, 3)
+    imgs = [landscape[0], portrait, landscape[1], landscape[2]]
+
+    model = _small_retinanet(num_class)
+    engine = DetectorEngine(model, max_batch_size=2)
+
+    # the pipeline is only built once per input type
+    assert engine.get_pipeline(True) is engine.get_pipeline(True)
+    data = engine.preprocess(landscape[0])
+    assert data['img_metas'][0].data['img_shape'] == (800, 1280, 3)
+
+    # and rebuilt when the test pipeline is edited in place
+    pipeline = engine.get_pipeline(True)
+    model.cfg.data.test.pipeline[1].img_scale = (640, 400)
+    assert engine.get_pipeline(True) is not pipeline
+    data = engine.preprocess(landscape[0])
+    assert data['img_metas'][0].data['img_shape'] == (400, 640, 3)
+
+    # images are grouped by size bucket, then split by max_batch_size
+    datas = [engine.preprocess(img) for img in imgs]
+    assert engine.group(datas) == [[0, 2], [3], [1]]
+
+    results = engine(imgs)
+    assert len(results) == len(imgs)
+    assert all(len(result) == num_class for result in results)
+    # results are returned in input order
+    single = engine(portrait)
+    for dets, single_dets in zip(results[1], single):
+        np.testing.assert_allclose(dets, single_dets, rtol=1e-4, atol=1e-4)
+
+
+def test_inference_service():
+    from mmdet.apis import (DetectorEngine, InferenceService,
+                            det_result_to_json)
+
+    num_class = 3
+    rng = np.random.RandomState(0)
+    imgs = [rng.rand(100, 160, 3) for _ in range(3)] + [rng.rand(160, 100, 3)]
+    model = _small_retinanet(num_class)
+    expected = DetectorEngine(model, max_batch_size=1)(imgs)
+
+    with InferenceService(
+            model, num_workers=2, max_batch_size=2, queue_size=2) as service:
+        futures = [service.submit(img) for img in imgs]
+        results = [future.result() for future in futures]
+        # failures are reported through the future of the request
+        with pytest.raises(Exception):
+            service.submit('not_exist.jpg').result()
+    metrics = service.metrics()
+    assert metrics['submitted'] == 5
+    assert metrics['preprocess']['processed'] == 4
+    assert metrics['preprocess']['failed'] == 1
+    assert metrics['model']['processed'] == 4
+    assert metrics['postprocess']['processed'] == 4
+    assert metrics['model']['queue_capacity'] == 2
+    for result, expected_result in zip(results, expected):
+        for dets, expected_dets in zip(result, expected_result):
+            np.testing.assert_allclose(
+                dets, expected_dets, rtol=1e-4, atol=1e-4)
+    with pytest.raises(RuntimeError):
+        service.submit(imgs[0])
+
+    # the postprocess stage converts the results
+    with InferenceService(
+            model, postprocess=det_result_to_json) as service:
+        dets = service(imgs[0])
+    assert len(dets) == sum(len(bboxes) for bboxes in expected[0])
+    assert all(det.keys() == {'label', 'score', 'bbox'} for det in dets)
+
+    from mmdet.core import BoxMask
+    mask = BoxMask(np.ones((2, 3), dtype=bool), (1, 2), (6, 8))
+    result = ([np.array([[1, 2, 4, 4, 0.9], [0, 0, 1, 1, 0.1]]),
+               np.zeros((0, 5))], [[mask, np.zeros((6, 8), dtype=bool)], []])
+    dets = det_result_to_json(result, classes=('a', 'b'), score_thr=0.5)
+    assert len(dets) == 1 and dets[0]['class'] == 'a'
+    assert dets[0]['segmentation']['size'] == [6, 8]
+    assert isinstance(dets[0]['segmentation']['counts'], str)
+
+
+def test_video_inference():
+    from mmdet.apis import (DetectorEngine, VideoInference,
+                            interpolate_bbox_results)
+
+    result1 = [np.array([[0, 0, 10, 10, 0.8], [50, 50, 60, 60, 0.9]])]
+    result2 = [np.array([[4, 0, 14, 10, 0.6], [90, 90, 99, 99, 0.7]])]
+    result = interpolate_bbox_results(result1, result2, 0.25)
+    # matched boxes are interpolated, unmatched ones kept from the nearer
+    np.testing.assert_allclose(
+        result[0], [[1, 0, 11, 10, 0.75], [50, 50, 60, 60, 0.9]])
+    result = interpolate_bbox_results(result1, result2, 0.75)
+    np.testing.assert_allclose(result[0][1], [90, 90, 99, 99, 0.7])
+
+    rng = np.random.RandomState(0)
+    frames = [rng.rand(100, 160, 3) for _ in range(5)]
+    model = _small_retinanet(3)
+    expected = DetectorEngine(model)(frames[::2])
+
+    video_inference = VideoInference(model, batch_size=2, frame_stride=2)
+    outputs = list(video_inference(frames))
+    assert len(outputs) == 5
+    assert all(frame is f for (frame, _), f in zip(outputs, frames))
+    for (_, result), expected_result in zip(outputs[::2], expected):
+        for dets, expected_dets in zip(result, expected_result):
+            np.testing.assert_allclose(
+                dets, expected_dets, rtol=1e-4, atol=1e-4)
+    stats = video_inference.stats
+    assert stats['frames'] == 5 and stats['key_frames'] == 3
+    assert stats['batches'] == 2
+    assert {'read', 'preprocess', 'model'} <= stats['stage_times'].keys()
+
+    # stopping early leaves no thread blocked on the full queues
+    num_threads = threading.active_count()
+    video_inference = VideoInference(model, batch_size=1, queue_size=1)
+    outputs = video_inference(frames * 4)
+    next(outputs)
+    outputs.close()
+    assert threading.active_count() == num_threads
+    assert video_inference.stats['frames'] == 1
+
+
 def test_yolox_random_size():
     from mmdet.models import build_detector
     model = _get_detector_cfg('yolox/yolox_tiny_8x8_300e_coco.py')
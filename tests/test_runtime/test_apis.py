@@ -1,9 +1,19 @@
+import json
 import os
+import os.path as osp
+import sys
+import tempfile
 from pathlib import Path
 
+import cv2
+import numpy as np
 import pytest
+import torch
+from mmcv import Config, ConfigDict
+from mmcv.runner import save_checkpoint
 
 from mmdet.apis import init_detector
+from mmdet.models import build_detector
 
 
 def test_init_detector():
@@ -30,3 +40,103 @@ def test_init_detector():
     with pytest.raises(TypeError):
         config_list = [config_file]
         model = init_detector(config_list)  # noqa: F841
+
+
+def _per_box_postprocess(data, classes, threshold):
+    """The per-box serialisation the TorchServe handler used before."""
+    output = []
+    for image_index, image_result in enumerate(data):
+        output.append([])
+        if isinstance(image_result, tuple):
+            bbox_result = image_result[0]
+        else:
+            bbox_result = image_result
+        for class_index, class_result in enumerate(bbox_result):
+            class_name = classes[class_index]
+            for bbox in class_result:
+                bbox_coords = bbox[:-1].tolist()
+                score = float(bbox[-1])
+                if score >= threshold:
+                    output[image_index].append({
+                        'class_name': class_name,
+                        'bbox': bbox_coords,
+                        'score': score
+                    })
+    return output
+
+
+def test_torchserve_handler():
+    pytest.importorskip('ts')
+    project_dir = osp.abspath(osp.join(osp.dirname(__file__), '..', '..'))
+    sys.path.insert(0, osp.join(project_dir, 'tools', 'deployment'))
+    from mmdet_handler import MMdetHandler, set_score_thr
+
+    # set_score_thr only raises the thresholds
+    model = torch.nn.Module()
+    model.query_head = torch.nn.Module()
+    model.query_head.test_cfg = ConfigDict(max_per_img=100)
+    model.bbox_head = torch.nn.Module()
+    model.bbox_head.test_cfg = ConfigDict(score_thr=0.6)
+    model.roi_head = torch.nn.Module()
+    model.roi_head.test_cfg = ConfigDict(max_per_img=100)
+    set_score_thr(model, 0.5)
+    assert model.query_head.test_cfg.score_thr == 0.5
+    assert model.bbox_head.test_cfg.score_thr == 0.6
+    assert 'score_thr' not in model.roi_head.test_cfg
+    set_score_thr(model, 0.3)
+    assert model.query_head.test_cfg.score_thr == 0.5
+    assert model.bbox_head.test_cfg.score_thr == 0.6
+
+    # a small RetinaNet with random weights laid out like a model store
+    cfg = Config.fromfile(
+        osp.join(project_dir,
+                 'configs/retinanet/retinanet_r50_fpn_1x_coco.py'))
+    cfg.model.backbone.depth = 18
+    cfg.model.backbone.init_cfg = None
+    cfg.model.neck.in_channels = [64, 128, 256, 512]
+    cfg.model.neck.out_channels = 32
+    cfg.model.bbox_head.in_channels = 32
+    cfg.model.bbox_head.feat_channels = 32
+    cfg.model.bbox_head.stacked_convs = 1
+    tmp_dir = tempfile.TemporaryDirectory()
+    cfg.dump(osp.join(tmp_dir.name, 'config.py'))
+    classes = tuple(f'class_{i}' for i in range(80))
+    save_checkpoint(
+        build_detector(cfg.model),
+        osp.join(tmp_dir.name, 'model.pth'),
+        meta=dict(CLASSES=classes))
+    context = ConfigDict(
+        system_properties=dict(model_dir=tmp_dir.name, gpu_id=0),
+        manifest=dict(model=dict(serializedFile='model.pth')))
+
+    handler = MMdetHandler()
+    handler.threshold = 0.3
+    handler.max_batch_size = 2
+    handler.initialize(context)
+    tmp_dir.cleanup()
+    assert handler.model.bbox_head.test_cfg.score_thr == 0.3
+
+    rng = np.random.RandomState(0)
+    imgs = [(rng.rand(h, w, 3) * 255).astype(np.uint8)
+            for h, w in [(100, 160), (160, 100), (100, 160)]]
+    batch = [
+        dict(body=cv2.imencode('.png', img)[1].tobytes()) for img in imgs
+    ]
+    results = handler.inference(handler.preprocess(batch))
+    output = handler.postprocess(results)
+    assert len(output) == len(imgs)
+    assert sum(len(dets) for dets in output) > 0
+    assert all(det['score'] >= 0.3 for dets in output for det in dets)
+    assert json.dumps(output) == json.dumps(
+        _per_box_postprocess(results, classes, 0.3))
+
+    # instance segmentation results and empty classes
+    bboxes = [
+        np.array([[1, 2, 3, 4, 0.9], [5, 6, 7, 8, 0.2]], dtype=np.float32),
+        np.zeros((0, 5), dtype=np.float32),
+        np.array([[9, 10, 11, 12, 0.5]], dtype=np.float32)
+    ] + [np.zeros((0, 5), dtype=np.float32)] * 77
+    segms = [[None] * len(dets) for dets in bboxes]
+    data = [(bboxes, segms), bboxes, [np.zeros((0, 5), np.float32)] * 80]
+    assert json.dumps(handler.postprocess(data)) == json.dumps(
+        _per_box_postprocess(data, classes, 0.3))
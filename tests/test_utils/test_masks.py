@@ -3,7 +3,8 @@ import numpy as np
 import pytest
 import torch
 
-from mmdet.core import BitmapMasks, PolygonMasks, mask2bbox
+from mmdet.core import (BitmapMasks, BoxMask, PolygonMasks,
+                        encode_mask_results, mask2bbox)
 
 
 def dummy_raw_bitmap_masks(size):
@@ -711,3 +712,27 @@ def test_mask2bbox():
     masks[0, 5, 2:7] = True
     bboxes = mask2bbox(masks)
     assert torch.allclose(bboxes_gt, bboxes)
+
+
+def test_box_mask():
+    rng = np.random.RandomState(0)
+    region = rng.rand(12, 7) > 0.5
+    region[:, -1] = True
+    box_mask = BoxMask(region, (3, 5), (20, 10))
+    full_mask = np.zeros((20, 10), dtype=bool)
+    full_mask[5:17, 3:10] = region
+    assert box_mask.shape == (20, 10)
+    assert (box_mask.to_ndarray() == full_mask).all()
+    assert (np.asarray(box_mask) == full_mask).all()
+
+    # box masks are encoded like the full image bitmaps
+    encoded = encode_mask_results([[box_mask], [full_mask]])
+    assert encoded[0][0] == encoded[1][0]
+
+    # regions touching the image border and empty regions
+    for region, offset in [(np.ones((20, 2), dtype=bool), (8, 0)),
+                           (np.zeros((4, 4), dtype=bool), (2, 2)),
+                           (np.zeros((20, 0), dtype=bool), (12, 0))]:
+        box_mask = BoxMask(region, offset, (20, 10))
+        assert box_mask.encode() == encode_mask_results(
+            [[box_mask.to_ndarray()]])[0][0]
@@ -6,7 +6,7 @@ import numpy as np
 import pytest
 import torch
 
-from mmdet.core.bbox import distance2bbox
+from mmdet.core.bbox import bbox2result, distance2bbox
 from mmdet.core.mask.structures import BitmapMasks, PolygonMasks
 from mmdet.core.utils import (center_of_mass, filter_scores_and_topk,
                               flip_tensor, mask2ndarray, select_single_mlvl)
@@ -98,6 +98,21 @@ def test_distance2bbox():
     assert rois.shape == out.shape
 
 
+def test_bbox2result():
+    bboxes = torch.rand(20, 5)
+    labels = torch.randint(0, 4, (20, ))
+    results = bbox2result(bboxes, labels, 5)
+    assert len(results) == 5
+    for i, result in enumerate(results):
+        # boxes keep their order within each class
+        assert np.array_equal(result, bboxes[labels == i].numpy())
+    assert results[4].shape == (0, 5)
+
+    results = bbox2result(torch.zeros(0, 5), torch.zeros(0).long(), 3)
+    assert len(results) == 3
+    assert all(result.shape == (0, 5) for result in results)
+
+
 @pytest.mark.parametrize('mask', [
     torch.ones((28, 28)),
     torch.zeros((28, 28)),
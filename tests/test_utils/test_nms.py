@@ -1,7 +1,7 @@
 import pytest
 import torch
 
-from mmdet.core.post_processing import mask_matrix_nms
+from mmdet.core.post_processing import mask_matrix_nms, weighted_box_fusion
 
 
 def _create_mask(N, h, w):
@@ -73,3 +73,24 @@ def test_nms_input_errors():
                         filter_thr=0.5)
     assert len(score) == 1
     assert score[0] == 1
+
+
+def test_weighted_box_fusion():
+    bboxes = torch.Tensor([[0, 0, 10, 10], [0, 0, 12, 12], [0, 0, 10, 10],
+                           [50, 50, 60, 60]])
+    scores = torch.Tensor([0.9, 0.3, 0.6, 0.5])
+    labels = torch.LongTensor([0, 0, 1, 0])
+    det_bboxes, det_labels = weighted_box_fusion(
+        bboxes, scores, labels, iou_thr=0.55, num_augs=2)
+    assert det_bboxes.shape == (3, 5)
+    # the first two boxes are fused, weighted by their scores
+    assert torch.allclose(det_bboxes[0],
+                          torch.Tensor([0, 0, 10.5, 10.5, 0.6]))
+    assert det_labels.tolist() == [0, 1, 0]
+    # boxes found by one of two augmentations are down-weighted
+    assert torch.allclose(det_bboxes[1:, 4], torch.Tensor([0.3, 0.25]))
+
+    det_bboxes, det_labels = weighted_box_fusion(
+        torch.zeros((0, 4)), torch.zeros(0), torch.zeros(0).long())
+    assert det_bboxes.shape == (0, 5)
+    assert det_labels.shape == (0, )
@@ -0,0 +1,271 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+"""Per-stage latency benchmark of CoDETR inference.
+
+Times the test pipeline, backbone, neck, transformer encoder and decoder,
+query head, box post-processing and mask refinement of a CoDETR model on
+synthetic images and reports latency percentiles and peak memory of every
+stage. Stage times and memory are inclusive, e.g. `query_head` contains
+`encoder`, `decoder` and `postprocess`.
+
+Example:
+    python tools/analysis_tools/benchmark_codetr.py \
+        projects/configs/co_dino/co_dino_5scale_r18_tiny_benchmark.py \
+        --device cpu --num-iters 20 --out codetr_benchmark.json
+"""
+import argparse
+import functools
+import time
+import warnings
+from collections import OrderedDict, defaultdict
+
+import mmcv
+import numpy as np
+import torch
+from mmcv import Config, DictAction
+from terminaltables import AsciiTable
+
+from mmdet.apis import DetectorEngine, init_detector
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Per-stage latency benchmark of CoDETR inference')
+    parser.add_argument('config', help='CoDETR config file path')
+    parser.add_argument(
+        '--checkpoint', help='checkpoint file, random weights if not given')
+    parser.add_argument(
+        '--shape',
+        type=int,
+        nargs=2,
+        default=[480, 640],
+        help='height and width of the synthetic input images')
+    parser.add_argument(
+        '--batch-size', type=int, default=1, help='images per forward')
+    parser.add_argument(
+        '--num-iters', type=int, default=20, help='number of timed iters')
+    parser.add_argument(
+        '--num-warmup', type=int, default=3, help='number of warmup iters')
+    parser.add_argument(
+        '--device', default='cuda:0' if torch.cuda.is_available() else 'cpu')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--out', help='path of the json report')
+    parser.add_argument(
+        '--cfg-options',
+        nargs='+',
+        action=DictAction,
+        help='override some settings in the used config, the key-value pair '
+        'in xxx=yyy format will be merged into config file.')
+    return parser.parse_args()
+
+
+class StageProfiler:
+    """Collect the wall time and peak memory of named inference stages.
+
+    Stages are timed by wrapping bound methods of the model, so hooks are
+    not needed and methods called directly (e.g. ``head.forward(...)``) are
+    covered too. Stages may nest. The peak memory of a stage is the maximum
+    memory in use while it runs, and the peak growth is that maximum minus
+    the memory in use when it starts. On CUDA the memory is the allocated
+    memory of the device, on CPU it is the resident set size of the
+    process, whose high-water mark is reset at the start of every stage
+    through ``/proc/self/clear_refs``. CPU memory is not measured where
+    procfs is not available.
+
+    Args:
+        device (torch.device): Device the model runs on.
+    """
+
+    def __init__(self, device):
+        self.is_cuda = device.type == 'cuda'
+        self.device = device
+        self.times = defaultdict(list)
+        self.peak_mems = defaultdict(float)
+        self.peak_growths = defaultdict(float)
+        self._iter_times = defaultdict(float)
+        self._stack = []
+        self._wrapped = []
+        self.with_cpu_memory = not self.is_cuda and self._reset_cpu_peak()
+        if not self.is_cuda and not self.with_cpu_memory:
+            warnings.warn('/proc/self/clear_refs is not writable, the '
+                          'memory of CPU stages is not measured')
+
+    def _sync(self):
+        if self.is_cuda:
+            torch.cuda.synchronize(self.device)
+
+    @staticmethod
+    def _read_cpu_memory():
+        """Return the current and peak resident set size in MB."""
+        mems = dict()
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(('VmRSS:', 'VmHWM:')):
+                    key, value = line.split(':')
+                    # the values are in kB
+                    mems[key] = int(value.split()[0]) / 1024
+        return mems['VmRSS'], mems['VmHWM']
+
+    @staticmethod
+    def _reset_cpu_peak():
+        """Reset the peak resident set size to the current one."""
+        try:
+            with open('/proc/self/clear_refs', 'w') as f:
+                f.write('5')
+        except OSError:
+            return False
+        return True
+
+    def _memory(self):
+        """Return the current and peak memory since the last reset in MB."""
+        if self.is_cuda:
+            return (torch.cuda.memory_allocated(self.device) / 1024**2,
+                    torch.cuda.max_memory_allocated(self.device) / 1024**2)
+        if self.with_cpu_memory:
+            return self._read_cpu_memory()
+        return 0., 0.
+
+    def _reset_peak(self):
+        if self.is_cuda:
+            torch.cuda.reset_peak_memory_stats(self.device)
+        elif self.with_cpu_memory:
+            self._reset_cpu_peak()
+
+    def start(self, name):
+        self._sync()
+        # keep the peak seen so far by the enclosing stages before the peak
+        # is reset for this stage
+        current, peak = self._memory()
+        for frame in self._stack:
+            frame[2] = max(frame[2], peak)
+        self._reset_peak()
+        self._stack.append([name, time.perf_counter(), current, current])
+
+    def stop(self):
+        self._sync()
+        name, start, peak, entry = self._stack.pop()
+        self._iter_times[name] += (time.perf_counter() - start) * 1000
+        peak = max(peak, self._memory()[1])
+        for frame in self._stack:
+            frame[2] = max(frame[2], peak)
+        self.peak_mems[name] = max(self.peak_mems[name], peak)
+        self.peak_growths[name] = max(self.peak_growths[name], peak - entry)
+
+    def wrap(self, obj, method, name):
+        """Time every call of ``obj.method`` as stage ``name``."""
+        func = getattr(obj, method)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            self.start(name)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.stop()
+
+        setattr(obj, method, wrapper)
+        self._wrapped.append((obj, method))
+
+    def unwrap(self):
+        for obj, method in self._wrapped:
+            delattr(obj, method)
+        self._wrapped = []
+
+    def next_iter(self, record=True):
+        if record:
+            for name, elapsed in self._iter_times.items():
+                self.times[name].append(elapsed)
+        self._iter_times = defaultdict(float)
+
+    def summary(self):
+        stages = OrderedDict()
+        for name, times in self.times.items():
+            times = np.asarray(times)
+            stages[name] = dict(
+                mean_ms=float(times.mean()),
+                p50_ms=float(np.percentile(times, 50)),
+                p90_ms=float(np.percentile(times, 90)),
+                p99_ms=float(np.percentile(times, 99)),
+                peak_mem_mb=float(self.peak_mems[name]),
+                peak_growth_mb=float(self.peak_growths[name]))
+        return stages
+
+
+def wrap_codetr_stages(profiler, model, engine):
+    """Register the inference stages of a CoDETR model."""
+    profiler.wrap(engine, 'preprocess', 'pipeline')
+    profiler.wrap(model, 'simple_test', 'model')
+    profiler.wrap(model.backbone, 'forward', 'backbone')
+    if model.with_neck:
+        profiler.wrap(model.neck, 'forward', 'neck')
+    if model.with_query_head:
+        query_head = model.query_head
+        profiler.wrap(query_head, 'forward', 'query_head')
+        profiler.wrap(query_head.transformer.encoder, 'forward', 'encoder')
+        profiler.wrap(query_head.transformer.decoder, 'forward', 'decoder')
+        profiler.wrap(query_head, 'get_bboxes', 'postprocess')
+    if hasattr(model, 'mask_head'):
+        profiler.wrap(model, 'simple_test_mask', 'mask')
+
+
+def main():
+    args = parse_args()
+    cfg = Config.fromfile(args.config)
+    if args.cfg_options is not None:
+        cfg.merge_from_dict(args.cfg_options)
+    assert cfg.model.type == 'CoDETR', 'only CoDETR models are supported'
+    torch.manual_seed(args.seed)
+
+    model = init_detector(cfg, args.checkpoint, device=args.device)
+    engine = DetectorEngine(model, max_batch_size=args.batch_size)
+    profiler = StageProfiler(engine.device)
+    wrap_codetr_stages(profiler, model, engine)
+
+    rng = np.random.RandomState(args.seed)
+    h, w = args.shape
+    imgs = [
+        rng.randint(0, 256, (h, w, 3), dtype=np.uint8)
+        for _ in range(args.batch_size)
+    ]
+    prog_bar = mmcv.ProgressBar(args.num_warmup + args.num_iters)
+    for i in range(args.num_warmup + args.num_iters):
+        profiler.start('total')
+        datas = [engine.preprocess(img) for img in imgs]
+        engine.forward(datas)
+        profiler.stop()
+        profiler.next_iter(record=i >= args.num_warmup)
+        prog_bar.update()
+    profiler.unwrap()
+
+    stages = profiler.summary()
+    total = stages['total']['mean_ms'] / 1000
+    report = dict(
+        config=args.config,
+        checkpoint=args.checkpoint,
+        device=str(engine.device),
+        shape=[h, w],
+        batch_size=args.batch_size,
+        num_iters=args.num_iters,
+        num_warmup=args.num_warmup,
+        torch_version=torch.__version__,
+        fps=args.batch_size / total,
+        stages=stages)
+
+    table_data = [[
+        'stage', 'mean (ms)', 'p50', 'p90', 'p99', 'peak mem (MB)',
+        'peak growth (MB)'
+    ]]
+    for name, stage in stages.items():
+        table_data.append([
+            name, f'{stage["mean_ms"]:.2f}', f'{stage["p50_ms"]:.2f}',
+            f'{stage["p90_ms"]:.2f}', f'{stage["p99_ms"]:.2f}',
+            f'{stage["peak_mem_mb"]:.1f}', f'{stage["peak_growth_mb"]:.1f}'
+        ])
+    print('\n' + AsciiTable(table_data).table)
+    print(f'fps: {report["fps"]:.2f} img / s')
+    if args.out:
+        mmcv.dump(report, args.out, indent=4)
+        print(f'report written to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
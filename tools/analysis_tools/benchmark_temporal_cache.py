@@ -0,0 +1,154 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+"""Benchmark the temporal feature cache of CoDETR on a video.
+
+Runs a CoDETR model over the frames of a video twice, once recomputing the
+features of every frame and once in streaming mode with a
+:obj:`TemporalFeatureCache`. Reports the fps of both runs and the drift of
+the cached results: the mAP of the cached detections against the full
+recompute detections above ``--score-thr`` as ground truth, and the mean
+IoU of the matched boxes.
+
+Example:
+    python tools/analysis_tools/benchmark_temporal_cache.py \
+        ${CONFIG} ${CHECKPOINT} --video demo/demo.mp4 --max-staleness 30
+"""
+import argparse
+import time
+
+import mmcv
+import numpy as np
+import torch
+from mmcv import Config, DictAction
+
+from mmdet.apis import DetectorEngine, init_detector
+from mmdet.core import eval_map
+from mmdet.core.evaluation.bbox_overlaps import bbox_overlaps
+from projects.models import TemporalFeatureCache
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the temporal feature cache of CoDETR')
+    parser.add_argument('config', help='CoDETR config file path')
+    parser.add_argument('checkpoint', help='checkpoint file')
+    parser.add_argument('--video', default='demo/demo.mp4', help='video file')
+    parser.add_argument(
+        '--max-frames', type=int, default=None, help='number of frames')
+    parser.add_argument('--tile-size', type=int, default=128)
+    parser.add_argument('--diff-thr', type=float, default=0.05)
+    parser.add_argument('--margin', type=int, default=128)
+    parser.add_argument('--max-staleness', type=int, default=30)
+    parser.add_argument(
+        '--no-crop',
+        action='store_true',
+        help='recompute the whole frame if any tile changed')
+    parser.add_argument(
+        '--score-thr',
+        type=float,
+        default=0.3,
+        help='score threshold of the full recompute boxes used as ground '
+        'truth of the drift')
+    parser.add_argument(
+        '--device', default='cuda:0' if torch.cuda.is_available() else 'cpu')
+    parser.add_argument('--out', help='path of the json report')
+    parser.add_argument(
+        '--cfg-options',
+        nargs='+',
+        action=DictAction,
+        help='override some settings in the used config, the key-value pair '
+        'in xxx=yyy format will be merged into config file.')
+    return parser.parse_args()
+
+
+def run(engine, frames):
+    """Run the detector on the frames one by one."""
+    results = []
+    prog_bar = mmcv.ProgressBar(len(frames))
+    start = time.perf_counter()
+    for frame in frames:
+        results.append(engine.forward([engine.preprocess(frame)])[0])
+        prog_bar.update()
+    if engine.is_cuda:
+        torch.cuda.synchronize()
+    return results, len(frames) / (time.perf_counter() - start)
+
+
+def box_drift(results, ref_results, score_thr):
+    """mAP and mean matched IoU of results against reference results."""
+    results, ref_results = [[
+        result[0] if isinstance(result, tuple) else result
+        for result in res
+    ] for res in (results, ref_results)]
+    annotations = []
+    ious = []
+    for result, ref_result in zip(results, ref_results):
+        ref_bboxes = np.vstack(ref_result)
+        ref_labels = np.concatenate([
+            np.full(len(bboxes), i) for i, bboxes in enumerate(ref_result)
+        ])
+        keep = ref_bboxes[:, 4] >= score_thr
+        annotations.append(
+            dict(bboxes=ref_bboxes[keep, :4], labels=ref_labels[keep]))
+        for bboxes, ref_bboxes in zip(result, ref_result):
+            ref_bboxes = ref_bboxes[ref_bboxes[:, 4] >= score_thr]
+            if len(bboxes) and len(ref_bboxes):
+                ious.append(
+                    bbox_overlaps(ref_bboxes[:, :4], bboxes[:, :4]).max(1))
+    mean_ap, _ = eval_map(results, annotations, logger='silent')
+    mean_iou = float(np.concatenate(ious).mean()) if ious else 0.
+    return mean_ap, mean_iou
+
+
+def main():
+    args = parse_args()
+    cfg = Config.fromfile(args.config)
+    if args.cfg_options is not None:
+        cfg.merge_from_dict(args.cfg_options)
+    assert cfg.model.type == 'CoDETR', 'only CoDETR models are supported'
+
+    model = init_detector(cfg, args.checkpoint, device=args.device)
+    engine = DetectorEngine(model, max_batch_size=1)
+    video = mmcv.VideoReader(args.video)
+    num_frames = len(video)
+    if args.max_frames is not None:
+        num_frames = min(num_frames, args.max_frames)
+    frames = [video[i] for i in range(num_frames)]
+
+    print('full recompute')
+    model.temporal_cache = None
+    full_results, full_fps = run(engine, frames)
+
+    print('\ntemporal feature cache')
+    cache = TemporalFeatureCache(
+        tile_size=args.tile_size,
+        diff_thr=args.diff_thr,
+        margin=args.margin,
+        max_staleness=args.max_staleness,
+        crop_recompute=not args.no_crop)
+    model.temporal_cache = cache
+    cached_results, cached_fps = run(engine, frames)
+    model.temporal_cache = None
+
+    mean_ap, mean_iou = box_drift(cached_results, full_results,
+                                  args.score_thr)
+    report = dict(
+        config=args.config,
+        video=args.video,
+        num_frames=num_frames,
+        full_fps=full_fps,
+        cached_fps=cached_fps,
+        speedup=cached_fps / full_fps,
+        drift_map=float(mean_ap),
+        drift_mean_iou=mean_iou,
+        cache_stats=cache.stats)
+    print(f'\nfull: {full_fps:.2f} fps, cached: {cached_fps:.2f} fps, '
+          f'speedup: {report["speedup"]:.2f}x')
+    print(f'cache: {cache.stats}')
+    print(f'drift against full recompute: mAP {mean_ap:.4f}, '
+          f'mean IoU {mean_iou:.4f}')
+    if args.out:
+        mmcv.dump(report, args.out, indent=4)
+
+
+if __name__ == '__main__':
+    main()
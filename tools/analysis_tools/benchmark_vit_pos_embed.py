@@ -0,0 +1,88 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+"""Benchmark the cached absolute position embedding of the ViT backbone.
+
+Example:
+    python tools/analysis_tools/benchmark_vit_pos_embed.py \
+        projects/configs/co_dino_vit/co_dino_5scale_vit_large_coco.py \
+        --shapes 1536 1536 1280 2048
+"""
+import argparse
+import time
+
+import torch
+from mmcv import Config, DictAction
+
+from mmdet.models import build_backbone
+from mmdet.models.backbones.vit import get_abs_pos
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the ViT absolute position embedding cache')
+    parser.add_argument('config', help='config file with a ViT backbone')
+    parser.add_argument(
+        '--shapes',
+        type=int,
+        nargs='+',
+        default=[1536, 1536, 1280, 2048],
+        help='padded input shapes as h1 w1 h2 w2 ..., defaults to the '
+        '1536 LSJ and 2048x1280 test scales')
+    parser.add_argument(
+        '--num-iters', type=int, default=100, help='number of timed calls')
+    parser.add_argument(
+        '--device', default='cuda:0' if torch.cuda.is_available() else 'cpu')
+    parser.add_argument(
+        '--cfg-options',
+        nargs='+',
+        action=DictAction,
+        help='override some settings in the used config, the key-value pair '
+        'in xxx=yyy format will be merged into config file.')
+    return parser.parse_args()
+
+
+def _timeit(func, num_iters, device):
+    for _ in range(5):
+        func()
+    if device.type == 'cuda':
+        torch.cuda.synchronize(device)
+    start = time.perf_counter()
+    for _ in range(num_iters):
+        func()
+    if device.type == 'cuda':
+        torch.cuda.synchronize(device)
+    return (time.perf_counter() - start) / num_iters * 1000
+
+
+def main():
+    args = parse_args()
+    assert len(args.shapes) % 2 == 0, '--shapes expects h w pairs'
+    cfg = Config.fromfile(args.config)
+    if args.cfg_options is not None:
+        cfg.merge_from_dict(args.cfg_options)
+    backbone_cfg = cfg.model.backbone
+    assert backbone_cfg.type == 'ViT', 'the config must use a ViT backbone'
+    backbone_cfg.init_cfg = None
+
+    device = torch.device(args.device)
+    backbone = build_backbone(backbone_cfg).to(device).eval()
+    assert backbone.pos_embed is not None, 'use_abs_pos is disabled'
+    patch_size = backbone.patch_embed.proj.stride[0]
+
+    shapes = list(zip(args.shapes[::2], args.shapes[1::2]))
+    with torch.no_grad():
+        for h, w in shapes:
+            hw = (h // patch_size, w // patch_size)
+            uncached = _timeit(
+                lambda: get_abs_pos(backbone.pos_embed,
+                                    backbone.pretrain_use_cls_token, hw),
+                args.num_iters, device)
+            cached = _timeit(lambda: backbone._get_abs_pos(hw),
+                             args.num_iters, device)
+            print(f'input {h}x{w} (tokens {hw[0]}x{hw[1]}): '
+                  f'interpolate {uncached:.3f} ms / img, '
+                  f'cached {cached:.3f} ms / img, '
+                  f'saving {uncached - cached:.3f} ms / img')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+"""Sweep the test time query budget of a Co-DINO model.
+
+Evaluates a Co-DINO model on (the first images of) its test set for every
+combination of ``--num-queries`` and ``--num-dec-layers``, see
+:meth:`CoDINOHead.set_query_budget`, and reports the accuracy, the model
+latency and whether the setting is on the accuracy / latency frontier, i.e.
+no faster setting is as accurate.
+
+Example:
+    python tools/analysis_tools/query_budget_sweep.py \
+        projects/configs/co_dino/co_dino_5scale_r50_1x_coco.py ${CHECKPOINT} \
+        --num-queries 100 300 900 --num-dec-layers 3 6 --max-images 500
+"""
+import argparse
+import itertools
+import time
+
+import mmcv
+import numpy as np
+import torch
+from mmcv import Config, DictAction
+from mmcv.runner import load_checkpoint, wrap_fp16_model
+from terminaltables import AsciiTable
+
+from mmdet.core import encode_mask_results
+from mmdet.datasets import build_dataloader, build_dataset
+from mmdet.models import build_detector
+from mmdet.utils import (build_dp, compat_cfg, get_device, replace_cfg_vals,
+                         update_data_root)
+from projects import *  # noqa: F401, F403
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Sweep the test time query budget of Co-DINO')
+    parser.add_argument('config', help='Co-DINO config file path')
+    parser.add_argument('checkpoint', help='checkpoint file')
+    parser.add_argument(
+        '--num-queries',
+        type=int,
+        nargs='+',
+        default=[100, 300, 900],
+        help='numbers of decoded queries, capped at the num_query of the '
+        'model')
+    parser.add_argument(
+        '--num-dec-layers',
+        type=int,
+        nargs='+',
+        default=None,
+        help='numbers of decoder layers run, defaults to all layers')
+    parser.add_argument(
+        '--max-images',
+        type=int,
+        default=500,
+        help='number of test images evaluated, 0 for all')
+    parser.add_argument(
+        '--num-warmup',
+        type=int,
+        default=5,
+        help='number of images of every setting not timed')
+    parser.add_argument(
+        '--metric', default='bbox', help='metric passed to evaluate')
+    parser.add_argument(
+        '--key',
+        default='bbox_mAP',
+        help='key of the evaluation result used as accuracy')
+    parser.add_argument('--gpu-id', type=int, default=0)
+    parser.add_argument('--out', help='path of the json report')
+    parser.add_argument(
+        '--cfg-options',
+        nargs='+',
+        action=DictAction,
+        help='override some settings in the used config, the key-value pair '
+        'in xxx=yyy format will be merged into config file.')
+    return parser.parse_args()
+
+
+def subset_dataset(dataset, num_images):
+    """Keep the first images of a dataset, evaluation included."""
+    if num_images <= 0 or num_images >= len(dataset):
+        return dataset
+    dataset.data_infos = dataset.data_infos[:num_images]
+    if hasattr(dataset, 'img_ids'):
+        dataset.img_ids = dataset.img_ids[:num_images]
+    if getattr(dataset, 'proposals', None) is not None:
+        dataset.proposals = dataset.proposals[:num_images]
+    if hasattr(dataset, 'flag'):
+        dataset.flag = dataset.flag[:num_images]
+    return dataset
+
+
+def run(model, data_loader, num_warmup):
+    """Test the model and time the forward of every image."""
+    model.eval()
+    is_cuda = next(model.parameters()).is_cuda
+    results = []
+    times = []
+    prog_bar = mmcv.ProgressBar(len(data_loader.dataset))
+    for i, data in enumerate(data_loader):
+        if is_cuda:
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        with torch.no_grad():
+            result = model(return_loss=False, rescale=True, **data)
+        if is_cuda:
+            torch.cuda.synchronize()
+        if i >= num_warmup:
+            times.append((time.perf_counter() - start) / len(result))
+        if isinstance(result[0], tuple):
+            result = [(bbox_results, encode_mask_results(mask_results))
+                      for bbox_results, mask_results in result]
+        results.extend(result)
+        for _ in range(len(result)):
+            prog_bar.update()
+    return results, times
+
+
+def frontier(points):
+    """Indices of the points no faster point is as accurate as."""
+    on_frontier = []
+    best = -np.inf
+    for i in sorted(range(len(points)), key=lambda i: points[i]['latency_ms']):
+        if points[i]['accuracy'] > best:
+            on_frontier.append(i)
+            best = points[i]['accuracy']
+    return set(on_frontier)
+
+
+def main():
+    args = parse_args()
+    cfg = Config.fromfile(args.config)
+    cfg = replace_cfg_vals(cfg)
+    update_data_root(cfg)
+    if args.cfg_options is not None:
+        cfg.merge_from_dict(args.cfg_options)
+    cfg = compat_cfg(cfg)
+    cfg.gpu_ids = [args.gpu_id]
+    cfg.device = get_device()
+    if 'pretrained' in cfg.model:
+        cfg.model.pretrained = None
+    elif 'init_cfg' in cfg.model.backbone:
+        cfg.model.backbone.init_cfg = None
+
+    cfg.data.test.test_mode = True
+    dataset = subset_dataset(build_dataset(cfg.data.test), args.max_images)
+    data_loader = build_dataloader(
+        dataset, samples_per_gpu=1, workers_per_gpu=2, dist=False,
+        shuffle=False)
+
+    cfg.model.train_cfg = None
+    model = build_detector(cfg.model, test_cfg=cfg.get('test_cfg'))
+    if cfg.get('fp16', None) is not None:
+        wrap_fp16_model(model)
+    checkpoint = load_checkpoint(model, args.checkpoint, map_location='cpu')
+    model.CLASSES = checkpoint.get('meta', {}).get('CLASSES',
+                                                   dataset.CLASSES)
+    query_head = model.query_head
+    assert hasattr(query_head, 'set_query_budget'), \
+        'only Co-DINO query heads support a query budget'
+    num_layers = query_head.transformer.decoder.num_layers
+    num_queries = sorted(
+        {min(n, query_head.num_query)
+         for n in args.num_queries})
+    num_dec_layers = sorted(
+        {min(n, num_layers)
+         for n in (args.num_dec_layers or [num_layers])})
+    model = build_dp(model, cfg.device, device_ids=cfg.gpu_ids)
+
+    points = []
+    for num_query, num_dec_layer in itertools.product(num_queries,
+                                                      num_dec_layers):
+        print(f'\nnum_query={num_query}, num_dec_layers={num_dec_layer}')
+        query_head.set_query_budget(num_query, num_dec_layer)
+        results, times = run(model, data_loader, args.num_warmup)
+        metric = dataset.evaluate(results, metric=args.metric)
+        latency = float(np.mean(times)) * 1000 if times else float('nan')
+        points.append(
+            dict(
+                num_query=num_query,
+                num_dec_layers=num_dec_layer,
+                accuracy=float(metric[args.key]),
+                latency_ms=latency,
+                fps=1000 / latency,
+                metric={k: float(v)
+                        for k, v in metric.items()
+                        if isinstance(v, (int, float))}))
+    query_head.set_query_budget()
+
+    on_frontier = frontier(points)
+    table_data = [[
+        'num_query', 'num_dec_layers', args.key, 'latency (ms)', 'fps',
+        'frontier'
+    ]]
+    for i, point in enumerate(points):
+        point['frontier'] = i in on_frontier
+        table_data.append([
+            point['num_query'], point['num_dec_layers'],
+            f'{point["accuracy"]:.4f}', f'{point["latency_ms"]:.2f}',
+            f'{point["fps"]:.2f}', '*' if point['frontier'] else ''
+        ])
+    print('\n' + AsciiTable(table_data).table)
+    if args.out:
+        mmcv.dump(
+            dict(
+                config=args.config,
+                checkpoint=args.checkpoint,
+                num_images=len(dataset),
+                key=args.key,
+                points=points),
+            args.out,
+            indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+"""Check the parity of an exported ONNX detector with the PyTorch model.
+
+Every image is resized to fit the input size bucket the model was exported
+with (``--shape``), padded to it and run through the PyTorch model and the
+ONNX Runtime session. The detections above ``--score-thr`` are matched per
+class by IoU, and the share of matched PyTorch detections, the mean IoU and
+the largest score difference of the matches and the latency of both
+backends are reported. The check fails if fewer than ``--min-match`` of the
+PyTorch detections are matched.
+
+Example:
+    python tools/deployment/pytorch2onnx.py ${CONFIG} ${CHECKPOINT} \
+        --shape 800 1216 --opset-version 16 --dynamic-batch \
+        --output-file codino.onnx
+    python tools/deployment/check_onnx_parity.py ${CONFIG} ${CHECKPOINT} \
+        codino.onnx data/coco/val2017 --shape 800 1216 --max-images 50
+"""
+import argparse
+import os.path as osp
+import sys
+import time
+
+import mmcv
+import numpy as np
+import torch
+from mmcv import Config, DictAction
+
+from mmdet.core.evaluation.bbox_overlaps import bbox_overlaps
+from mmdet.core.export import build_model_from_cfg
+from mmdet.core.export.model_wrappers import ONNXRuntimeDetector
+from projects import *  # noqa: F401, F403
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Check an ONNX detector against the PyTorch model')
+    parser.add_argument('config', help='config file path')
+    parser.add_argument('checkpoint', help='checkpoint file')
+    parser.add_argument('onnx_file', help='exported ONNX model')
+    parser.add_argument(
+        'imgs', nargs='+', help='image files or directories of images')
+    parser.add_argument(
+        '--shape',
+        type=int,
+        nargs=2,
+        default=[800, 1216],
+        help='input size bucket (height, width) of the ONNX model')
+    parser.add_argument(
+        '--max-images', type=int, default=50, help='number of images checked')
+    parser.add_argument(
+        '--score-thr',
+        type=float,
+        default=0.3,
+        help='score threshold of the compared detections')
+    parser.add_argument(
+        '--iou-thr',
+        type=float,
+        default=0.9,
+        help='minimum IoU of matched detections')
+    parser.add_argument(
+        '--min-match',
+        type=float,
+        default=0.95,
+        help='minimum share of matched PyTorch detections to pass')
+    parser.add_argument('--out', help='path of the json report')
+    parser.add_argument(
+        '--cfg-options',
+        nargs='+',
+        action=DictAction,
+        help='override some settings in the used config, the key-value pair '
+        'in xxx=yyy format will be merged into config file.')
+    return parser.parse_args()
+
+
+def list_images(paths, max_images):
+    files = []
+    for path in paths:
+        if osp.isdir(path):
+            files.extend(
+                osp.join(path, f) for f in sorted(
+                    mmcv.scandir(path, ('.jpg', '.jpeg', '.png', '.bmp'))))
+        else:
+            files.append(path)
+    assert files, 'no images found'
+    return files[:max_images]
+
+
+def get_normalize_cfg(test_pipeline):
+    for transform in test_pipeline:
+        if transform['type'] == 'Normalize':
+            return transform
+        for sub_transform in transform.get('transforms', []):
+            if sub_transform['type'] == 'Normalize':
+                return sub_transform
+    raise ValueError('Failed to find `Normalize` in the test pipeline')
+
+
+def preprocess(filename, shape, normalize_cfg):
+    """Resize an image to fit the bucket and pad it to the bucket."""
+    img = mmcv.imread(filename)
+    ori_h, ori_w = img.shape[:2]
+    pad_h, pad_w = shape
+    scale = min(pad_h / ori_h, pad_w / ori_w)
+    img_w, img_h = int(ori_w * scale + 0.5), int(ori_h * scale + 0.5)
+    img = mmcv.imresize(img, (min(img_w, pad_w), min(img_h, pad_h)))
+    img_h, img_w = img.shape[:2]
+    img = mmcv.imnormalize(img, np.array(normalize_cfg['mean'], np.float32),
+                           np.array(normalize_cfg['std'], np.float32),
+                           normalize_cfg.get('to_rgb', True))
+    img = mmcv.impad(img, shape=(pad_h, pad_w))
+    img = torch.from_numpy(img.transpose(2, 0, 1)).unsqueeze(0).contiguous()
+    img_meta = dict(
+        filename=filename,
+        ori_filename=osp.basename(filename),
+        ori_shape=(ori_h, ori_w, 3),
+        img_shape=(img_h, img_w, 3),
+        pad_shape=(pad_h, pad_w, 3),
+        batch_input_shape=(pad_h, pad_w),
+        scale_factor=np.array(
+            [img_w / ori_w, img_h / ori_h, img_w / ori_w, img_h / ori_h],
+            dtype=np.float32),
+        flip=False,
+        flip_direction=None)
+    return img, img_meta
+
+
+def match(result, ref_result, score_thr, iou_thr):
+    """Match the detections of a result to the reference detections."""
+    num_ref, num_matched = 0, 0
+    ious, score_diffs = [], []
+    for bboxes, ref_bboxes in zip(result, ref_result):
+        ref_bboxes = ref_bboxes[ref_bboxes[:, 4] >= score_thr]
+        num_ref += len(ref_bboxes)
+        if len(ref_bboxes) == 0 or len(bboxes) == 0:
+            continue
+        overlaps = bbox_overlaps(ref_bboxes[:, :4], bboxes[:, :4])
+        matched = np.zeros(len(bboxes), dtype=bool)
+        for i in np.argsort(-ref_bboxes[:, 4]):
+            overlap = np.where(matched, -1, overlaps[i])
+            j = overlap.argmax()
+            if overlap[j] < iou_thr:
+                continue
+            matched[j] = True
+            num_matched += 1
+            ious.append(overlap[j])
+            score_diffs.append(abs(bboxes[j, 4] - ref_bboxes[i, 4]))
+    return num_ref, num_matched, ious, score_diffs
+
+
+def main():
+    args = parse_args()
+    cfg = Config.fromfile(args.config)
+    if args.cfg_options is not None:
+        cfg.merge_from_dict(args.cfg_options)
+    normalize_cfg = get_normalize_cfg(cfg.data.test.pipeline)
+
+    model = build_model_from_cfg(args.config, args.checkpoint,
+                                 args.cfg_options)
+    onnx_model = ONNXRuntimeDetector(args.onnx_file, model.CLASSES, 0)
+
+    num_ref, num_matched = 0, 0
+    ious, score_diffs = [], []
+    times = dict(pytorch=[], onnxruntime=[])
+    files = list_images(args.imgs, args.max_images)
+    prog_bar = mmcv.ProgressBar(len(files))
+    for filename in files:
+        img, img_meta = preprocess(filename, args.shape, normalize_cfg)
+
+        start = time.perf_counter()
+        with torch.no_grad():
+            result = model([img],
+                           img_metas=[[dict(img_meta)]],
+                           return_loss=False,
+                           rescale=True)[0]
+        times['pytorch'].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        onnx_result = onnx_model([img], img_metas=[[img_meta]],
+                                 return_loss=False)[0]
+        times['onnxruntime'].append(time.perf_counter() - start)
+
+        if isinstance(result, tuple):
+            result = result[0]
+        if isinstance(onnx_result, tuple):
+            onnx_result = onnx_result[0]
+        stats = match(onnx_result, result, args.score_thr, args.iou_thr)
+        num_ref += stats[0]
+        num_matched += stats[1]
+        ious.extend(stats[2])
+        score_diffs.extend(stats[3])
+        prog_bar.update()
+
+    match_ratio = num_matched / num_ref if num_ref else 1.
+    report = dict(
+        config=args.config,
+        onnx_file=args.onnx_file,
+        shape=args.shape,
+        num_images=len(files),
+        num_dets=num_ref,
+        match_ratio=match_ratio,
+        mean_iou=float(np.mean(ious)) if ious else None,
+        max_score_diff=float(np.max(score_diffs)) if score_diffs else None,
+        pytorch_ms=float(np.mean(times['pytorch'])) * 1000,
+        onnxruntime_ms=float(np.mean(times['onnxruntime'])) * 1000)
+    print(f'\n{num_matched} / {num_ref} PyTorch detections matched '
+          f'({match_ratio:.4f}), mean IoU {report["mean_iou"]}, max score '
+          f'difference {report["max_score_diff"]}')
+    print(f'latency: PyTorch {report["pytorch_ms"]:.2f} ms, ONNX Runtime '
+          f'{report["onnxruntime_ms"]:.2f} ms')
+    if args.out:
+        mmcv.dump(report, args.out, indent=4)
+    if match_ratio < args.min_match:
+        print(f'parity check failed: less than {args.min_match} of the '
+              'detections are matched')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
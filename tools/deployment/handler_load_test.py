@@ -0,0 +1,165 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+"""Load test of the TorchServe handler without a running server.
+
+Drives :class:`MMdetHandler` in-process with batches of encoded images like
+TorchServe does and reports the throughput and the latency of every
+handler stage. The ``ts`` package has to be installed, the server itself is
+not used.
+
+Example:
+    python tools/deployment/handler_load_test.py \
+        ${CONFIG} ${CHECKPOINT} demo/demo.jpg --batch-size 8 --num-batches 50
+"""
+import argparse
+import os
+import os.path as osp
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import mmcv
+import numpy as np
+import torch
+from terminaltables import AsciiTable
+
+sys.path.insert(0, osp.dirname(osp.abspath(__file__)))
+from mmdet_handler import MMdetHandler  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Load test the TorchServe handler in-process')
+    parser.add_argument('config', help='config file path')
+    parser.add_argument('checkpoint', help='checkpoint file')
+    parser.add_argument(
+        'imgs', nargs='+', help='image files or directories of images')
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=8,
+        help='number of requests per handler call, like the batch size '
+        'of the TorchServe model')
+    parser.add_argument(
+        '--num-batches', type=int, default=50, help='number of timed batches')
+    parser.add_argument(
+        '--num-warmup', type=int, default=3, help='number of warmup batches')
+    parser.add_argument(
+        '--score-thr', type=float, default=0.5, help='bbox score threshold')
+    parser.add_argument(
+        '--num-workers', type=int, default=4, help='decoding threads')
+    parser.add_argument(
+        '--max-batch-size',
+        type=int,
+        default=8,
+        help='maximum number of images forwarded together')
+    parser.add_argument('--gpu-id', type=int, default=0)
+    parser.add_argument('--out', help='path of the json report')
+    return parser.parse_args()
+
+
+class LocalContext:
+    """The parts of the TorchServe context used by the handler."""
+
+    def __init__(self, model_dir, serialized_file, gpu_id):
+        self.system_properties = dict(model_dir=model_dir, gpu_id=gpu_id)
+        self.manifest = dict(model=dict(serializedFile=serialized_file))
+
+
+def load_requests(paths):
+    """Read the encoded bytes of the images to send."""
+    files = []
+    for path in paths:
+        if osp.isdir(path):
+            files.extend(
+                osp.join(path, f) for f in sorted(
+                    mmcv.scandir(path, ('.jpg', '.jpeg', '.png', '.bmp'))))
+        else:
+            files.append(path)
+    assert files, 'no images found'
+    requests = []
+    for filename in files:
+        with open(filename, 'rb') as f:
+            requests.append(dict(body=f.read()))
+    return requests
+
+
+def main():
+    args = parse_args()
+
+    # lay out the model like the model store of TorchServe
+    model_dir = tempfile.mkdtemp()
+    shutil.copy(args.config, osp.join(model_dir, 'config.py'))
+    os.symlink(
+        osp.abspath(args.checkpoint),
+        osp.join(model_dir, osp.basename(args.checkpoint)))
+    context = LocalContext(model_dir, osp.basename(args.checkpoint),
+                           args.gpu_id)
+
+    MMdetHandler.threshold = args.score_thr
+    MMdetHandler.num_workers = args.num_workers
+    MMdetHandler.max_batch_size = args.max_batch_size
+    handler = MMdetHandler()
+    handler.initialize(context)
+    shutil.rmtree(model_dir)
+
+    requests = load_requests(args.imgs)
+    stage_times = defaultdict(list)
+    num_dets = 0
+    prog_bar = mmcv.ProgressBar(args.num_warmup + args.num_batches)
+    for i in range(args.num_warmup + args.num_batches):
+        batch = [
+            requests[(i * args.batch_size + j) % len(requests)]
+            for j in range(args.batch_size)
+        ]
+        times = dict()
+        start = time.perf_counter()
+        data = handler.preprocess(batch)
+        times['preprocess'] = time.perf_counter()
+        data = handler.inference(data)
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        times['inference'] = time.perf_counter()
+        output = handler.postprocess(data)
+        times['postprocess'] = time.perf_counter()
+        if i >= args.num_warmup:
+            last = start
+            for name, end in times.items():
+                stage_times[name].append((end - last) * 1000)
+                last = end
+            stage_times['batch'].append((last - start) * 1000)
+            num_dets += sum(len(dets) for dets in output)
+        prog_bar.update()
+
+    total = sum(stage_times['batch']) / 1000
+    num_imgs = args.num_batches * args.batch_size
+    report = dict(
+        config=args.config,
+        checkpoint=args.checkpoint,
+        batch_size=args.batch_size,
+        num_batches=args.num_batches,
+        score_thr=args.score_thr,
+        imgs_per_second=num_imgs / total,
+        dets_per_img=num_dets / num_imgs,
+        stages=dict())
+    table_data = [['stage', 'mean (ms)', 'p50', 'p90', 'p99']]
+    for name, times in stage_times.items():
+        times = np.asarray(times)
+        stage = dict(
+            mean_ms=float(times.mean()),
+            p50_ms=float(np.percentile(times, 50)),
+            p90_ms=float(np.percentile(times, 90)),
+            p99_ms=float(np.percentile(times, 99)))
+        report['stages'][name] = stage
+        table_data.append([name] +
+                          [f'{value:.2f}' for value in stage.values()])
+    print('\n' + AsciiTable(table_data).table)
+    print(f'throughput: {report["imgs_per_second"]:.2f} img / s, '
+          f'{report["dets_per_img"]:.1f} detections / img')
+    if args.out:
+        mmcv.dump(report, args.out, indent=4)
+
+
+if __name__ == '__main__':
+    main()
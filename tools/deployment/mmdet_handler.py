@@ -1,16 +1,51 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import base64
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 import mmcv
+import numpy as np
 import torch
 from ts.torch_handler.base_handler import BaseHandler
 
-from mmdet.apis import inference_detector, init_detector
+from mmdet.apis import DetectorEngine, init_detector
+
+
+def set_score_thr(model, score_thr):
+    """Filter low scoring detections inside the model.
+
+    Raises the ``score_thr`` of the test configs that filter the final
+    detections, so the boxes below the threshold are dropped on the device
+    before the results are moved to the host. For CoDETR the threshold is
+    set on the query head, which also skips the masks of the dropped boxes.
+
+    Args:
+        model (nn.Module): The detector.
+        score_thr (float): Minimum score of the returned detections.
+    """
+    query_head = getattr(model, 'query_head', None)
+    if query_head is not None and query_head.test_cfg is not None:
+        query_head.test_cfg['score_thr'] = max(
+            query_head.test_cfg.get('score_thr', 0), score_thr)
+    for m in model.modules():
+        test_cfg = getattr(m, 'test_cfg', None)
+        if isinstance(test_cfg, dict) and 'score_thr' in test_cfg:
+            test_cfg['score_thr'] = max(test_cfg['score_thr'], score_thr)
 
 
 class MMdetHandler(BaseHandler):
+    """TorchServe handler of mmdet detectors.
+
+    The images of a TorchServe batch are decoded and run through the test
+    pipeline by a thread pool, grouped into batches of similar size by a
+    :obj:`DetectorEngine` and forwarded without gradients. Detections below
+    ``threshold`` are filtered inside the model, see :func:`set_score_thr`.
+    """
     threshold = 0.5
+    # number of threads decoding and transforming the images of a batch
+    num_workers = 4
+    # maximum number of images forwarded together
+    max_batch_size = 8
 
     def initialize(self, context):
         properties = context.system_properties
@@ -25,47 +60,50 @@ class MMdetHandler(BaseHandler):
         checkpoint = os.path.join(model_dir, serialized_file)
         self.config_file = os.path.join(model_dir, 'config.py')
 
-        self.model = init_detector(self.config_file, checkpoint, self.device)
+        self.model = init_detector(
+            self.config_file, checkpoint, device=self.device)
+        set_score_thr(self.model, self.threshold)
+        self.engine = DetectorEngine(
+            self.model, max_batch_size=self.max_batch_size)
+        self.pool = ThreadPoolExecutor(self.num_workers)
         self.initialized = True
 
-    def preprocess(self, data):
-        images = []
-
-        for row in data:
-            image = row.get('data') or row.get('body')
-            if isinstance(image, str):
-                image = base64.b64decode(image)
-            image = mmcv.imfrombytes(image)
-            images.append(image)
+    def _load(self, row):
+        image = row.get('data') or row.get('body')
+        if isinstance(image, str):
+            image = base64.b64decode(image)
+        image = mmcv.imfrombytes(image)
+        return self.engine.preprocess(image)
 
-        return images
+    def preprocess(self, data):
+        return list(self.pool.map(self._load, data))
 
     def inference(self, data, *args, **kwargs):
-        results = inference_detector(self.model, data)
+        results = [None] * len(data)
+        for inds in self.engine.group(data):
+            batch_results = self.engine.forward([data[i] for i in inds])
+            for idx, result in zip(inds, batch_results):
+                results[idx] = result
         return results
 
     def postprocess(self, data):
         # Format output following the example ObjectDetectionHandler format
         output = []
-        for image_index, image_result in enumerate(data):
-            output.append([])
+        for image_result in data:
             if isinstance(image_result, tuple):
-                bbox_result, segm_result = image_result
-                if isinstance(segm_result, tuple):
-                    segm_result = segm_result[0]  # ms rcnn
+                bbox_result = image_result[0]
             else:
-                bbox_result, segm_result = image_result, None
-
-            for class_index, class_result in enumerate(bbox_result):
-                class_name = self.model.CLASSES[class_index]
-                for bbox in class_result:
-                    bbox_coords = bbox[:-1].tolist()
-                    score = float(bbox[-1])
-                    if score >= self.threshold:
-                        output[image_index].append({
-                            'class_name': class_name,
-                            'bbox': bbox_coords,
-                            'score': score
-                        })
-
+                bbox_result = image_result
+            bboxes = np.vstack(bbox_result).reshape(-1, 5)
+            labels = np.repeat(
+                np.arange(len(bbox_result)),
+                [len(bbox) for bbox in bbox_result])
+            keep = bboxes[:, 4] >= self.threshold
+            class_names = [self.model.CLASSES[i] for i in labels[keep]]
+            output.append([
+                dict(class_name=class_name, bbox=bbox, score=score)
+                for class_name, bbox, score in zip(
+                    class_names, bboxes[keep, :4].tolist(),
+                    bboxes[keep, 4].tolist())
+            ])
         return output
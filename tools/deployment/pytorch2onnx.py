@@ -11,6 +11,7 @@ from mmcv import Config, DictAction
 
 from mmdet.core.export import build_model_from_cfg, preprocess_example_input
 from mmdet.core.export.model_wrappers import ONNXRuntimeDetector
+from projects import *  # noqa: F401, F403
 
 
 def pytorch2onnx(model,
@@ -24,7 +25,8 @@ def pytorch2onnx(model,
                  test_img=None,
                  do_simplify=False,
                  dynamic_export=None,
-                 skip_postprocess=False):
+                 skip_postprocess=False,
+                 dynamic_batch=False):
 
     input_config = {
         'input_shape': input_shape,
@@ -67,7 +69,15 @@ def pytorch2onnx(model,
         output_names.append('masks')
     input_name = 'input'
     dynamic_axes = None
-    if dynamic_export:
+    if dynamic_batch:
+        # the spatial shapes are fixed, e.g. for the transformer of CoDETR
+        dynamic_axes = {
+            name: {
+                0: 'batch'
+            }
+            for name in [input_name] + output_names
+        }
+    elif dynamic_export:
         dynamic_axes = {
             input_name: {
                 0: 'batch',
@@ -147,8 +157,15 @@ def pytorch2onnx(model,
                 return_loss=False,
                 rescale=True)[0]
 
-        img_list = [_.cuda().contiguous() for _ in img_list]
-        if dynamic_export:
+        if torch.cuda.is_available():
+            img_list = [_.cuda().contiguous() for _ in img_list]
+        if dynamic_batch:
+            # run a batch of two images to test the dynamic batch size
+            img_list = [
+                torch.cat([_, _.flip(-1)]).contiguous() for _ in img_list
+            ]
+            img_meta_list = [img_meta_list[0] * 2]
+        elif dynamic_export:
             img_list = img_list + [_.flip(-1).contiguous() for _ in img_list]
             img_meta_list = img_meta_list * 2
         # get onnx output
@@ -217,7 +234,12 @@ def parse_args():
         action='store_true',
         help='Show onnx graph and detection outputs')
     parser.add_argument('--output-file', type=str, default='tmp.onnx')
-    parser.add_argument('--opset-version', type=int, default=11)
+    parser.add_argument(
+        '--opset-version',
+        type=int,
+        default=11,
+        help='11, or 16 to export grid_sample (e.g. the deformable '
+        'attention of CoDETR) as a native ONNX op')
     parser.add_argument(
         '--test-img', type=str, default=None, help='Images for test')
     parser.add_argument(
@@ -268,6 +290,11 @@ def parse_args():
         '--dynamic-export',
         action='store_true',
         help='Whether to export onnx with dynamic axis.')
+    parser.add_argument(
+        '--dynamic-batch',
+        action='store_true',
+        help='Whether to export onnx with a dynamic batch size only. The '
+        'spatial shape stays fixed to `--shape`, as CoDETR models need.')
     parser.add_argument(
         '--skip-postprocess',
         action='store_true',
@@ -284,13 +311,17 @@ if __name__ == '__main__':
         parsed directly from config file and are deprecated and \
         will be removed in future releases.')
 
-    assert args.opset_version == 11, 'MMDet only support opset 11 now'
+    assert args.opset_version in (11, 16), \
+        'MMDet only support opset 11 and 16 now'
 
-    try:
-        from mmcv.onnx.symbolic import register_extra_symbolics
-    except ModuleNotFoundError:
-        raise NotImplementedError('please update mmcv to version>=v1.0.4')
-    register_extra_symbolics(args.opset_version)
+    # opset 16 has native ops for the extra symbolics of mmcv
+    if args.opset_version == 11:
+        try:
+            from mmcv.onnx.symbolic import register_extra_symbolics
+        except ModuleNotFoundError:
+            raise NotImplementedError(
+                'please update mmcv to version>=v1.0.4')
+        register_extra_symbolics(args.opset_version)
 
     cfg = Config.fromfile(args.config)
     if args.cfg_options is not None:
@@ -328,7 +359,8 @@ if __name__ == '__main__':
         test_img=args.test_img,
         do_simplify=args.simplify,
         dynamic_export=args.dynamic_export,
-        skip_postprocess=args.skip_postprocess)
+        skip_postprocess=args.skip_postprocess,
+        dynamic_batch=args.dynamic_batch)
 
     # Following strings of text style are from colorama package
     bright_style, reset_style = '\x1b[1m', '\x1b[0m'
@@ -0,0 +1,145 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+"""Decode and resize the test images of a dataset once into image shards.
+
+The images of the test set of a config are loaded and resized as by its test
+pipeline and written to memory-mapped shards, see
+:class:`mmdet.datasets.ImageShards`. With multiple test scales, the image of
+the largest scale is kept. Runs loading the images by
+:class:`LoadImageFromShards` instead of :class:`LoadImageFromFile` skip
+decoding and resizing, which is bit-exact at the kept test scale, and
+the dataloader workers share the pages of the shards.
+
+Example:
+    python tools/misc/build_image_shards.py ${CONFIG} data/coco/val2017_shards
+    python tools/test.py ${CONFIG} ${CHECKPOINT} --eval bbox --cfg-options \
+        data.test.pipeline.0.type=LoadImageFromShards \
+        data.test.pipeline.0.shard_dir=data/coco/val2017_shards
+"""
+import argparse
+from multiprocessing import Pool
+
+import mmcv
+from mmcv import Config, DictAction
+from mmcv.utils import build_from_cfg
+
+from mmdet.datasets import ImageShardWriter, build_dataset
+from mmdet.datasets.builder import PIPELINES
+from mmdet.utils import replace_cfg_vals, update_data_root
+
+RESIZE_TYPES = ('Resize', 'FusedResizeNormalizePad')
+RESIZE_KEYS = ('keep_ratio', 'interpolation', 'backend')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Write the resized test images of a dataset to shards')
+    parser.add_argument('config', help='config file path')
+    parser.add_argument('out', help='directory of the image shards')
+    parser.add_argument(
+        '--shard-size',
+        type=float,
+        default=4,
+        help='size of a shard in GiB')
+    parser.add_argument(
+        '--nproc', type=int, default=4, help='processes loading images')
+    parser.add_argument(
+        '--cfg-options',
+        nargs='+',
+        action=DictAction,
+        help='override some settings in the used config, the key-value pair '
+        'in xxx=yyy format will be merged into config file.')
+    return parser.parse_args()
+
+
+def parse_test_pipeline(pipeline):
+    """Get the loading, the resize config and the test scales of a test
+    pipeline."""
+    load_cfg = pipeline[0]
+    assert load_cfg['type'] == 'LoadImageFromFile', \
+        'the test pipeline must start with LoadImageFromFile'
+    transforms, scales = pipeline[1:], None
+    for transform in pipeline[1:]:
+        if transform['type'] == 'MultiScaleFlipAug':
+            assert transform.get('img_scale') is not None, \
+                'test scales given by scale_factor are not supported'
+            scales = transform['img_scale']
+            transforms = transform['transforms']
+            break
+    resize_cfg = None
+    for transform in transforms:
+        if transform['type'] in RESIZE_TYPES:
+            resize_cfg = transform
+            break
+    assert resize_cfg is not None, 'no Resize in the test pipeline'
+    if scales is None:
+        scales = resize_cfg['img_scale']
+    if not isinstance(scales, list):
+        scales = [scales]
+    resize_cfg = {
+        key: resize_cfg[key]
+        for key in RESIZE_KEYS if key in resize_cfg
+    }
+    return load_cfg, dict(type='Resize', **resize_cfg), \
+        [tuple(scale) for scale in scales]
+
+
+def init_worker(load_cfg, resize_cfg, scales):
+    global load, resize, test_scales
+    load = build_from_cfg(load_cfg, PIPELINES)
+    resize = build_from_cfg(resize_cfg, PIPELINES)
+    test_scales = scales
+
+
+def resize_image(task):
+    """Load and resize an image to its largest test scale."""
+    data_info, img_prefix = task
+    results = load(dict(img_info=data_info, img_prefix=img_prefix))
+    h, w = results['ori_shape'][:2]
+    if resize.keep_ratio:
+        results['scale'] = max(
+            test_scales,
+            key=lambda scale: min(
+                max(scale) / max(h, w),
+                min(scale) / min(h, w)))
+    else:
+        results['scale'] = max(
+            test_scales, key=lambda scale: scale[0] * scale[1])
+    results = resize(results)
+    return data_info['filename'], results['img'], results['ori_shape']
+
+
+def main():
+    args = parse_args()
+    cfg = Config.fromfile(args.config)
+    cfg = replace_cfg_vals(cfg)
+    update_data_root(cfg)
+    if args.cfg_options is not None:
+        cfg.merge_from_dict(args.cfg_options)
+
+    cfg.data.test.test_mode = True
+    dataset = build_dataset(cfg.data.test)
+    load_cfg, resize_cfg, scales = parse_test_pipeline(cfg.data.test.pipeline)
+    writer = ImageShardWriter(
+        args.out,
+        shard_size=int(args.shard_size * (1 << 30)),
+        meta=dict(
+            config=args.config,
+            load=dict(load_cfg),
+            resize=resize_cfg,
+            scales=scales))
+
+    tasks = [(data_info, dataset.img_prefix)
+             for data_info in dataset.data_infos]
+    prog_bar = mmcv.ProgressBar(len(tasks))
+    with Pool(args.nproc, init_worker,
+              (load_cfg, resize_cfg, scales)) as pool:
+        for filename, img, ori_shape in pool.imap(
+                resize_image, tasks, chunksize=16):
+            writer.add(filename, img, ori_shape)
+            prog_bar.update()
+    writer.close()
+    print(f'\n{len(tasks)} images written to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
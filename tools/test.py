@@ -13,6 +13,7 @@ from mmcv.runner import (get_dist_info, init_dist, load_checkpoint,
                          wrap_fp16_model)
 
 from mmdet.apis import multi_gpu_test, single_gpu_test
+from mmdet.core import BaseDetResults
 from mmdet.datasets import (build_dataloader, build_dataset,
                             replace_ImageToTensor)
 from mmdet.models import build_detector
@@ -31,6 +32,12 @@ def parse_args():
         '--work-dir',
         help='the directory to save the file containing evaluation metrics')
     parser.add_argument('--out', help='output result file in pickle format')
+    parser.add_argument(
+        '--result-dir',
+        help='directory to stream the bbox / instance segmentation results '
+        'to in a columnar on-disk format instead of keeping them in memory, '
+        'in distributed testing every rank writes its own shard and the '
+        'directory must be shared by all ranks')
     parser.add_argument(
         '--fuse-conv-bn',
         action='store_true',
@@ -237,7 +244,7 @@ def main():
     if not distributed:
         model = build_dp(model, cfg.device, device_ids=cfg.gpu_ids)
         outputs = single_gpu_test(model, data_loader, args.show, args.show_dir,
-                                  args.show_score_thr)
+                                  args.show_score_thr, args.result_dir)
     else:
         model = build_ddp(
             model,
@@ -246,13 +253,17 @@ def main():
             broadcast_buffers=False)
         outputs = multi_gpu_test(
             model, data_loader, args.tmpdir, args.gpu_collect
-            or cfg.evaluation.get('gpu_collect', False))
+            or cfg.evaluation.get('gpu_collect', False), args.result_dir)
 
     rank, _ = get_dist_info()
     if rank == 0:
+        if args.result_dir:
+            print(f'\nresults are streamed to {args.result_dir}')
         if args.out:
             print(f'\nwriting results to {args.out}')
-            mmcv.dump(outputs, args.out)
+            mmcv.dump(
+                outputs.to_list() if isinstance(outputs, BaseDetResults) else
+                outputs, args.out)
         kwargs = {} if args.eval_options is None else args.eval_options
         if args.format_only:
             dataset.format_results(outputs, **kwargs)